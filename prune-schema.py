@@ -1,54 +1,168 @@
 import argparse
 import json
+import os
 
 
-def prune_schema(full_schema, target_type, target_title):
-    defs = full_schema.get("$defs", {})
-    if target_type not in defs:
-        raise ValueError(f"Type '{target_type}' not found in $defs")
-
-    referenced_names = {target_type}
-    to_process = [defs[target_type]]
-
-    # Step 1: Find all recursive references
+def find_refs(node):
+    """Names of all types referenced (as "#/$defs/TypeName") within a node"""
+    refs = set()
+    to_process = [node]
     while to_process:
         current = to_process.pop()
-
-        # We look for strings like "#/$defs/TypeName"
         if isinstance(current, dict):
             for key, value in current.items():
                 if key == "$ref" and isinstance(value, str):
-                    ref_name = value.split("/")[-1]
-                    if ref_name in defs and ref_name not in referenced_names:
-                        referenced_names.add(ref_name)
-                        to_process.append(defs[ref_name])
+                    refs.add(value.split("/")[-1])
                 else:
                     to_process.append(value)
         elif isinstance(current, list):
             to_process.extend(current)
+    return refs
+
+
+class SchemaPruner:
+    """Prunes one loaded JSON schema to any number of target types.
+
+    The $ref graph of $defs is built once. Transitive closures are computed
+    once per strongly connected component (mutually referencing types share
+    one closure), in reverse topological order, and memoized as bitsets over
+    the $defs order, so pruning to many targets costs about one pass over the
+    schema rather than one per target.
+    """
+
+    def __init__(self, full_schema):
+        self.full_schema = full_schema
+        self.defs = full_schema.get("$defs", {})
+        self.names = list(self.defs)
+        self.order = {name: i for i, name in enumerate(self.names)}
+        self.graph = {
+            name: sorted(ref for ref in find_refs(definition) if ref in self.defs)
+            for name, definition in self.defs.items()
+        }
+        self.component = {}
+        self.closures = []
+        self._condense()
+
+    def _condense(self):
+        # Iterative Tarjan; components are emitted after all components they
+        # reference, so their closures are already known.
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        counter = 0
+        for root in self.graph:
+            if root in index:
+                continue
+            work = [(root, iter(self.graph[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(self.graph[successor])))
+                        break
+                    if successor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        self._close_component(stack, on_stack, node)
 
-    # Step 2: Build the new pruned schema
-    pruned_defs = {name: defs[name] for name in referenced_names}
+    def _close_component(self, stack, on_stack, root):
+        members = []
+        while True:
+            member = stack.pop()
+            on_stack.discard(member)
+            members.append(member)
+            if member == root:
+                break
+        component = len(self.closures)
+        closure = 0
+        for member in members:
+            self.component[member] = component
+            closure |= 1 << self.order[member]
+        for member in members:
+            for ref in self.graph[member]:
+                if self.component[ref] != component:
+                    closure |= self.closures[self.component[ref]]
+        self.closures.append(closure)
+
+    def referenced_names(self, target_type):
+        """Names of the target and all types it references, in $defs order"""
+        if target_type not in self.defs:
+            raise ValueError(f"Type '{target_type}' not found in $defs")
+        closure = self.closures[self.component[target_type]]
+        bits = bin(closure)[:1:-1]
+        return [self.names[i] for i, bit in enumerate(bits) if bit == "1"]
+
+    def prune(self, target_type, target_title):
+        names = self.referenced_names(target_type)
+        return {
+            "$schema": self.full_schema.get(
+                "$schema", "https://json-schema.org/draft/2020-12/schema"
+            ),
+            "title": target_title,
+            "$ref": f"#/$defs/{target_type}",
+            "$defs": {name: self.defs[name] for name in names},
+        }
+
+
+def prune_schema(full_schema, target_type, target_title):
+    return SchemaPruner(full_schema).prune(target_type, target_title)
+
+
+def load_manifest(path):
+    """Targets as a list of {"type", "title", "output"} entries (JSON or YAML)"""
+    with open(path) as f:
+        if path.endswith(".json"):
+            manifest = json.load(f)
+        else:
+            import yaml
+
+            manifest = yaml.safe_load(f)
+    return manifest["targets"] if isinstance(manifest, dict) else manifest
 
-    return {
-        "$schema": full_schema.get(
-            "$schema", "https://json-schema.org/draft/2020-12/schema"
-        ),
-        "title": target_title,
-        "$ref": f"#/$defs/{target_type}",
-        "$defs": pruned_defs,
-    }
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Prune a JSON schema to a specific type and its dependencies.")
+    parser = argparse.ArgumentParser(description="Prune a JSON schema to specific types and their dependencies.")
     parser.add_argument("input_file", help="Path to the input JSON schema file")
-    parser.add_argument("output_file", help="Path to the output pruned JSON schema file")
-    parser.add_argument("target_type", help="Type name to prune to (must exist in $defs)")
-    parser.add_argument("target_title", help="Title for the pruned schema")
+    parser.add_argument("output_file", nargs="?", help="Path to the output pruned JSON schema file")
+    parser.add_argument("target_type", nargs="?", help="Type name to prune to (must exist in $defs)")
+    parser.add_argument("target_title", nargs="?", help="Title for the pruned schema")
+    parser.add_argument("--manifest", help="JSON/YAML file listing targets (type, title, output) to prune in one pass")
+    parser.add_argument("--target", nargs=3, action="append", default=[], metavar=("TYPE", "TITLE", "OUTPUT"),
+                        help="Additional target to prune to; may be repeated")
+    parser.add_argument("--output-dir", help="Directory relative manifest/target outputs are written to")
     args = parser.parse_args()
 
+    targets = [{"type": t, "title": title, "output": out} for t, title, out in args.target]
+    if args.manifest:
+        targets.extend(load_manifest(args.manifest))
+    if args.output_file or args.target_type or args.target_title:
+        if not (args.output_file and args.target_type and args.target_title):
+            parser.error("output_file, target_type and target_title must be given together")
+        targets.insert(0, {"type": args.target_type, "title": args.target_title, "output": args.output_file})
+    if not targets:
+        parser.error("no targets given")
+
     with open(args.input_file) as f:
         schema = json.load(f)
-    pruned = prune_schema(schema, args.target_type, args.target_title)
-    with open(args.output_file, "w") as f:
-        json.dump(pruned, f, indent=2)
\ No newline at end of file
+    pruner = SchemaPruner(schema)
+    for target in targets:
+        output = target["output"]
+        if args.output_dir and not os.path.isabs(output):
+            output = os.path.join(args.output_dir, output)
+        pruned = pruner.prune(target["type"], target["title"])
+        with open(output, "w") as f:
+            json.dump(pruned, f, indent=2)
@@ -0,0 +1,75 @@
+"""Helpers shared by the indexes and stores of the package (internal)."""
+import gc
+import json
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Union
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Disable the garbage collector for the block (unless it already is)"""
+    # Building allocates a few small objects per entity and reference, which
+    # would otherwise trigger repeated collections over the whole model
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Ids:
+    """Dense indexes of interned ids"""
+
+    def __init__(self) -> None:
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, id: str) -> int:
+        found = self.index.get(id)
+        if found is None:
+            found = self.index[id] = len(self.ids)
+            self.ids.append(id)
+        return found
+
+
+class JsonLineError(ValueError):
+    """A line of JSON lines input that is not exactly one JSON value"""
+
+    def __init__(self, source: str, line: int, reason: str) -> None:
+        super().__init__(f"{source}, line {line}: {reason}")
+        self.source = source
+        self.line = line
+        self.reason = reason
+
+
+_raw_decode = json.JSONDecoder().raw_decode
+
+
+def json_lines(
+    lines: Iterable[Union[str, bytes]], source: str = "<input>", errors: Optional[list[JsonLineError]] = None
+) -> Iterator[tuple[int, Any]]:
+    """(line number, value) of the non-blank lines of JSON lines input, each
+    decoded on its own. A line that is not one JSON value raises
+    JsonLineError, or is appended to ``errors`` and skipped if given."""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("UTF-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value, end = _raw_decode(line)
+            if end != len(line):
+                raise json.JSONDecodeError("Extra data", line, end)
+        except json.JSONDecodeError as e:
+            error = JsonLineError(source, number, f"{e.msg} at column {e.colno}")
+            if errors is None:
+                raise error from None
+            errors.append(error)
+            continue
+        yield number, value
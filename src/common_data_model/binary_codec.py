@@ -0,0 +1,366 @@
+"""Compact binary wire format for System Data Model versions.
+
+A version is written as a header followed by length-prefixed frames: the
+first frame holds the version and its functional model without their
+top-level collections (see :data:`~common_data_model.version_store.
+COLLECTIONS`), each following frame holds one entity of a collection, and an
+empty frame ends the version. Several versions can follow each other on the
+same stream, and :func:`iter_entities` decodes one entity at a time.
+
+Frames encode the JSON form of the data (as produced by
+:func:`common_data_model.fast_codec.to_dict`) in a tagged, msgpack-like
+format. Every string is written once per version and referenced by index
+afterwards, and the table of strings starts out with the slot names and
+enum values of the schema, so keys, enum values, client ids and repeated
+ids take one or two bytes. Decoding gives back exactly the JSON form, so
+``json_dumper`` output is the same before and after a round trip.
+
+Layout::
+
+    header   "SDMB" format(1 byte) schema fingerprint(4 bytes, big endian)
+    frame    varint length, payload (one value); length 0 ends the version
+    value    tag(1 byte) followed by
+               NULL FALSE TRUE  -
+               INT              zigzag varint
+               FLOAT            IEEE 754 double, big endian
+               STRING           string
+               LIST             varint count, values
+               DICT             varint count, (string key, value) pairs
+    string   varint (index << 1) for a string in the table, or
+             varint (length << 1 | 1) and the UTF-8 bytes of a new string
+"""
+import dataclasses
+import io
+import struct
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Union
+
+from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+from linkml_runtime.utils.yamlutils import YAMLRoot
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.json_stream import ENTITY_CLASSES
+from common_data_model.version_store import COLLECTIONS
+
+Source = Union[str, Path, bytes, IO[bytes]]
+
+MAGIC = b"SDMB"
+FORMAT_VERSION = 1
+
+NULL, FALSE, TRUE, INT, FLOAT, STRING, LIST, DICT = range(8)
+
+_DOUBLE = struct.Struct(">d")
+_CONSTANTS = (None, False, True)
+_static: Optional[tuple[list[str], bytes]] = None
+
+
+def static_strings() -> tuple[list[str], bytes]:
+    """Strings every table starts with (the slot names and enum values of the
+    datamodel) and the header identifying them"""
+    global _static
+    if _static is None:
+        strings = set()
+        for obj in vars(cdm).values():
+            if not isinstance(obj, type):
+                continue
+            if issubclass(obj, EnumDefinitionImpl):
+                strings.update(v.code.text for v in vars(obj).values() if isinstance(v, obj))
+            elif issubclass(obj, YAMLRoot) and dataclasses.is_dataclass(obj):
+                strings.update(f.name for f in dataclasses.fields(obj) if not f.name.startswith("_"))
+        table = sorted(strings)
+        fingerprint = zlib.crc32("\n".join(table).encode("UTF-8"))
+        _static = table, MAGIC + bytes([FORMAT_VERSION]) + fingerprint.to_bytes(4, "big")
+    return _static
+
+
+#region Encoding
+
+
+def _put_varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class _Encoder:
+    def __init__(self) -> None:
+        strings, _ = static_strings()
+        self.index = {s: i for i, s in enumerate(strings)}
+        self.out = bytearray()
+
+    def string(self, s: str) -> None:
+        out = self.out
+        i = self.index.get(s)
+        if i is not None:
+            _put_varint(out, i << 1)
+            return
+        self.index[s] = len(self.index)
+        data = s.encode("UTF-8")
+        _put_varint(out, len(data) << 1 | 1)
+        out += data
+
+    def value(self, v: Any) -> None:
+        out = self.out
+        cls = v.__class__
+        if cls is str:
+            out.append(STRING)
+            self.string(v)
+        elif cls is dict:
+            out.append(DICT)
+            _put_varint(out, len(v))
+            for key, item in v.items():
+                if key.__class__ is not str:
+                    raise TypeError(f"Dictionary keys must be strings, not {key!r}")
+                self.string(key)
+                self.value(item)
+        elif cls is list or cls is tuple:
+            out.append(LIST)
+            _put_varint(out, len(v))
+            for item in v:
+                self.value(item)
+        elif v is None:
+            out.append(NULL)
+        elif v is True:
+            out.append(TRUE)
+        elif v is False:
+            out.append(FALSE)
+        elif isinstance(v, int):
+            out.append(INT)
+            _put_varint(out, v << 1 if v >= 0 else (-v << 1) - 1)
+        elif isinstance(v, float):
+            out.append(FLOAT)
+            out += _DOUBLE.pack(v)
+        elif isinstance(v, str):
+            self.value(str(v))
+        elif isinstance(v, (Decimal, datetime, date)):
+            # Written as strings by json_dumper
+            self.value(str(v))
+        else:
+            raise TypeError(f"Cannot encode {cls.__name__} values")
+
+    def frame(self, v: Any) -> bytes:
+        self.out = bytearray()
+        self.value(v)
+        payload = self.out
+        self.out = bytearray()
+        _put_varint(self.out, len(payload))
+        return bytes(self.out + payload)
+
+
+def _head(element: cdm.SystemSdmSystemModelVersion) -> dict:
+    # Shallow copies of the version and functional model without collections
+    head = fast_codec.new(type(element))
+    head.__dict__.update(element.__dict__)
+    if element.functionalModel is not None:
+        head.functionalModel = fast_codec.new(type(element.functionalModel))
+        head.functionalModel.__dict__.update(element.functionalModel.__dict__)
+    for owner, key in COLLECTIONS.values():
+        target = getattr(head, owner) if owner else head
+        if target is not None:
+            setattr(target, key, [])
+    return fast_codec.to_dict(head)
+
+
+def iter_frames(element: cdm.SystemSdmSystemModelVersion) -> Iterator[bytes]:
+    """Header and frames of ``element``, one entity at a time"""
+    encoder = _Encoder()
+    yield static_strings()[1]
+    yield encoder.frame(_head(element))
+    for name, (owner, key) in COLLECTIONS.items():
+        target = getattr(element, owner) if owner else element
+        for entity in (getattr(target, key) or []) if target is not None else []:
+            yield encoder.frame([name, fast_codec.to_dict(entity)])
+    yield b"\x00"
+
+
+def dumps(element: cdm.SystemSdmSystemModelVersion) -> bytes:
+    return b"".join(iter_frames(element))
+
+
+def dump(element: cdm.SystemSdmSystemModelVersion, to_file: Union[str, Path, IO[bytes]]) -> None:
+    """Write ``element`` to a path or a binary file object (e.g. a socket file)"""
+    if isinstance(to_file, (str, Path)):
+        with open(to_file, "wb") as output_file:
+            dump(element, output_file)
+        return
+    write = to_file.write
+    for frame in iter_frames(element):
+        write(frame)
+    to_file.flush()
+
+
+#endregion
+
+#region Decoding
+
+
+def _decoder() -> Callable[[bytes, int], tuple[Any, int]]:
+    """Function decoding the value at an offset of a payload, with the string
+    table of one version. Strings and small varints are decoded inline, as
+    this is where decoding spends its time."""
+    strings = list(static_strings()[0])
+    append_string = strings.append
+    unpack_double = _DOUBLE.unpack_from
+
+    def value(data: bytes, pos: int) -> tuple[Any, int]:
+        tag = data[pos]
+        if tag < INT:
+            return _CONSTANTS[tag], pos + 1
+        if tag == FLOAT:
+            return unpack_double(data, pos + 1)[0], pos + 9
+        if tag > DICT:
+            raise ValueError(f"Unknown tag {tag} at offset {pos}")
+        n = data[pos + 1]
+        pos += 2
+        if n > 0x7F:
+            n, pos = _varint(data, pos - 1)
+        if tag == STRING:
+            if not n & 1:
+                return strings[n >> 1], pos
+            end = pos + (n >> 1)
+            s = data[pos:end].decode("UTF-8")
+            append_string(s)
+            return s, end
+        if tag == DICT:
+            result = {}
+            for _ in range(n):
+                k = data[pos]
+                pos += 1
+                if k > 0x7F:
+                    k, pos = _varint(data, pos - 1)
+                if not k & 1:
+                    key = strings[k >> 1]
+                else:
+                    end = pos + (k >> 1)
+                    key = data[pos:end].decode("UTF-8")
+                    append_string(key)
+                    pos = end
+                result[key], pos = value(data, pos)
+            return result, pos
+        if tag == LIST:
+            result = [None] * n
+            for i in range(n):
+                result[i], pos = value(data, pos)
+            return result, pos
+        # INT
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+
+    return value
+
+
+def _varint(data: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _read(stream: IO[bytes], size: int) -> bytes:
+    data = stream.read(size)
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("Truncated SDM binary stream")
+        data += chunk
+    return data
+
+
+def _read_varint(stream: IO[bytes]) -> int:
+    n = shift = 0
+    while True:
+        b = _read(stream, 1)[0]
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n
+        shift += 7
+
+
+def _frames(stream: IO[bytes]) -> Iterator[Any]:
+    """Decoded frames of the next version on ``stream``"""
+    header = static_strings()[1]
+    found = _read(stream, len(header))
+    if found[:4] != MAGIC:
+        raise ValueError("Not an SDM binary stream")
+    if found != header:
+        raise ValueError("SDM binary stream was written with a different schema or format version")
+    value = _decoder()
+    while True:
+        size = _read_varint(stream)
+        if not size:
+            return
+        payload = _read(stream, size)
+        decoded, end = value(payload, 0)
+        if end != size:
+            raise ValueError("Malformed SDM binary frame")
+        yield decoded
+
+
+def _open(source: Source) -> IO[bytes]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, (str, Path)):
+        return open(source, "rb")
+    return source
+
+
+def iter_entities(
+    source: Source, collections: Optional[Iterable[str]] = None
+) -> Iterator[tuple[str, Any]]:
+    """Yield ``(collection, entity)`` for the entities of the next version on
+    ``source``, one entity in memory at a time"""
+    wanted = set(COLLECTIONS if collections is None else collections)
+    unknown = wanted - ENTITY_CLASSES.keys()
+    if unknown:
+        raise ValueError(f"Unknown collections: {', '.join(sorted(unknown))}")
+    stream = _open(source)
+    try:
+        frames = _frames(stream)
+        next(frames)
+        for name, entity in frames:
+            if name in wanted:
+                yield name, fast_codec.from_dict(ENTITY_CLASSES[name], entity)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+def load(source: Source) -> cdm.SystemSdmSystemModelVersion:
+    """Read the next version from a path, bytes or a binary file object"""
+    stream = _open(source)
+    try:
+        frames = _frames(stream)
+        head = next(frames)
+        entities: dict[str, list] = {}
+        for name, entity in frames:
+            entities.setdefault(name, []).append(fast_codec.from_dict(ENTITY_CLASSES[name], entity))
+    finally:
+        if stream is not source:
+            stream.close()
+    functional_model = head.get("functionalModel")
+    for name, (owner, key) in COLLECTIONS.items():
+        if name not in entities:
+            continue
+        if owner:
+            functional_model = head[owner] = functional_model or {}
+            functional_model[key] = entities[name]
+        else:
+            head[key] = entities[name]
+    if functional_model is not None:
+        head["functionalModel"] = fast_codec.from_dict(cdm.SystemSdmFunctionalModel, functional_model)
+    return fast_codec.from_dict(cdm.SystemSdmSystemModelVersion, head)
+
+
+def loads(data: bytes) -> cdm.SystemSdmSystemModelVersion:
+    return load(data)
+
+
+#endregion
@@ -0,0 +1,341 @@
+"""Consolidation of many BOMs into one buy list, a ``ProConsolidatedBOM``.
+
+Procurement runs merge thousands of project BOMs, each built a number of
+times, into the quantities to buy of every part. :class:`BomConsolidator`
+flattens the items of the BOMs added to it into columnar arrays:
+
+* parts are keyed by (manufacturer, MPN) after normalizing both (see
+  :mod:`common_data_model.part_index`), and the
+  raw texts are interned so every distinct spelling is normalized once;
+* every BOM line keeps its part and quantity (the item quantity times the
+  builds of its BOM) in arrays, and its substitutes in a CSR pair of
+  arrays; alternates, which replace a part in every BOM, join it in an
+  equivalence group (union-find over the parts);
+* the quantities are summed per part in one pass over the line arrays.
+
+:meth:`BomConsolidator.consolidate` builds the ``ProConsolidatedBOM`` with
+an item per part, its alternates and substitutes, and ``ProBomIssue``
+entries for the conflicts found: lines without MPN, designators not
+matching quantities, parts with several library parts, and MPNs listed
+both with and without manufacturer.
+"""
+from array import array
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.part_index import normalize_manufacturer, normalize_mpn
+
+ERROR = "Error"
+WARNING = "Warning"
+
+BomLike = Union[cdm.ProBomWIP, cdm.ProBomRelease, dict]
+
+
+class _Keys:
+    """Dense ids of normalized keys, with the id of every raw text cached"""
+
+    def __init__(self, normalize: Callable[[str], str], aliases: Optional[dict[str, str]] = None) -> None:
+        self.normalize = normalize
+        self.aliases = {normalize(k): normalize(v) for k, v in (aliases or {}).items()}
+        self.keys: list[str] = []
+        # First spelling of every key, as shown in the consolidated BOM
+        self.texts: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._raw: dict[str, int] = {}
+
+    def id(self, text: str) -> int:
+        found = self._raw.get(text)
+        if found is None:
+            key = self.normalize(text)
+            key = self.aliases.get(key, key)
+            found = self._ids.get(key)
+            if found is None:
+                found = self._ids[key] = len(self.keys)
+                self.keys.append(key)
+                self.texts.append(text.strip())
+            self._raw[text] = found
+        return found
+
+
+class Part(NamedTuple):
+    manufacturer: str
+    mpn: str
+
+
+def _items(value: Any) -> list:
+    if not value:
+        return []
+    if isinstance(value, dict):
+        return list(value.values())
+    return value if isinstance(value, list) else [value]
+
+
+class BomConsolidator:
+    def __init__(self, manufacturers: Optional[dict[str, str]] = None) -> None:
+        """Consolidator of BOMs, with ``manufacturers`` mapping aliases to
+        manufacturer names (e.g. ``{"TI": "Texas Instruments"}``)"""
+        self._manufacturers = _Keys(normalize_manufacturer, manufacturers)
+        self._mpns = _Keys(normalize_mpn)
+        # (manufacturer id << 32 | MPN id) -> part, and back
+        self._parts: dict[int, int] = {}
+        # (manufacturer, MPN) as spelled in the BOMs -> part
+        self._raw_parts: dict[tuple[Optional[str], str], int] = {}
+        self._part_manufacturer = array("i")
+        self._part_mpn = array("i")
+        # Library part and component of every part (first seen)
+        self._library: list[Optional[str]] = []
+        self._component: list[Optional[str]] = []
+        # Alternate equivalence groups
+        self._parent = array("i")
+        # Lines: part, quantity, BOM, and substitutes (CSR)
+        self._line_part = array("i")
+        self._line_quantity = array("q")
+        self._line_bom = array("i")
+        self._substitute_offsets = array("i", [0])
+        self._substitutes = array("i")
+        self.boms: list[str] = []
+        # (severity, part or -1, description, how to fix)
+        self._issues: list[tuple[str, int, str, str]] = []
+        self._library_conflicts: set[tuple[int, str]] = set()
+
+    @property
+    def lines(self) -> int:
+        return len(self._line_part)
+
+    @property
+    def parts(self) -> int:
+        return len(self._part_mpn)
+
+    def part(self, index: int) -> Part:
+        return Part(
+            self._manufacturers.texts[self._part_manufacturer[index]],
+            self._mpns.texts[self._part_mpn[index]],
+        )
+
+    #region Loading
+
+    def add(self, bom: BomLike, builds: int = 1, name: Optional[str] = None) -> None:
+        """Add the items of a BOM (object or JSON form), built ``builds`` times"""
+        get = dict.get if isinstance(bom, dict) else getattr
+        if name is None:
+            name = str(get(bom, "id") or len(self.boms))
+        index = len(self.boms)
+        self.boms.append(name)
+
+        line_part, line_quantity, line_bom = self._line_part, self._line_quantity, self._line_bom
+        substitute_offsets, substitutes = self._substitute_offsets, self._substitutes
+        for item in _items(get(bom, "items")):
+            quantity = get(item, "quantity") or 0
+            designators = get(item, "designators")
+            element = get(item, "primaryElement")
+            part = self._part(element, get) if element else -1
+            if part < 0:
+                self._issues.append(
+                    (ERROR, -1, f"Item {self._designators(designators)} of {name} has no MPN", "Select a part for the item.")
+                )
+                continue
+            if designators and len(designators) != quantity:
+                self._issues.append(
+                    (
+                        WARNING,
+                        part,
+                        f"Item {self._designators(designators)} of {name} has {len(designators)} designators"
+                        f" for a quantity of {quantity}",
+                        "Correct the quantity or the designators of the item.",
+                    )
+                )
+            line_part.append(part)
+            line_quantity.append(int(quantity) * builds)
+            line_bom.append(index)
+            alternates = get(item, "alternates")
+            if alternates:
+                for alternate in _items(alternates):
+                    other = self._part(alternate, get)
+                    if other >= 0:
+                        self._union(part, other)
+            others = get(item, "substitutes")
+            if others:
+                for substitute in _items(others):
+                    other = self._part(substitute, get)
+                    if other >= 0 and other != part:
+                        substitutes.append(other)
+            substitute_offsets.append(len(substitutes))
+
+    @staticmethod
+    def _designators(designators: Optional[list]) -> str:
+        if not designators:
+            return "(no designators)"
+        if len(designators) > 3:
+            return ", ".join(designators[:3]) + ", ..."
+        return ", ".join(designators)
+
+    def _part(self, element: Any, get) -> int:
+        raw = (get(element, "BomItemElement_manufacturer"), get(element, "BomItemElement_mpn"))
+        library = get(element, "BomItemElement_part")
+        part = self._raw_parts.get(raw)
+        if part is None:
+            if not raw[1] or not raw[1].strip():
+                return -1
+            manufacturer = self._manufacturers.id(raw[0] or "")
+            mpn = self._mpns.id(raw[1])
+            key = manufacturer << 32 | mpn
+            part = self._parts.get(key)
+            if part is None:
+                part = self._parts[key] = len(self._part_mpn)
+                self._part_manufacturer.append(manufacturer)
+                self._part_mpn.append(mpn)
+                self._parent.append(part)
+                self._library.append(str(library) if library else None)
+                component = get(element, "BomItemElement_component")
+                self._component.append(str(component) if component else None)
+            self._raw_parts[raw] = part
+        if library and self._library[part] != library:
+            if self._library[part] is None:
+                self._library[part] = str(library)
+            elif (part, library) not in self._library_conflicts:
+                self._library_conflicts.add((part, str(library)))
+                self._issues.append(
+                    (
+                        ERROR,
+                        part,
+                        f"{self._describe(part)} is linked to library parts {self._library[part]} and {library}",
+                        "Link the BOM items of the part to one library part.",
+                    )
+                )
+        return part
+
+    def _describe(self, part: int) -> str:
+        manufacturer, mpn = self.part(part)
+        return f"{mpn} ({manufacturer})" if manufacturer else mpn
+
+    def _find(self, part: int) -> int:
+        parent = self._parent
+        while parent[part] != part:
+            parent[part] = parent[parent[part]]
+            part = parent[part]
+        return part
+
+    def _union(self, a: int, b: int) -> None:
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self._parent[max(a, b)] = min(a, b)
+
+    #endregion
+
+    #region Consolidation
+
+    def quantities(self) -> array:
+        """Total quantity of every part, indexed by part"""
+        totals = array("q", bytes(8 * self.parts))
+        for part, quantity in zip(self._line_part, self._line_quantity):
+            totals[part] += quantity
+        return totals
+
+    def groups(self) -> list[list[int]]:
+        """Parts of every alternate equivalence group of more than one part"""
+        members: dict[int, list[int]] = {}
+        for part in range(self.parts):
+            members.setdefault(self._find(part), []).append(part)
+        return [group for group in members.values() if len(group) > 1]
+
+    def substitutes(self) -> dict[int, list[int]]:
+        """Substitutes of every part that has any, in any BOM"""
+        found: dict[int, dict[int, None]] = {}
+        offsets, substitutes = self._substitute_offsets, self._substitutes
+        for line, part in enumerate(self._line_part):
+            start, end = offsets[line], offsets[line + 1]
+            if start != end:
+                found.setdefault(part, {}).update(dict.fromkeys(substitutes[start:end]))
+        return {part: list(others) for part, others in found.items()}
+
+    def issues(self) -> list[cdm.ProBomIssue]:
+        """Issues found so far, and of MPNs listed both with and without
+        manufacturer"""
+        return [self._issue(issue) for issue in self._all_issues()]
+
+    def _all_issues(self) -> list[tuple[str, int, str, str]]:
+        issues = list(self._issues)
+        by_mpn: dict[int, list[int]] = {}
+        for part, mpn in enumerate(self._part_mpn):
+            by_mpn.setdefault(mpn, []).append(part)
+        # Different manufacturers of an MPN are second sources, but an MPN
+        # without manufacturer could be any of them
+        unknown = self._manufacturers._ids.get("")
+        for mpn, parts in by_mpn.items():
+            if len(parts) > 1 and unknown is not None:
+                anonymous = [p for p in parts if self._part_manufacturer[p] == unknown]
+                if anonymous:
+                    names = ", ".join(self._manufacturers.texts[self._part_manufacturer[p]] for p in parts if p not in anonymous)
+                    issues.append(
+                        (
+                            WARNING,
+                            anonymous[0],
+                            f"{self._mpns.texts[mpn]} is listed without manufacturer and under {names}",
+                            "Set the manufacturer of the part in the BOM items that miss it.",
+                        )
+                    )
+        return issues
+
+    @staticmethod
+    def _issue(issue: tuple[str, int, str, str]) -> cdm.ProBomIssue:
+        severity, _, description, how_to_fix = issue
+        return fast_codec.from_dict(
+            cdm.ProBomIssue,
+            {"BomIssue_description": description, "BomIssue_howToFix": how_to_fix, "BomIssue_severity": severity},
+        )
+
+    def _element(self, part: int) -> dict:
+        manufacturer, mpn = self.part(part)
+        element = {"BomItemElement_mpn": mpn}
+        if manufacturer:
+            element["BomItemElement_manufacturer"] = manufacturer
+        if self._library[part]:
+            element["BomItemElement_part"] = self._library[part]
+        if self._component[part]:
+            element["BomItemElement_component"] = self._component[part]
+        return element
+
+    def consolidate(self, id: str) -> cdm.ProConsolidatedBOM:
+        """Consolidated BOM with an item per part in the BOMs, by manufacturer
+        and MPN, with its total quantity, alternates and substitutes"""
+        totals = self.quantities()
+        members: dict[int, list[int]] = {}
+        for group in self.groups():
+            for part in group:
+                members[part] = group
+        substitutes = self.substitutes()
+        part_issues: dict[int, list[cdm.ProBomIssue]] = {}
+        bom_issues = []
+        for issue in self._all_issues():
+            converted = self._issue(issue)
+            # Issues of parts without item (only alternates or substitutes)
+            # are issues of the BOM
+            if issue[1] < 0 or not totals[issue[1]]:
+                bom_issues.append(converted)
+            else:
+                part_issues.setdefault(issue[1], []).append(converted)
+
+        items = []
+        for part in sorted(range(self.parts), key=lambda p: (self._mpns.keys[self._part_mpn[p]], self._part_manufacturer[p])):
+            if not totals[part]:
+                continue
+            item: dict[str, Any] = {"quantity": totals[part], "primaryElement": self._element(part)}
+            if part in members:
+                item["alternates"] = [self._element(p) for p in members[part] if p != part]
+            if part in substitutes:
+                item["substitutes"] = [self._element(p) for p in substitutes[part]]
+            if part in part_issues:
+                item["issues"] = part_issues[part]
+            items.append(fast_codec.from_dict(cdm.ProBomItem, item))
+        return cdm.ProConsolidatedBOM(id=id, items=items, issues=bom_issues)
+
+    #endregion
+
+
+def consolidate(id: str, boms: Iterable[tuple[BomLike, int]], manufacturers: Optional[dict[str, str]] = None) -> cdm.ProConsolidatedBOM:
+    """Consolidated BOM of (BOM, builds) pairs"""
+    consolidator = BomConsolidator(manufacturers)
+    for bom, builds in boms:
+        consolidator.add(bom, builds)
+    return consolidator.consolidate(id)
@@ -0,0 +1,320 @@
+"""Generator of the schema-specialized JSON codec used by :mod:`fast_codec`.
+
+For every class of the generated datamodel it emits a ``to_dict`` function
+that produces the dictionary ``json_dumper`` would serialize (same keys and
+key order, empty values dropped, enums as their text) and a ``from_dict``
+function that builds the same object ``json_loader`` would, applying the
+coercions of the class' ``__post_init__`` directly instead of going through
+the generic constructor. The slot semantics (aliases, inlining, ranges,
+required slots) are taken from linkml's own ``PythonGenerator`` so that the
+codec follows the datamodel it was generated with.
+
+Run after ``gen-project`` (see the ``gen-codec`` target in project.Makefile)::
+
+    python -m common_data_model.codec_gen src/common_data_model/schema/common_data_model.yaml \\
+        -o src/common_data_model/datamodel/common_data_model_codec.py
+"""
+import argparse
+import builtins
+import dataclasses
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+DATAMODEL = "common_data_model.datamodel.common_data_model"
+DATAMODEL_PACKAGE = "common_data_model.datamodel"
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema", "common_data_model.yaml")
+
+# Slot kinds, following the branches of PythonGenerator.gen_postinit
+COERCE = "coerce"  # scalar type, enum or reference by identifier
+COERCE_LIST = "coerce_list"
+OBJECT = "object"  # inlined class
+INLINED_LIST = "inlined_list"  # inlined list of keyed entities
+OBJECTS = "objects"  # inlined list without a key
+RAW = "raw"  # not processed by __post_init__ (e.g. range Any)
+ANY_OF = "any_of"  # union of ranges, coerced by trial; only absent values are fast
+# Shapes only the generic constructor handles; from_dict falls back to it
+UNSUPPORTED = "unsupported"
+
+
+@dataclass
+class SlotRule:
+    kind: str
+    # Python name of the class the value is coerced to / constructed as
+    type_name: Optional[str] = None
+    range_kind: Optional[str] = None  # "type", "enum" or "class"
+    required: bool = False
+    key_name: Optional[str] = None
+    keyed: bool = False
+
+
+class CodecGenerator:
+    def __init__(self, schema_path: str = SCHEMA_PATH) -> None:
+        # linkml is only needed to generate the codec, not to use it
+        from linkml.generators.pythongen import PythonGenerator
+
+        self.gen = PythonGenerator(schema_path, mergeimports=True)
+        self.schema = self.gen.schema
+        self.classes = {
+            self.gen.class_or_type_name(c.name): c for c in self.schema.classes.values()
+        }
+
+    def rule(self, cls, slot) -> SlotRule:
+        gen, schema = self.gen, self.schema
+        if slot.designates_type:
+            return SlotRule(UNSUPPORTED)
+        if not slot.multivalued and (slot.any_of or slot.exactly_one_of):
+            return SlotRule(ANY_OF, range_kind="type", required=bool(slot.required))
+        if slot.range in schema.classes and gen.is_class_unconstrained(schema.classes[slot.range]):
+            return SlotRule(RAW)
+        if slot.range in schema.enums and not schema.enums[slot.range].permissible_values:
+            return SlotRule(RAW)
+
+        _, _, type_name = gen.class_reference_type(slot, cls)
+        if slot.range in schema.enums:
+            range_kind = "enum"
+        elif slot.range in schema.types:
+            range_kind = "type"
+        else:
+            range_kind = "class"
+        rule = SlotRule(COERCE, type_name, range_kind, bool(slot.required))
+
+        if not slot.multivalued:
+            if range_kind == "class" and not schema.classes[slot.range].slots:
+                rule.kind = UNSUPPORTED
+            elif range_kind == "class" and not (gen.class_identifier(slot.range) and not slot.inlined):
+                rule.kind = OBJECT
+        elif slot.inlined:
+            range_cls = schema.classes[slot.range]
+            identifier = gen.class_identifier(range_cls)
+            rule.keyed = bool(identifier)
+            if not identifier:
+                for range_slot_name in range_cls.slots:
+                    range_slot = schema.slots[range_slot_name]
+                    if range_slot.required and range_slot.range not in schema.classes:
+                        identifier = range_slot.name
+                        break
+            if not identifier:
+                rule.kind = OBJECTS
+            elif slot.inlined_as_list:
+                rule.kind = INLINED_LIST
+                rule.key_name = gen.aliased_slot_name(identifier)
+            else:
+                rule.kind = UNSUPPORTED
+        else:
+            rule.kind = COERCE_LIST
+        # Classes referenced by id are serialized like scalars
+        if range_kind == "class" and rule.kind in (COERCE, COERCE_LIST):
+            rule.range_kind = "type"
+        return rule
+
+    def class_rules(self, pycls: type) -> dict[str, list[SlotRule]]:
+        """Rules of each field, in the order the __post_init__ chain applies them"""
+        rules: dict[str, list[SlotRule]] = {}
+        for base in pycls.__mro__:
+            cls = self.classes.get(base.__name__)
+            if cls is None or not dataclasses.is_dataclass(base):
+                continue
+            # Same slots as PythonGenerator.gen_postinits
+            pkeys = [] if cls.mixin or cls.abstract else self.gen.primary_keys_for(cls)
+            slots = [self.schema.slots[k] for k in pkeys]
+            domain_slots = [s for s in self.gen.domain_slots(cls) if s.name not in pkeys]
+            slots += [s for s in domain_slots if s.required] + [s for s in domain_slots if not s.required]
+            for slot in slots:
+                rules.setdefault(self.gen.slot_name(slot.name), []).append(self.rule(cls, slot))
+        return rules
+
+    def generate(self) -> str:
+        import importlib
+
+        datamodel = importlib.import_module(DATAMODEL)
+        classes = [
+            c
+            for c in vars(datamodel).values()
+            if isinstance(c, type)
+            # Defined in the datamodel or one of its subset modules
+            and c.__module__.rpartition(".")[0] == DATAMODEL_PACKAGE
+            and dataclasses.is_dataclass(c)
+            and c.__name__ in self.classes
+        ]
+        lines = [
+            f'"""Auto generated from {os.path.basename(self.gen.schema.source_file or "")}'
+            ' by common_data_model.codec_gen; do not edit"""',
+            f"import {DATAMODEL} as cdm",
+            "from common_data_model.fast_codec import (",
+            "    JsonObj, Slow, enum_text, enum_texts, generic, inlined_list, is_empty,",
+            "    new, objects, scalars,",
+            ")",
+            "",
+            "_SCALAR = (str, int, float)",
+            "",
+            "",
+            "def _object(v):",
+            "    to_dict = TO_DICT.get(v.__class__)",
+            "    return to_dict(v) or None if to_dict is not None else generic(v)",
+            "",
+            "",
+        ]
+        class_rules = {c: self.class_rules(c) for c in classes}
+        self.to_dicts = {c.__name__ for c in classes}
+        self.from_dicts = {
+            c.__name__ for c in classes if self._fast_from_dict(dataclasses.fields(c), class_rules[c])
+        }
+        for pycls in classes:
+            fields = dataclasses.fields(pycls)
+            lines += self._to_dict(pycls, fields, class_rules[pycls])
+            if pycls.__name__ in self.from_dicts:
+                lines += self._from_dict(pycls, fields, class_rules[pycls])
+        lines.append("TO_DICT = {")
+        lines += [f"    cdm.{c.__name__}: _to_dict_{c.__name__}," for c in classes]
+        lines += ["}", "", "FROM_DICT = {"]
+        lines += [f"    cdm.{c.__name__}: _from_dict_{c.__name__}," for c in classes if c.__name__ in self.from_dicts]
+        lines += ["}", ""]
+        return "\n".join(lines)
+
+    def _to_dict(self, pycls: type, fields, rules) -> list[str]:
+        name = pycls.__name__
+        lines = [f"def _to_dict_{name}(obj):", "    d = {}"]
+        for f in fields:
+            rule = rules.get(f.name, [SlotRule(RAW)])[0]
+            key = repr(f.name)
+            lines.append(f"    v = obj.{f.name}")
+            if rule.kind in (COERCE, ANY_OF) and rule.range_kind == "type":
+                lines += [
+                    "    if v is not None:",
+                    "        if isinstance(v, _SCALAR):",
+                    f"            d[{key}] = v",
+                    "        elif (v := generic(v)) is not None:",
+                    f"            d[{key}] = v",
+                ]
+                continue
+            if rule.kind in (OBJECT, INLINED_LIST, OBJECTS) and rule.type_name not in self.to_dicts:
+                rule = SlotRule(RAW)
+            if rule.kind == OBJECT:
+                lines += [
+                    "    if v is not None:",
+                    f"        v = _to_dict_{rule.type_name}(v) or None if v.__class__ is cdm.{rule.type_name} "
+                    "else _object(v)",
+                ]
+            elif rule.kind in (INLINED_LIST, OBJECTS):
+                to_dict = f"_to_dict_{rule.type_name}"
+                lines += [
+                    "    if v:",
+                    f"        v = [x for e in v if (x := {to_dict}(e) or None if e.__class__ is cdm.{rule.type_name} "
+                    "else _object(e)) is not None] or None if v.__class__ is list else generic(v)",
+                ]
+            elif rule.kind == COERCE_LIST:
+                helper = "enum_texts" if rule.range_kind == "enum" else "scalars"
+                lines += ["    if v:", f"        v = {helper}(v)"]
+            elif rule.kind == COERCE and rule.range_kind == "enum":
+                lines += ["    if v is not None:", "        v = enum_text(v)"]
+            else:
+                lines += ["    if v is not None:", "        v = generic(v)"]
+            lines += ["        if v is not None:", f"            d[{key}] = v"]
+        lines += ["    return d", "", ""]
+        return lines
+
+    @staticmethod
+    def _default(f: dataclasses.Field) -> Optional[str]:
+        if f.default_factory is list:
+            return "[]"
+        if f.default_factory is dict:
+            return "{}"
+        if f.default_factory is dataclasses.MISSING and (f.default is None or isinstance(f.default, (bool, int, float, str))):
+            return repr(f.default)
+        return None
+
+    def _coercer(self, type_name: str) -> str:
+        return type_name if hasattr(builtins, type_name) else f"cdm.{type_name}"
+
+    def _fast_from_dict(self, fields, rules) -> bool:
+        for f in fields:
+            chain = rules.get(f.name, [])
+            kinds = {r.kind for r in chain}
+            if self._default(f) is None or UNSUPPORTED in kinds or (len(chain) > 1 and not kinds <= {COERCE}):
+                return False
+        return True
+
+    def _from_dict(self, pycls: type, fields, rules) -> list[str]:
+        name = pycls.__name__
+        lines = [
+            f"if not data.keys() <= _FIELDS_{name}:",
+            "    raise Slow",
+            f"obj = new(cdm.{name})",
+            "d = obj.__dict__",
+        ]
+        for f in fields:
+            chain = rules.get(f.name, [SlotRule(RAW)])
+            lines.append(f"v = data.get({f.name!r}, {self._default(f)})")
+            if any(r.required for r in chain):
+                lines += ["if is_empty(v):", "    raise Slow"]
+            for rule in chain:
+                coercer = self._coercer(rule.type_name) if rule.type_name else None
+                # Classes without a fast path are built by their constructor
+                from_dict = f"_from_dict_{rule.type_name}" if rule.type_name in self.from_dicts else None
+                if rule.kind == ANY_OF:
+                    lines += ["if v is not None:", "    raise Slow"]
+                elif rule.kind == COERCE:
+                    test = "" if rule.required else "v is not None and "
+                    lines += [f"if {test}not isinstance(v, {coercer}):", f"    v = {coercer}(v)"]
+                elif rule.kind == COERCE_LIST:
+                    lines += [
+                        "if not isinstance(v, list):",
+                        "    v = [v] if v is not None else []",
+                        f"v = [e if isinstance(e, {coercer}) else {coercer}(e) for e in v]",
+                    ]
+                elif rule.kind == OBJECT:
+                    lines += [
+                        f"if v is not None and not isinstance(v, {coercer}):",
+                        "    if v.__class__ is not dict:",
+                        "        raise Slow",
+                        f"    v = {from_dict}(v)" if from_dict else f"    v = {coercer}(**v)",
+                    ]
+                elif rule.kind == INLINED_LIST:
+                    lines.append(
+                        f"v = inlined_list(v, {coercer}, {from_dict}, "
+                        f"{rule.key_name!r}, {rule.keyed})"
+                    )
+                elif rule.kind == OBJECTS:
+                    lines.append(f"v = objects(v, {coercer}, {from_dict})")
+                else:
+                    # Assigned through JsonObj.__setattr__ by the constructor
+                    lines += ["if isinstance(v, dict):", "    v = JsonObj(v)"]
+            lines.append(f"d[{f.name!r}] = v")
+        lines.append("return obj")
+        return [
+            f"_FIELDS_{name} = frozenset({[f.name for f in fields]!r})",
+            "",
+            "",
+            f"def _from_dict_{name}(data):",
+            "    try:",
+            *("        " + line for line in lines),
+            "    except Slow:",
+            "        # Input shapes only the constructor handles",
+            f"        return cdm.{name}(**data)",
+            "",
+            "",
+        ]
+
+
+def generate_codec(schema_path: str = SCHEMA_PATH) -> str:
+    """Source of the codec module for the schema and its generated datamodel"""
+    return CodecGenerator(schema_path).generate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the fast JSON codec for the datamodel.")
+    parser.add_argument("schema", nargs="?", default=SCHEMA_PATH, help="Path to the LinkML schema")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    source = generate_codec(args.schema)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(source)
+    else:
+        print(source)
+
+
+if __name__ == "__main__":
+    main()
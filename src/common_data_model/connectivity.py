@@ -0,0 +1,307 @@
+"""Connectivity graph of the functional blocks and ports of a functional model.
+
+Connections are stored as flat lists of endpoints (block id, port id), in
+both the ESD document and the SDM functional model. :class:`ConnectivityGraph`
+integer-indexes blocks and ports and keeps the connections in compact
+adjacency arrays (CSR: an offsets array and a flat array of indices per
+relation), answering neighbour, port usage, net and path queries without
+scanning the connection list.
+
+Connections added after the graph was built (e.g. by
+``ESDClient.add_connection``) are kept in small pending lists and merged
+into the arrays once they exceed a fraction of the graph, so adding is
+amortized O(1). Nets and connected components are maintained with
+union-find as connections are added, and the ports of every net of more
+than one port are listed under its root, the smaller list being merged
+into the larger on union, so a net is read in time linear in its size.
+Removing connections requires building a new graph.
+"""
+from array import array
+from itertools import accumulate
+from typing import Any, Iterable, Optional
+
+from common_data_model._util import gc_paused
+
+# (block id, port id); the port id is None for endpoints naming only a block
+PortKey = tuple[str, Optional[str]]
+
+# Pending connections are merged into the arrays beyond this share of them
+COMPACT_RATIO = 0.25
+COMPACT_MIN = 1024
+
+
+def _csr(count: int, rows: array, values: Optional[array] = None) -> tuple[array, array]:
+    """Offsets and values of a CSR relation with ``count`` rows, given the
+    row of every value (and the values, which default to their positions)"""
+    counts = [0] * (count + 1)
+    for row in rows:
+        counts[row + 1] += 1
+    # Stable, so the values of a row keep their order
+    order = sorted(range(len(rows)), key=rows.__getitem__)
+    return (
+        array("l", accumulate(counts)),
+        array("l", order if values is None else map(values.__getitem__, order)),
+    )
+
+
+def _find(parent: array, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+class ConnectivityGraph:
+    def __init__(
+        self, blocks: Iterable[Any] = (), connections: Iterable[Any] = ()
+    ) -> None:
+        """Graph of the given functional blocks (with their ports) and
+        connections (with their endpoints), from the ESD document or the SDM"""
+        self.block_ids: list[str] = []
+        self.port_keys: list[PortKey] = []
+        self.connection_ids: list[str] = []
+        self._blocks: dict[str, int] = {}
+        self._ports: dict[PortKey, int] = {}
+        self._port_block = array("l")
+        # Connection -> ports, and the connection of every endpoint;
+        # append-only, so always complete
+        self._connection_offsets = array("l", [0])
+        self._connection_ports = array("l")
+        self._endpoint_connections = array("l")
+        # Port -> connections and block -> ports, for the ports and
+        # connections that existed at the last compaction
+        self._port_offsets = array("l", [0])
+        self._port_connections = array("l")
+        self._block_offsets = array("l", [0])
+        self._block_ports = array("l")
+        self._pending_connections: dict[int, list[int]] = {}
+        self._pending_ports: dict[int, list[int]] = {}
+        self._pending = 0
+        self._port_parent = array("l")
+        self._block_parent = array("l")
+        # Root port -> ports of its net, for the nets of several ports
+        self._net_ports: dict[int, list[int]] = {}
+
+        with gc_paused():
+            for block in blocks:
+                for port in block.ports or ():
+                    self.add_port(block.id, port.id)
+                self.add_block(block.id)
+            for connection in connections:
+                self._add_connection(connection)
+            self.compact()
+
+    @classmethod
+    def from_model(cls, model: Any) -> "ConnectivityGraph":
+        """Graph of a ``SystemSdmFunctionalModel`` or ``SystemESDDocument``"""
+        return cls(model.functionalBlocks or (), model.connections or ())
+
+    #region Building
+
+    def add_block(self, block_id: str) -> int:
+        index = self._blocks.get(block_id)
+        if index is None:
+            index = self._blocks[block_id] = len(self.block_ids)
+            self.block_ids.append(block_id)
+            self._block_parent.append(index)
+        return index
+
+    def add_port(self, block_id: str, port_id: Optional[str]) -> int:
+        key = (block_id, port_id)
+        index = self._ports.get(key)
+        if index is None:
+            block = self.add_block(block_id)
+            index = self._ports[key] = len(self.port_keys)
+            self.port_keys.append(key)
+            self._port_block.append(block)
+            self._port_parent.append(index)
+            self._pending_ports.setdefault(block, []).append(index)
+            self._pending += 1
+        return index
+
+    def add_connection(self, connection: Any) -> int:
+        """Add a connection with its endpoints; the blocks and ports it
+        names are added if they are not in the graph yet"""
+        index = self._add_connection(connection)
+        if self._pending > max(COMPACT_MIN, COMPACT_RATIO * len(self._connection_ports)):
+            self.compact()
+        return index
+
+    def _add_connection(self, connection: Any) -> int:
+        index = len(self.connection_ids)
+        self.connection_ids.append(connection.id)
+        ports = [self.add_port(e.functionalBlockId, e.portId) for e in connection.endpoints or ()]
+        self._connection_ports.extend(ports)
+        self._connection_offsets.append(len(self._connection_ports))
+        self._endpoint_connections.extend([index] * len(ports))
+        for port in ports:
+            self._pending_connections.setdefault(port, []).append(index)
+        self._pending += len(ports)
+        for port in ports[1:]:
+            self._union_ports(ports[0], port)
+            self._union(self._block_parent, self._port_block[ports[0]], self._port_block[port])
+        return index
+
+    @staticmethod
+    def _union(parent: array, a: int, b: int) -> None:
+        a, b = _find(parent, a), _find(parent, b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    def _union_ports(self, a: int, b: int) -> None:
+        parent = self._port_parent
+        a, b = _find(parent, a), _find(parent, b)
+        if a == b:
+            return
+        root, child = min(a, b), max(a, b)
+        parent[child] = root
+        nets = self._net_ports
+        ports, merged = nets.pop(root, None) or [root], nets.pop(child, None) or [child]
+        if len(ports) < len(merged):
+            ports, merged = merged, ports
+        ports.extend(merged)
+        nets[root] = ports
+
+    def compact(self) -> None:
+        """Merge the pending connections and ports into the adjacency arrays"""
+        if not self._pending:
+            return
+        self._port_offsets, self._port_connections = _csr(
+            len(self.port_keys), self._connection_ports, self._endpoint_connections
+        )
+        self._block_offsets, self._block_ports = _csr(len(self.block_ids), self._port_block)
+        self._pending_connections.clear()
+        self._pending_ports.clear()
+        self._pending = 0
+
+    #endregion
+
+    #region Queries
+
+    def _port(self, block_id: str, port_id: Optional[str]) -> Optional[int]:
+        return self._ports.get((block_id, port_id))
+
+    def _connections_at(self, port: int) -> list[int]:
+        found = []
+        if port + 1 < len(self._port_offsets):
+            found = self._port_connections[self._port_offsets[port] : self._port_offsets[port + 1]].tolist()
+        return found + self._pending_connections.get(port, [])
+
+    def _ports_of_block(self, block: int) -> list[int]:
+        found = []
+        if block + 1 < len(self._block_offsets):
+            found = self._block_ports[self._block_offsets[block] : self._block_offsets[block + 1]].tolist()
+        return found + self._pending_ports.get(block, [])
+
+    def _ports_of_connection(self, connection: int) -> array:
+        offsets = self._connection_offsets
+        return self._connection_ports[offsets[connection] : offsets[connection + 1]]
+
+    def _neighbour_ports(self, port: int) -> set[int]:
+        found = set()
+        for connection in self._connections_at(port):
+            found.update(self._ports_of_connection(connection))
+        found.discard(port)
+        return found
+
+    def _neighbour_blocks(self, block: int) -> set[int]:
+        port_block = self._port_block
+        found = set()
+        for port in self._ports_of_block(block):
+            for connection in self._connections_at(port):
+                found.update(port_block[p] for p in self._ports_of_connection(connection))
+        found.discard(block)
+        return found
+
+    def connections_at(self, block_id: str, port_id: Optional[str]) -> list[str]:
+        """Ids of the connections with an endpoint at a port"""
+        port = self._port(block_id, port_id)
+        if port is None:
+            return []
+        return [self.connection_ids[c] for c in self._connections_at(port)]
+
+    def port_usage(self, block_id: str, port_id: Optional[str]) -> int:
+        """Number of connection endpoints at a port"""
+        return len(self.connections_at(block_id, port_id))
+
+    def neighbours(self, block_id: str, port_id: Optional[str] = None) -> list:
+        """Ports connected to a port, or ids of the blocks connected to a block
+        when no port is given"""
+        if port_id is None:
+            block = self._blocks.get(block_id)
+            if block is None:
+                return []
+            return [self.block_ids[b] for b in sorted(self._neighbour_blocks(block))]
+        port = self._port(block_id, port_id)
+        if port is None:
+            return []
+        return [self.port_keys[p] for p in sorted(self._neighbour_ports(port))]
+
+    def net(self, block_id: str, port_id: Optional[str]) -> list[PortKey]:
+        """All ports connected to a port, directly or through other ports"""
+        port = self._port(block_id, port_id)
+        if port is None:
+            return []
+        ports = self._net_ports.get(_find(self._port_parent, port), (port,))
+        return [self.port_keys[p] for p in sorted(ports)]
+
+    def nets(self) -> list[list[PortKey]]:
+        """Ports grouped by net, for the nets connecting more than one port"""
+        keys = self.port_keys
+        return [[keys[p] for p in sorted(ports)] for _, ports in sorted(self._net_ports.items())]
+
+    def components(self) -> list[list[str]]:
+        """Ids of the blocks grouped by connected component"""
+        return self._groups(self._block_parent, self.block_ids)
+
+    @staticmethod
+    def _groups(parent: array, names: list) -> list[list]:
+        groups: dict[int, list] = {}
+        for i, name in enumerate(names):
+            groups.setdefault(_find(parent, i), []).append(name)
+        return list(groups.values())
+
+    def connected(self, source_block_id: str, target_block_id: str) -> bool:
+        source = self._blocks.get(source_block_id)
+        target = self._blocks.get(target_block_id)
+        if source is None or target is None:
+            return False
+        return _find(self._block_parent, source) == _find(self._block_parent, target)
+
+    def path(self, source_block_id: str, target_block_id: str) -> Optional[list[str]]:
+        """Ids of the blocks on a shortest path between two blocks, None if
+        they are not connected"""
+        if not self.connected(source_block_id, target_block_id):
+            return None
+        source, target = self._blocks[source_block_id], self._blocks[target_block_id]
+        # Breadth-first from both ends, expanding the smaller frontier, until
+        # the searches meet
+        forward, backward = {source: source}, {target: target}
+        forward_frontier, backward_frontier = [source], [target]
+        meeting = source if source == target else None
+        while meeting is None:
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, seen, other = forward_frontier, forward, backward
+            else:
+                frontier, seen, other = backward_frontier, backward, forward
+            following = []
+            for block in frontier:
+                for neighbour in sorted(self._neighbour_blocks(block)):
+                    if neighbour not in seen:
+                        seen[neighbour] = block
+                        following.append(neighbour)
+                        if neighbour in other:
+                            meeting = neighbour
+                            break
+                if meeting is not None:
+                    break
+            frontier[:] = following
+        path = [meeting]
+        while path[-1] != source:
+            path.append(forward[path[-1]])
+        path.reverse()
+        while path[-1] != target:
+            path.append(backward[path[-1]])
+        return [self.block_ids[b] for b in path]
+
+    #endregion
@@ -0,0 +1,261 @@
+"""Generator of the per-subset layout of the Python datamodel.
+
+``gen-project`` generates the whole datamodel into one module, so every
+consumer imports every schema module. This generator splits the same
+``PythonGenerator`` output into one module per schema module of the
+datamodel package (``datamodel.system``, ``datamodel.device_model``,
+``datamodel.procurement``, ...):
+
+* ``_base`` holds the generated imports, namespaces, types and the
+  identifier classes (which are tiny and referenced from everywhere);
+* each schema module holds its classes and enums. Base classes are imported
+  before the classes are defined; annotations naming classes of other
+  modules are turned into forward references, and the names used by
+  ``__post_init__`` are imported after the classes are defined, so subset
+  modules can reference each other;
+* ``_slots`` holds the slot definitions, which reference every module;
+* ``common_data_model`` imports all of them, so existing
+  ``import common_data_model.datamodel.common_data_model as cdm`` code sees
+  the same names and the same class objects as before;
+* ``__init__`` loads the module defining a name on first access, e.g.
+  ``from common_data_model.datamodel import SystemSdmFunctionalBlock``.
+
+Run after ``gen-project`` (see the ``gen-subsets`` target in
+project.Makefile)::
+
+    python -m common_data_model.datamodel_split src/common_data_model/schema/common_data_model.yaml \\
+        -o src/common_data_model/datamodel
+"""
+import argparse
+import ast
+import os
+from collections import defaultdict
+from typing import Optional
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema", "common_data_model.yaml")
+FACADE = "common_data_model"
+BASE = "_base"
+SLOTS = "_slots"
+
+HEADER = "# Auto generated from {schema} by common_data_model.datamodel_split; do not edit\n"
+
+
+def _names(nodes: list[ast.AST]) -> set[str]:
+    return {n.id for node in nodes for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def _import(module: str, names: set[str], comment: str = "") -> list[str]:
+    if not names:
+        return []
+    return [f"from .{module} import ({comment}", *(f"    {name}," for name in sorted(names)), ")"]
+
+
+class DatamodelSplitter:
+    def __init__(self, schema_path: str = SCHEMA_PATH) -> None:
+        # linkml is only needed to generate the layout, not to use it
+        from linkml.generators.pythongen import PythonGenerator
+        from linkml_runtime.utils.formatutils import camelcase
+
+        self.schema_path = schema_path
+        self.gen = PythonGenerator(schema_path, mergeimports=True)
+        self.source = self.gen.serialize()
+        self.lines = self.source.splitlines()
+        schema_modules = self._schema_modules()
+        self.subsets = list(dict.fromkeys(schema_modules.values()))
+        # Python name of every class and enum -> subset module defining it
+        self.owners: dict[str, str] = {}
+        for cls in self.gen.schema.classes.values():
+            self.owners[self.gen.class_or_type_name(cls.name)] = schema_modules.get(cls.from_schema, BASE)
+        for enum in self.gen.schema.enums.values():
+            self.owners[camelcase(enum.name)] = schema_modules.get(enum.from_schema, BASE)
+
+    def _schema_modules(self) -> dict[str, str]:
+        """Id of every local schema module imported by the schema -> module name"""
+        import yaml
+
+        with open(self.schema_path) as f:
+            schema = yaml.safe_load(f)
+        directory = os.path.dirname(self.schema_path)
+        modules = {}
+        for name in schema.get("imports", []):
+            path = os.path.join(directory, f"{name}.yaml")
+            if os.path.exists(path):
+                with open(path) as f:
+                    modules[yaml.safe_load(f)["id"]] = name
+        return modules
+
+    def _module_of(self, node: ast.stmt) -> str:
+        if isinstance(node, ast.ClassDef):
+            if node.name == "slots":
+                return SLOTS
+            return self.owners.get(node.name, BASE)
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name) and t.value.id == "slots"
+            for t in node.targets
+        ):
+            return SLOTS
+        return BASE
+
+    def _text(self, node: ast.stmt, quoted: Optional[set[str]] = None) -> str:
+        start = min([node.lineno, *(d.lineno for d in getattr(node, "decorator_list", []))])
+        lines = self.lines[start - 1 : node.end_lineno]
+        if quoted:
+            # Turn the given names in field annotations into forward references
+            spans = defaultdict(list)
+            for statement in node.body:
+                if isinstance(statement, ast.AnnAssign):
+                    for n in ast.walk(statement.annotation):
+                        if isinstance(n, ast.Name) and n.id in quoted:
+                            spans[n.lineno - start].append((n.col_offset, n.end_col_offset))
+            for i, columns in spans.items():
+                line = lines[i]
+                for begin, end in sorted(columns, reverse=True):
+                    line = f'{line[:begin]}"{line[begin:end]}"{line[end:]}'
+                lines[i] = line
+        return "\n".join(lines)
+
+    def split(self) -> dict[str, str]:
+        """Source of every module of the datamodel package, by module name"""
+        tree = ast.parse(self.source)
+        statements: dict[str, list[ast.stmt]] = defaultdict(list)
+        defined: dict[str, str] = {}
+        for node in tree.body:
+            module = self._module_of(node)
+            statements[module].append(node)
+            if isinstance(node, ast.ClassDef):
+                defined[node.name] = module
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        defined[target.id] = module
+
+        schema = os.path.basename(self.schema_path)
+        sources = {BASE: self._base(statements[BASE], schema)}
+        for module in self.subsets:
+            sources[module] = self._subset(module, statements[module], defined, schema)
+        sources[SLOTS] = self._slots(statements[SLOTS], defined, schema)
+        public = {name: module for name, module in defined.items() if not name.startswith("_")}
+        sources[FACADE] = self._facade(schema)
+        sources["__init__"] = self._package(public, schema)
+        return sources
+
+    def _base(self, nodes: list[ast.stmt], schema: str) -> str:
+        # The comment header of the generated module, then its definitions
+        header = []
+        for line in self.lines:
+            if not line.startswith("#"):
+                break
+            header.append(line)
+        body = "\n\n".join(self._text(node) for node in nodes)
+        return "\n".join([HEADER.format(schema=schema) + "# Shared definitions of all subsets", *header[1:], "", body, ""])
+
+    def _subset(self, module: str, nodes: list[ast.stmt], defined: dict[str, str], schema: str) -> str:
+        def foreign(names: set[str]) -> dict[str, set[str]]:
+            imports = defaultdict(set)
+            for name in names:
+                owner = defined.get(name)
+                if owner not in (None, module, BASE):
+                    imports[owner].add(name)
+            return imports
+
+        classes, before, after = [], set(), set()
+        for node in nodes:
+            functions = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            annotations = [n.annotation for n in node.body if isinstance(n, ast.AnnAssign)]
+            quoted = {name for names in foreign(_names(annotations)).values() for name in names}
+            # Evaluated when the class is defined: bases, decorators and class attributes
+            others = [n for n in node.body if n not in functions and not isinstance(n, ast.AnnAssign)]
+            others += [n.value for n in node.body if isinstance(n, ast.AnnAssign) and n.value is not None]
+            before |= _names([*node.bases, *node.decorator_list, *others])
+            after |= _names(functions) | quoted
+            classes.append(self._text(node, quoted))
+
+        lines = [HEADER.format(schema=schema) + f"# Subset: {module}", "from ._base import *  # noqa: F401,F403"]
+        before_imports = foreign(before)
+        for owner in sorted(before_imports):
+            lines += _import(owner, before_imports[owner])
+        lines += ["", "", "\n\n\n".join(classes)]
+        after_imports = foreign(after - before)
+        if after_imports:
+            lines += ["", "", "# Classes of other subsets used once the classes above are defined"]
+            for owner in sorted(after_imports):
+                lines += _import(owner, after_imports[owner], "  # noqa: E402")
+        return "\n".join([*lines, ""])
+
+    def _slots(self, nodes: list[ast.stmt], defined: dict[str, str], schema: str) -> str:
+        imports = defaultdict(set)
+        for name in _names(nodes):
+            owner = defined.get(name)
+            if owner not in (None, BASE, SLOTS):
+                imports[owner].add(name)
+        lines = [HEADER.format(schema=schema) + "# Slots", "from ._base import *  # noqa: F401,F403"]
+        for owner in sorted(imports):
+            lines += _import(owner, imports[owner])
+        lines += ["", ""]
+        lines += [self._text(node) + ("\n" if isinstance(node, ast.ClassDef) else "") for node in nodes]
+        return "\n".join([*lines, ""])
+
+    def _facade(self, schema: str) -> str:
+        lines = [
+            HEADER.format(schema=schema).rstrip(),
+            '"""The whole datamodel; import single subsets to load only part of it"""',
+            "from ._base import *  # noqa: F401,F403",
+            *(f"from .{module} import *  # noqa: F401,F403" for module in self.subsets),
+            f"from .{SLOTS} import slots  # noqa: F401",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def _package(self, public: dict[str, str], schema: str) -> str:
+        lines = [
+            HEADER.format(schema=schema).rstrip(),
+            '"""Generated datamodel.',
+            "",
+            "Names are loaded on first access together with the subset module defining",
+            "them, so that only the subsets a consumer uses are imported.",
+            '"""',
+            "import importlib",
+            "",
+            f"SUBSETS = {tuple(self.subsets)!r}",
+            "",
+            "_MODULES = {",
+            *(f"    {name!r}: {module!r}," for name, module in public.items()),
+            "}",
+            "",
+            "",
+            "def __getattr__(name):",
+            "    try:",
+            "        module = _MODULES[name]",
+            "    except KeyError:",
+            '        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None',
+            '    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)',
+            "    globals()[name] = value",
+            "    return value",
+            "",
+            "",
+            "def __dir__():",
+            "    return sorted({*globals(), *_MODULES})",
+            "",
+        ]
+        return "\n".join(lines)
+
+
+def split_datamodel(schema_path: str = SCHEMA_PATH) -> dict[str, str]:
+    """Source of every module of the per-subset datamodel package"""
+    return DatamodelSplitter(schema_path).split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the per-subset layout of the Python datamodel.")
+    parser.add_argument("schema", nargs="?", default=SCHEMA_PATH, help="Path to the LinkML schema")
+    parser.add_argument("-o", "--output", required=True, help="Datamodel package directory")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for module, source in split_datamodel(args.schema).items():
+        with open(os.path.join(args.output, f"{module}.py"), "w") as f:
+            f.write(source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Schema-specialized JSON serialization of the generated datamodel.
+
+Drop-in fast path for ``json_dumper``/``json_loader``: :func:`dumps` returns
+the same text as ``json_dumper.dumps(element, inject_type=False)`` and
+:func:`loads` builds the same objects as ``json_loader.loads``, using the
+per-class ``to_dict``/``from_dict`` functions generated by
+:mod:`common_data_model.codec_gen` instead of reflecting over every slot.
+
+The codec is generated next to the datamodel by ``make gen-codec``, which
+needs the linkml generators of the development dependencies; using this
+module before that step raises an ImportError. Input shapes the generated code does not cover (e.g. the compact
+dictionary forms of inlined lists) are handed to the generic constructor,
+so the result is always the one of ``json_loader``.
+"""
+import json
+import types
+from json.encoder import INFINITY as _INFINITY
+from json.encoder import encode_basestring as _encode_string
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, TypeVar
+
+from jsonasobj2 import JsonObj
+from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+from linkml_runtime.utils.formatutils import is_empty, remove_empty_items
+from linkml_runtime.utils.yamlutils import YAMLRoot
+
+from common_data_model import instrumentation
+
+CODEC_MODULE = "common_data_model.datamodel.common_data_model_codec"
+
+T = TypeVar("T", bound=YAMLRoot)
+
+_codec: Optional[types.ModuleType] = None
+
+__all__ = ["codec", "to_dict", "dumps", "dump", "from_dict", "loads", "load"]
+
+
+def codec() -> types.ModuleType:
+    """The generated codec module"""
+    global _codec
+    if _codec is None:
+        import importlib
+
+        try:
+            _codec = importlib.import_module(CODEC_MODULE)
+        except ModuleNotFoundError as e:
+            if e.name != CODEC_MODULE:
+                raise
+            raise ImportError(
+                f"The codec module {CODEC_MODULE} has not been generated: run `make gen-codec`"
+                " (python -m common_data_model.codec_gen -o <datamodel directory>/common_data_model_codec.py)",
+                name=CODEC_MODULE,
+            ) from None
+    return _codec
+
+
+#region Serialization
+
+
+def _default(o: Any) -> Any:
+    # json_dumper's fallback encoding
+    if isinstance(o, YAMLRoot):
+        return remove_empty_items(o, hide_protected_keys=True)
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, datetime | date):
+        return str(o)
+    return json.JSONDecoder().decode(o)
+
+
+def to_dict(element: YAMLRoot) -> dict:
+    """JSON-ready dictionary of ``element``, as serialized by ``json_dumper``"""
+    convert = codec().TO_DICT.get(type(element))
+    if convert is None:
+        return remove_empty_items(element, hide_protected_keys=True)
+    return convert(element)
+
+
+def _float(o: float) -> str:
+    if o != o:
+        return "NaN"
+    if o in (_INFINITY, -_INFINITY):
+        return "Infinity" if o > 0 else "-Infinity"
+    return float.__repr__(o)
+
+
+def _encode(o: Any, indent: str, out: list[str]) -> None:
+    """json.dumps(o, ensure_ascii=False, indent="  ") into ``out``.
+
+    The standard library only has a C encoder for compact output; this one
+    only handles the plain JSON types to_dict produces, but is several times
+    faster than the pure Python encoder the stdlib uses for indented output.
+    """
+    cls = o.__class__
+    if cls is dict:
+        if not o:
+            out.append("{}")
+            return
+        if not all(k.__class__ is str for k in o):
+            # Keys are coerced to strings by the standard encoder
+            text = json.dumps(o, default=_default, ensure_ascii=False, indent="  ")
+            out.append(text.replace("\n", "\n" + indent))
+            return
+        inner = indent + "  "
+        separator = "{\n" + inner
+        for key, value in o.items():
+            out.append(separator + _encode_string(key) + ": ")
+            if value.__class__ is str:
+                out.append(_encode_string(value))
+            else:
+                _encode(value, inner, out)
+            separator = ",\n" + inner
+        out.append("\n" + indent + "}")
+    elif cls is list or cls is tuple:
+        if not o:
+            out.append("[]")
+            return
+        inner = indent + "  "
+        separator = "[\n" + inner
+        for value in o:
+            out.append(separator)
+            if value.__class__ is str:
+                out.append(_encode_string(value))
+            else:
+                _encode(value, inner, out)
+            separator = ",\n" + inner
+        out.append("\n" + indent + "]")
+    elif isinstance(o, str):
+        out.append(_encode_string(o))
+    elif o is None:
+        out.append("null")
+    elif o is True:
+        out.append("true")
+    elif o is False:
+        out.append("false")
+    elif isinstance(o, int):
+        out.append(int.__repr__(o))
+    elif isinstance(o, float):
+        out.append(_float(o))
+    else:
+        _encode(_default(o), indent, out)
+
+
+def dumps(element: YAMLRoot) -> str:
+    """Same as ``json_dumper.dumps(element, inject_type=False)``"""
+    with instrumentation.stage("serialize.to_dict"):
+        data = to_dict(element)
+    with instrumentation.stage("serialize.encode"):
+        out: list[str] = []
+        _encode(data, "", out)
+        text = "".join(out)
+    instrumentation.count("serialize.characters", len(text))
+    return text
+
+
+def dump(element: YAMLRoot, to_file: str) -> None:
+    with open(to_file, "w", encoding="UTF-8") as output_file:
+        output_file.write(dumps(element))
+
+
+#endregion
+
+#region Deserialization
+
+
+class Slow(Exception):
+    """Raised by generated code for input only the generic constructor handles"""
+
+
+def from_dict(target_class: type[T], data: dict) -> T:
+    """Same as ``target_class(**data)`` for a dictionary parsed from JSON"""
+    convert = codec().FROM_DICT.get(target_class)
+    if convert is None:
+        return target_class(**data)
+    return convert(data)
+
+
+def loads(source: str, target_class: type[T]) -> T:
+    """Same as ``json_loader.loads(source, target_class=target_class)``"""
+    return from_dict(target_class, json.loads(source))
+
+
+def load(source: str, target_class: type[T]) -> T:
+    with open(source, encoding="UTF-8") as input_file:
+        return from_dict(target_class, json.load(input_file))
+
+
+#endregion
+
+#region Support for the generated code
+
+new = object.__new__
+
+
+def generic(v: Any) -> Any:
+    """json_dumper's conversion of a value; None if it is empty"""
+    return remove_empty_items(v, hide_protected_keys=True, inside=True)
+
+
+def scalars(v: Any) -> Optional[list]:
+    if v.__class__ is not list:
+        return generic(v)
+    converted = [
+        e if isinstance(e, (str, int, float)) else generic(e)
+        for e in v
+        if not (e.__class__ is str and e == "_root")
+    ]
+    return [e for e in converted if e is not None] or None
+
+
+def enum_text(v: Any) -> Any:
+    if isinstance(v, EnumDefinitionImpl) and len(v.__dict__) == 1 and v._code.text is not None:
+        return v._code.text
+    return generic(v)
+
+
+def enum_texts(v: Any) -> Optional[list]:
+    if v.__class__ is not list:
+        return generic(v)
+    return [e for e in map(enum_text, v) if e is not None] or None
+
+
+def inlined_list(
+    v: Any, cls: type, convert: Optional[Callable[[dict], Any]], key_name: str, keyed: bool
+) -> list:
+    """YAMLRoot._normalize_inlined_as_list for a list of entity dictionaries"""
+    if v is None or (v.__class__ is dict and not v):
+        return []
+    if v.__class__ is not list:
+        raise Slow
+    cooked = []
+    keys = set()
+    for entry in v:
+        if not isinstance(entry, cls):
+            # Single entry dictionaries may be {key: {...}} or {key: value}
+            if entry.__class__ is not dict or (
+                len(entry) == 1
+                and (key_name not in entry or isinstance(entry[key_name], (dict, list, JsonObj)))
+            ):
+                raise Slow
+            entry = convert(entry) if convert else cls(**entry)
+        if keyed:
+            key = getattr(entry, key_name)
+            if key in keys:
+                raise Slow
+            keys.add(key)
+        cooked.append(entry)
+    return cooked
+
+
+def objects(v: Any, cls: type, convert: Optional[Callable[[dict], Any]]) -> list:
+    if not isinstance(v, list):
+        v = [v] if v is not None else []
+    cooked = []
+    for entry in v:
+        if not isinstance(entry, cls):
+            if entry.__class__ is not dict:
+                raise Slow
+            entry = convert(entry) if convert else cls(**entry)
+        cooked.append(entry)
+    return cooked
+
+
+#endregion
@@ -0,0 +1,360 @@
+"""Columnar store of OTA devices with incrementally maintained rollups.
+
+Fleets of a few million ``ota_Device`` objects are too heavy to keep as
+generated objects, and counting the devices of a fleet on a package or in
+a status would walk all of them. :class:`FleetStore` keeps devices as
+columns instead:
+
+* device, fleet and package ids are interned to dense indexes;
+* the status of every device is a code in an ``array("b")`` (the
+  ``ota_DeviceStatus`` values, and one more for no status);
+* the fleets and packages of a device are multi-valued columns: the first
+  value of every device in an array and further values in a dict, as most
+  devices are in one fleet and report one package;
+* the number of devices per (fleet, status), per (fleet, status,
+  package) and per (fleet, status, package version) is updated on every
+  change of a device, by removing what the device contributed before the
+  change and adding what it contributes after it. A device with several
+  packages of one version counts once for that version. Row 0 of the
+  rollups counts all devices, fleet ``i`` is row ``i + 1``.
+
+Status updates are ingested from JSON lines (:meth:`FleetStore.ingest`),
+one object per line with the device ``id`` and any of ``status``,
+``fleets``, ``packages`` and ``name``, and devices, fleets and packages are
+exported back to ``OtaDevice``, ``OtaFleet`` and ``OtaPackage`` on demand.
+"""
+from array import array
+from typing import IO, Any, Iterable, Iterator, Optional, Union
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model._util import Ids, JsonLineError, gc_paused, json_lines
+
+STATUSES = tuple(v.code.text for v in vars(cdm.OtaDeviceStatus).values() if isinstance(v, cdm.OtaDeviceStatus))
+NO_STATUS = len(STATUSES)
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+_ROW = NO_STATUS + 1
+
+
+def _values(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class _Multi:
+    """Multi-valued column: the first value of every row (-1 for none) in
+    an array, and the further values of the rows with several in a dict"""
+
+    def __init__(self) -> None:
+        self.first = array("i")
+        self.more: dict[int, tuple[int, ...]] = {}
+
+    def append(self) -> None:
+        self.first.append(-1)
+
+    def get(self, row: int) -> tuple[int, ...]:
+        first = self.first[row]
+        if first < 0:
+            return ()
+        more = self.more.get(row)
+        return (first, *more) if more else (first,)
+
+    def set(self, row: int, values: tuple[int, ...]) -> None:
+        self.first[row] = values[0] if values else -1
+        if len(values) > 1:
+            self.more[row] = values[1:]
+        else:
+            self.more.pop(row, None)
+
+
+class FleetStore:
+    def __init__(self) -> None:
+        self._devices = Ids()
+        self._fleets = Ids()
+        self._packages = Ids()
+        # Device columns
+        self._status = array("b")
+        self._device_fleets = _Multi()
+        self._device_packages = _Multi()
+        self._names: dict[int, str] = {}
+        # Fleet and package columns
+        self._fleet_names: dict[int, str] = {}
+        self._package_names: dict[int, str] = {}
+        # Interned version of every package that has one
+        self._versions = Ids()
+        self._package_versions: dict[int, int] = {}
+        # Rollups: (row * _ROW + status) -> devices, (row, status, package)
+        # -> devices, and per version (row * _ROW + status) -> devices
+        self._counts = array("q", bytes(8 * _ROW))
+        self._package_counts: dict[tuple[int, int, int], int] = {}
+        self._version_counts: list[array] = []
+        # Ids of the devices of the invalid records skipped by ingest (None
+        # for records without one), and the lines it could not decode
+        self.rejected: list[Optional[str]] = []
+        self.errors: list[JsonLineError] = []
+
+    def __len__(self) -> int:
+        return len(self._status)
+
+    #region Updates
+
+    def _device(self, id: str) -> int:
+        device = self._devices.index.get(id)
+        if device is None:
+            device = self._devices.add(id)
+            self._status.append(NO_STATUS)
+            self._device_fleets.append()
+            self._device_packages.append()
+            self._counts[NO_STATUS] += 1
+        return device
+
+    def _fleet(self, id: str) -> int:
+        fleet = self._fleets.index.get(id)
+        if fleet is None:
+            fleet = self._fleets.add(id)
+            self._counts.extend(array("q", bytes(8 * _ROW)))
+            for column in self._version_counts:
+                column.extend(array("q", bytes(8 * _ROW)))
+        return fleet
+
+    def _contribute(self, device: int, sign: int) -> None:
+        status = self._status[device]
+        counts, package_counts, version_counts = self._counts, self._package_counts, self._version_counts
+        packages = self._device_packages.get(device)
+        package_versions = self._package_versions
+        if len(packages) == 1:
+            version = package_versions.get(packages[0])
+            versions = () if version is None else (version,)
+        else:
+            versions = {package_versions[p] for p in packages if p in package_versions}
+        for row in (0, *(fleet + 1 for fleet in self._device_fleets.get(device))):
+            cell = row * _ROW + status
+            counts[cell] += sign
+            for package in packages:
+                key = row, status, package
+                package_counts[key] = package_counts.get(key, 0) + sign
+            for version in versions:
+                version_counts[version][cell] += sign
+
+    def update(self, record: dict) -> None:
+        """Apply the state of a device: its ``id`` and any of ``status``,
+        ``fleets``, ``packages`` (lists of ids, replacing the current ones)
+        and ``name``. Raises ValueError, leaving the store unchanged, for a
+        record without an id or with an unknown status."""
+        if not isinstance(record, dict):
+            raise ValueError(f"Device update is not an object: {record!r}")
+        if "id" not in record:
+            raise ValueError(f"Device update without an id: {record}")
+        status = record.get("status", ...)
+        if status is not ... and status is not None:
+            if not isinstance(status, str):
+                status = status.code.text
+            if status not in _STATUS_CODES:
+                raise ValueError(f"Unknown status {status!r} of device {record['id']}")
+        # Resolve everything before the device's contribution is taken out
+        device = self._device(str(record["id"]))
+        fleets = record.get("fleets")
+        if fleets is not None:
+            fleets = tuple(dict.fromkeys(self._fleet(str(f)) for f in _values(fleets)))
+        packages = record.get("packages")
+        if packages is not None:
+            packages = tuple(dict.fromkeys(self._packages.add(str(p)) for p in _values(packages)))
+        name = record.get("name")
+        if name is not None:
+            self._names[device] = str(name)
+        if status is ... and fleets is None and packages is None:
+            return
+        self._contribute(device, -1)
+        if status is not ...:
+            self._status[device] = NO_STATUS if status is None else _STATUS_CODES[status]
+        if fleets is not None:
+            self._device_fleets.set(device, fleets)
+        if packages is not None:
+            self._device_packages.set(device, packages)
+        self._contribute(device, 1)
+
+    def add_device(self, device: Union[cdm.OtaDevice, dict]) -> None:
+        """Add or replace a device, as an object or its JSON form"""
+        if not isinstance(device, dict):
+            device = fast_codec.to_dict(device)
+        self.update(
+            {
+                "id": device["id"],
+                "name": device.get("name"),
+                "status": device.get("status"),
+                "fleets": device.get("fleets") or [],
+                "packages": device.get("packages") or [],
+            }
+        )
+
+    def add_fleet(self, fleet: Union[cdm.OtaFleet, dict]) -> None:
+        """Add a fleet, and add its devices to it"""
+        get = dict.get if isinstance(fleet, dict) else getattr
+        index = self._fleet(str(get(fleet, "id")))
+        name = get(fleet, "name")
+        if name:
+            self._fleet_names[index] = str(name)
+        for id in _values(get(fleet, "devices")):
+            device = self._device(str(id))
+            fleets = self._device_fleets.get(device)
+            if index not in fleets:
+                self._contribute(device, -1)
+                self._device_fleets.set(device, (*fleets, index))
+                self._contribute(device, 1)
+
+    def add_package(self, package: Union[cdm.OtaPackage, dict]) -> None:
+        get = dict.get if isinstance(package, dict) else getattr
+        index = self._packages.add(str(get(package, "id")))
+        name, version = get(package, "name"), get(package, "version")
+        if name:
+            self._package_names[index] = str(name)
+        if version:
+            version = self._versions.add(str(version))
+            if version == len(self._version_counts):
+                self._version_counts.append(array("q", bytes(8 * len(self._counts))))
+            if self._package_versions.get(index) != version:
+                # Move the devices that have the package to the new version
+                devices = self._package_devices(index)
+                for device in devices:
+                    self._contribute(device, -1)
+                self._package_versions[index] = version
+                for device in devices:
+                    self._contribute(device, 1)
+
+    def _package_devices(self, package: int) -> list[int]:
+        more = self._device_packages.more
+        devices = [d for d, p in enumerate(self._device_packages.first) if p == package]
+        devices.extend(d for d, packages in more.items() if package in packages)
+        return devices
+
+    def ingest(self, lines: Union[IO, Iterable[Union[str, bytes]]]) -> int:
+        """Apply the device updates of JSON lines (a file or an iterable of
+        lines); returns the number of updates applied. Lines that are not
+        one JSON value are skipped and listed in ``errors``, invalid records
+        (see :meth:`update`) are skipped and the ids of their devices listed
+        in ``rejected``."""
+        count = 0
+        update = self.update
+        with gc_paused():
+            for _, record in json_lines(lines, getattr(lines, "name", "<input>"), self.errors):
+                try:
+                    update(record)
+                except ValueError:
+                    self.rejected.append(record.get("id") if isinstance(record, dict) else None)
+                else:
+                    count += 1
+        return count
+
+    #endregion
+
+    #region Rollups
+
+    def _row(self, fleet: Optional[str]) -> int:
+        if fleet is None:
+            return 0
+        index = self._fleets.index.get(fleet)
+        if index is None:
+            raise KeyError(f"Unknown fleet {fleet}")
+        return index + 1
+
+    def status_counts(self, fleet: Optional[str] = None) -> dict[Optional[str], int]:
+        """Devices of a fleet (or of all fleets) per status, None for no status"""
+        start = self._row(fleet) * _ROW
+        counts = self._counts[start : start + _ROW]
+        return {(STATUSES[s] if s < NO_STATUS else None): n for s, n in enumerate(counts) if n}
+
+    def package_counts(self, fleet: Optional[str] = None, status: Optional[str] = ...) -> dict[str, int]:
+        """Devices of a fleet (or of all fleets) per installed package, of any
+        status or of one (None for no status)"""
+        row = self._row(fleet)
+        code = ... if status is ... else (NO_STATUS if status is None else _STATUS_CODES[status])
+        found: dict[str, int] = {}
+        ids = self._packages.ids
+        for (r, s, package), n in self._package_counts.items():
+            if r == row and n and (code is ... or s == code):
+                found[ids[package]] = found.get(ids[package], 0) + n
+        return found
+
+    def count(self, fleet: Optional[str] = None, status: Optional[str] = ..., version: Optional[str] = None) -> int:
+        """Devices of a fleet (or all), of a status (any by default, None for
+        no status) and with a package of a version (any by default)"""
+        row = self._row(fleet)
+        code = ... if status is ... else (NO_STATUS if status is None else _STATUS_CODES[status])
+        if version is None:
+            start = row * _ROW
+            if code is ...:
+                return sum(self._counts[start : start + _ROW])
+            return self._counts[start + code]
+        index = self._versions.index.get(version)
+        if index is None:
+            return 0
+        start = row * _ROW
+        column = self._version_counts[index]
+        if code is ...:
+            return sum(column[start : start + _ROW])
+        return column[start + code]
+
+    def devices(self, fleet: Optional[str] = None, status: Optional[str] = ...) -> list[str]:
+        """Ids of the devices of a fleet (or all) and of a status (any by
+        default, None for no status), by scanning the columns"""
+        row = self._row(fleet)
+        code = ... if status is ... else (NO_STATUS if status is None else _STATUS_CODES[status])
+        ids, statuses = self._devices.ids, self._status
+        if row == 0:
+            if code is ...:
+                return list(ids)
+            return [ids[d] for d, s in enumerate(statuses) if s == code]
+        fleet_index = row - 1
+        first, more = self._device_fleets.first, self._device_fleets.more
+        return [
+            ids[d]
+            for d, f in enumerate(first)
+            if (f == fleet_index or (d in more and fleet_index in more[d])) and (code is ... or statuses[d] == code)
+        ]
+
+    #endregion
+
+    #region Export
+
+    def device(self, id: str) -> cdm.OtaDevice:
+        return self._export_device(self._devices.index[id])
+
+    def _export_device(self, device: int) -> cdm.OtaDevice:
+        data: dict[str, Any] = {"id": self._devices.ids[device]}
+        if device in self._names:
+            data["name"] = self._names[device]
+        status = self._status[device]
+        if status != NO_STATUS:
+            data["status"] = STATUSES[status]
+        fleets = self._device_fleets.get(device)
+        if fleets:
+            data["fleets"] = [self._fleets.ids[f] for f in fleets]
+        packages = self._device_packages.get(device)
+        if packages:
+            data["packages"] = [self._packages.ids[p] for p in packages]
+        return fast_codec.from_dict(cdm.OtaDevice, data)
+
+    def export_devices(self, ids: Optional[Iterable[str]] = None) -> Iterator[cdm.OtaDevice]:
+        """Devices as ``OtaDevice`` objects, all of them or those of ``ids``"""
+        if ids is None:
+            return (self._export_device(d) for d in range(len(self)))
+        return (self._export_device(self._devices.index[id]) for id in ids)
+
+    def fleet(self, id: str) -> cdm.OtaFleet:
+        index = self._fleets.index[id]
+        data: dict[str, Any] = {"id": id, "devices": self.devices(id)}
+        if index in self._fleet_names:
+            data["name"] = self._fleet_names[index]
+        return fast_codec.from_dict(cdm.OtaFleet, data)
+
+    def package(self, id: str) -> cdm.OtaPackage:
+        index = self._packages.index[id]
+        data: dict[str, Any] = {"id": id}
+        if index in self._package_names:
+            data["name"] = self._package_names[index]
+        if index in self._package_versions:
+            data["version"] = self._versions.ids[self._package_versions[index]]
+        return fast_codec.from_dict(cdm.OtaPackage, data)
+
+    #endregion
@@ -0,0 +1,255 @@
+"""GRIDs (globally unique resource ids) of the schema classes.
+
+Most classes carry a ``grid`` annotation with the template of their GRIDs,
+e.g. ``grid:workspace:{workspace-id}:library:part/{id}``. :func:`registry`
+reads the templates from the schema once and compiles each into a
+:class:`GridTemplate`, which formats GRIDs with a ``%`` format string and
+parses them with a regular expression. :class:`GridRegistry` finds the
+template of any GRID through a trie of the template segments.
+
+A GRID is made of segments, each starting at a ``:`` or ``/`` (but the
+first one), and a field of a template (``{workspace-id}``) is the text of a
+whole segment, so field values cannot contain ``:`` or ``/``. Field names
+are used with ``-`` replaced by ``_`` (``workspace_id``). Templates shared by
+several classes (e.g. the BOM classes) are compiled once, with all their
+classes.
+"""
+import os
+import re
+from operator import itemgetter
+from typing import Any, Iterable, NamedTuple, Optional, Union
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema", "common_data_model.yaml")
+
+_SEGMENTS = re.compile(r"(?:^|[:/])[^:/]*").findall
+_FIELD = re.compile(r"\{([^{}]+)\}")
+
+_registry: Optional["GridRegistry"] = None
+
+
+class ParsedGrid(NamedTuple):
+    template: "GridTemplate"
+    values: dict[str, str]
+
+
+def schema_templates(schema_path: str = SCHEMA_PATH) -> dict[str, str]:
+    """GRID template of every annotated class of the schema and of the local
+    schemas it imports, by class name"""
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(schema_path) as f:
+        schemas = [yaml.load(f, Loader=loader)]
+    directory = os.path.dirname(schema_path)
+    for name in schemas[0].get("imports", []):
+        path = os.path.join(directory, f"{name}.yaml")
+        if os.path.exists(path):
+            with open(path) as f:
+                schemas.append(yaml.load(f, Loader=loader))
+    templates = {}
+    for schema in schemas:
+        for name, cls in (schema.get("classes") or {}).items():
+            grid = ((cls or {}).get("annotations") or {}).get("grid")
+            if isinstance(grid, dict):
+                grid = grid.get("value")
+            if grid and grid.strip():
+                templates[name] = grid.strip()
+    return templates
+
+
+def _separator(segment: str) -> str:
+    return segment[0] if segment[:1] in (":", "/") else ""
+
+
+class GridTemplate:
+    """Compiled GRID template of one or more classes"""
+
+    def __init__(self, template: str, classes: tuple[str, ...] = ()) -> None:
+        self.template = template
+        self.classes = classes
+        self.segments = _SEGMENTS(template)
+        fields, formats, patterns = [], [], []
+        for segment in self.segments:
+            separator = _separator(segment)
+            text = segment[len(separator) :]
+            field = _FIELD.fullmatch(text)
+            if field:
+                fields.append(field.group(1).replace("-", "_"))
+                formats.append(separator + "%s")
+                patterns.append(re.escape(separator) + "([^:/\\n]*)")
+            elif "{" in text or "}" in text:
+                raise ValueError(f"Fields of GRID template {template} must be whole segments")
+            else:
+                formats.append(segment.replace("%", "%%"))
+                patterns.append(re.escape(segment))
+        self.fields = tuple(fields)
+        self._format = "".join(formats)
+        self._match = re.compile("".join(patterns)).fullmatch
+        self._scan = re.compile(f"^{''.join(patterns)}$", re.MULTILINE).findall
+
+    def __repr__(self) -> str:
+        return f"GridTemplate({self.template!r}, {self.classes!r})"
+
+    def format(self, **values: str) -> str:
+        try:
+            return self._format % tuple(values[f] for f in self.fields)
+        except KeyError as e:
+            raise KeyError(f"GRID template {self.template} needs a value for {e.args[0]}") from None
+
+    def format_object(self, element: Any, **values: str) -> str:
+        """GRID of an object; fields without a value are taken from its
+        attributes (e.g. ``id``)"""
+        return self.format(**{f: values[f] if f in values else getattr(element, f) for f in self.fields})
+
+    def parse(self, grid: str) -> Optional[dict[str, str]]:
+        """Field values of a GRID, None if it does not match the template"""
+        match = self._match(grid)
+        return dict(zip(self.fields, match.groups())) if match else None
+
+    def format_many(self, **values: Union[str, Iterable[str]]) -> list[str]:
+        """GRIDs of columns of field values; a string is used for every GRID"""
+        constants = {f: v for f, v in values.items() if isinstance(v, str)}
+        columns = [f for f in self.fields if f not in constants]
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise KeyError(f"GRID template {self.template} needs values for {', '.join(missing)}")
+        if not columns:
+            raise ValueError("format_many needs at least one column of values")
+        # Constants go into the format string, once
+        fmt = self._format % tuple(
+            constants[f].replace("%", "%%") if f in constants else "%s" for f in self.fields
+        )
+        if len(columns) == 1:
+            prefix, suffix = (fmt % "\0").split("\0")
+            if not suffix:
+                return list(map(prefix.__add__, values[columns[0]]))
+            return [prefix + v + suffix for v in values[columns[0]]]
+        return list(map(fmt.__mod__, zip(*(values[f] for f in columns))))
+
+    def parse_many(self, grids: Iterable[str]) -> dict[str, list[str]]:
+        """Columns of field values of GRIDs of this template, matched in one
+        scan of their text"""
+        grids = grids if isinstance(grids, list) else list(grids)
+        text = "\n".join(grids)
+        rows = self._scan(text) if text.count("\n") == len(grids) - 1 else []
+        if len(rows) != len(grids):
+            for grid in grids:
+                if self._match(grid) is None:
+                    raise ValueError(f"{grid} does not match GRID template {self.template}")
+        if len(self.fields) == 1:
+            return {self.fields[0]: rows}
+        return {f: list(map(itemgetter(i), rows)) for i, f in enumerate(self.fields)}
+
+
+class _Node:
+    __slots__ = ("literals", "fields", "template")
+
+    def __init__(self) -> None:
+        # Child by literal segment, and by separator for a field segment
+        self.literals: dict[str, _Node] = {}
+        self.fields: dict[str, _Node] = {}
+        self.template: Optional[GridTemplate] = None
+
+
+class GridRegistry:
+    """GRID templates by class, and dispatch of GRIDs to their template.
+
+    The trie of the template segments is compiled into one regular
+    expression with an alternative per child of every node, so a GRID is
+    dispatched in a single match; the empty group closing the alternative
+    of a template tells which one matched.
+    """
+
+    def __init__(self, templates: dict[str, str]) -> None:
+        classes: dict[str, list[str]] = {}
+        for name, template in templates.items():
+            classes.setdefault(template, []).append(name)
+        self.templates = {template: GridTemplate(template, tuple(names)) for template, names in classes.items()}
+        self.by_class = {name: self.templates[template] for name, template in templates.items()}
+        root = _Node()
+        for template in self.templates.values():
+            node = root
+            for segment in template.segments:
+                separator = _separator(segment)
+                if _FIELD.fullmatch(segment[len(separator) :]):
+                    node = node.fields.setdefault(separator, _Node())
+                else:
+                    node = node.literals.setdefault(segment, _Node())
+            node.template = template
+        # Template and field groups, by the index of the group ending a match
+        self._ends: dict[int, tuple[GridTemplate, tuple[int, ...]]] = {}
+        self._groups = 0
+        trie = self._pattern(root, ())
+        self._match = re.compile(trie).fullmatch
+        # Every line of a text gives one match; the last group is for the lines of no template
+        self._scan = re.compile(f"^(?:{trie}|()[^\\n]*$)", re.MULTILINE).finditer
+
+    def _pattern(self, node: _Node, fields: tuple[int, ...]) -> str:
+        alternatives = []
+        for segment, child in node.literals.items():
+            alternatives.append(re.escape(segment) + self._pattern(child, fields))
+        for separator, child in node.fields.items():
+            self._groups += 1
+            alternatives.append(f"{re.escape(separator)}([^:/\\n]*){self._pattern(child, (*fields, self._groups))}")
+        if node.template is not None:
+            self._groups += 1
+            self._ends[self._groups] = node.template, (0, *fields)
+            alternatives.append("()$")
+        return alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+
+    def __len__(self) -> int:
+        return len(self.by_class)
+
+    def __contains__(self, cls: Any) -> bool:
+        return getattr(cls, "class_name", cls) in self.by_class
+
+    def __getitem__(self, cls: Any) -> GridTemplate:
+        """Template of a class, given by schema name (``lib_part``), generated
+        class or instance"""
+        return self.by_class[getattr(cls, "class_name", cls)]
+
+    def dispatch(self, grid: str) -> Optional[GridTemplate]:
+        parsed = self.parse(grid)
+        return parsed.template if parsed else None
+
+    def parse(self, grid: str) -> Optional[ParsedGrid]:
+        """Template and field values of any GRID, None if none matches"""
+        match = self._match(grid)
+        if match is None:
+            return None
+        template, groups = self._ends[match.lastindex]
+        return ParsedGrid(template, dict(zip(template.fields, match.group(*groups)[1:])))
+
+    def parse_many(self, grids: Iterable[str]) -> list[Optional[ParsedGrid]]:
+        """:meth:`parse` of many GRIDs, matched in one scan of their text"""
+        grids = grids if isinstance(grids, list) else list(grids)
+        text = "\n".join(grids)
+        if text.count("\n") != len(grids) - 1:
+            return list(map(self.parse, grids))
+        ends = self._ends
+        parsed: list[Optional[ParsedGrid]] = []
+        append = parsed.append
+        for match in self._scan(text):
+            end = ends.get(match.lastindex)
+            if end is None:
+                append(None)
+            else:
+                template, groups = end
+                append(ParsedGrid(template, dict(zip(template.fields, match.group(*groups)[1:]))))
+        return parsed
+
+    def format(self, element: Any, **values: str) -> str:
+        """GRID of an object of an annotated class (see
+        :meth:`GridTemplate.format_object`)"""
+        return self[element].format_object(element, **values)
+
+    def format_many(self, cls: Any, **values: Union[str, Iterable[str]]) -> list[str]:
+        return self[cls].format_many(**values)
+
+
+def registry() -> GridRegistry:
+    """Registry of the GRID templates of the schema, read on first use"""
+    global _registry
+    if _registry is None:
+        _registry = GridRegistry(schema_templates())
+    return _registry
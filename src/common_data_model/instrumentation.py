@@ -0,0 +1,251 @@
+"""Opt-in instrumentation of hot paths: stage timings, event counters and
+allocation samples.
+
+Instrumented code wraps its phases in :func:`stage` and reports events with
+:func:`count`::
+
+    with instrumentation.stage("compile.connections"):
+        ...
+    instrumentation.count("compile.entities.connections", len(connections))
+
+Nothing is recorded unless a :class:`Recorder` is active (see
+:func:`recording`): :func:`stage` then returns a shared no-op context
+manager and :func:`count` returns right away. Code called per entity can
+test ``instrumentation.active is not None`` itself to avoid even the call.
+
+A recorder accumulates, per stage, the number of calls and the time spent
+(nested stages are included in their enclosing stage) and, when created
+with ``allocations=True``, the memory allocated by the stage according to
+``tracemalloc`` (net and peak), which slows the instrumented code down
+several times. When the recording ends, or on :meth:`Recorder.flush`, the
+results are passed to its sinks: :class:`CounterSink` keeps totals in the
+process, :class:`JsonLinesSink` appends them to a JSON lines log and
+:class:`PrometheusSink` renders them in the Prometheus text format. Any
+object with an ``emit(snapshot)`` method can be a sink.
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import IO, Iterable, Iterator, Optional, Protocol, Union
+
+# The recorder of the current recording, if any
+active: Optional["Recorder"] = None
+
+_NO_STAGE = nullcontext()
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    # Bytes allocated and not freed by the stage, and the largest peak of
+    # its calls above the memory in use when they started (with allocations)
+    allocated: int = 0
+    peak: int = 0
+
+    def add(self, other: "StageStats") -> None:
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.allocated += other.allocated
+        self.peak = max(self.peak, other.peak)
+
+
+class Sink(Protocol):
+    def emit(self, snapshot: dict) -> None:
+        ...
+
+
+#region Recording
+
+
+class _Stage:
+    __slots__ = ("recorder", "name", "start", "memory")
+
+    def __init__(self, recorder: "Recorder", name: str) -> None:
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        peaks = self.recorder._peaks
+        if peaks is not None:
+            # tracemalloc has one peak: the enclosing stage keeps the peak
+            # reached so far before it is reset for this one
+            self.memory, peak = tracemalloc.get_traced_memory()
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        elapsed = time.perf_counter() - self.start
+        recorder = self.recorder
+        stats = recorder.stages.get(self.name)
+        if stats is None:
+            stats = recorder.stages[self.name] = StageStats()
+        stats.calls += 1
+        stats.seconds += elapsed
+        peaks = recorder._peaks
+        if peaks is not None:
+            memory, peak = tracemalloc.get_traced_memory()
+            peak = max(peaks.pop(), peak)
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            stats.allocated += memory - self.memory
+            stats.peak = max(stats.peak, peak - self.memory)
+
+
+class Recorder:
+    """Stage statistics and counters of one recording"""
+
+    def __init__(self, sinks: Iterable[Sink] = (), allocations: bool = False) -> None:
+        self.sinks = list(sinks)
+        self.allocations = allocations
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, int] = {}
+        # Peaks reached by the open stages, while allocations are traced
+        self._peaks: Optional[list[int]] = None
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        return {
+            "time": time.time(),
+            "stages": {name: asdict(stats) for name, stats in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def flush(self) -> None:
+        """Pass the results to the sinks and start again from zero"""
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+        self.stages.clear()
+        self.counters.clear()
+
+
+def stage(name: str):
+    """Context manager timing a stage of the active recording"""
+    return _NO_STAGE if active is None else active.stage(name)
+
+
+def count(name: str, n: int = 1) -> None:
+    if active is not None:
+        active.count(name, n)
+
+
+@contextmanager
+def recording(
+    recorder: Optional[Recorder] = None, sinks: Iterable[Sink] = (), allocations: bool = False
+) -> Iterator[Recorder]:
+    """Record instrumented code run in the block, then flush the results to
+    the recorder's sinks. Recordings do not nest: an inner recording
+    replaces the outer one until it ends."""
+    global active
+    if recorder is None:
+        recorder = Recorder(sinks, allocations)
+    previous = active
+    started = recorder.allocations and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if recorder.allocations:
+        recorder._peaks = []
+    active = recorder
+    try:
+        yield recorder
+    finally:
+        active = previous
+        recorder._peaks = None
+        if started:
+            tracemalloc.stop()
+        recorder.flush()
+
+
+#endregion
+
+#region Sinks
+
+
+class CounterSink:
+    """Totals of every snapshot emitted, in this process"""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, int] = {}
+
+    def emit(self, snapshot: dict) -> None:
+        for name, stats in snapshot["stages"].items():
+            self.stages.setdefault(name, StageStats()).add(StageStats(**stats))
+        for name, n in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+
+class JsonLinesSink:
+    """Appends every snapshot as one line of JSON to a file or stream"""
+
+    def __init__(self, target: Union[str, os.PathLike, IO[str]]) -> None:
+        self.target = target
+
+    def emit(self, snapshot: dict) -> None:
+        line = json.dumps(snapshot, separators=(",", ":")) + "\n"
+        if isinstance(self.target, (str, os.PathLike)):
+            with open(self.target, "a", encoding="UTF-8") as f:
+                f.write(line)
+        else:
+            self.target.write(line)
+            self.target.flush()
+
+
+class PrometheusSink(CounterSink):
+    """Totals in the Prometheus text exposition format, written to ``path``
+    (e.g. for the node exporter's textfile collector) after every snapshot
+    if given"""
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None, prefix: str = "cdm") -> None:
+        super().__init__()
+        self.path = path
+        self.prefix = prefix
+
+    def emit(self, snapshot: dict) -> None:
+        super().emit(snapshot)
+        if self.path is not None:
+            # Written aside and renamed, so scrapes never see a partial file
+            temporary = f"{os.fspath(self.path)}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="UTF-8") as f:
+                f.write(self.render())
+            os.replace(temporary, self.path)
+
+    def render(self) -> str:
+        p = self.prefix
+        metrics = [
+            (f"{p}_stage_calls_total", "counter", "Calls of instrumented stages.", "stage",
+             {n: s.calls for n, s in self.stages.items()}),
+            (f"{p}_stage_seconds_total", "counter", "Time spent in instrumented stages.", "stage",
+             {n: s.seconds for n, s in self.stages.items()}),
+            (f"{p}_stage_allocated_bytes", "gauge", "Memory allocated and not freed by stages.", "stage",
+             {n: s.allocated for n, s in self.stages.items() if s.allocated or s.peak}),
+            (f"{p}_stage_peak_bytes", "gauge", "Largest memory peak of a stage call.", "stage",
+             {n: s.peak for n, s in self.stages.items() if s.allocated or s.peak}),
+            (f"{p}_events_total", "counter", "Instrumented events.", "event", self.counters),
+        ]
+        lines = []
+        for name, kind, help_text, label, values in metrics:
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                escaped = key.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{{label}="{escaped}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+#endregion
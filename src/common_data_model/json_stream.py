@@ -0,0 +1,328 @@
+"""Streaming JSON serialization and loading of System Data Model versions.
+
+:func:`dump` writes exactly the text of ``json_dumper.dumps(element,
+inject_type=False)`` but produces it incrementally: the document skeleton
+(the version, its functional model, the top-level collections and the
+entities in them) is walked lazily and only the values below ``depth`` are
+encoded as a whole, using the same conversion as ``json_dumper``. Memory is
+bounded by the largest such value instead of by the document.
+
+:func:`iter_entities` reads a document incrementally and yields the entities
+of the top-level collections (see :data:`~common_data_model.version_store.
+COLLECTIONS`) one at a time; :func:`load` assembles a whole version the same
+way, without holding the document text or its parsed dictionaries.
+
+Both accept paths and text or binary file objects, so sockets can be used
+through ``socket.makefile()``.
+"""
+import io
+import json
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Optional, Union
+
+from jsonasobj2 import items
+from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+from linkml_runtime.utils.formatutils import is_empty, remove_empty_items
+from linkml_runtime.utils.yamlutils import YAMLRoot
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.version_store import COLLECTIONS
+
+Source = Union[str, Path, IO]
+
+# Same layout as json_dumper
+INDENT = "  "
+# Nesting depth down to which the writer streams: version (0), functional
+# model / collections (1), blocks and device models (2), their attributes (3)
+DEFAULT_DEPTH = 4
+CHUNK_SIZE = 1 << 16
+
+ENTITY_CLASSES: dict[str, type] = {
+    "functionalBlocks": cdm.SystemSdmFunctionalBlock,
+    "connections": cdm.SystemSdmConnection,
+    "deviceModels": cdm.SystemSdmDeviceModel,
+    "softwareModels": cdm.SystemSdmSoftwareModel,
+    "hardwareModels": cdm.SystemSdmHardwareModel,
+}
+
+_COLLECTION_AT = {location: name for name, location in COLLECTIONS.items()}
+_WHITESPACE = " \t\n\r"
+_NUMBER_TAIL = frozenset("0123456789.eE+-")
+
+
+#region Writer
+
+
+def _text(stream: IO) -> IO:
+    """Text view of a binary stream (e.g. ``socket.makefile("rb")``)"""
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        return io.TextIOWrapper(stream, encoding="UTF-8")
+    return stream
+
+
+def _default(o: Any) -> Any:
+    # json_dumper's fallback encoding
+    if isinstance(o, YAMLRoot):
+        return remove_empty_items(o, hide_protected_keys=True)
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, datetime | date):
+        return str(o)
+    return json.JSONDecoder().decode(o)
+
+
+def _streamable(value: Any) -> bool:
+    if isinstance(value, list):
+        return True
+    # Enums and objects with protected attributes are flattened by
+    # remove_empty_items, so they are always encoded as a whole
+    return (
+        isinstance(value, YAMLRoot)
+        and not isinstance(value, EnumDefinitionImpl)
+        and not any(k.startswith("_") for k in value.__dict__)
+    )
+
+
+def _encode(value: Any, depth: int, inside: bool) -> Optional[str]:
+    value = remove_empty_items(value, hide_protected_keys=True, inside=inside)
+    if inside and is_empty(value):
+        return None
+    text = json.dumps(value, default=_default, ensure_ascii=False, indent=INDENT)
+    return text.replace("\n", "\n" + INDENT * depth) if depth else text
+
+
+def _iter_json(
+    value: Any, depth: int, max_depth: int, inside: bool = True, extra: tuple = ()
+) -> Iterator[str]:
+    if depth >= max_depth or not _streamable(value):
+        text = _encode(value, depth, inside)
+        if text is not None:
+            yield text
+        return
+
+    if isinstance(value, list):
+        children = ((None, e) for e in value if not (isinstance(e, str) and e == "_root"))
+        opening, closing = "[", "]"
+    else:
+        children = items(value)
+        opening, closing = "{", "}"
+    indent = "\n" + INDENT * (depth + 1)
+    empty = True
+    for key, child in (*children, *extra) if extra else children:
+        # Empty values are dropped, so nothing is written before the first
+        # chunk of a child is known to exist
+        chunks = _iter_json(child, depth + 1, max_depth)
+        head = next(chunks, None)
+        if head is None:
+            continue
+        prefix = (opening if empty else ",") + indent
+        if key is not None:
+            prefix += json.dumps(key, ensure_ascii=False) + ": "
+        yield prefix + head
+        yield from chunks
+        empty = False
+    if not empty:
+        yield "\n" + INDENT * depth + closing
+    elif not inside:
+        yield opening + closing
+
+
+def iter_json(
+    element: YAMLRoot, depth: int = DEFAULT_DEPTH, inject_type: bool = False
+) -> Iterator[str]:
+    """Chunks of the JSON text of ``element`` as produced by ``json_dumper.dumps``"""
+    extra = (("@type", element.__class__.__name__),) if inject_type else ()
+    return _iter_json(element, 0, depth, inside=False, extra=extra)
+
+
+def dump(
+    element: YAMLRoot,
+    to_file: Source,
+    depth: int = DEFAULT_DEPTH,
+    inject_type: bool = False,
+) -> None:
+    """Write ``element`` as JSON to a path or a text or binary file object"""
+    if isinstance(to_file, (str, Path)):
+        with open(to_file, "w", encoding="UTF-8") as output_file:
+            dump(element, output_file, depth, inject_type)
+        return
+    output_file = _text(to_file)
+    write = output_file.write
+    for chunk in iter_json(element, depth, inject_type):
+        write(chunk)
+    output_file.flush()
+    if output_file is not to_file:
+        output_file.detach()
+
+
+#endregion
+
+#region Reader
+
+
+class _Scanner:
+    """Pull parser over a text stream that decodes one JSON value at a time
+    and keeps only the unconsumed part of the stream buffered"""
+
+    def __init__(self, stream: IO, chunk_size: int) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the stream)"""
+        while True:
+            buffer, pos = self.buffer, self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, token: str) -> None:
+        found = self.peek()
+        if found != token:
+            raise ValueError(f"Expected '{token}' but found '{found or 'end of input'}'")
+        self.pos += 1
+
+    def accept(self, token: str) -> bool:
+        if self.peek() == token:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read at least as much again as is buffered
+                # so that large values are decoded in linear time overall
+                if not self._fill(max(self.chunk_size, len(self.buffer) - self.pos)):
+                    raise
+                continue
+            # A number may continue in the next chunk: the match ends with the
+            # buffer, or before a fraction or exponent cut short ("1.", "2e+")
+            if (
+                len(self.buffer) - end <= 2
+                and isinstance(value, (int, float))
+                and all(c in _NUMBER_TAIL for c in self.buffer[end:])
+                and self._fill(self.chunk_size)
+            ):
+                continue
+            self.pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object starting at the current position"""
+        self.expect("{")
+        if self.accept("}"):
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if not self.accept(","):
+                self.expect("}")
+                return
+
+    def elements(self) -> Iterator[Any]:
+        """Values of the array starting at the current position"""
+        self.expect("[")
+        if self.accept("]"):
+            return
+        while True:
+            yield self.value()
+            if not self.accept(","):
+                self.expect("]")
+                return
+
+
+def _events(scanner: _Scanner, owner: str = "") -> Iterator[tuple[str, str, Any, bool]]:
+    """(owner, attribute, value, is collection entity) for every attribute
+    of the version and of its functional model"""
+    for key in scanner.members():
+        collection = _COLLECTION_AT.get((owner, key))
+        if collection is not None and scanner.peek() == "[":
+            for entity in scanner.elements():
+                yield owner, key, entity, True
+        elif collection is not None and scanner.peek() == "{":
+            # Collection inlined as a dictionary keyed by id
+            for entity in scanner.value().values():
+                yield owner, key, entity, True
+        elif not owner and key == "functionalModel" and scanner.peek() == "{":
+            yield from _events(scanner, key)
+        else:
+            yield owner, key, scanner.value(), False
+
+
+@contextmanager
+def _scan(source: Source, chunk_size: int) -> Iterator[_Scanner]:
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="UTF-8") as input_file:
+            yield _Scanner(input_file, chunk_size)
+        return
+    stream = _text(source)
+    try:
+        yield _Scanner(stream, chunk_size)
+    finally:
+        if stream is not source:
+            stream.detach()
+
+
+def iter_entities(
+    source: Source,
+    collections: Optional[Iterable[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[tuple[str, Any]]:
+    """Yield ``(collection, entity)`` for the entities of the top-level
+    collections in document order, one entity in memory at a time"""
+    wanted = set(COLLECTIONS if collections is None else collections)
+    unknown = wanted - ENTITY_CLASSES.keys()
+    if unknown:
+        raise ValueError(f"Unknown collections: {', '.join(sorted(unknown))}")
+    with _scan(source, chunk_size) as scanner:
+        for _, key, value, is_entity in _events(scanner):
+            if is_entity and key in wanted:
+                yield key, ENTITY_CLASSES[key](**value)
+
+
+def load(source: Source, chunk_size: int = CHUNK_SIZE) -> cdm.SystemSdmSystemModelVersion:
+    """Load a version written by :func:`dump` or ``json_dumper``, building
+    each entity as soon as it has been read"""
+    attributes: dict[str, dict[str, Any]] = {"": {}, "functionalModel": {}}
+    functional_model = False
+    with _scan(source, chunk_size) as scanner:
+        for owner, key, value, is_entity in _events(scanner):
+            functional_model = functional_model or owner == "functionalModel"
+            if is_entity:
+                attributes[owner].setdefault(key, []).append(ENTITY_CLASSES[key](**value))
+            else:
+                attributes[owner][key] = value
+    root = attributes[""]
+    if functional_model:
+        root["functionalModel"] = cdm.SystemSdmFunctionalModel(**attributes["functionalModel"])
+    return cdm.SystemSdmSystemModelVersion(**root)
+
+
+#endregion
@@ -0,0 +1,401 @@
+"""Index of parts by manufacturer and MPN, joining BOM elements, supply parts
+and library parts.
+
+``pro_BomItemElement`` (``BomItemElement_mpn``/``_manufacturer``),
+``sup_part`` (``Part_mpn``/``Part_manufacturer``) and library parts (linked
+to MPNs by the BOM elements that use them) identify the same physical
+parts, with MPNs spelled with varying punctuation and case.
+:func:`normalize_mpn` and :func:`normalize_manufacturer` are the canonical
+keys, and :class:`PartIndex` finds the supply and library parts of a
+(manufacturer, MPN) through a hash table, of an MPN prefix through the
+entries sorted by MPN, and of every element of a BOM with
+:meth:`PartIndex.match`.
+
+The index is one buffer, built in memory by :class:`PartIndexBuilder` or
+memory-mapped from the file written by :meth:`PartIndex.save`, so worker
+processes opening the same file share its pages instead of each loading a
+copy.
+
+Layout (little endian, sections aligned to 8 bytes)::
+
+    header    "CDMPART" format(1 byte) entries(u64) strings(u64) slots(u64)
+              metadata length(u64)
+    strings   offsets (u64 * (strings + 1)) into the UTF-8 blob, blob
+    entries   normalized MPN, normalized manufacturer, MPN, manufacturer and
+              id (u32 string indexes each), kind (u8), sorted by normalized
+              MPN and manufacturer
+    hash      first entry + 1 of every (manufacturer, MPN), 0 when free
+              (u32 * slots), and the high bits of its hash (u32 * slots)
+    metadata  JSON: manufacturer aliases
+"""
+import bisect
+import json
+import mmap
+import re
+import struct
+import zlib
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple, Optional, Union
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model._util import gc_paused
+
+MAGIC = b"CDMPART"
+FORMAT_VERSION = 1
+
+SUPPLY = 0
+LIBRARY = 1
+KINDS = ("supply", "library")
+
+_HEADER = struct.Struct("<7sBQQQQ")
+_COLUMNS = ("norm_mpn", "norm_manufacturer", "mpn", "manufacturer", "id")
+
+# Legal-form words dropped from the end of manufacturer names
+MANUFACTURER_SUFFIXES = frozenset(
+    ("inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "llc", "gmbh", "ag", "sa", "bv", "nv", "plc", "kg")
+)
+
+_SEPARATORS = re.compile(r"[\W_]+")
+# Characters kept in MPNs: + and # are part of many ordering codes
+_MPN_PUNCTUATION = re.compile(r"[^0-9A-Z+#]+")
+
+
+def normalize_mpn(mpn: str) -> str:
+    """MPN in upper case, without whitespace and punctuation other than + and #"""
+    return _MPN_PUNCTUATION.sub("", mpn.upper())
+
+
+def normalize_manufacturer(name: str) -> str:
+    """Manufacturer name in lower case, without punctuation and legal form"""
+    words = _SEPARATORS.sub(" ", name.casefold()).split()
+    while len(words) > 1 and words[-1] in MANUFACTURER_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _hash(manufacturer: bytes, mpn: bytes) -> int:
+    """Hash of a key, the same in every process (unlike hash()): CRC-32 for
+    the slot and Adler-32 for the tag telling keys of a slot apart"""
+    key = manufacturer + b"\0" + mpn
+    return zlib.crc32(key) | zlib.adler32(key) << 32
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class _Layout(NamedTuple):
+    string_offsets: int
+    blob: int
+    columns: dict[str, int]
+    kind: int
+    slots: int
+    tags: int
+    metadata: int
+    size: int
+
+
+def _layout(entries: int, strings: int, blob: int, slots: int, metadata: int) -> _Layout:
+    position = _HEADER.size
+    string_offsets = position = _align(position)
+    blob_start = position = position + 8 * (strings + 1)
+    position = _align(position + blob)
+    columns = {}
+    for name in _COLUMNS:
+        columns[name] = position
+        position = _align(position + 4 * entries)
+    kind = position
+    slots_start = position = _align(position + entries)
+    tags = position = position + 4 * slots
+    metadata_start = position = position + 4 * slots
+    return _Layout(string_offsets, blob_start, columns, kind, slots_start, tags, metadata_start, position + metadata)
+
+
+class Match(NamedTuple):
+    kind: str
+    id: str
+    manufacturer: str
+    mpn: str
+
+
+def _get(element: Any, *slots: str) -> Optional[str]:
+    get = dict.get if isinstance(element, dict) else getattr
+    for slot in slots:
+        value = get(element, slot, None)
+        if value:
+            return str(value)
+    return None
+
+
+class PartIndexBuilder:
+    def __init__(self, manufacturers: Optional[dict[str, str]] = None) -> None:
+        """Builder of a part index, with ``manufacturers`` mapping aliases
+        (e.g. supply company ids) to manufacturer names"""
+        self.aliases = {normalize_manufacturer(k): normalize_manufacturer(v) for k, v in (manufacturers or {}).items()}
+        self._entries: set[tuple[str, str, int, str, str, str]] = set()
+        # Keys of the manufacturer names seen, as there are few of them
+        self._manufacturers: dict[str, str] = {}
+
+    def _manufacturer_key(self, manufacturer: str) -> str:
+        key = self._manufacturers.get(manufacturer)
+        if key is None:
+            key = normalize_manufacturer(manufacturer)
+            key = self._manufacturers[manufacturer] = self.aliases.get(key, key)
+        return key
+
+    def add(self, kind: int, id: str, manufacturer: Optional[str], mpn: str) -> None:
+        key = normalize_mpn(mpn)
+        if key:
+            self._entries.add((key, self._manufacturer_key(manufacturer or ""), kind, str(id), mpn, manufacturer or ""))
+
+    def add_supply_parts(self, parts: Iterable[Union[cdm.SupPart, dict]]) -> None:
+        add = self.add
+        with gc_paused():
+            for part in parts:
+                get = dict.get if isinstance(part, dict) else getattr
+                mpn = get(part, "Part_mpn")
+                if mpn:
+                    add(SUPPLY, get(part, "id"), get(part, "Part_manufacturer"), str(mpn))
+
+    def add_library_parts(self, elements: Iterable[Union[cdm.ProBomItemElement, dict]]) -> None:
+        """Library parts of the BOM elements linked to one, by their MPN"""
+        for element in elements:
+            part, mpn = _get(element, "BomItemElement_part"), _get(element, "BomItemElement_mpn")
+            if part and mpn:
+                self.add(LIBRARY, part, _get(element, "BomItemElement_manufacturer"), mpn)
+
+    def build(self) -> "PartIndex":
+        with gc_paused():
+            return PartIndex(self._buffer())
+
+    def _buffer(self) -> bytearray:
+        entries = sorted(self._entries)
+        n = len(entries)
+        # Normalized MPNs (equal ones adjacent once sorted), MPNs (as their
+        # normalized MPN when the same) and ids are mostly distinct and
+        # stored as they come; the few manufacturer names are interned
+        strings: list[str] = []
+        norm_mpns = array("I", bytes(4 * n))
+        mpns = array("I", bytes(4 * n))
+        previous, string = None, -1
+        for index, entry in enumerate(entries):
+            if entry[0] != previous:
+                previous, string = entry[0], len(strings)
+                strings.append(previous)
+            norm_mpns[index] = string
+            if entry[4] == entry[0]:
+                mpns[index] = string
+            else:
+                mpns[index] = len(strings)
+                strings.append(entry[4])
+        ids = array("I", range(len(strings), len(strings) + n))
+        strings.extend(entry[3] for entry in entries)
+        manufacturers = {}
+        for field in (1, 5):
+            manufacturers.update(dict.fromkeys(entry[field] for entry in entries))
+        interned = {name: len(strings) + i for i, name in enumerate(manufacturers)}
+        strings.extend(manufacturers)
+        columns = [
+            norm_mpns,
+            array("I", (interned[entry[1]] for entry in entries)),
+            mpns,
+            array("I", (interned[entry[5]] for entry in entries)),
+            ids,
+        ]
+        encoded = list(map(str.encode, strings))
+        offsets = array("Q", [0])
+        offsets.extend(accumulate(map(len, encoded)))
+        blob = b"".join(encoded)
+
+        slots = 16
+        while slots < 2 * len(entries):
+            slots *= 2
+        table = array("I", bytes(4 * slots))
+        tags = array("I", bytes(4 * slots))
+        mask = slots - 1
+        previous = None
+        for index, entry in enumerate(entries):
+            key = entry[1], entry[0]
+            if key == previous:
+                continue
+            previous = key
+            value = _hash(encoded[columns[1][index]], encoded[norm_mpns[index]])
+            slot = value & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = index + 1
+            tags[slot] = value >> 32
+
+        metadata = json.dumps({"aliases": self.aliases}).encode("UTF-8")
+        layout = _layout(len(entries), len(strings), len(blob), slots, len(metadata))
+        buffer = bytearray(layout.size)
+        _HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, len(entries), len(strings), slots, len(metadata))
+        buffer[layout.string_offsets : layout.blob] = offsets.tobytes()
+        buffer[layout.blob : layout.blob + len(blob)] = blob
+        for column, position in zip(columns, layout.columns.values()):
+            buffer[position : position + 4 * len(entries)] = column.tobytes()
+        buffer[layout.kind : layout.kind + len(entries)] = bytes(entry[2] for entry in entries)
+        buffer[layout.slots : layout.tags] = table.tobytes()
+        buffer[layout.tags : layout.metadata] = tags.tobytes()
+        buffer[layout.metadata :] = metadata
+        return buffer
+
+
+class PartIndex:
+    def __init__(self, buffer: Union[bytes, bytearray, mmap.mmap]) -> None:
+        """Index over a buffer built by :class:`PartIndexBuilder` or read
+        from a file (see :meth:`open`)"""
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, entries, strings, slots, metadata = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a part index")
+        if version != FORMAT_VERSION:
+            raise ValueError("Part index was written with a different format version")
+        layout = _layout(entries, strings, 0, slots, metadata)
+        self._offsets = view[layout.string_offsets : layout.blob].cast("Q")
+        blob = self._offsets[strings]
+        self._blob = view[layout.blob : layout.blob + blob]
+        layout = _layout(entries, strings, blob, slots, metadata)
+        self._columns = {
+            name: view[position : position + 4 * entries].cast("I") for name, position in layout.columns.items()
+        }
+        self._kinds = view[layout.kind : layout.kind + entries]
+        self._slots = view[layout.slots : layout.tags].cast("I")
+        self._tags = view[layout.tags : layout.metadata].cast("I")
+        self._mask = slots - 1
+        self.aliases: dict[str, str] = json.loads(bytes(view[layout.metadata : layout.size]))["aliases"]
+        self._views = [view, self._offsets, self._blob, *self._columns.values(), self._kinds, self._slots, self._tags]
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    #region Persistence
+
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "wb") as file:
+            file.write(self._buffer)
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "PartIndex":
+        """Index memory-mapped (read only) from a file written by :meth:`save`"""
+        with open(path, "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self) -> "PartIndex":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    #endregion
+
+    #region Queries
+
+    def _bytes(self, string: int) -> bytes:
+        return bytes(self._blob[self._offsets[string] : self._offsets[string + 1]])
+
+    def _string(self, string: int) -> str:
+        return self._bytes(string).decode("UTF-8")
+
+    def _match(self, entry: int) -> Match:
+        columns = self._columns
+        return Match(
+            KINDS[self._kinds[entry]],
+            self._string(columns["id"][entry]),
+            self._string(columns["manufacturer"][entry]),
+            self._string(columns["mpn"][entry]),
+        )
+
+    def _manufacturer_key(self, manufacturer: str) -> str:
+        key = normalize_manufacturer(manufacturer)
+        return self.aliases.get(key, key)
+
+    def _find(self, manufacturer: bytes, mpn: bytes, value: Optional[int] = None) -> list[Match]:
+        if value is None:
+            value = _hash(manufacturer, mpn)
+        slot, tag = value & self._mask, value >> 32
+        slots, tags = self._slots, self._tags
+        norm_mpn, norm_manufacturer = self._columns["norm_mpn"], self._columns["norm_manufacturer"]
+        while slots[slot]:
+            first = slots[slot] - 1
+            if (
+                tags[slot] == tag
+                and self._bytes(norm_mpn[first]) == mpn
+                and self._bytes(norm_manufacturer[first]) == manufacturer
+            ):
+                # Entries of a key are adjacent, and share its strings
+                end = first + 1
+                while (
+                    end < len(self)
+                    and norm_mpn[end] == norm_mpn[first]
+                    and norm_manufacturer[end] == norm_manufacturer[first]
+                ):
+                    end += 1
+                return [self._match(e) for e in range(first, end)]
+            slot = (slot + 1) & self._mask
+        return []
+
+    def _range(self, prefix: bytes, exact: bool = False) -> range:
+        norm_mpn = self._columns["norm_mpn"]
+        key = lambda entry: self._bytes(norm_mpn[entry])
+        entries = range(len(self))
+        start = bisect.bisect_left(entries, prefix, key=key)
+        if exact:
+            end = bisect.bisect_right(entries, prefix, lo=start, key=key)
+        else:
+            end = start
+            while end < len(self) and key(end).startswith(prefix):
+                end += 1
+        return range(start, end)
+
+    def lookup(self, manufacturer: Optional[str], mpn: str) -> list[Match]:
+        """Parts of a manufacturer and MPN, or of the MPN by any manufacturer"""
+        key = normalize_mpn(mpn).encode("UTF-8")
+        if not manufacturer:
+            return [self._match(e) for e in self._range(key, exact=True)]
+        return self._find(self._manufacturer_key(manufacturer).encode("UTF-8"), key)
+
+    def search(self, prefix: str, limit: Optional[int] = None) -> list[Match]:
+        """Parts with MPNs starting with ``prefix``, in MPN order"""
+        found = self._range(normalize_mpn(prefix).encode("UTF-8"))
+        if limit is not None:
+            found = found[:limit]
+        return [self._match(e) for e in found]
+
+    def match(self, elements: Iterable[Union[cdm.ProBomItemElement, dict]]) -> list[list[Match]]:
+        """Parts of every BOM element (primary elements, alternates,
+        substitutes, or their JSON form), by manufacturer and MPN, or by MPN
+        alone for elements without manufacturer"""
+        keys: dict[tuple[str, str], Optional[tuple[bytes, bytes]]] = {}
+        wanted = []
+        for element in elements:
+            raw = (
+                _get(element, "BomItemElement_manufacturer") or "",
+                _get(element, "BomItemElement_mpn") or "",
+            )
+            wanted.append(raw)
+            if raw not in keys:
+                mpn = normalize_mpn(raw[1])
+                keys[raw] = (self._manufacturer_key(raw[0]).encode("UTF-8"), mpn.encode("UTF-8")) if mpn else None
+        # Every distinct key is looked up once, in slot order for locality
+        # in memory-mapped tables
+        found: dict[tuple[bytes, bytes], list[Match]] = {}
+        hashes = {key: _hash(*key) for key in keys.values() if key is not None}
+        for key, value in sorted(hashes.items(), key=lambda item: item[1] & self._mask):
+            manufacturer, mpn = key
+            if manufacturer:
+                found[key] = self._find(manufacturer, mpn, value)
+            else:
+                found[key] = [self._match(e) for e in self._range(mpn, exact=True)]
+        return [found[keys[raw]] if keys[raw] is not None else [] for raw in wanted]
+
+    #endregion
@@ -0,0 +1,305 @@
+"""Pin multiplexing conflict detection and pin assignment for device models.
+
+Every configuration of a peripheral mode (``DmPeripheralConfiguration``)
+claims the pins its ``pinConfigs`` route functions to, the peripheral
+instance it configures and the values of its ``pinDependencyConfigs``. A
+:class:`PinMux` encodes each configuration as a bitset (a Python int) over
+the resources of the device: one bit per pin (``DmPort`` of the device),
+one per peripheral instance and one per dependency value. Two
+configurations can be enabled together when their resources are disjoint
+and they do not select different values of the same dependency, which is a
+couple of integer operations whatever the number of pins.
+
+:meth:`PinMux.conflicts` checks a whole set of enabled configurations with
+one pass of ORs over their bitsets, and :meth:`PinMux.solve` searches for
+a conflict-free configuration for every requested peripheral (e.g.
+``["UART", "SPI", "I2C"]``) by backtracking, most constrained request
+first, and prunes with forward checking. :meth:`PinMux.assignment_model`
+gives the pins used by a selection as a ``SftPinAssignmentModel``.
+"""
+import re
+from typing import Any, Iterable, NamedTuple, Optional
+
+import common_data_model.datamodel.common_data_model as cdm
+
+
+class Option(NamedTuple):
+    """A peripheral configuration of the device and where it is defined"""
+
+    peripheral: cdm.DmPeripheral
+    instance: cdm.DmPeripheralInstance
+    mode: cdm.DmPeripheralMode
+    configuration: cdm.DmPeripheralConfiguration
+
+
+class PinConflict(NamedTuple):
+    # Pin, peripheral instance or dependency name, and the ids of the
+    # configurations claiming it
+    resource: str
+    configuration_ids: list[str]
+
+
+def _words(*names: Optional[str]) -> set[str]:
+    return {w for name in names if name for w in re.split(r"[^0-9a-z]+", name.lower()) if w}
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PinMux:
+    def __init__(self, device: Any) -> None:
+        """Pin multiplexing of a ``SystemSdmDeviceModel`` or ``DmFullstackDeviceModel``"""
+        self.device = device
+        # Resources: pins first, then peripheral instances and dependency values
+        self.ports: list[cdm.DmPort] = list(device.ports or ())
+        self.resources: list[str] = [port.name or port.id for port in self.ports]
+        self._resources: dict[str, int] = {}
+        for i, port in enumerate(self.ports):
+            for name in (port.id, port.name):
+                if name:
+                    self._resources.setdefault(name.upper(), i)
+        self.options: list[Option] = []
+        self.masks: list[int] = []
+        self._instances: list[int] = []
+        # Dependency bits of every option, and the bits of the other values
+        # of the same dependencies, which the option excludes
+        self.dependencies: list[int] = []
+        self._excluded: list[int] = []
+        self._option_index: dict[str, int] = {}
+        # Words of the peripheral, instance and mode names -> option indexes
+        self._words: dict[str, set[int]] = {}
+        dependency_values: dict[str, int] = {}
+        for peripheral in device.peripherals or ():
+            for instance in peripheral.instances or ():
+                instance_bit = 1 << self._resource(f"instance:{instance.id}")
+                for mode in instance.modes or ():
+                    words = _words(peripheral.id, peripheral.name, instance.id, instance.name, mode.name)
+                    for configuration in mode.configurations or ():
+                        for word in words:
+                            self._words.setdefault(word, set()).add(len(self.options))
+                        mask = instance_bit
+                        for pin_config in configuration.pinConfigs or ():
+                            mask |= 1 << self._resource(self._pin_of(pin_config))
+                        dependencies = 0
+                        for dependency in configuration.pinDependencyConfigs or ():
+                            bit = 1 << self._resource(f"dependency:{dependency.name}={dependency.value}")
+                            dependencies |= bit
+                            dependency_values[dependency.name] = dependency_values.get(dependency.name, 0) | bit
+                        self._option_index.setdefault(configuration.id, len(self.options))
+                        self.options.append(Option(peripheral, instance, mode, configuration))
+                        self.masks.append(mask)
+                        self._instances.append(instance_bit)
+                        self.dependencies.append(dependencies)
+        for i, option in enumerate(self.options):
+            excluded = 0
+            for dependency in option.configuration.pinDependencyConfigs or ():
+                excluded |= dependency_values[dependency.name]
+            self._excluded.append(excluded & ~self.dependencies[i])
+
+    def _resource(self, name: str) -> int:
+        index = self._resources.get(name.upper())
+        if index is None:
+            index = self._resources[name.upper()] = len(self.resources)
+            self.resources.append(name)
+        return index
+
+    @staticmethod
+    def _pin_of(pin_config: cdm.DmPeripheralPinConfig) -> str:
+        """Port a pin function is routed to, e.g. "P202" for sci9.rxd.p202"""
+        if pin_config.portName:
+            return pin_config.portName
+        if pin_config.port:
+            return pin_config.port
+        return (pin_config.pinValue or "").rpartition(".")[2]
+
+    def index(self, configuration_id: str) -> int:
+        try:
+            return self._option_index[configuration_id]
+        except KeyError:
+            raise ValueError(f"Unknown peripheral configuration: {configuration_id}") from None
+
+    def compatible(self, a: int, b: int) -> bool:
+        """Whether the options at two indexes can be enabled together"""
+        return not (
+            self.masks[a] & self.masks[b]
+            or self.dependencies[a] & self._excluded[b]
+        )
+
+    #region Conflicts
+
+    def conflicts(self, configuration_ids: Iterable[str]) -> list[PinConflict]:
+        """Pins, peripheral instances and dependencies claimed by more than
+        one of the given configurations, with the configurations claiming them"""
+        indexes = [self.index(i) for i in configuration_ids]
+        used = shared = dependencies = excluded = 0
+        for i in indexes:
+            mask = self.masks[i]
+            shared |= used & mask
+            used |= mask
+            dependencies |= self.dependencies[i]
+            excluded |= self._excluded[i]
+        # Dependency values selected while another value of the same
+        # dependency is selected too
+        shared |= dependencies & excluded
+        if not shared:
+            return []
+        claimants: dict[int, list[int]] = {}
+        for i in indexes:
+            for bit in _bits((self.masks[i] | self.dependencies[i]) & shared):
+                claimants.setdefault(bit, []).append(i)
+        found = []
+        reported: dict[str, PinConflict] = {}
+        for bit in sorted(claimants):
+            resource = self.resources[bit]
+            if resource.startswith("dependency:"):
+                # Reported once per dependency, with every configuration
+                # selecting a value of it
+                resource = resource.partition("=")[0]
+                if resource not in reported:
+                    reported[resource] = PinConflict(resource, [])
+                    found.append(reported[resource])
+                reported[resource].configuration_ids.extend(
+                    self.options[i].configuration.id for i in claimants[bit]
+                )
+            else:
+                found.append(PinConflict(resource, [self.options[i].configuration.id for i in claimants[bit]]))
+        return found
+
+    #endregion
+
+    #region Assignment
+
+    def candidates(self, request: str) -> list[int]:
+        """Indexes of the options matching a request: a configuration id, or
+        words of the peripheral, instance or mode names (e.g. "UART",
+        "SCI9", "Asynchronous UART")"""
+        if request in self._option_index:
+            return [self._option_index[request]]
+        matches = [self._words.get(word, set()) for word in _words(request)]
+        return sorted(set.intersection(*matches)) if matches else []
+
+    def solve(
+        self, requests: Iterable[str], enabled: Iterable[str] = ()
+    ) -> Optional[list[Option]]:
+        """A conflict-free option for every request, in the order of the
+        requests, that is also compatible with the ``enabled`` configurations;
+        None if there is none"""
+        requests = list(requests)
+        fixed = [self.index(i) for i in enabled]
+        if self.conflicts(self.options[i].configuration.id for i in fixed):
+            return None
+        used = dependencies = excluded = 0
+        for i in fixed:
+            used |= self.masks[i]
+            dependencies |= self.dependencies[i]
+            excluded |= self._excluded[i]
+
+        # Identical requests share a domain and are searched as one group
+        # choosing options in increasing order, so that the same options are
+        # not tried in every order. Options with the same resources are
+        # interchangeable; only the first one is kept.
+        groups: dict[str, list[int]] = {}
+        for position, request in enumerate(requests):
+            groups.setdefault(request, []).append(position)
+        domains = []
+        for request in groups:
+            seen: set[tuple[int, int]] = set()
+            domain = []
+            for i in self.candidates(request):
+                key = (self.masks[i], self.dependencies[i])
+                if key not in seen:
+                    seen.add(key)
+                    domain.append(i)
+            domains.append(domain)
+
+        masks, option_dependencies, option_excluded = self.masks, self.dependencies, self._excluded
+        instances = self._instances
+        pin_mask = (1 << len(self.ports)) - 1
+        pin_counts = [(m & pin_mask).bit_count() for m in masks]
+        chosen: list[list[int]] = [[] for _ in domains]
+        failed: set[tuple] = set()
+
+        def search(counts: tuple, used: int, dependencies: int, excluded: int) -> bool:
+            if not any(counts):
+                return True
+            after = tuple(c[-1] if c else -1 for c in chosen)
+            state = (counts, after, used, dependencies)
+            if state in failed:
+                return False
+            # Forward checking: every group needs as many options that still
+            # fit, of distinct instances, and the pins left have to be enough
+            # for the smallest options of all groups; branch on the group
+            # with the fewest options left per request
+            live = {}
+            needed = 0
+            for g, count in enumerate(counts):
+                if not count:
+                    continue
+                options = [
+                    i
+                    for i in domains[g]
+                    if i > after[g]
+                    and not (masks[i] & used or option_dependencies[i] & excluded or option_excluded[i] & dependencies)
+                ]
+                if len(options) < count or (count > 1 and len({instances[i] for i in options}) < count):
+                    failed.add(state)
+                    return False
+                needed += count * min(pin_counts[i] for i in options)
+                live[g] = options
+            if needed > (pin_mask & ~used).bit_count():
+                failed.add(state)
+                return False
+            group = min(live, key=lambda g: len(live[g]) / counts[g])
+            rest = counts[:group] + (counts[group] - 1,) + counts[group + 1 :]
+            for i in live[group]:
+                chosen[group].append(i)
+                if search(
+                    rest,
+                    used | masks[i],
+                    dependencies | option_dependencies[i],
+                    excluded | option_excluded[i],
+                ):
+                    return True
+                chosen[group].pop()
+            failed.add(state)
+            return False
+
+        if not search(tuple(len(positions) for positions in groups.values()), used, dependencies, excluded):
+            return None
+        selection: list[Optional[Option]] = [None] * len(requests)
+        for positions, indexes in zip(groups.values(), chosen):
+            for position, i in zip(positions, indexes):
+                selection[position] = self.options[i]
+        return selection
+
+    def assignment_model(self, selection: Iterable[Option]) -> cdm.SftPinAssignmentModel:
+        """Pins used by the selected options, with the function routed to them.
+        The pin number is the package pin of the port if it is numeric and
+        the position of the port on the device otherwise."""
+        pins = []
+        for option in selection:
+            for pin_config in option.configuration.pinConfigs or ():
+                # Looked up without allocating, so exports leave the layout as is
+                pin = self._pin_of(pin_config)
+                index = self._resources.get(pin.upper())
+                if index is None:
+                    raise ValueError(f"Unknown pin: {pin}")
+                port = self.ports[index] if index < len(self.ports) else None
+                number = port.pin if port is not None and port.pin else ""
+                name = self.resources[index]
+                pins.append(
+                    cdm.SftPinAssignment(
+                        pinNumber=int(number) if number.isdigit() else index + 1,
+                        pinName=name,
+                        pinFunction=pin_config.pinName or pin_config.function,
+                        symbolicName=(port.symbolicName if port is not None else None) or name,
+                    )
+                )
+        pins.sort(key=lambda pin: pin.pinNumber)
+        return cdm.SftPinAssignmentModel(pins=pins)
+
+    #endregion
@@ -0,0 +1,264 @@
+"""Id-keyed reference index and referential integrity checks of SDM versions.
+
+Entities of a version refer to each other by id (block to hardware
+components, endpoints to blocks and ports, hardware components and software
+models to device models, ...; see :data:`REFERENCES`). :class:`SdmReferenceIndex`
+is built in one pass over a version and maps every id to its entity and
+every id to the references made to it, so that references resolve in O(1)
+and :meth:`~SdmReferenceIndex.check` finds all dangling references and
+duplicate ids in O(N).
+
+Everything an entity of a top-level collection (see :data:`~common_data_model.
+version_store.COLLECTIONS`) contains is indexed under that entity, so
+:meth:`~SdmReferenceIndex.apply` updates the index for a patch by
+re-indexing only the top-level entities the patch touches.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model._util import gc_paused
+from common_data_model.sdm_diff import ADD, MODIFY, REMOVE, Path, SdmPatch, apply_patch_tracked
+from common_data_model.version_store import COLLECTIONS
+
+# Entity keys are ids, or (parent id, id) for kinds only unique in their parent
+Key = Union[str, tuple[str, str]]
+EntityKey = tuple[str, Key]
+
+# Kind of the entities of each top-level collection
+COLLECTION_KINDS: dict[str, str] = {
+    "functionalBlocks": "functionalBlock",
+    "connections": "connection",
+    "deviceModels": "deviceModel",
+    "softwareModels": "softwareModel",
+    "hardwareModels": "hardwareModel",
+}
+
+# Entities contained in entities of a kind: list attribute -> kind
+CHILDREN: dict[str, dict[str, str]] = {
+    "functionalBlock": {"ports": "port"},
+    "connection": {"endpoints": "endpoint"},
+    "deviceModel": {"peripherals": "peripheral"},
+    "peripheral": {"instances": "peripheralInstance"},
+    "softwareModel": {"softwareComponents": "softwareComponent"},
+    "hardwareModel": {"hardwareComponents": "hardwareComponent"},
+}
+
+# Kinds without an id; their references are made by their parent
+ANONYMOUS = {"endpoint"}
+
+# Kinds whose ids are only unique within their parent
+SCOPED = {"port", "peripheral"}
+
+# (kind, slot) -> (kind of the referenced entity, slot of the referring
+# entity holding the parent id of the referenced entity for SCOPED kinds)
+REFERENCES: dict[tuple[str, str], tuple[str, Optional[str]]] = {
+    ("functionalBlock", "hardwareComponentIds"): ("hardwareComponent", None),
+    ("port", "hardwareComponentId"): ("hardwareComponent", None),
+    ("port", "softwareComponentId"): ("softwareComponent", None),
+    ("port", "peripheralInstanceId"): ("peripheralInstance", None),
+    ("endpoint", "functionalBlockId"): ("functionalBlock", None),
+    ("endpoint", "portId"): ("port", "functionalBlockId"),
+    ("hardwareModel", "functionalBlockIds"): ("functionalBlock", None),
+    ("hardwareComponent", "deviceModelId"): ("deviceModel", None),
+    ("softwareModel", "deviceModelId"): ("deviceModel", None),
+    ("softwareComponent", "dependencyIds"): ("softwareComponent", None),
+    ("softwareComponent", "peripheralInstanceId"): ("peripheralInstance", None),
+}
+
+_SLOTS: dict[str, list[tuple[str, str, Optional[str]]]] = {}
+for (_kind, _slot), (_target, _scope) in REFERENCES.items():
+    _SLOTS.setdefault(_kind, []).append((_slot, _target, _scope))
+
+_COLLECTION_AT = {location: name for name, location in COLLECTIONS.items()}
+
+
+class Reference(NamedTuple):
+    # Referring entity, slot (prefixed by the list attribute for references
+    # of ANONYMOUS entities, e.g. "endpoints.portId") and referenced entity
+    source: EntityKey
+    slot: str
+    target: EntityKey
+
+
+@dataclass
+class IntegrityReport:
+    dangling: list[Reference] = field(default_factory=list)
+    duplicates: list[EntityKey] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.dangling and not self.duplicates
+
+
+def _ids(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class SdmReferenceIndex:
+    def __init__(self, version: cdm.SystemSdmSystemModelVersion) -> None:
+        self.version = version
+        self._entities: dict[EntityKey, list[Any]] = {}
+        self._referrers: dict[EntityKey, list[Reference]] = {}
+        # What each top-level entity added to the index:
+        # (collection, id) -> [(definitions, references)] per entity
+        self._owned: dict[tuple[str, str], list[tuple[list, list[Reference]]]] = {}
+        with gc_paused():
+            for collection, entities in self._collections(version):
+                for entity in entities:
+                    self._add(collection, entity)
+
+    @staticmethod
+    def _collections(version: cdm.SystemSdmSystemModelVersion) -> Iterator[tuple[str, list]]:
+        for name, (owner, key) in COLLECTIONS.items():
+            target = getattr(version, owner) if owner else version
+            if target is not None:
+                yield name, getattr(target, key) or []
+
+    #region Indexing
+
+    def _add(self, collection: str, root: Any) -> None:
+        definitions: list[tuple[EntityKey, Any]] = []
+        references: list[Reference] = []
+        # (kind, entity, parent id, referring entity, slot prefix)
+        stack = [(COLLECTION_KINDS[collection], root, None, None, "")]
+        while stack:
+            kind, entity, parent_id, source, prefix = stack.pop()
+            if kind in ANONYMOUS:
+                own_id = parent_id
+            else:
+                own_id = entity.id
+                source = (kind, (parent_id, own_id) if kind in SCOPED else own_id)
+                prefix = ""
+                definitions.append((source, entity))
+            for slot, target, scope in _SLOTS.get(kind, ()):
+                for value in _ids(getattr(entity, slot)):
+                    key = (getattr(entity, scope), value) if scope else value
+                    references.append(Reference(source, prefix + slot, (target, key)))
+            for name, child_kind in CHILDREN.get(kind, {}).items():
+                for child in getattr(entity, name) or ():
+                    child_prefix = f"{prefix}{name}." if child_kind in ANONYMOUS else ""
+                    stack.append((child_kind, child, own_id, source, child_prefix))
+
+        entities, referrers = self._entities, self._referrers
+        for key, entity in definitions:
+            entities.setdefault(key, []).append(entity)
+        for reference in references:
+            referrers.setdefault(reference.target, []).append(reference)
+        self._owned.setdefault((collection, root.id), []).append((definitions, references))
+
+    def _remove(self, collection: str, entity_id: str) -> None:
+        entities, referrers = self._entities, self._referrers
+        for definitions, references in self._owned.pop((collection, entity_id), ()):
+            for key, entity in definitions:
+                remaining = [e for e in entities[key] if e is not entity]
+                if remaining:
+                    entities[key] = remaining
+                else:
+                    del entities[key]
+            for reference in references:
+                referring = referrers[reference.target]
+                referring.remove(reference)
+                if not referring:
+                    del referrers[reference.target]
+
+    #endregion
+
+    #region Queries
+
+    def get(self, kind: str, key: Key) -> Optional[Any]:
+        """Entity of a kind with a key (the first one if the key is duplicated)"""
+        found = self._entities.get((kind, key))
+        return found[0] if found else None
+
+    def resolve(self, reference: Reference) -> Optional[Any]:
+        """Entity a reference refers to, None if it is dangling"""
+        return self.get(*reference.target)
+
+    def referrers(self, kind: str, key: Key) -> list[Reference]:
+        """References made to the entity of a kind with a key"""
+        return list(self._referrers.get((kind, key), ()))
+
+    def entities(self) -> Iterator[tuple[EntityKey, Any]]:
+        for key, found in self._entities.items():
+            for entity in found:
+                yield key, entity
+
+    def references(self) -> Iterator[Reference]:
+        for referring in self._referrers.values():
+            yield from referring
+
+    def check(self) -> IntegrityReport:
+        """All dangling references and duplicate ids"""
+        entities = self._entities
+        return IntegrityReport(
+            dangling=[
+                reference
+                for target, referring in self._referrers.items()
+                if target not in entities
+                for reference in referring
+            ],
+            duplicates=[key for key, found in entities.items() if len(found) > 1],
+        )
+
+    #endregion
+
+    #region Updates
+
+    def _top_level(self, path: Path) -> Optional[tuple[str, str, Path]]:
+        """Collection and id of the top-level entity a path is in, and its path"""
+        owner = ""
+        for depth, step in enumerate(path):
+            if isinstance(step, tuple):
+                name, entity_id = step
+                collection = _COLLECTION_AT.get((owner, name))
+                if collection is None:
+                    return None
+                return collection, entity_id, path[: depth + 1]
+            owner = step
+        return None
+
+    def apply(self, patch: SdmPatch) -> cdm.SystemSdmSystemModelVersion:
+        """Apply ``patch`` to the indexed version and update the index for the
+        entities it changes. Returns the new version, which is then indexed."""
+        version, written = apply_patch_tracked(self.version, patch)
+        stale: set[tuple[str, str]] = set()
+        # (collection, id) -> new entities to index
+        fresh: dict[tuple[str, str], list] = {}
+        for change in patch.changes:
+            located = self._top_level(change.path)
+            if located is not None:
+                collection, entity_id, top_path = located
+                stale.add((collection, entity_id))
+                if change.op == ADD and change.path == top_path:
+                    fresh[collection, entity_id] = [change.value]
+                elif change.op == REMOVE and change.path == top_path:
+                    fresh.pop((collection, entity_id), None)
+                else:
+                    fresh[collection, entity_id] = [written[top_path]]
+            elif change.op == MODIFY:
+                # Attributes of the version or its functional model; whole
+                # collections may be replaced
+                owner = change.path[0] if change.path else ""
+                replaced = [_COLLECTION_AT.get((owner, name)) for name in change.value]
+                if not owner and "functionalModel" in change.value:
+                    replaced += [c for c, (o, _) in COLLECTIONS.items() if o == "functionalModel"]
+                for collection in filter(None, replaced):
+                    stale.update(k for k in self._owned if k[0] == collection)
+                    for key in [k for k in fresh if k[0] == collection]:
+                        del fresh[key]
+                    for entities_collection, entities in self._collections(version):
+                        if entities_collection == collection:
+                            for entity in entities:
+                                fresh.setdefault((collection, entity.id), []).append(entity)
+        for collection, entity_id in stale:
+            self._remove(collection, entity_id)
+        for (collection, _), entities in fresh.items():
+            for entity in entities:
+                self._add(collection, entity)
+        self.version = version
+        return version
+
+    #endregion
@@ -0,0 +1,412 @@
+"""Compact, array-backed register and memory maps of device models.
+
+The address map of a device model (``DmAddressMap``: segments, address
+blocks with their memories and registers, register fields and field enums)
+can have hundreds of thousands of entries for a large part family, each a
+generated dataclass instance with its own ``__dict__``. :class:`RegisterMap`
+stores every level of the map as a table of parallel arrays (one array per
+slot; strings are interned into one table and stored as indexes, and
+nested entries are stored as ranges of the next level), and gives out small
+``__slots__`` views of entries on demand.
+
+Segments, address blocks and registers have interval indexes (start
+addresses in sorted arrays with the running maximum of their ends), so
+finding the entries covering an address takes O(log n) and overlapping
+entries are found with one sweep.
+
+:meth:`RegisterMap.from_address_map` loads the map from a ``DmAddressMap``
+or its JSON form (as produced by :func:`common_data_model.fast_codec.
+to_dict`), and :meth:`RegisterMap.to_address_map` converts it back.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+import common_data_model.datamodel.common_data_model as cdm
+
+START = "dm_HasAddressRange_start_address"
+SIZE = "dm_HasAddressRange_size"
+
+# Kinds of columns: addresses and sizes, bit positions, strings, enum
+# values and lists of strings
+INT, BITS, STR, ENUM, STRS = "int", "bits", "str", "enum", "strs"
+
+# Array type of every kind of column (strings are stored as indexes into
+# the string table), and the value of missing values for every array type
+TYPECODES = {INT: "q", BITS: "h", STR: "i", ENUM: "i", STRS: "i"}
+MISSING = {"q": -(2**63), "h": -(2**15), "i": -1}
+
+# Span of entries without a size in the interval indexes
+DEFAULT_SIZE = 1
+
+
+class Level(NamedTuple):
+    cls: type
+    # (slot, short name used by views, kind of column, enum class)
+    columns: list[tuple[str, str, str, Optional[type]]]
+    # (slot, level) of the lists of nested entries
+    children: list[tuple[str, str]]
+
+
+LEVELS: dict[str, Level] = {
+    "segment": Level(
+        cdm.DmAddressSegment,
+        [
+            (START, "start_address", INT, None),
+            (SIZE, "size", INT, None),
+            ("description", "description", STR, None),
+            ("dm_AddressSegment_name", "name", STR, None),
+            ("dm_AddressSegment_aliases", "aliases", STRS, None),
+            ("dm_AddressSegment_peripherals", "peripherals", STRS, None),
+        ],
+        [("dm_AddressSegment_blocks", "block")],
+    ),
+    "block": Level(
+        cdm.DmAddressBlock,
+        [
+            (START, "start_address", INT, None),
+            (SIZE, "size", INT, None),
+            ("description", "description", STR, None),
+            ("dm_AddressBlock_name", "name", STR, None),
+            ("dm_AddressBlock_type", "type", ENUM, cdm.DmAddressBlockType),
+            ("dm_AddressBlock_peripheral_instance", "peripheral_instance", STR, None),
+        ],
+        [("dm_AddressBlock_memories", "memory"), ("dm_AddressBlock_registers", "register")],
+    ),
+    "memory": Level(
+        cdm.DmMemory,
+        [
+            ("dm_Memory_name", "name", STR, None),
+            ("dm_Memory_type", "type", STR, None),
+            ("dm_Memory_size", "size", INT, None),
+        ],
+        [],
+    ),
+    "register": Level(
+        cdm.DmRegister,
+        [
+            (START, "start_address", INT, None),
+            (SIZE, "size", INT, None),
+            ("description", "description", STR, None),
+            ("dm_Register_name", "name", STR, None),
+            ("dm_Register_access", "access", ENUM, cdm.DmAccessType),
+            ("dm_Register_reset_value", "reset_value", STR, None),
+            ("dm_Register_reset_mask", "reset_mask", STR, None),
+        ],
+        [("dm_Register_fields", "field")],
+    ),
+    "field": Level(
+        cdm.DmRegisterField,
+        [
+            ("description", "description", STR, None),
+            ("dm_RegisterField_name", "name", STR, None),
+            ("dm_RegisterField_lsb", "lsb", BITS, None),
+            ("dm_RegisterField_msb", "msb", BITS, None),
+            ("dm_RegisterField_access", "access", ENUM, cdm.DmAccessType),
+        ],
+        [("dm_RegisterField_enums", "enum")],
+    ),
+    "enum": Level(
+        cdm.DmFieldEnum,
+        [
+            ("description", "description", STR, None),
+            ("dm_FieldEnum_name", "name", STR, None),
+            ("dm_FieldEnum_value", "value", STR, None),
+        ],
+        [],
+    ),
+}
+
+# Levels with address ranges, outermost first
+ADDRESSED = ("segment", "block", "register")
+
+SEGMENTS = "dm_AddressMapModel_segments"
+
+
+def _entries(value: Any) -> list:
+    if not value:
+        return []
+    if isinstance(value, dict):
+        return list(value.values())
+    return value if isinstance(value, list) else [value]
+
+
+class _Table:
+    """Columns of one level, and the ranges of nested entries of each entry"""
+
+    def __init__(self, level: Level) -> None:
+        self.level = level
+        self.count = 0
+        self.columns: dict[str, array] = {}
+        self.lists: dict[str, tuple[array, array]] = {}
+        for _, name, kind, _ in level.columns:
+            if kind == STRS:
+                self.lists[name] = (array("i", [0]), array("i"))
+            else:
+                self.columns[name] = array(TYPECODES[kind])
+        # Child level -> offsets of the nested entries of every entry; the
+        # parent of an entry is found by bisecting the offsets of its level
+        self.children: dict[str, array] = {child: array("i", [0]) for _, child in level.children}
+
+    def nbytes(self) -> int:
+        arrays = [*self.columns.values(), *self.children.values()]
+        arrays += [a for pair in self.lists.values() for a in pair]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+class _Interval:
+    """Entries of a level sorted by start address, with the running maximum
+    of their ends, for stabbing queries"""
+
+    def __init__(self, table: _Table) -> None:
+        starts, sizes = table.columns["start_address"], table.columns["size"]
+        self.order = array("l", sorted(range(table.count), key=starts.__getitem__))
+        self.starts = array("q", (starts[i] for i in self.order))
+        self.ends = array("q", (starts[i] + (sizes[i] if sizes[i] > 0 else DEFAULT_SIZE) for i in self.order))
+        self.max_ends = array("q", self.ends)
+        for k in range(1, len(self.max_ends)):
+            if self.max_ends[k] < self.max_ends[k - 1]:
+                self.max_ends[k] = self.max_ends[k - 1]
+
+    def covering(self, address: int) -> list[int]:
+        """Indexes of the entries covering an address, innermost (latest
+        start) first. O(log n) when entries covering the address do not
+        overlap others."""
+        found = []
+        k = bisect_right(self.starts, address) - 1
+        while k >= 0 and self.max_ends[k] > address:
+            if self.ends[k] > address:
+                found.append(self.order[k])
+            k -= 1
+        return found
+
+    def overlaps(self) -> Iterator[tuple[int, int]]:
+        """Pairs of overlapping entries: every entry starting before the end
+        of an earlier one, with the earlier entry reaching furthest"""
+        furthest = -1
+        for k in range(len(self.starts)):
+            if furthest >= 0 and self.starts[k] < self.ends[furthest]:
+                yield self.order[furthest], self.order[k]
+            if furthest < 0 or self.ends[k] > self.ends[furthest]:
+                furthest = k
+
+
+class Entry:
+    """View of one entry of a :class:`RegisterMap`; slots are read by the
+    short names of :data:`LEVELS` (``name``, ``start_address``, ``lsb``, ...)"""
+
+    __slots__ = ("map", "level", "index")
+
+    def __init__(self, register_map: "RegisterMap", level: str, index: int) -> None:
+        self.map = register_map
+        self.level = level
+        self.index = index
+
+    def __getattr__(self, name: str) -> Any:
+        return self.map._value(self.level, self.index, name)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Entry)
+            and other.map is self.map
+            and (other.level, other.index) == (self.level, self.index)
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.level, self.index))
+
+    def __repr__(self) -> str:
+        return f"Entry({self.level}, {self.name!r})"
+
+    @property
+    def parent(self) -> Optional["Entry"]:
+        level = self.map._parent_level.get(self.level)
+        if level is None:
+            return None
+        offsets = self.map._tables[level].children[self.level]
+        return Entry(self.map, level, bisect_right(offsets, self.index) - 1)
+
+    def children(self, level: str) -> list["Entry"]:
+        offsets = self.map._tables[self.level].children[level]
+        return [Entry(self.map, level, i) for i in range(offsets[self.index], offsets[self.index + 1])]
+
+    def to_object(self) -> Any:
+        """The entry (and its nested entries) as a generated dataclass instance"""
+        return self.map._object(self.level, self.index)
+
+
+class Location(NamedTuple):
+    segment: Optional[Entry]
+    block: Optional[Entry]
+    register: Optional[Entry]
+
+
+class RegisterMap:
+    def __init__(self) -> None:
+        self.strings: list[str] = []
+        self._string_index: dict[str, int] = {}
+        self._tables = {name: _Table(level) for name, level in LEVELS.items()}
+        self._parent_level = {child: name for name, level in LEVELS.items() for _, child in level.children}
+        self._intervals: dict[str, _Interval] = {}
+
+    #region Loading and conversion
+
+    @classmethod
+    def from_address_map(cls, address_map: Union[cdm.DmAddressMap, dict]) -> "RegisterMap":
+        """Register map of a ``DmAddressMap`` or its JSON form"""
+        register_map = cls()
+        if isinstance(address_map, dict):
+            segments = address_map.get(SEGMENTS)
+            register_map._load("segment", _entries(segments), dict.get)
+        else:
+            register_map._load("segment", _entries(address_map.dm_AddressMapModel_segments), getattr)
+        return register_map
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def _load(self, level: str, entries: list, get) -> None:
+        table = self._tables[level]
+        spec = table.level
+        for entry in entries:
+            table.count += 1
+            for slot, name, kind, _ in spec.columns:
+                value = get(entry, slot)
+                if kind == INT or kind == BITS:
+                    column = table.columns[name]
+                    column.append(MISSING[column.typecode] if value is None else int(value))
+                elif kind == STR:
+                    table.columns[name].append(self._intern(None if value is None else str(value)))
+                elif kind == ENUM:
+                    if value is not None and not isinstance(value, str):
+                        value = value.code.text
+                    table.columns[name].append(self._intern(value))
+                else:
+                    offsets, values = table.lists[name]
+                    values.extend(self._intern(str(v)) for v in _entries(value))
+                    offsets.append(len(values))
+            for slot, child in spec.children:
+                self._load(child, _entries(get(entry, slot)), get)
+                table.children[child].append(self._tables[child].count)
+
+    def _value(self, level: str, index: int, name: str) -> Any:
+        table = self._tables[level]
+        column = table.columns.get(name)
+        if column is not None:
+            value = column[index]
+            if value == MISSING[column.typecode]:
+                return None
+            return self.strings[value] if column.typecode == "i" else value
+        if name in table.lists:
+            offsets, values = table.lists[name]
+            return [self.strings[v] for v in values[offsets[index] : offsets[index + 1]]]
+        raise AttributeError(f"{level} has no slot {name!r}")
+
+    def _object(self, level: str, index: int) -> Any:
+        table = self._tables[level]
+        spec = table.level
+        values = {}
+        for slot, name, kind, enum in spec.columns:
+            value = self._value(level, index, name)
+            if value is None or value == []:
+                continue
+            values[slot] = enum(value) if kind == ENUM else value
+        for slot, child in spec.children:
+            offsets = table.children[child]
+            values[slot] = [self._object(child, i) for i in range(offsets[index], offsets[index + 1])]
+        return spec.cls(**values)
+
+    def to_address_map(self) -> cdm.DmAddressMap:
+        segments = [self._object("segment", i) for i in range(self._tables["segment"].count)]
+        return cdm.DmAddressMap(dm_AddressMapModel_segments=segments)
+
+    #endregion
+
+    #region Queries
+
+    def __len__(self) -> int:
+        return sum(table.count for table in self._tables.values())
+
+    def nbytes(self) -> int:
+        """Size of the arrays of the map (not counting the string table)"""
+        return sum(table.nbytes() for table in self._tables.values())
+
+    def count(self, level: str) -> int:
+        return self._tables[level].count
+
+    def entry(self, level: str, index: int) -> Entry:
+        if not 0 <= index < self._tables[level].count:
+            raise IndexError(f"{level} index out of range: {index}")
+        return Entry(self, level, index)
+
+    def entries(self, level: str) -> Iterator[Entry]:
+        return (Entry(self, level, i) for i in range(self._tables[level].count))
+
+    def _interval(self, level: str) -> _Interval:
+        interval = self._intervals.get(level)
+        if interval is None:
+            interval = self._intervals[level] = _Interval(self._tables[level])
+        return interval
+
+    def covering(self, level: str, address: int) -> list[Entry]:
+        """Segments, blocks or registers covering an address, innermost first"""
+        return [Entry(self, level, i) for i in self._interval(level).covering(address)]
+
+    def locate(self, address: int) -> Location:
+        """The segment, address block and register covering an address"""
+        found = []
+        for level in ADDRESSED:
+            covering = self._interval(level).covering(address)
+            found.append(Entry(self, level, covering[0]) if covering else None)
+        return Location(*found)
+
+    def register_at(self, address: int) -> Optional[Entry]:
+        return self.locate(address).register
+
+    def fields_at(self, address: int, bit: Optional[int] = None) -> list[Entry]:
+        """Fields of the register covering an address, or only the ones
+        covering a bit of it"""
+        register = self.register_at(address)
+        if register is None:
+            return []
+        return [
+            f
+            for f in register.children("field")
+            if bit is None or (f.lsb is not None and f.lsb <= bit <= (f.msb if f.msb is not None else f.lsb))
+        ]
+
+    def overlaps(self) -> list[tuple[Entry, Entry]]:
+        """Overlapping segments, address blocks, registers and register
+        fields (fields of one register overlapping in bits)"""
+        found = [
+            (Entry(self, level, a), Entry(self, level, b))
+            for level in ADDRESSED
+            for a, b in self._interval(level).overlaps()
+        ]
+        table = self._tables["register"]
+        offsets = table.children["field"]
+        lsbs, msbs = self._tables["field"].columns["lsb"], self._tables["field"].columns["msb"]
+        missing = MISSING[lsbs.typecode]
+        for register in range(table.count):
+            # (lsb, msb, index) of the fields with bit positions; a field
+            # without msb is one bit wide
+            fields = sorted(
+                (lsbs[i], msbs[i] if msbs[i] != missing else lsbs[i], i)
+                for i in range(offsets[register], offsets[register + 1])
+                if lsbs[i] != missing
+            )
+            highest = None
+            for lsb, msb, i in fields:
+                if highest is not None and lsb <= highest[1]:
+                    found.append((Entry(self, "field", highest[2]), Entry(self, "field", i)))
+                if highest is None or msb > highest[1]:
+                    highest = (lsb, msb, i)
+        return found
+
+    #endregion
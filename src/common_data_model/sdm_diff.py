@@ -0,0 +1,280 @@
+"""Structural diff and patch (ECO) of System Data Model versions.
+
+Entities are matched by their stable ids (the GUIDs assigned by the client id
+mappers), never by list position. :func:`diff_sdm` walks both versions once,
+using id-keyed indexes for every inlined entity list and skipping sub-trees
+shared between the versions, and emits a compact :class:`SdmPatch` of
+add/remove/modify changes. :func:`apply_patch` replays a patch on a baseline
+by path copying, so the result shares every untouched entity with the
+baseline and applying costs O(changes) rather than O(model).
+
+Pure reorderings of otherwise unchanged entities are not part of a patch;
+added entities are inserted after the entity that preceded them in the target.
+"""
+import dataclasses
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Any, Optional, Union
+
+from linkml_runtime.utils.yamlutils import YAMLRoot
+
+import common_data_model.datamodel.common_data_model as cdm
+
+# A path step is either an inlined single entity attribute ("functionalModel")
+# or an entity in an inlined list, as (list attribute, entity id).
+PathStep = Union[str, tuple[str, str]]
+Path = tuple[PathStep, ...]
+
+ADD = "add"
+REMOVE = "remove"
+MODIFY = "modify"
+
+# Attributes of the version itself that identify it rather than its content
+_ROOT_IDENTITY = ("id", "version")
+
+_fields_cache: dict[type, tuple[str, ...]] = {}
+
+
+class PatchConflictError(ValueError):
+    """Raised when a patch does not apply to the given baseline"""
+
+
+@dataclass
+class SdmChange:
+    op: str
+    path: Path
+    # Added or removed entity, or the modified attributes with their new values
+    value: Any = None
+    # Id of the entity an added entity follows (None for the list head)
+    after: Optional[str] = None
+
+
+@dataclass
+class SdmPatch:
+    base_version: int
+    target_version: int
+    changes: list[SdmChange] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+
+def _fields(entity: YAMLRoot) -> tuple[str, ...]:
+    cls = type(entity)
+    if cls not in _fields_cache:
+        _fields_cache[cls] = tuple(f.name for f in dataclasses.fields(cls))
+    return _fields_cache[cls]
+
+
+def _is_entity(value: Any) -> bool:
+    return isinstance(value, YAMLRoot) and getattr(value, "id", None) is not None
+
+
+def _is_entity_list(old: Any, new: Any) -> bool:
+    return (
+        isinstance(old, list)
+        and isinstance(new, list)
+        and bool(old or new)
+        and all(_is_entity(e) for e in old)
+        and all(_is_entity(e) for e in new)
+    )
+
+
+def _diff_entity(
+    old: YAMLRoot,
+    new: YAMLRoot,
+    path: Path,
+    changes: list[SdmChange],
+    skip: tuple[str, ...] = (),
+) -> None:
+    modified = {}
+    for name in _fields(new):
+        if name in skip:
+            continue
+        a, b = getattr(old, name), getattr(new, name)
+        if a is b:
+            continue
+        if _is_entity_list(a, b):
+            if _diff_list(a, b, path, name, changes):
+                continue
+        elif _is_entity(a) and _is_entity(b) and a.id == b.id:
+            _diff_entity(a, b, path + (name,), changes)
+            continue
+        if a != b:
+            modified[name] = b
+    if modified:
+        changes.append(SdmChange(MODIFY, path, modified))
+
+
+def _diff_list(
+    old: list, new: list, path: Path, name: str, changes: list[SdmChange]
+) -> bool:
+    """Diff two entity lists by id; False if ids are not unique"""
+    old_by_id = {e.id: e for e in old}
+    new_ids = {e.id for e in new}
+    if len(old_by_id) != len(old) or len(new_ids) != len(new):
+        return False
+
+    previous = None
+    for entity in new:
+        step = path + ((name, entity.id),)
+        baseline = old_by_id.get(entity.id)
+        if baseline is None:
+            changes.append(SdmChange(ADD, step, entity, after=previous))
+        elif baseline is not entity:
+            _diff_entity(baseline, entity, step, changes)
+        previous = entity.id
+    for entity_id, entity in old_by_id.items():
+        if entity_id not in new_ids:
+            changes.append(SdmChange(REMOVE, path + ((name, entity_id),), entity))
+    return True
+
+
+def diff_sdm(
+    old: cdm.SystemSdmSystemModelVersion, new: cdm.SystemSdmSystemModelVersion
+) -> SdmPatch:
+    """Compute the patch turning ``old`` into ``new`` in a single linear pass"""
+    patch = SdmPatch(base_version=old.version, target_version=old.version + 1)
+    _diff_entity(old, new, (), patch.changes, skip=_ROOT_IDENTITY)
+    return patch
+
+
+class _PatchWriter:
+    """Copy-on-write access to the entities and lists along patched paths.
+
+    Positions in a copied list stay valid while the patch is applied: removed
+    entities leave a tombstone and entities inserted before the end of a list
+    are parked next to their anchor. :meth:`compact` then rebuilds each list
+    that needs it once.
+    """
+
+    def __init__(self, root: YAMLRoot) -> None:
+        self.root = root
+        # Writable copies of the entities along the patched paths, by path
+        self.written: dict[Path, YAMLRoot] = {(): root}
+        self._lists: dict[tuple[Path, str], list] = {}
+        self._positions: dict[tuple[Path, str], dict[str, int]] = {}
+        # Entities inserted mid-list, by the id they follow (None for the head)
+        self._inserts: dict[tuple[Path, str], dict[Optional[str], list]] = {}
+        self._anchors: dict[tuple[Path, str], dict[str, Optional[str]]] = {}
+        self._tombstones: set[tuple[Path, str]] = set()
+
+    def entity(self, path: Path) -> YAMLRoot:
+        if path not in self.written:
+            step = path[-1]
+            if isinstance(step, tuple):
+                name, entity_id = step
+                entities, positions = self.collection(path[:-1], name)
+                if entity_id not in positions:
+                    raise PatchConflictError(f"No entity at {path}")
+                writable = copy(entities[positions[entity_id]])
+                entities[positions[entity_id]] = writable
+            else:
+                parent = self.entity(path[:-1])
+                shared = getattr(parent, step)
+                if shared is None:
+                    raise PatchConflictError(f"No entity at {path}")
+                writable = copy(shared)
+                setattr(parent, step, writable)
+            self.written[path] = writable
+        return self.written[path]
+
+    def collection(self, path: Path, name: str) -> tuple[list, dict[str, int]]:
+        key = (path, name)
+        if key not in self._lists:
+            parent = self.entity(path)
+            entities = list(getattr(parent, name) or [])
+            setattr(parent, name, entities)
+            self._lists[key] = entities
+            self._positions[key] = {e.id: i for i, e in enumerate(entities)}
+        return self._lists[key], self._positions[key]
+
+    def add(self, path: Path, entity: YAMLRoot, after: Optional[str]) -> None:
+        name, entity_id = path[-1]
+        key = (path[:-1], name)
+        entities, positions = self.collection(*key)
+        anchors = self._anchors.setdefault(key, {})
+        if entity_id in positions or entity_id in anchors:
+            raise PatchConflictError(f"Entity already exists at {path}")
+        if after is not None and after not in positions and after not in anchors:
+            raise PatchConflictError(f"No entity {after} to insert {path} after")
+
+        if after is not None and positions.get(after) == len(entities) - 1:
+            positions[entity_id] = len(entities)
+            entities.append(entity)
+            return
+        # Park the entity right after its predecessor, which may be parked itself
+        anchor = anchors.get(after, after)
+        parked = self._inserts.setdefault(key, {}).setdefault(anchor, [])
+        index = 0
+        if after != anchor:
+            index = next(i for i, e in enumerate(parked) if e.id == after) + 1
+        parked.insert(index, entity)
+        anchors[entity_id] = anchor
+
+    def remove(self, path: Path) -> None:
+        name, entity_id = path[-1]
+        key = (path[:-1], name)
+        entities, positions = self.collection(*key)
+        if entity_id not in positions:
+            raise PatchConflictError(f"No entity at {path}")
+        entities[positions.pop(entity_id)] = None
+        self._tombstones.add(key)
+        self.written.pop(path, None)
+
+    def modify(self, path: Path, values: dict[str, Any]) -> None:
+        entity = self.entity(path)
+        for name, value in values.items():
+            setattr(entity, name, value)
+            # Lists replaced wholesale are no longer the ones cached for the path
+            self._lists.pop((path, name), None)
+            self._positions.pop((path, name), None)
+
+    def compact(self) -> None:
+        for key in self._tombstones | self._inserts.keys():
+            entities = self._lists.get(key)
+            if entities is None:
+                continue
+            inserts = self._inserts.get(key, {})
+            compacted = list(inserts.get(None, []))
+            for entity in entities:
+                if entity is not None:
+                    compacted.append(entity)
+                    compacted.extend(inserts.get(entity.id, ()))
+            entities[:] = compacted
+
+
+def apply_patch(
+    base: cdm.SystemSdmSystemModelVersion, patch: SdmPatch
+) -> cdm.SystemSdmSystemModelVersion:
+    """Apply ``patch`` to ``base`` and return the resulting version.
+
+    ``base`` is left untouched and shares all entities the patch does not
+    change with the result.
+    """
+    return apply_patch_tracked(base, patch)[0]
+
+
+def apply_patch_tracked(
+    base: cdm.SystemSdmSystemModelVersion, patch: SdmPatch
+) -> tuple[cdm.SystemSdmSystemModelVersion, dict[Path, YAMLRoot]]:
+    """:func:`apply_patch`, also returning the entities of the result that were
+    copied along the patched paths, by path"""
+    if base.version != patch.base_version:
+        raise PatchConflictError(
+            f"Patch applies to version {patch.base_version}, not {base.version}"
+        )
+    root = copy(base)
+    root.version = patch.target_version
+    writer = _PatchWriter(root)
+    for change in patch.changes:
+        if change.op == ADD:
+            writer.add(change.path, change.value, change.after)
+        elif change.op == REMOVE:
+            writer.remove(change.path)
+        elif change.op == MODIFY:
+            writer.modify(change.path, change.value)
+        else:
+            raise ValueError(f"Unknown patch operation '{change.op}'")
+    writer.compact()
+    return root, writer.written
@@ -0,0 +1,466 @@
+"""Local SIM service sharing versioned System Data Models between tools.
+
+:class:`SimServer` keeps the versions of one
+:class:`SystemSdmSystemModelVersion` in an
+:class:`~common_data_model.version_store.SdmVersionStore` and serves them
+over an asyncio stream server to any number of :class:`SimClient`
+connections (ESD, E2 studio, Altium Designer, ...).
+
+* Pushes are ECOs (:class:`~common_data_model.sdm_diff.SdmPatch`) against
+  the version the client last saw, committed with compare-and-swap on the
+  versions of the entities they change: the server records the last
+  version changing every entity, and a push is refused if a version newer
+  than its base changed one of its entities. Otherwise it is applied to the
+  latest version, so clients changing different entities do not have to
+  retry each other's pushes. A refused push is answered with the ECO to the
+  latest version, on which the client can rebase its changes and push
+  again. Checking and committing happen in one step of the event loop, so
+  no locks are needed.
+* Pulls are answered from the immutable snapshot of the latest version,
+  with the ECO from the version of the client (or the whole version in the
+  binary format when the client has none), and never wait for pushes. The
+  encoded answer is shared by all the clients pulling from the same
+  version until the next commit.
+* A client coalesces bursts of pushes: while one push is in flight, the
+  models pushed meanwhile replace each other and only the last one is
+  pushed next, with all the callers getting the version that holds it.
+
+Layout of the messages, in both directions::
+
+    message  header size(4 bytes) body size(4 bytes), both big endian,
+             JSON header, body
+    header   {"op": "pull", "version": n or null}
+               -> {"kind": "current" | "patch" | "full", "version": n}
+                  with the ECO (JSON) or the version (binary) as body
+             {"op": "push", "base": n} with the ECO (JSON) as body
+               -> {"ok": true | false, "version": n[, "kind": ...]} with
+                  the answer to a pull from the base unless the ECO was
+                  committed right on top of it, or
+                  {"ok": false, "version": n, "error": text}
+             {"op": "version"} -> {"version": n}
+"""
+import argparse
+import asyncio
+import json
+import struct
+from typing import Any, Optional
+
+from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+from linkml_runtime.utils.yamlutils import YAMLRoot
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import binary_codec, fast_codec
+from common_data_model.sdm_diff import (
+    ADD, MODIFY, REMOVE, Path, PatchConflictError, SdmChange, SdmPatch, apply_patch, diff_sdm,
+)
+from common_data_model.version_store import SdmVersionStore
+
+DEFAULT_PORT = 8765
+
+_SIZES = struct.Struct(">II")
+
+_classes: dict[str, type] = {}
+
+
+# Entities are tracked by the first steps of the paths of changes
+_DEPTH = 2
+
+
+class SimVersionError(RuntimeError):
+    """Raised when a push is refused because a newer version of the SIM
+    changed the same entities"""
+
+
+#region ECO encoding
+
+
+def _class(name: str) -> type:
+    if not _classes:
+        for cls in vars(cdm).values():
+            if isinstance(cls, type) and issubclass(cls, (YAMLRoot, EnumDefinitionImpl)):
+                _classes[getattr(cls, "class_name", cls.__name__)] = cls
+    return _classes[name]
+
+
+def _encode_value(v: Any) -> Any:
+    if isinstance(v, YAMLRoot):
+        return {"@type": v.class_name, "value": fast_codec.to_dict(v)}
+    if isinstance(v, EnumDefinitionImpl):
+        return {"@enum": type(v).__name__, "value": v.code.text}
+    if isinstance(v, list):
+        return [_encode_value(e) for e in v]
+    return fast_codec.generic(v) if not isinstance(v, (str, int, float, bool, type(None))) else v
+
+
+def _decode_value(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "@type" in v:
+            return fast_codec.from_dict(_class(v["@type"]), v["value"])
+        return _class(v["@enum"])(v["value"])
+    if isinstance(v, list):
+        return [_decode_value(e) for e in v]
+    return v
+
+
+def encode_patch(patch: SdmPatch) -> dict:
+    """JSON form of an ECO; entities and enums carry their class"""
+    return {
+        "base": patch.base_version,
+        "target": patch.target_version,
+        "changes": [
+            [
+                change.op,
+                [list(step) if isinstance(step, tuple) else step for step in change.path],
+                {name: _encode_value(v) for name, v in change.value.items()}
+                if isinstance(change.value, dict)
+                else _encode_value(change.value),
+                change.after,
+            ]
+            for change in patch.changes
+        ],
+    }
+
+
+def decode_patch(data: dict) -> SdmPatch:
+    """ECO of its JSON form; raises ValueError (or KeyError, TypeError) for
+    anything that is not one"""
+    patch = SdmPatch(
+        data["base"],
+        data["target"],
+        [
+            SdmChange(
+                op,
+                tuple(tuple(step) if isinstance(step, list) else step for step in path),
+                {name: _decode_value(v) for name, v in value.items()}
+                if isinstance(value, dict) and "@type" not in value
+                else _decode_value(value),
+                after,
+            )
+            for op, path, value, after in data["changes"]
+        ],
+    )
+    for change in patch.changes:
+        if change.op == MODIFY:
+            valid = isinstance(change.value, dict)
+        else:
+            valid = change.op in (ADD, REMOVE) and isinstance(change.value, YAMLRoot)
+        if not valid:
+            raise ValueError(f"Invalid {change.op} change at {change.path}")
+    return patch
+
+
+#endregion
+
+#region Messages
+
+
+async def _read_message(reader: asyncio.StreamReader) -> tuple[dict, bytes]:
+    header_size, body_size = _SIZES.unpack(await reader.readexactly(_SIZES.size))
+    header = await reader.readexactly(header_size)
+    body = await reader.readexactly(body_size) if body_size else b""
+    # Decoded once the whole message is read, so a bad header leaves the
+    # stream at the next message
+    header = json.loads(header)
+    if not isinstance(header, dict):
+        raise ValueError(f"Message header is not an object: {header!r}")
+    return header, body
+
+
+def _message(header: dict, body: bytes = b"") -> bytes:
+    encoded = json.dumps(header).encode()
+    return _SIZES.pack(len(encoded), len(body)) + encoded + body
+
+
+#endregion
+
+#region Server
+
+
+class SimServer:
+    """asyncio server of the versions of one System Data Model"""
+
+    def __init__(self, model: Optional[cdm.SystemSdmSystemModelVersion] = None) -> None:
+        if model is None:
+            model = cdm.SystemSdmSystemModelVersion(id="sim", version=0)
+        self.store = SdmVersionStore(model)
+        self.pushes = 0
+        self.refused = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+        # Encoded pull answers of the latest version, by version of the client
+        self._answers: dict[Optional[int], bytes] = {}
+        self._answered_version = self.store.version
+        # Last version changing an entity, and changing it or anything in it
+        self._changed: dict[Path, int] = {}
+        self._changed_within: dict[Path, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self.store.version
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> tuple[str, int]:
+        """Start serving; returns the address (``port`` 0 picks a free one)"""
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Closed connections end their handlers like clients disconnecting
+            for writer in self._connections:
+                writer.close()
+            await asyncio.gather(*self._connections.values())
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "SimServer":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    header, body = await _read_message(reader)
+                    answer = self._answer(header, body)
+                except asyncio.IncompleteReadError:
+                    return
+                except (KeyError, TypeError, ValueError) as e:
+                    # Malformed message: answered, the connection stays open
+                    self.refused += 1
+                    answer = {"ok": False, "version": self.version, "error": f"Invalid message: {e}"}, b""
+                writer.write(_message(*answer))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def _answer(self, header: dict, body: bytes) -> tuple[dict, bytes]:
+        op = header.get("op")
+        if op == "pull":
+            return self.pull(header.get("version"))
+        if op == "push":
+            return self.push(header.get("base"), body)
+        if op == "version":
+            return {"version": self.version}, b""
+        return {"ok": False, "version": self.version, "error": f"Unknown operation {op}"}, b""
+
+    def pull(self, version: Optional[int]) -> tuple[dict, bytes]:
+        """Header and body of the answer to a pull from a client at
+        ``version`` (None for a client without a version)"""
+        latest = self.store.version
+        if self._answered_version != latest:
+            self._answers.clear()
+            self._answered_version = latest
+        answer = self._answers.get(version)
+        if answer is None:
+            snapshot = self.store.snapshot()
+            try:
+                baseline = None if version is None else self.store[version]
+            except KeyError:
+                baseline = None
+            if version == latest:
+                answer = {"kind": "current", "version": latest}, b""
+            elif baseline is None:
+                answer = {"kind": "full", "version": latest}, binary_codec.dumps(snapshot)
+            else:
+                patch = diff_sdm(baseline, snapshot)
+                patch.target_version = latest
+                answer = {"kind": "patch", "version": latest}, json.dumps(encode_patch(patch)).encode()
+            self._answers[version] = answer
+        return answer
+
+    def push(self, base: int, body: bytes) -> tuple[dict, bytes]:
+        """Commit the ECO of a client at version ``base`` on top of the latest
+        version, unless a version newer than ``base`` changed one of its
+        entities. The answer brings the client to the latest version."""
+        self.pushes += 1
+        latest = self.store.version
+        if not isinstance(base, int) or not base <= latest:
+            self.refused += 1
+            return {"ok": False, "version": latest, "error": f"Unknown version {base}"}, b""
+        try:
+            patch = decode_patch(json.loads(body))
+        except (KeyError, TypeError, ValueError) as e:
+            self.refused += 1
+            return {"ok": False, "version": latest, "error": f"Invalid ECO: {e!r}"}, b""
+        if base != latest and self._conflicts(base, patch):
+            self.refused += 1
+            header, answer = self.pull(base)
+            return {"ok": False, **header}, answer
+        patch.base_version, patch.target_version = latest, latest + 1
+        try:
+            self.store.commit(apply_patch(self.store.snapshot(), patch))
+        except (KeyError, TypeError, ValueError) as e:
+            # PatchConflictError, or an ECO that is not a valid patch
+            self.refused += 1
+            return {"ok": False, "version": latest, "error": str(e)}, b""
+        self._record(patch, latest + 1)
+        if base == latest:
+            return {"ok": True, "version": latest + 1}, b""
+        header, answer = self.pull(base)
+        return {"ok": True, **header}, answer
+
+    def _conflicts(self, base: int, patch: SdmPatch) -> bool:
+        changed, within = self._changed, self._changed_within
+        for change in patch.changes:
+            key = change.path[:_DEPTH]
+            if within.get(key, -1) > base:
+                return True
+            if any(changed.get(key[:i], -1) > base for i in range(len(key))):
+                return True
+        return False
+
+    def _record(self, patch: SdmPatch, version: int) -> None:
+        for change in patch.changes:
+            key = change.path[:_DEPTH]
+            self._changed[key] = version
+            for i in range(len(key) + 1):
+                self._changed_within[key[:i]] = version
+
+
+#endregion
+
+#region Client
+
+
+class SimClient:
+    """Connection of a tool to a :class:`SimServer`.
+
+    ``baseline`` is the latest version the client pulled or pushed. With
+    ``rebase`` set, a push refused because a newer version changed the same
+    entities moves to that version and pushes the same changes on top of it
+    (the last push wins); otherwise it raises :class:`SimVersionError`.
+    Changes that no longer apply raise
+    :class:`~common_data_model.sdm_diff.PatchConflictError`.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, rebase: bool = True) -> None:
+        self.baseline: Optional[cdm.SystemSdmSystemModelVersion] = None
+        self.rebase = rebase
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        self._pending: Optional[cdm.SystemSdmSystemModelVersion] = None
+        self._waiting: list[asyncio.Future] = []
+        self._pushing: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = DEFAULT_PORT, rebase: bool = True) -> "SimClient":
+        return cls(*await asyncio.open_connection(host, port), rebase=rebase)
+
+    async def close(self) -> None:
+        if self._pushing is not None:
+            await asyncio.gather(self._pushing, return_exceptions=True)
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def __aenter__(self) -> "SimClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _request(self, header: dict, body: bytes = b"") -> tuple[dict, bytes]:
+        async with self._lock:
+            self._writer.write(_message(header, body))
+            await self._writer.drain()
+            return await _read_message(self._reader)
+
+    async def version(self) -> int:
+        return (await self._request({"op": "version"}))[0]["version"]
+
+    async def pull(self) -> cdm.SystemSdmSystemModelVersion:
+        """Bring ``baseline`` up to the latest version of the SIM"""
+        self._update(
+            *await self._request({"op": "pull", "version": None if self.baseline is None else self.baseline.version})
+        )
+        return self.baseline
+
+    def _update(self, header: dict, body: bytes) -> None:
+        if header["kind"] == "full":
+            self.baseline = binary_codec.loads(body)
+        elif header["kind"] == "patch":
+            self.baseline = apply_patch(self.baseline, decode_patch(json.loads(body)))
+
+    async def push(self, model: cdm.SystemSdmSystemModelVersion) -> int:
+        """Push the changes of ``model`` since ``baseline``; returns the version
+        of the SIM holding them. Models pushed while an earlier push is in
+        flight are coalesced into one push of the last of them."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending = model
+        self._waiting.append(future)
+        if self._pushing is None or self._pushing.done():
+            self._pushing = asyncio.ensure_future(self._push_pending())
+        return await future
+
+    async def _push_pending(self) -> None:
+        while self._pending is not None:
+            model, waiting = self._pending, self._waiting
+            self._pending, self._waiting = None, []
+            try:
+                version = await self._push(model)
+            except Exception as e:
+                for future in waiting:
+                    future.set_exception(e)
+            else:
+                for future in waiting:
+                    future.set_result(version)
+
+    async def _push(self, model: cdm.SystemSdmSystemModelVersion) -> int:
+        if self.baseline is None:
+            await self.pull()
+        patch = diff_sdm(self.baseline, model)
+        while patch.changes:
+            patch.base_version, patch.target_version = self.baseline.version, self.baseline.version + 1
+            header, body = await self._request(
+                {"op": "push", "base": patch.base_version}, json.dumps(encode_patch(patch)).encode()
+            )
+            if header["ok"]:
+                if "kind" in header:
+                    # Committed on top of newer versions
+                    self._update(header, body)
+                else:
+                    self.baseline = apply_patch(self.baseline, patch)
+                break
+            if "error" in header:
+                raise PatchConflictError(header["error"])
+            if not self.rebase:
+                raise SimVersionError(
+                    f"SIM version {header['version']} is newer than baseline version {self.baseline.version}"
+                )
+            # The answer brings the baseline to the latest version
+            self._update(header, body)
+        return self.baseline.version
+
+
+#endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a System Data Model to SIM clients.")
+    parser.add_argument("model", nargs="?", help="Initial system model version (JSON)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    model = fast_codec.load(args.model, cdm.SystemSdmSystemModelVersion) if args.model else None
+
+    async def serve() -> None:
+        server = SimServer(model)
+        host, port = await server.start(args.host, args.port)
+        print(f"Serving version {server.version} on {host}:{port}")
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""Streaming importer of CMSIS-SVD files into the device model.
+
+SVD files describe the peripherals of a part family and their registers,
+fields and enumerated values, and are commonly 20-80 MB of XML. The
+importer reads them with ``xml.etree.ElementTree.iterparse`` and converts
+one ``<peripheral>`` element at a time, which is then cleared, so the XML
+in memory is bounded by the largest peripheral:
+
+* every peripheral becomes a ``DmPeripheralInstance`` of the
+  ``DmPeripheral`` of its ``groupName``, and a ``DmAddressBlock`` at its
+  base address holding its registers (``DmRegister``, with absolute start
+  addresses and sizes in bytes), their fields (``DmRegisterField``) and
+  enumerated values (``DmFieldEnum``);
+* ``derivedFrom`` peripherals, registers, fields and enumerated values are
+  resolved by reference: derived registers share the field objects of the
+  registers they derive from, and derived fields their enum objects;
+* register properties (``size``, ``access``, ``resetValue``,
+  ``resetMask``) are inherited from the device, peripheral and clusters,
+  ``dim`` arrays are expanded and cluster registers are named
+  ``CLUSTER.REGISTER``.
+
+:func:`load_svd` builds a ``DmFullstackDeviceModel`` of one file (SVD has
+no processor clock, so no ``DmProcessor`` is created), and
+:func:`import_catalogue` converts many files across a process pool and
+reports the throughput. From the command line::
+
+    python -m common_data_model.svd_import vendor/*.svd -o device_models -j 8
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional, Union
+from xml.etree.ElementTree import Element, iterparse
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+
+Source = Union[str, Path, IO[bytes]]
+
+# SVD access types -> DmAccessType
+ACCESS = {
+    "read-only": "ReadOnly",
+    "write-only": "WriteOnly",
+    "read-write": "ReadWrite",
+    "writeOnce": "WriteOnly",
+    "read-writeOnce": "ReadWrite",
+}
+# Converted once and shared, as the constructors convert enum texts slowly
+_ACCESS = {name: cdm.DmAccessType(value) for name, value in ACCESS.items()}
+
+# Register properties inherited from the device, peripherals and clusters
+PROPERTIES = ("size", "access", "resetValue", "resetMask")
+
+_UNITS = {"k": 1 << 10, "K": 1 << 10, "m": 1 << 20, "M": 1 << 20, "g": 1 << 30, "G": 1 << 30}
+
+
+def _int(text: Optional[str]) -> Optional[int]:
+    """SVD scaledNonNegativeInteger: decimal, 0x hexadecimal or #binary
+    (with x for don't care bits), optionally with a k/M/G multiplier"""
+    if text is None:
+        return None
+    text = text.strip()
+    if text.startswith("#"):
+        return int(text[1:].replace("x", "0").replace("X", "0"), 2)
+    if text.lower().startswith("0x"):
+        return int(text, 16)
+    if text and text[-1] in _UNITS:
+        return int(text[:-1], 0) * _UNITS[text[-1]]
+    return int(text)
+
+
+def _text(element: Element, tag: str) -> Optional[str]:
+    child = element.find(tag)
+    if child is None or child.text is None:
+        return None
+    # Descriptions are wrapped and indented in most files
+    return " ".join(child.text.split())
+
+
+def _dim_names(element: Element, name: str) -> list[tuple[str, int]]:
+    """(name, address increment) of every element of a dim array, or of the
+    element alone"""
+    dim = _int(_text(element, "dim"))
+    if not dim:
+        return [(name, 0)]
+    increment = _int(_text(element, "dimIncrement")) or 0
+    index = _text(element, "dimIndex")
+    if index and re.fullmatch(r"\d+-\d+", index):
+        first, last = map(int, index.split("-"))
+        indexes = [str(i) for i in range(first, last + 1)]
+    elif index:
+        indexes = [i.strip() for i in index.split(",")]
+    else:
+        indexes = [str(i) for i in range(dim)]
+    return [(name.replace("%s", i), n * increment) for n, i in enumerate(indexes[:dim])]
+
+
+def _derivations(source: Source) -> Optional[set[str]]:
+    """Peripherals named by the derivedFrom paths of an SVD file, found by
+    scanning its bytes, or None for file objects that cannot be rewound"""
+    pattern = re.compile(rb"derivedFrom\s*=\s*[\"']([^\"'.]*)")
+    if isinstance(source, (str, Path)):
+        file = open(source, "rb")
+    elif source.seekable():
+        file, position = source, source.tell()
+    else:
+        return None
+    found = set()
+    tail = b""
+    try:
+        while chunk := file.read(1 << 20):
+            # Names split across chunks are found again in the overlap
+            data = tail + chunk
+            found.update(m.group(1).decode() for m in pattern.finditer(data))
+            tail = data[-256:]
+    finally:
+        if file is source:
+            source.seek(position)
+        else:
+            file.close()
+    return found
+
+
+class SvdPeripheral(NamedTuple):
+    # DmPeripheral the instance belongs to (the SVD groupName), the instance
+    # and the address block of its registers
+    group: str
+    instance: cdm.DmPeripheralInstance
+    block: cdm.DmAddressBlock
+    registers: int
+
+
+class _Register(NamedTuple):
+    # A converted register, by offset from its peripheral, for derivations
+    offset: int
+    values: dict
+
+
+class SvdReader:
+    def __init__(self, source: Source) -> None:
+        """Reader of an SVD file, a path or a binary file object"""
+        self.source = source
+        # Device level elements (name, vendor, series, description, ...)
+        self.device: dict[str, str] = {}
+        self._defaults: dict[str, str] = {}
+        # Peripherals other peripherals derive from (None: any), whose
+        # registers, fields and enumerated values are kept for derivations
+        self._referenced: Optional[set[str]] = None
+        # Peripheral name -> (base address, registers, group, description)
+        self._peripherals: dict[str, tuple[int, list[_Register], str, Optional[str]]] = {}
+        # Enumerated values by name and by qualified name, and fields by
+        # qualified name, of the kept peripherals and of the current one
+        self._enums: dict[str, list] = {}
+        self._fields: dict[str, cdm.DmRegisterField] = {}
+        self._local_enums: dict[str, list] = {}
+        self._local_fields: dict[str, cdm.DmRegisterField] = {}
+        # Name of the peripheral being converted
+        self._scope = ""
+
+    def peripherals(self) -> Iterator[SvdPeripheral]:
+        """Converted peripherals in file order, one at a time"""
+        self._referenced = _derivations(self.source)
+        depth = 0
+        container = None
+        for event, element in iterparse(self.source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and element.tag == "peripherals":
+                    container = element
+                continue
+            depth -= 1
+            if depth == 2 and element.tag == "peripheral" and container is not None:
+                yield self._peripheral(element)
+                # Drop the converted element from <peripherals>
+                container.clear()
+            elif depth == 1:
+                if element.tag in PROPERTIES:
+                    self._defaults[element.tag] = (element.text or "").strip()
+                elif len(element) == 0 and element.text is not None:
+                    self.device[element.tag] = " ".join(element.text.split())
+                elif element.tag == "peripherals":
+                    element.clear()
+
+    #region Conversion
+
+    def _properties(self, element: Element, inherited: dict[str, str]) -> dict[str, str]:
+        found = dict(inherited)
+        for name in PROPERTIES:
+            value = _text(element, name)
+            if value is not None:
+                found[name] = value
+        return found
+
+    def _peripheral(self, element: Element) -> SvdPeripheral:
+        name = _text(element, "name")
+        base = self._peripherals.get(element.get("derivedFrom", ""))
+        base_address = _int(_text(element, "baseAddress"))
+        group = _text(element, "groupName") or (base[2] if base else None) or name
+        description = _text(element, "description") or (base[3] if base else None)
+        properties = self._properties(element, self._defaults)
+        self._scope = name
+
+        registers: list[_Register] = []
+        if base is not None:
+            # Registers of the base peripheral, sharing their fields
+            registers.extend(base[1])
+        own = element.find("registers")
+        if own is not None:
+            added = self._registers(own, 0, "", properties, registers)
+            # Registers of the derived peripheral replace those of its base
+            names = {r.values["dm_Register_name"] for r in added}
+            registers = [r for r in registers if r.values["dm_Register_name"] not in names] + added
+        if self._referenced is None or name in self._referenced:
+            self._peripherals[name] = (base_address, registers, group, description)
+            self._fields.update(self._local_fields)
+            self._enums.update(self._local_enums)
+        self._local_fields.clear()
+        self._local_enums.clear()
+
+        instance_id = name.lower()
+        starts = [base_address]
+        ends = [base_address]
+        for block in element.findall("addressBlock"):
+            offset, size = _int(_text(block, "offset")) or 0, _int(_text(block, "size")) or 0
+            starts.append(base_address + offset)
+            ends.append(base_address + offset + size)
+        built = []
+        for register in sorted(registers, key=lambda r: r.offset):
+            values = dict(register.values)
+            values["dm_HasAddressRange_start_address"] = base_address + register.offset
+            built.append(fast_codec.from_dict(cdm.DmRegister, values))
+        block = {
+            "dm_HasAddressRange_start_address": min(starts),
+            "dm_HasAddressRange_size": max(ends) - min(starts) or None,
+            "description": description,
+            "dm_AddressBlock_name": name,
+            "dm_AddressBlock_type": "Peripheral",
+            "dm_AddressBlock_peripheral_instance": instance_id,
+            "dm_AddressBlock_registers": built,
+        }
+        return SvdPeripheral(
+            group,
+            cdm.DmPeripheralInstance(id=instance_id, name=name),
+            fast_codec.from_dict(cdm.DmAddressBlock, {k: v for k, v in block.items() if v is not None}),
+            len(built),
+        )
+
+    def _registers(
+        self, element: Element, offset: int, prefix: str, inherited: dict[str, str], known: list[_Register]
+    ) -> list[_Register]:
+        found: list[_Register] = []
+        for child in element:
+            if child.tag == "cluster":
+                properties = self._properties(child, inherited)
+                cluster_offset = offset + (_int(_text(child, "addressOffset")) or 0)
+                for name, increment in _dim_names(child, _text(child, "name") or ""):
+                    found.extend(
+                        self._registers(child, cluster_offset + increment, f"{prefix}{name}.", properties, known)
+                    )
+            elif child.tag == "register":
+                found.extend(self._register(child, offset, prefix, inherited, [*known, *found]))
+        return found
+
+    def _register(
+        self, element: Element, offset: int, prefix: str, inherited: dict[str, str], known: list[_Register]
+    ) -> list[_Register]:
+        values: dict[str, Any] = {}
+        base_offset = 0
+        derived_from = element.get("derivedFrom")
+        if derived_from:
+            base = self._derived_register(derived_from, known)
+            if base is not None:
+                base_offset, values = base.offset - offset, dict(base.values)
+        # Properties of a derived register come from its base, unless given
+        properties = self._properties(element, {} if values else inherited)
+        size = _int(properties.get("size"))
+        values.update(
+            (slot, value)
+            for slot, value in (
+                ("description", _text(element, "description")),
+                ("dm_HasAddressRange_size", size // 8 if size else None),
+                ("dm_Register_access", _ACCESS.get(properties.get("access", ""))),
+                ("dm_Register_reset_value", properties.get("resetValue")),
+                ("dm_Register_reset_mask", properties.get("resetMask")),
+            )
+            if value is not None
+        )
+        fields = element.find("fields")
+        name = _text(element, "name") or ""
+        if fields is not None:
+            values["dm_Register_fields"] = self._fields_of(fields, f"{self._scope}.{prefix}{name}")
+        address_offset = _int(_text(element, "addressOffset"))
+        register_offset = offset + (address_offset if address_offset is not None else base_offset)
+        return [
+            _Register(register_offset + increment, {**values, "dm_Register_name": prefix + register_name})
+            for register_name, increment in _dim_names(element, name)
+        ]
+
+    def _derived_register(self, reference: str, known: list[_Register]) -> Optional[_Register]:
+        peripheral, _, name = reference.rpartition(".")
+        registers = known
+        if peripheral and peripheral in self._peripherals:
+            registers = self._peripherals[peripheral][1]
+        else:
+            name = reference
+        return next((r for r in registers if r.values.get("dm_Register_name") == name), None)
+
+    def _fields_of(self, element: Element, qualified: str) -> list[cdm.DmRegisterField]:
+        found = []
+        for field in element.findall("field"):
+            name = _text(field, "name")
+            values: dict[str, Any] = {}
+            derived_from = field.get("derivedFrom")
+            if derived_from:
+                base = (
+                    self._local_fields.get(f"{qualified}.{derived_from}")
+                    or self._local_fields.get(derived_from)
+                    or self._fields.get(derived_from)
+                )
+                if base is not None:
+                    values = {
+                        "description": base.description,
+                        "dm_RegisterField_lsb": base.dm_RegisterField_lsb,
+                        "dm_RegisterField_msb": base.dm_RegisterField_msb,
+                        "dm_RegisterField_access": base.dm_RegisterField_access,
+                        "dm_RegisterField_enums": base.dm_RegisterField_enums,
+                    }
+            lsb, msb = self._bits(field)
+            values.update(
+                (slot, value)
+                for slot, value in (
+                    ("description", _text(field, "description")),
+                    ("dm_RegisterField_lsb", lsb),
+                    ("dm_RegisterField_msb", msb),
+                    ("dm_RegisterField_access", _ACCESS.get(_text(field, "access") or "")),
+                )
+                if value is not None
+            )
+            values["dm_RegisterField_name"] = name
+            enums = field.find("enumeratedValues")
+            if enums is not None:
+                values["dm_RegisterField_enums"] = self._enums_of(enums, f"{qualified}.{name}")
+            converted = fast_codec.from_dict(cdm.DmRegisterField, {k: v for k, v in values.items() if v is not None})
+            self._local_fields[f"{qualified}.{name}"] = converted
+            found.append(converted)
+        return found
+
+    @staticmethod
+    def _bits(field: Element) -> tuple[Optional[int], Optional[int]]:
+        offset = _int(_text(field, "bitOffset"))
+        if offset is not None:
+            return offset, offset + (_int(_text(field, "bitWidth")) or 1) - 1
+        lsb = _int(_text(field, "lsb"))
+        if lsb is not None:
+            return lsb, _int(_text(field, "msb"))
+        bit_range = _text(field, "bitRange")
+        if bit_range:
+            msb, lsb = bit_range.strip("[]").split(":")
+            return int(lsb), int(msb)
+        return None, None
+
+    def _enums_of(self, element: Element, qualified: str) -> list:
+        derived_from = element.get("derivedFrom")
+        if derived_from:
+            # By name, or by qualified name; shared with the values derived from
+            shared = (
+                self._local_enums.get(derived_from)
+                or self._enums.get(derived_from)
+                or self._local_enums.get(derived_from.rpartition(".")[2])
+            )
+            if shared is not None:
+                return shared
+        enums = [
+            fast_codec.from_dict(
+                cdm.DmFieldEnum,
+                {
+                    k: v
+                    for k, v in (
+                        ("description", _text(value, "description")),
+                        ("dm_FieldEnum_name", _text(value, "name")),
+                        ("dm_FieldEnum_value", _text(value, "value") or ("default" if _text(value, "isDefault") else None)),
+                    )
+                    if v is not None
+                },
+            )
+            for value in element.findall("enumeratedValue")
+        ]
+        name = _text(element, "name")
+        self._local_enums[qualified] = enums
+        if name:
+            self._local_enums[name] = self._local_enums[f"{qualified}.{name}"] = enums
+        return enums
+
+    #endregion
+
+
+def load_svd(source: Source) -> cdm.DmFullstackDeviceModel:
+    """Device model of the peripherals and registers of an SVD file"""
+    reader = SvdReader(source)
+    peripherals: dict[str, list[cdm.DmPeripheralInstance]] = {}
+    blocks = []
+    for peripheral in reader.peripherals():
+        peripherals.setdefault(peripheral.group, []).append(peripheral.instance)
+        blocks.append(peripheral.block)
+    name = reader.device.get("name", "")
+    address_map = None
+    if blocks:
+        start = min(b.dm_HasAddressRange_start_address for b in blocks)
+        end = max(b.dm_HasAddressRange_start_address + (b.dm_HasAddressRange_size or 0) for b in blocks)
+        address_map = cdm.DmAddressMap(
+            dm_AddressMapModel_segments=[
+                cdm.DmAddressSegment(
+                    dm_HasAddressRange_start_address=start,
+                    dm_HasAddressRange_size=end - start,
+                    dm_AddressSegment_name="Peripherals",
+                    dm_AddressSegment_peripherals=[group.lower() for group in peripherals],
+                    dm_AddressSegment_blocks=blocks,
+                )
+            ]
+        )
+    return cdm.DmFullstackDeviceModel(
+        id=name,
+        mpn=name,
+        dm_FullStackDeviceModel_family=reader.device.get("series") or name,
+        peripherals=[
+            cdm.DmPeripheral(id=group.lower(), name=group, instances=instances)
+            for group, instances in peripherals.items()
+        ],
+        dm_FullStackDeviceModel_address_map=address_map,
+    )
+
+
+#region Catalogues
+
+
+class ImportResult(NamedTuple):
+    path: str
+    peripherals: int
+    registers: int
+    seconds: float
+
+
+def import_file(path: str, output: Optional[str] = None) -> ImportResult:
+    """Import one SVD file, and write its device model as JSON to the
+    ``output`` directory if given"""
+    start = time.perf_counter()
+    model = load_svd(path)
+    if output:
+        fast_codec.dump(model, os.path.join(output, f"{Path(path).stem}.json"))
+    blocks = model.dm_FullStackDeviceModel_address_map.dm_AddressMapModel_segments[0].dm_AddressSegment_blocks if (
+        model.dm_FullStackDeviceModel_address_map
+    ) else []
+    return ImportResult(
+        path,
+        len(blocks),
+        sum(len(b.dm_AddressBlock_registers) for b in blocks),
+        time.perf_counter() - start,
+    )
+
+
+def import_catalogue(
+    paths: Iterable[str], output: Optional[str] = None, processes: Optional[int] = None
+) -> Iterator[ImportResult]:
+    """Import SVD files across a pool of ``processes`` (one per CPU by
+    default; 1 imports in this process), yielding results as files complete"""
+    paths = list(paths)
+    if output:
+        os.makedirs(output, exist_ok=True)
+    if processes == 1:
+        for path in paths:
+            yield import_file(path, output)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        yield from pool.map(import_file, paths, [output] * len(paths))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import CMSIS-SVD files into device models.")
+    parser.add_argument("svd", nargs="+", help="SVD files")
+    parser.add_argument("-o", "--output", help="Directory for the device models (JSON)")
+    parser.add_argument("-j", "--processes", type=int, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    registers = 0
+    for result in import_catalogue(args.svd, args.output, args.processes):
+        registers += result.registers
+        print(
+            f"{result.path}: {result.peripherals} peripherals, {result.registers} registers"
+            f" in {result.seconds:.2f} s"
+        )
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.svd)} files, {registers} registers in {elapsed:.2f} s ({registers / elapsed:.0f} registers/s)")
+
+
+if __name__ == "__main__":
+    main()
+
+#endregion
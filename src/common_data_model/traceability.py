@@ -0,0 +1,498 @@
+"""Traceability index of requirements, verification cases and change requests.
+
+The requirement classes link to each other by id through many slots (see
+:data:`LINKS`). :class:`TraceabilityIndex` interns every id to a dense node
+index and keeps the links as typed edges: for every node, a dict of the
+nodes it links to with a bit mask of the link types. Edges point
+downstream, in the direction impact propagates (from a change request to
+the requirements it impacts, from a requirement to its children, to the
+artifacts satisfying it and to the verification cases validating it, ...),
+whichever end of the link declares it; the membership of requirements in
+specifications and baselines does not propagate impact.
+
+Reachability is kept on the condensation of the impact graph: nodes in a
+cycle form one strongly connected component, represented by its smallest
+node, and the components are kept in a topological order. Adding a link
+updates the order with the Pearce-Kelly algorithm, which only visits the
+components between the two ends in the order and merges the components of
+a cycle the link closes. Removing a link within a component (which may
+split it) condenses the graph again on the next query. The set of
+components reachable from a component is cached when it is queried, and
+cached sets are extended as links are added, so repeated impact queries
+only expand the components they reach.
+"""
+from array import array
+from typing import Any, Iterable, NamedTuple, Optional, Union
+
+from common_data_model import fast_codec
+from common_data_model._util import Ids, gc_paused
+
+# Link types; a link of type TYPES[i] has bit 1 << i in the masks of the edges
+TYPES = (
+    "children",
+    "revisions",
+    "satisfiedBy",
+    "verifiedBy",
+    "tracedFrom",
+    "impacts",
+    "generates",
+    "uses",
+    "evidence",
+    "triggers",
+    "inputs",
+    "includes",
+    "ofSpecification",
+)
+_BIT = {name: 1 << i for i, name in enumerate(TYPES)}
+# Links not propagating impact
+MEMBERSHIP = _BIT["includes"] | _BIT["ofSpecification"]
+IMPACT = (1 << len(TYPES)) - 1 & ~MEMBERSHIP
+
+# Slot -> (link type, whether the edge goes from the value to the object
+# declaring it, class of the values)
+LINKS: dict[str, tuple[str, bool, Optional[str]]] = {
+    "req_requirement_children": ("children", False, "req_requirement"),
+    "req_requirement_parent": ("children", True, "req_requirement"),
+    "revisions": ("revisions", False, None),
+    "revisionOf": ("revisions", True, None),
+    "req_requirement_satisfied_by_artifacts": ("satisfiedBy", False, "req_artifact"),
+    "req_requirement_verified_by_activities": ("verifiedBy", False, None),
+    "req_verification_validates_requirements": ("verifiedBy", True, "req_requirement"),
+    "req_requirement_traced_from_sources": ("tracedFrom", True, "req_artifact"),
+    "req_change_impacts_requirements": ("impacts", False, "req_requirement"),
+    "req_change_impacts_specifications": ("impacts", False, "req_requirement_specification"),
+    "req_change_generates_revisions": ("generates", False, "req_requirement_revision"),
+    "req_revision_derives_from_change": ("generates", True, "req_requirement_change_request"),
+    "req_verification_uses_artifacts": ("uses", True, "req_artifact"),
+    "req_verification_generates_evidence": ("evidence", False, "req_artifact"),
+    "req_verification_triggers_changes": ("triggers", False, "req_requirement_change_request"),
+    "req_specification_inputs": ("inputs", True, "req_artifact"),
+    "req_specification_includes_requirements": ("includes", False, "req_requirement"),
+    "req_baseline_includes_requirements": ("includes", False, "req_requirement"),
+    "req_baseline_of_specification": ("ofSpecification", False, "req_requirement_specification"),
+}
+
+REQUIREMENT = "req_requirement"
+
+# Queried reachable sets kept
+CACHE_SIZE = 4096
+
+
+class BaselineDiff(NamedTuple):
+    added: list[str]
+    removed: list[str]
+    # Requirements of both baselines impacted by the added or removed ones
+    affected: list[str]
+
+
+def _values(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _id(value: Any) -> Optional[str]:
+    # Artifacts are inlined objects, identified by an id when they have one
+    if isinstance(value, dict):
+        value = value.get("id")
+    elif not isinstance(value, str):
+        value = getattr(value, "id", None)
+    return None if value is None else str(value)
+
+
+class TraceabilityIndex:
+    def __init__(self, elements: Iterable[Any] = (), cls: Optional[type] = None) -> None:
+        self._ids = Ids()
+        self._kinds: list[Optional[str]] = []
+        # Node -> {node: link type mask}, downstream and upstream
+        self._out: dict[int, dict[int, int]] = {}
+        self._in: dict[int, dict[int, int]] = {}
+        # Component of every node (its smallest node), the nodes of the
+        # components of several nodes, and the position of every component
+        # in the topological order
+        self._component = array("l")
+        self._members: dict[int, list[int]] = {}
+        self._order = array("q")
+        self._next_order = 0
+        # Component -> components reachable from it (itself included)
+        self._reach: dict[int, set[int]] = {}
+        # Condensation to rebuild before the next query
+        self._stale = False
+        self.add_all(elements, cls)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._ids.index
+
+    #region Links
+
+    def _node(self, id: str, kind: Optional[str] = None) -> int:
+        node = self._ids.index.get(id)
+        if node is None:
+            node = self._ids.add(id)
+            self._kinds.append(kind)
+            self._component.append(node)
+            self._order.append(self._next_order)
+            self._next_order += 1
+        elif kind is not None and self._kinds[node] is None:
+            self._kinds[node] = kind
+        return node
+
+    def _links(self, element: Any, cls: Optional[type]) -> tuple[str, str, list[tuple[str, str]]]:
+        if isinstance(element, dict):
+            if cls is None:
+                raise ValueError("The class of elements in their JSON form is needed")
+            data = element
+        else:
+            cls = type(element)
+            data = fast_codec.to_dict(element)
+        links = [(slot, target) for slot in LINKS if slot in data for target in map(_id, _values(data[slot])) if target]
+        return str(data["id"]), cls.class_name, links
+
+    def add(self, element: Any, cls: Optional[type] = None) -> None:
+        """Add the links of a requirement class object (or of its JSON form,
+        then of ``cls``)"""
+        id, kind, links = self._links(element, cls)
+        self._node(id, kind)
+        for slot, target in links:
+            self.link(id, slot, target)
+
+    def add_all(self, elements: Iterable[Any], cls: Optional[type] = None) -> None:
+        """Add many elements; the graph is condensed once, on the next query"""
+        self._stale = True
+        with gc_paused():
+            for element in elements:
+                self.add(element, cls)
+
+    def replace(self, old: Any, new: Any, cls: Optional[type] = None) -> None:
+        """Replace the links of an element by those of its new state. A link
+        declared at both ends (e.g. ``req_requirement_verified_by_activities``
+        and ``req_verification_validates_requirements``) is one link, removed
+        when either end stops declaring it."""
+        old_id, _, old_links = self._links(old, cls)
+        new_id, kind, new_links = self._links(new, cls)
+        if old_id != new_id:
+            raise ValueError(f"Cannot replace {old_id} by {new_id}")
+        self._node(new_id, kind)
+        kept = set(new_links)
+        for slot, target in old_links:
+            if (slot, target) not in kept:
+                self.unlink(old_id, slot, target)
+        for slot, target in new_links:
+            self.link(new_id, slot, target)
+
+    def _edge(self, source: str, slot: str, target: str) -> tuple[int, int, int]:
+        try:
+            type, reverse, kind = LINKS[slot]
+        except KeyError:
+            raise KeyError(f"{slot} is not a traceability slot") from None
+        value = self._node(target, kind)
+        owner = self._node(source)
+        return (value, owner, _BIT[type]) if reverse else (owner, value, _BIT[type])
+
+    def link(self, source: str, slot: str, target: str) -> None:
+        """Add the link made by ``source`` to ``target`` through ``slot``"""
+        u, v, bit = self._edge(source, slot, target)
+        out = self._out.setdefault(u, {})
+        mask = out.get(v, 0)
+        if mask & bit:
+            return
+        out[v] = mask | bit
+        self._in.setdefault(v, {})[u] = mask | bit
+        if mask & IMPACT or not bit & IMPACT or self._stale:
+            return
+        x, y = self._component[u], self._component[v]
+        if x != y:
+            self._insert(x, y)
+
+    def unlink(self, source: str, slot: str, target: str) -> None:
+        """Remove the link made by ``source`` to ``target`` through ``slot``"""
+        u, v, bit = self._edge(source, slot, target)
+        mask = self._out.get(u, {}).get(v, 0)
+        if not mask & bit:
+            return
+        mask &= ~bit
+        if mask:
+            self._out[u][v] = self._in[v][u] = mask
+        else:
+            del self._out[u][v], self._in[v][u]
+        if mask & IMPACT or not bit & IMPACT or self._stale:
+            return
+        x, y = self._component[u], self._component[v]
+        if x == y:
+            # The component may split
+            self._stale = True
+            self._reach.clear()
+        elif y not in self._successors(x):
+            for c in [c for c, reach in self._reach.items() if x in reach]:
+                del self._reach[c]
+
+    #endregion
+
+    #region Condensation
+
+    def _nodes(self, component: int) -> Iterable[int]:
+        return self._members.get(component) or (component,)
+
+    def _successors(self, component: int) -> set[int]:
+        found = set()
+        comp, out = self._component, self._out
+        for node in self._nodes(component):
+            targets = out.get(node)
+            if targets:
+                found.update([comp[v] for v, mask in targets.items() if mask & IMPACT])
+        found.discard(component)
+        return found
+
+    def _predecessors(self, component: int) -> set[int]:
+        found = set()
+        comp, into = self._component, self._in
+        for node in self._nodes(component):
+            sources = into.get(node)
+            if sources:
+                found.update([comp[u] for u, mask in sources.items() if mask & IMPACT])
+        found.discard(component)
+        return found
+
+    def _insert(self, x: int, y: int) -> None:
+        """Update the order and the components for a new edge between
+        components x -> y (Pearce-Kelly)"""
+        order = self._order
+        low, high = order[y], order[x]
+        if low < high:
+            # Components between y and x in the order reachable from y, and
+            # those reaching x; y reaches x if x is one of the former
+            forward, stack = {y}, [y]
+            while stack:
+                for c in self._successors(stack.pop()):
+                    if c not in forward and order[c] <= high:
+                        forward.add(c)
+                        stack.append(c)
+            backward, stack = {x}, [x]
+            while stack:
+                for c in self._predecessors(stack.pop()):
+                    if c not in backward and order[c] >= low:
+                        backward.add(c)
+                        stack.append(c)
+            positions = sorted(order[c] for c in forward | backward)
+            key = order.__getitem__
+            if x in forward:
+                cycle = forward & backward
+                merged = self._merge(cycle)
+                before, after = sorted(backward - cycle, key=key), sorted(forward - cycle, key=key)
+                # The merged component takes the position following those
+                # reaching it, the components it reaches keep the last ones
+                sequence = [*before, merged]
+                positions = positions[: len(sequence)] + positions[len(positions) - len(after) :]
+                sequence.extend(after)
+                self._reach.clear()
+            else:
+                sequence = sorted(backward, key=key) + sorted(forward, key=key)
+            for c, position in zip(sequence, positions):
+                order[c] = position
+            if x in forward:
+                return
+        for reach in list(self._reach.values()):
+            if x in reach and y not in reach:
+                reach |= self._reachable(y)
+
+    def _merge(self, components: set[int]) -> int:
+        nodes = sorted(n for c in components for n in self._nodes(c))
+        merged = nodes[0]
+        for c in components:
+            self._members.pop(c, None)
+        for n in nodes:
+            self._component[n] = merged
+        self._members[merged] = nodes
+        return merged
+
+    def _condense(self) -> None:
+        """Strongly connected components and their topological order
+        (Tarjan, iteratively)"""
+        count = len(self._ids)
+        out = self._out
+        index = array("l", [-1]) * count
+        low = array("l", [0]) * count
+        on_stack = bytearray(count)
+        stack: list[int] = []
+        components: list[list[int]] = []
+        counter = 0
+
+        def targets(node: int) -> Iterable[int]:
+            found = out.get(node)
+            return iter([v for v, mask in found.items() if mask & IMPACT]) if found else iter(())
+
+        for root in range(count):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, targets(root))]
+            while work:
+                node, successors = work[-1]
+                for v in successors:
+                    if index[v] < 0:
+                        index[v] = low[v] = counter
+                        counter += 1
+                        stack.append(v)
+                        on_stack[v] = 1
+                        work.append((v, targets(v)))
+                        break
+                    if on_stack[v] and index[v] < low[node]:
+                        low[node] = index[v]
+                else:
+                    work.pop()
+                    if work and low[node] < low[work[-1][0]]:
+                        low[work[-1][0]] = low[node]
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            v = stack.pop()
+                            on_stack[v] = 0
+                            component.append(v)
+                            if v == node:
+                                break
+                        components.append(component)
+        # Components come out sinks first
+        self._members = {}
+        self._order = array("q", bytes(8 * count))
+        for position, component in enumerate(reversed(components)):
+            merged = min(component)
+            if len(component) > 1:
+                component.sort()
+                self._members[merged] = component
+            for n in component:
+                self._component[n] = merged
+            self._order[merged] = position
+        self._next_order = len(components)
+        self._reach.clear()
+        self._stale = False
+
+    def _reachable(self, component: int) -> set[int]:
+        """Components reachable from a component, from the cache or
+        expanding only the components whose set is not cached"""
+        found = self._reach.get(component)
+        if found is not None:
+            return found
+        found, stack = {component}, [component]
+        cached = self._reach
+        while stack:
+            for c in self._successors(stack.pop()):
+                if c not in found:
+                    reach = cached.get(c)
+                    if reach is None:
+                        found.add(c)
+                        stack.append(c)
+                    else:
+                        found |= reach
+        if len(cached) >= CACHE_SIZE:
+            del cached[next(iter(cached))]
+        cached[component] = found
+        return found
+
+    #endregion
+
+    #region Queries
+
+    def _index(self, id: str) -> int:
+        node = self._ids.index.get(id)
+        if node is None:
+            raise KeyError(f"Unknown id {id}")
+        return node
+
+    def _kind(self, kind: Union[None, str, type]) -> Optional[str]:
+        return getattr(kind, "class_name", kind)
+
+    def kind(self, id: str) -> Optional[str]:
+        """Class name of an id, if known"""
+        return self._kinds[self._index(id)]
+
+    def impact(self, ids: Union[str, Iterable[str]], kind: Union[None, str, type] = None) -> set[str]:
+        """Ids transitively impacted by changes of ``ids`` (e.g. a change
+        request), optionally only those of a class"""
+        if self._stale:
+            self._condense()
+        sources = [self._index(ids)] if isinstance(ids, str) else [self._index(id) for id in ids]
+        components: set[int] = set()
+        for node in sources:
+            components |= self._reachable(self._component[node])
+        kind = self._kind(kind)
+        names, kinds, members = self._ids.ids, self._kinds, self._members
+        # Components of one node are the node itself
+        nodes = [n for c in components.intersection(members) for n in members[c]]
+        nodes.extend(components.difference(members))
+        if kind is None:
+            found = set(map(names.__getitem__, nodes))
+        else:
+            found = {names[n] for n in nodes if kinds[n] == kind}
+        found.difference_update([names[n] for n in sources])
+        return found
+
+    def impacted_by(self, id: str, node: str) -> bool:
+        """Whether a change of ``id`` impacts ``node``"""
+        if self._stale:
+            self._condense()
+        return self._component[self._index(node)] in self._reachable(self._component[self._index(id)])
+
+    def linked(self, id: str, type: str, upstream: bool = False) -> list[str]:
+        """Ids directly linked to ``id`` by links of a type, downstream (e.g.
+        the children of a requirement) or upstream"""
+        bit = _BIT[type]
+        edges = (self._in if upstream else self._out).get(self._index(id), {})
+        names = self._ids.ids
+        return [names[n] for n, mask in edges.items() if mask & bit]
+
+    def unverified(self, through_children: bool = False) -> list[str]:
+        """Requirements without a verification case; with
+        ``through_children``, a requirement whose children are all verified
+        is verified too"""
+        verified_by, children = _BIT["verifiedBy"], _BIT["children"]
+        out, kinds, names = self._out, self._kinds, self._ids.ids
+        requirements = [n for n, kind in enumerate(kinds) if kind == REQUIREMENT]
+        direct = {n for n in requirements if any(m & verified_by for m in out.get(n, {}).values())}
+        if not through_children:
+            return [names[n] for n in requirements if n not in direct]
+        covered: dict[int, bool] = {}
+        for root in requirements:
+            if root in covered:
+                continue
+            # Post-order over the children, a requirement in a cycle of
+            # children counting as not verified through them
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                below = [v for v, mask in out.get(node, {}).items() if mask & children]
+                if node in direct:
+                    covered[node] = True
+                elif not expanded:
+                    covered.setdefault(node, False)
+                    stack.append((node, True))
+                    stack.extend((v, False) for v in below if v not in covered)
+                else:
+                    covered[node] = bool(below) and all(covered.get(v, False) for v in below)
+        return [names[n] for n in requirements if not covered[n]]
+
+    def diff_baselines(self, old: str, new: str) -> BaselineDiff:
+        """Requirements added and removed from baseline ``old`` to ``new``,
+        and those of both impacted by the added or removed ones"""
+        includes = _BIT["includes"]
+        names = self._ids.ids
+
+        def requirements(baseline: str) -> set[int]:
+            return {v for v, mask in self._out.get(self._index(baseline), {}).items() if mask & includes}
+
+        before, after = requirements(old), requirements(new)
+        added, removed = after - before, before - after
+        affected: set[str] = set()
+        if added or removed:
+            kept = {names[n] for n in before & after}
+            affected = self.impact([names[n] for n in added | removed], REQUIREMENT) & kept
+        return BaselineDiff(
+            sorted(names[n] for n in added), sorted(names[n] for n in removed), sorted(affected)
+        )
+
+    #endregion
@@ -0,0 +1,638 @@
+"""Validation of CDM documents with JSON schema validators compiled to Python.
+
+The JSON schemas generated from the CDM (``gen-json-schema``, or the pruned
+schemas of ``prune-schema.py``) use a small set of keywords: ``type``,
+``properties``, ``required``, ``additionalProperties``, ``items``,
+``$ref`` to ``$defs``, ``anyOf`` and ``enum``. :func:`compile_schema`
+turns every definition into a Python function checking exactly its
+keywords, with the nested property and item schemas inlined, so a valid
+document costs a few dictionary lookups and type checks per value instead
+of a walk of the schema per document. Errors are reported as
+:class:`ValidationError` with the JSON pointer of the failing value and
+the messages of the ``jsonschema`` package (with long values shortened).
+Other validation keywords (``pattern``, ``minimum``, ``const``...) are
+supported too; keywords the compiler does not know raise ``ValueError``
+when compiling.
+
+:class:`CompiledSchema` caches the compiled code on disk keyed by the hash
+of the schema (and the Python version), so a process starts with one
+``marshal.loads``. :class:`ValidationEngine` validates batches of
+documents against a target class across a process pool, and records the
+content hash of every validated document with its errors in a SQLite
+database next to the compiled schemas: documents already validated
+against the same schema are not validated again. From the command line::
+
+    python -m common_data_model.validation project/jsonschema/system_data_model.schema.json \\
+        incoming/*.json -j 8
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import CodeType
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
+
+# Bumped when the generated code changes, so cached validators are rebuilt
+FORMAT = 1
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "common_data_model",
+    "validation",
+)
+
+# Keywords that do not validate anything
+ANNOTATIONS = frozenset(
+    {
+        "$schema", "$id", "$comment", "$defs", "title", "description", "default", "examples",
+        "deprecated", "readOnly", "writeOnly", "format", "metamodel_version", "version",
+    }
+)
+_TYPES = {
+    "string": "isinstance({0}, str)",
+    "object": "isinstance({0}, dict)",
+    "array": "isinstance({0}, list)",
+    "null": "{0} is None",
+    "boolean": "isinstance({0}, bool)",
+    "integer": "(isinstance({0}, int) and not isinstance({0}, bool) or isinstance({0}, float) and {0}.is_integer())",
+    "number": "(isinstance({0}, (int, float)) and not isinstance({0}, bool))",
+}
+
+Document = Union[bytes, str, dict, list]
+
+
+class ValidationError(NamedTuple):
+    # JSON pointer of the failing value ("" for the document)
+    path: str
+    keyword: str
+    message: str
+
+
+#region Compiler
+
+
+class _Compiler:
+    def __init__(self, schema: dict) -> None:
+        self.schema = schema
+        self.defs = schema.get("$defs", {})
+        self.constants: list[str] = []
+        self.functions: list[list[str]] = []
+        self.names: dict[str, str] = {}
+        self.pending: list[tuple[str, Any]] = []
+        self.count = 0
+        self.counter = 0
+
+    def constant(self, expression: str) -> str:
+        self.constants.append(f"_c{len(self.constants)} = {expression}")
+        return f"_c{len(self.constants) - 1}"
+
+    def ref(self, ref: str) -> str:
+        prefix = "#/$defs/"
+        if not ref.startswith(prefix) or ref[len(prefix):] not in self.defs:
+            raise ValueError(f"Unresolvable $ref {ref!r}")
+        name = ref[len(prefix):]
+        if name not in self.names:
+            self.names[name] = self.function(self.defs[name])
+        return self.names[name]
+
+    def function(self, node: Any) -> str:
+        """Name of a function returning the errors of a value (None if valid)"""
+        name = f"_f{self.count}"
+        self.count += 1
+        self.pending.append((name, node))
+        return name
+
+    def compile(self, targets: Iterable[str]) -> str:
+        entries = {name: self.ref(f"#/$defs/{name}") for name in targets}
+        root = self.function({k: v for k, v in self.schema.items() if k != "$defs"})
+        while self.pending:
+            name, node = self.pending.pop()
+            body: list[str] = []
+            self.emit(node, "x", [], body, "    ")
+            self.functions.append([f"def {name}(x):", "    e = None", *body, "    return e"])
+        lines = [*self.constants, ""]
+        for function in self.functions:
+            lines.extend(function)
+            lines.append("")
+        lines.append(f"ROOT = {root}")
+        lines.append("VALIDATORS = {" + ", ".join(f"{n!r}: {f}" for n, f in entries.items()) + "}")
+        return "\n".join(lines) + "\n"
+
+    def variable(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def emit(self, node: Any, x: str, path: list[str], out: list[str], indent: str) -> None:
+        p = "(" + "".join(f"{part}, " for part in path) + ")"
+
+        def error(keyword: str, message: str) -> str:
+            return f"e = _err(e, {p}, {keyword!r}, {message})"
+
+        if node is True or node == {}:
+            return
+        if node is False:
+            out.append(f"{indent}{error('false', _message(x, ' is not allowed'))}")
+            return
+        unknown = set(node) - ANNOTATIONS - _KEYWORDS
+        if unknown:
+            raise ValueError(f"Unsupported JSON schema keyword(s) {sorted(unknown)}")
+
+        if "$ref" in node:
+            s = self.variable("s")
+            out.append(f"{indent}{s} = {self.ref(node['$ref'])}({x})")
+            out.append(f"{indent}if {s}:")
+            out.append(f"{indent}    e = _sub(e, {p}, {s})")
+        if "type" in node:
+            types = [node["type"]] if isinstance(node["type"], str) else node["type"]
+            names = ", ".join(repr(t) for t in types)
+            out.append(f"{indent}if not ({_type_check(types, x)}):")
+            out.append(f"{indent}    {error('type', _message(x, f' is not of type {names}'))}")
+        if "enum" in node:
+            values = node["enum"]
+            if all(isinstance(v, str) for v in values):
+                c = self.constant(f"frozenset({values!r})")
+                out.append(f"{indent}if not (isinstance({x}, str) and {x} in {c}):")
+            else:
+                out.append(f"{indent}if {x} not in {self.constant(repr(tuple(values)))}:")
+            out.append(f"{indent}    {error('enum', _message(x, f' is not one of {values!r}'))}")
+        if "const" in node:
+            const = node["const"]
+            out.append(f"{indent}if {x} != {self.constant(repr(const))}:")
+            out.append(f"{indent}    {error('const', repr(f'{const!r} was expected'))}")
+        for sub in node.get("allOf", ()):
+            self.emit(sub, x, path, out, indent)
+        if "anyOf" in node:
+            # Type-only alternatives are checked inline, and first
+            typed = [a for a in node["anyOf"] if isinstance(a, dict) and set(a) - ANNOTATIONS == {"type"}]
+            failures = [f"not ({_type_check(a['type'], x)})" for a in typed]
+            failures += [f"{self.function(a)}({x})" for a in node["anyOf"] if not any(a is t for t in typed)]
+            out.append(f"{indent}if {' and '.join(failures)}:")
+            out.append(f"{indent}    {error('anyOf', _message(x, ' is not valid under any of the given schemas'))}")
+
+        # Keywords applying to one type of values, under one check of it
+        for value_type, emitter in (
+            ("string", self.emit_string),
+            ("number", self.emit_number),
+            ("object", self.emit_object),
+            ("array", self.emit_array),
+        ):
+            body: list[str] = []
+            emitter(node, x, path, body, indent + "    ", error)
+            if body:
+                out.append(f"{indent}if {_TYPES[value_type].format(x)}:")
+                out.extend(body)
+
+    def emit_string(self, node: dict, x: str, path: list[str], out: list[str], inner: str, error: Callable) -> None:
+        if "pattern" in node:
+            c = self.constant(f"_re.compile({node['pattern']!r})")
+            out.append(f"{inner}if not {c}.search({x}):")
+            out.append(f"{inner}    {error('pattern', _message(x, ' does not match ' + repr(node['pattern'])))}")
+        if "minLength" in node:
+            out.append(f"{inner}if len({x}) < {node['minLength']}:")
+            out.append(f"{inner}    {error('minLength', _message(x, ' is too short'))}")
+        if "maxLength" in node:
+            out.append(f"{inner}if len({x}) > {node['maxLength']}:")
+            out.append(f"{inner}    {error('maxLength', _message(x, ' is too long'))}")
+
+    def emit_number(self, node: dict, x: str, path: list[str], out: list[str], indent: str, error: Callable) -> None:
+        checks = [
+            ("minimum", "<", "is less than the minimum of"),
+            ("maximum", ">", "is greater than the maximum of"),
+            ("exclusiveMinimum", "<=", "is less than or equal to the minimum of"),
+            ("exclusiveMaximum", ">=", "is greater than or equal to the maximum of"),
+        ]
+        for keyword, operator, text in checks:
+            if keyword in node:
+                out.append(f"{indent}if {x} {operator} {node[keyword]!r}:")
+                out.append(f"{indent}    {error(keyword, _message(x, f' {text} {node[keyword]!r}'))}")
+
+    def emit_object(self, node: dict, x: str, path: list[str], out: list[str], inner: str, error: Callable) -> None:
+        for name in node.get("required", ()):
+            out.append(f"{inner}if {name!r} not in {x}:")
+            out.append(f"{inner}    {error('required', repr(f'{name!r} is a required property'))}")
+        properties = node.get("properties", {})
+        for name, sub in properties.items():
+            if not isinstance(sub, dict) or set(sub) - ANNOTATIONS:
+                v = self.variable("v")
+                body: list[str] = []
+                self.emit(sub, v, [*path, repr(name)], body, inner + "    ")
+                if body:
+                    out.append(f"{inner}{v} = {x}.get({name!r}, _MISSING)")
+                    out.append(f"{inner}if {v} is not _MISSING:")
+                    out.extend(body)
+        additional = node.get("additionalProperties", True)
+        if additional is not True and additional != {}:
+            c = self.constant(f"frozenset({sorted(properties)!r})")
+            if additional is False:
+                out.append(f"{inner}if not {c}.issuperset({x}):")
+                out.append(f"{inner}    {error('additionalProperties', f'_extra({x}, {c})')}")
+            else:
+                k, v = self.variable("k"), self.variable("v")
+                body = []
+                self.emit(additional, v, [*path, k], body, inner + "        ")
+                if body:
+                    out.append(f"{inner}for {k}, {v} in {x}.items():")
+                    out.append(f"{inner}    if {k} not in {c}:")
+                    out.extend(body)
+
+    def emit_array(self, node: dict, x: str, path: list[str], out: list[str], inner: str, error: Callable) -> None:
+        if "minItems" in node:
+            out.append(f"{inner}if len({x}) < {node['minItems']}:")
+            out.append(f"{inner}    {error('minItems', _message(x, ' is too short'))}")
+        if "maxItems" in node:
+            out.append(f"{inner}if len({x}) > {node['maxItems']}:")
+            out.append(f"{inner}    {error('maxItems', _message(x, ' is too long'))}")
+        if "items" in node:
+            i, v = self.variable("i"), self.variable("v")
+            body: list[str] = []
+            self.emit(node["items"], v, [*path, i], body, inner + "    ")
+            if body:
+                out.append(f"{inner}for {i}, {v} in enumerate({x}):")
+                out.extend(body)
+
+
+def _type_check(types: Union[str, list[str]], x: str) -> str:
+    if isinstance(types, str):
+        types = [types]
+    unknown = set(types) - set(_TYPES)
+    if unknown:
+        raise ValueError(f"Unsupported JSON schema type(s) {sorted(unknown)}")
+    return " or ".join(_TYPES[t].format(x) for t in types)
+
+
+def _message(x: str, text: str) -> str:
+    # Expression of an error message starting with the failing value
+    return f"_short({x}) + {text!r}"
+
+
+_KEYWORDS = frozenset(
+    {
+        "$ref", "type", "enum", "const", "allOf", "anyOf", "pattern", "minLength", "maxLength", "minimum",
+        "maximum", "exclusiveMinimum", "exclusiveMaximum", "properties", "required", "additionalProperties",
+        "items", "minItems", "maxItems",
+    }
+)
+
+
+def compile_schema(schema: dict, targets: Optional[Iterable[str]] = None) -> str:
+    """Python source of the validators of a JSON schema: ``ROOT`` for the
+    schema itself and ``VALIDATORS[name]`` for each of ``targets`` (by
+    default every ``$defs`` entry). Validators return None for a valid
+    value, or a list of (path, keyword, message) tuples."""
+    return _Compiler(schema).compile(schema.get("$defs", {}) if targets is None else targets)
+
+
+# Helpers of the generated code
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def _short(value: Any) -> str:
+    text = repr(value)
+    return text if len(text) <= 80 else f"{text[:76]}...{text[-1]}"
+
+
+def _err(errors: Optional[list], path: tuple, keyword: str, message: str) -> list:
+    if errors is None:
+        errors = []
+    errors.append((path, keyword, message))
+    return errors
+
+
+def _sub(errors: Optional[list], path: tuple, nested: list) -> list:
+    if errors is None:
+        errors = []
+    errors.extend((path + p, keyword, message) for p, keyword, message in nested)
+    return errors
+
+
+def _extra(value: dict, allowed: frozenset) -> str:
+    extra = [key for key in value if key not in allowed]
+    verb = "was" if len(extra) == 1 else "were"
+    return f"Additional properties are not allowed ({', '.join(map(repr, extra))} {verb} unexpected)"
+
+
+def _pointer(path: tuple) -> str:
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in path)
+
+
+#endregion
+
+#region Compiled schemas
+
+
+def schema_digest(schema: Union[str, os.PathLike, dict]) -> str:
+    """Hash of a schema: of the file's bytes, or of the canonical JSON of a
+    loaded schema"""
+    if isinstance(schema, dict):
+        data = json.dumps(schema, sort_keys=True, separators=(",", ":")).encode()
+    else:
+        with open(schema, "rb") as f:
+            data = f.read()
+    return hashlib.sha256(data).hexdigest()
+
+
+class CompiledSchema:
+    """Validators of the classes of one JSON schema"""
+
+    def __init__(self, code: CodeType, digest: str) -> None:
+        self.code = code
+        self.digest = digest
+        namespace = {"_re": re, "_MISSING": _MISSING, "_short": _short, "_err": _err, "_sub": _sub, "_extra": _extra}
+        exec(code, namespace)
+        self._root = namespace["ROOT"]
+        self._validators: dict[str, Callable] = namespace["VALIDATORS"]
+
+    @classmethod
+    def load(
+        cls, schema: Union[str, os.PathLike, dict], cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+    ) -> "CompiledSchema":
+        """Compiled validators of a JSON schema (a path or loaded schema),
+        read from ``cache_dir`` if it was compiled before"""
+        digest = schema_digest(schema)
+        cached = os.path.join(cache_dir, f"{digest}.{sys.implementation.cache_tag}.v{FORMAT}.bin") if cache_dir else None
+        if cached and os.path.exists(cached):
+            with open(cached, "rb") as f:
+                return cls(marshal.load(f), digest)
+        if not isinstance(schema, dict):
+            with open(schema, encoding="UTF-8") as f:
+                schema = json.load(f)
+        code = compile(compile_schema(schema), f"<validators {digest[:12]}>", "exec")
+        if cached:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Written aside and renamed, as other processes may load it
+            temporary = f"{cached}.{os.getpid()}"
+            with open(temporary, "wb") as f:
+                marshal.dump(code, f)
+            os.replace(temporary, cached)
+        return cls(code, digest)
+
+    @property
+    def targets(self) -> list[str]:
+        return list(self._validators)
+
+    def validate(self, document: Any, target: Optional[str] = None) -> list[ValidationError]:
+        """Errors of a JSON document against a class of the schema (by
+        default, the schema's root)"""
+        if target is None:
+            errors = self._root(document)
+        elif target in self._validators:
+            errors = self._validators[target](document)
+        else:
+            raise KeyError(f"No class '{target}' in the schema")
+        return [ValidationError(_pointer(p), keyword, message) for p, keyword, message in errors or ()]
+
+
+#endregion
+
+#region Engine
+
+
+class DocumentResult(NamedTuple):
+    # Path of the file, or position of the document in its batch
+    source: Union[str, int]
+    digest: str
+    errors: list[ValidationError]
+    # Whether the result comes from an earlier validation
+    cached: bool
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class ValidationReport:
+    schema: str
+    target: Optional[str]
+    results: list[DocumentResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.results)
+
+    @property
+    def invalid(self) -> list[DocumentResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def cached(self) -> int:
+        return sum(result.cached for result in self.results)
+
+    def to_dict(self) -> dict:
+        return {
+            "schema": self.schema,
+            "target": self.target,
+            "documents": len(self.results),
+            "invalid": len(self.invalid),
+            "cached": self.cached,
+            "seconds": self.seconds,
+            "errors": [
+                {"source": r.source, "digest": r.digest, "errors": [e._asdict() for e in r.errors]} for r in self.invalid
+            ],
+        }
+
+
+# Compiled schema of a worker process, set by _init_worker
+_worker_schema: Optional[CompiledSchema] = None
+
+
+def _init_worker(code: bytes, digest: str) -> None:
+    global _worker_schema
+    _worker_schema = CompiledSchema(marshal.loads(code), digest)
+
+
+def _parse(data: Union[bytes, str], yaml_text: bool) -> Any:
+    if yaml_text:
+        import yaml
+
+        try:
+            return yaml.load(data, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        except yaml.YAMLError as e:
+            raise ValueError(" ".join(str(e).split())) from e
+    return json.loads(data)
+
+
+def _validate_chunk(
+    chunk: list[tuple[Document, bool]], target: Optional[str], schema: Optional[CompiledSchema] = None
+) -> list[list[ValidationError]]:
+    schema = schema or _worker_schema
+    results = []
+    for document, yaml_text in chunk:
+        if isinstance(document, (bytes, str)):
+            try:
+                document = _parse(document, yaml_text)
+            except ValueError as e:
+                results.append([ValidationError("", "parse", str(e))])
+                continue
+        results.append(schema.validate(document, target))
+    return results
+
+
+class ValidationEngine:
+    """Validates batches of documents against a compiled schema, across
+    ``processes`` worker processes (one per CPU by default; 1 validates in
+    this process), skipping documents already validated against the same
+    schema when a ``cache_dir`` is given"""
+
+    # Documents sent to a worker at once
+    CHUNK = 64
+
+    def __init__(
+        self,
+        schema: Union[str, os.PathLike, dict, CompiledSchema],
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        processes: Optional[int] = None,
+    ) -> None:
+        self.schema = schema if isinstance(schema, CompiledSchema) else CompiledSchema.load(schema, cache_dir)
+        self.processes = processes or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, "validated.sqlite"))
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS validated ("
+                "schema TEXT, target TEXT, digest TEXT, errors TEXT, PRIMARY KEY (schema, target, digest)"
+                ") WITHOUT ROWID"
+            )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self) -> "ValidationEngine":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def validate(self, documents: Iterable[Document], target: Optional[str] = None) -> ValidationReport:
+        """Validate documents given as JSON text or loaded JSON"""
+        batch = [(i, document, False) for i, document in enumerate(documents)]
+        return self._validate(batch, target)
+
+    def validate_files(self, paths: Iterable[Union[str, os.PathLike]], target: Optional[str] = None) -> ValidationReport:
+        """Validate JSON or YAML files, one document per file"""
+        batch = []
+        for path in paths:
+            name = os.fspath(path)
+            with open(name, "rb") as f:
+                batch.append((name, f.read(), name.endswith((".yaml", ".yml"))))
+        return self._validate(batch, target)
+
+    def _validate(self, batch: list[tuple[Any, Document, bool]], target: Optional[str]) -> ValidationReport:
+        start = time.perf_counter()
+        report = ValidationReport(self.schema.digest, target)
+        digests = [_content_digest(document) for _, document, _ in batch]
+        known = self._known(digests, target)
+        # Documents to validate, once per content
+        todo: dict[str, tuple[Document, bool]] = {}
+        for digest, (_, document, yaml_text) in zip(digests, batch):
+            if digest not in known and digest not in todo:
+                todo[digest] = (document, yaml_text)
+        validated = dict(zip(todo, self._run(list(todo.values()), target)))
+        if self._db is not None and validated:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO validated VALUES (?, ?, ?, ?)",
+                    [
+                        (self.schema.digest, target or "", digest, json.dumps(errors))
+                        for digest, errors in validated.items()
+                    ],
+                )
+        for digest, (source, _, _) in zip(digests, batch):
+            if digest in known:
+                report.results.append(DocumentResult(source, digest, known[digest], True))
+            else:
+                report.results.append(DocumentResult(source, digest, validated[digest], False))
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _known(self, digests: list[str], target: Optional[str]) -> dict[str, list[ValidationError]]:
+        if self._db is None:
+            return {}
+        known = {}
+        unique = list(set(digests))
+        for i in range(0, len(unique), 500):
+            chunk = unique[i : i + 500]
+            rows = self._db.execute(
+                f"SELECT digest, errors FROM validated WHERE schema = ? AND target = ? "
+                f"AND digest IN ({', '.join('?' * len(chunk))})",
+                [self.schema.digest, target or "", *chunk],
+            )
+            for digest, errors in rows:
+                known[digest] = [ValidationError(*e) for e in json.loads(errors)]
+        return known
+
+    def _run(self, documents: list[tuple[Document, bool]], target: Optional[str]) -> list[list[ValidationError]]:
+        if self.processes == 1 or len(documents) <= self.CHUNK:
+            return _validate_chunk(documents, target, self.schema)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.processes,
+                initializer=_init_worker,
+                initargs=(marshal.dumps(self.schema.code), self.schema.digest),
+            )
+        chunks = [documents[i : i + self.CHUNK] for i in range(0, len(documents), self.CHUNK)]
+        results = []
+        for chunk in self._pool.map(_validate_chunk, chunks, [target] * len(chunks)):
+            results.extend(chunk)
+        return results
+
+
+def _content_digest(document: Document) -> str:
+    if isinstance(document, str):
+        document = document.encode()
+    elif not isinstance(document, bytes):
+        document = json.dumps(document, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(document, digest_size=16).hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate JSON/YAML documents against a CDM JSON schema.")
+    parser.add_argument("schema", help="JSON schema (e.g. project/jsonschema/system_data_model.schema.json)")
+    parser.add_argument("documents", nargs="+", help="JSON or YAML files")
+    parser.add_argument("-C", "--target-class", help="Class to validate against (default: the schema's root)")
+    parser.add_argument("-j", "--processes", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Compiled schemas and validated documents")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the cache")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    with ValidationEngine(args.schema, None if args.no_cache else args.cache_dir, args.processes) as engine:
+        report = engine.validate_files(args.documents, args.target_class)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        for result in report.invalid:
+            for error in result.errors:
+                print(f"{result.source}: {error.path or '/'}: {error.message}")
+        print(
+            f"{len(report.results)} documents, {len(report.invalid)} invalid ({report.cached} already validated)"
+            f" in {report.seconds:.2f} s"
+        )
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
+
+#endregion
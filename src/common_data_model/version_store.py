@@ -0,0 +1,171 @@
+"""Persistent, copy-on-write store of System Data Model versions.
+
+Every committed :class:`SystemSdmSystemModelVersion` is kept as is and shares
+all unchanged entities (functional blocks, connections, device, software and
+hardware models) with the version it was derived from. A new version only
+allocates the entities that changed plus the lists of references pointing at
+them, so memory grows with the size of the edits rather than with
+``model size x versions``.
+
+Versions handed out by the store are shared between versions and must be
+treated as immutable; derive new versions through :meth:`SdmVersionStore.edit`.
+"""
+from copy import copy
+from typing import Any, Iterator
+
+import common_data_model.datamodel.common_data_model as cdm
+
+# Id-keyed entity collections of a version, as (owner attribute, list attribute);
+# an empty owner means the list lives directly on the version.
+COLLECTIONS: dict[str, tuple[str, str]] = {
+    "functionalBlocks": ("functionalModel", "functionalBlocks"),
+    "connections": ("functionalModel", "connections"),
+    "deviceModels": ("", "deviceModels"),
+    "softwareModels": ("", "softwareModels"),
+    "hardwareModels": ("", "hardwareModels"),
+}
+
+
+class SdmVersionBuilder:
+    """Derives a new version from a base version by path copying.
+
+    Only the version object, the functional model (when one of its collections
+    changes) and the touched collection lists are copied; entities that are not
+    replaced stay shared with the base version.
+    """
+
+    def __init__(self, base: cdm.SystemSdmSystemModelVersion) -> None:
+        self.base = base
+        self.sdm = copy(base)
+        self.sdm.version = base.version + 1
+        self._copied: set[str] = set()
+        self._positions: dict[str, dict[str, int]] = {}
+
+    def set(self, name: str, value: Any) -> None:
+        """Replace a top-level attribute (e.g. ``functionalModel``)"""
+        setattr(self.sdm, name, value)
+        if name == "functionalModel":
+            self._copied.discard("functionalModel")
+            for collection in ("functionalBlocks", "connections"):
+                self._copied.discard(collection)
+                self._positions.pop(collection, None)
+
+    def put(self, collection: str, entity: Any) -> None:
+        """Add an entity to a collection, replacing the one with the same id"""
+        entities = self._writable(collection)
+        positions = self._index(collection, entities)
+        if entity.id in positions:
+            entities[positions[entity.id]] = entity
+        else:
+            positions[entity.id] = len(entities)
+            entities.append(entity)
+
+    def remove(self, collection: str, entity_id: str) -> None:
+        """Remove the entity with the given id from a collection"""
+        entities = self._writable(collection)
+        positions = self._index(collection, entities)
+        del entities[positions[entity_id]]
+        self._positions.pop(collection)
+
+    def get(self, collection: str, entity_id: str) -> Any:
+        entities = self._list(collection)
+        return entities[self._index(collection, entities)[entity_id]]
+
+    def _list(self, collection: str) -> list:
+        owner, name = COLLECTIONS[collection]
+        target = getattr(self.sdm, owner) if owner else self.sdm
+        return getattr(target, name) if target is not None else []
+
+    def _index(self, collection: str, entities: list) -> dict[str, int]:
+        if collection not in self._positions:
+            self._positions[collection] = {e.id: i for i, e in enumerate(entities)}
+        return self._positions[collection]
+
+    def _writable(self, collection: str) -> list:
+        owner, name = COLLECTIONS[collection]
+        target = self.sdm
+        if owner:
+            if owner not in self._copied:
+                shared = getattr(self.sdm, owner)
+                if shared is None:
+                    raise ValueError(f"Version has no {owner} to hold {collection}")
+                setattr(self.sdm, owner, copy(shared))
+                self._copied.add(owner)
+            target = getattr(self.sdm, owner)
+        if collection not in self._copied:
+            setattr(target, name, list(getattr(target, name)))
+            self._copied.add(collection)
+        return getattr(target, name)
+
+
+class SdmVersionStore:
+    """Append-only history of System Data Model versions with O(1) snapshots
+    and random access to any committed version."""
+
+    def __init__(self, initial: cdm.SystemSdmSystemModelVersion) -> None:
+        self._first = initial.version
+        self._versions: list[cdm.SystemSdmSystemModelVersion] = [initial]
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __iter__(self) -> Iterator[cdm.SystemSdmSystemModelVersion]:
+        return iter(self._versions)
+
+    def __getitem__(self, version: int) -> cdm.SystemSdmSystemModelVersion:
+        if not self._first <= version <= self.version:
+            raise KeyError(f"Version {version} is not in the store")
+        return self._versions[version - self._first]
+
+    @property
+    def version(self) -> int:
+        return self._first + len(self._versions) - 1
+
+    def snapshot(self) -> cdm.SystemSdmSystemModelVersion:
+        """Latest version; shared with the store, so do not mutate it"""
+        return self._versions[-1]
+
+    def edit(self) -> "SdmVersionEdit":
+        """Start a copy-on-write edit of the latest version.
+
+        Used as a context manager, the edit is committed on exit::
+
+            with store.edit() as v:
+                v.put("deviceModels", device_model)
+        """
+        return SdmVersionEdit(self, self.snapshot())
+
+    def commit(
+        self, sdm: cdm.SystemSdmSystemModelVersion
+    ) -> cdm.SystemSdmSystemModelVersion:
+        """Append a version that shares unchanged entities with its predecessor.
+
+        The store takes ownership of ``sdm``; its version number must follow
+        the latest one.
+        """
+        if sdm.version != self.version + 1:
+            raise ValueError(
+                f"Version {sdm.version} does not follow latest version {self.version}"
+            )
+        self._versions.append(sdm)
+        return sdm
+
+
+class SdmVersionEdit(SdmVersionBuilder):
+    """Version builder bound to a store, committed on context exit"""
+
+    def __init__(
+        self, store: SdmVersionStore, base: cdm.SystemSdmSystemModelVersion
+    ) -> None:
+        super().__init__(base)
+        self.store = store
+
+    def __enter__(self) -> "SdmVersionEdit":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def commit(self) -> cdm.SystemSdmSystemModelVersion:
+        return self.store.commit(self.sdm)
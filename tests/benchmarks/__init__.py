@@ -0,0 +1 @@
+"""Benchmarks for common-data-model (run as modules, not collected by pytest)."""
@@ -0,0 +1,50 @@
+"""Binary wire format vs JSON: payload size and encode/decode time.
+
+Run with ``python -m tests.benchmarks.bench_binary_codec``. The document is
+``tests/data/esd_basic_flow.json`` scaled as in ``bench_fast_codec``.
+"""
+import argparse
+import gzip
+import json
+
+from linkml_runtime.dumpers import json_dumper
+from linkml_runtime.loaders import json_loader
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import binary_codec, fast_codec
+from tests.benchmarks.bench_fast_codec import DATA, best_of, scale_document
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    target = cdm.SystemSdmSystemModelVersion
+    sdm = json_loader.loads(
+        json.dumps(scale_document(json.loads(DATA.read_text()), args.scale)), target_class=target
+    )
+    fast_codec.codec()
+
+    text, dump_ms = best_of(args.repeat, lambda: json_dumper.dumps(sdm, inject_type=False).encode("UTF-8"))
+    data, encode_ms = best_of(args.repeat, lambda: binary_codec.dumps(sdm))
+    loaded, load_ms = best_of(args.repeat, lambda: json_loader.loads(text, target_class=target))
+    decoded, decode_ms = best_of(args.repeat, lambda: binary_codec.loads(data))
+    assert decoded == loaded
+    assert json_dumper.dumps(decoded, inject_type=False).encode("UTF-8") == text
+
+    print(f"{'format':<18} {'size [KiB]':>11} {'gzip [KiB]':>11} {'encode [ms]':>12} {'decode [ms]':>12}")
+    for name, payload, encode, decode in (
+        ("json_dumper", text, dump_ms, load_ms),
+        ("binary_codec", data, encode_ms, decode_ms),
+    ):
+        print(
+            f"{name:<18} {len(payload) / 1024:>11.0f} {len(gzip.compress(payload)) / 1024:>11.0f}"
+            f" {encode:>12.0f} {decode:>12.0f}"
+        )
+    print(f"{len(text) / len(data):.1f}x smaller, decoded {load_ms / decode_ms:.1f}x faster, identical JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Consolidation of many BOMs into a buy list.
+
+Run with ``python -m tests.benchmarks.bench_bom_consolidation``. The
+synthetic BOMs (in JSON form) draw their items from a pool of parts with
+several spellings of every MPN and manufacturer, some items with the
+alternate or the substitute of their part. The consolidator is compared with summing the
+quantities in a dict keyed by the normalized manufacturer and MPN of
+every line.
+"""
+import argparse
+import random
+import time
+
+from common_data_model.bom_consolidation import BomConsolidator, normalize_manufacturer, normalize_mpn
+
+MANUFACTURERS = ["Texas Instruments", "Yageo", "Vishay", "Murata", "Analog Devices", "STMicroelectronics", "Microchip"]
+
+
+def spellings(rng: random.Random, mpn: str, manufacturer: str) -> tuple[str, str]:
+    if rng.random() < 0.2:
+        mpn = mpn.lower()
+    if rng.random() < 0.2:
+        manufacturer = manufacturer.upper() + " Inc."
+    return mpn, manufacturer
+
+
+def build_boms(boms: int, lines: int, parts: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    pool = [(f"PN{p:06d}-{p % 97:02d}", MANUFACTURERS[p % len(MANUFACTURERS)]) for p in range(parts)]
+    built = []
+    for b in range(boms):
+        items = []
+        for line in range(lines):
+            p = rng.randrange(parts)
+            mpn, manufacturer = spellings(rng, *pool[p])
+            quantity = rng.randint(1, 8)
+            item = {
+                "quantity": quantity,
+                "designators": [f"R{line}_{d}" for d in range(quantity)],
+                "primaryElement": {"BomItemElement_mpn": mpn, "BomItemElement_manufacturer": manufacturer},
+            }
+            if rng.random() < 0.05:
+                # Parts have a fixed alternate (in pairs) and substitute
+                if rng.random() < 0.5:
+                    kind, other = "alternates", pool[p ^ 1]
+                else:
+                    kind, other = "substitutes", pool[(p + 2) % parts]
+                item[kind] = [{"BomItemElement_mpn": other[0], "BomItemElement_manufacturer": other[1]}]
+            items.append(item)
+        built.append({"id": f"bom-{b}", "items": items})
+    return built
+
+
+def naive(boms: list[dict], builds: list[int]) -> dict[tuple[str, str], int]:
+    totals: dict[tuple[str, str], int] = {}
+    for bom, count in zip(boms, builds):
+        for item in bom["items"]:
+            element = item["primaryElement"]
+            key = (
+                normalize_manufacturer(element.get("BomItemElement_manufacturer") or ""),
+                normalize_mpn(element["BomItemElement_mpn"]),
+            )
+            totals[key] = totals.get(key, 0) + item["quantity"] * count
+    return totals
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boms", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--parts", type=int, default=50_000)
+    args = parser.parse_args()
+
+    boms = build_boms(args.boms, args.lines, args.parts)
+    builds = [1 + b % 50 for b in range(args.boms)]
+
+    def load():
+        consolidator = BomConsolidator()
+        for bom, count in zip(boms, builds):
+            consolidator.add(bom, count)
+        return consolidator
+
+    consolidator, add = timed(load)
+    totals, group = timed(consolidator.quantities)
+    consolidated, build = timed(lambda: consolidator.consolidate("buy-list"))
+    expected, baseline = timed(lambda: naive(boms, builds))
+    assert sum(totals) == sum(expected.values()) and len(consolidated.items) == len(expected)
+
+    print(f"{consolidator.lines} lines, {len(consolidated.items)} parts, {sum(totals)} pieces")
+    print(f"{'':>24} {'time [s]':>9}")
+    print(f"{'load':>24} {add:>9.2f}")
+    print(f"{'sum quantities':>24} {group:>9.2f}")
+    print(f"{'build consolidated BOM':>24} {build:>9.2f}")
+    print(f"{'total':>24} {add + group + build:>9.2f}")
+    print(f"{'normalize every line':>24} {baseline:>9.2f}  (quantities only)")
+
+
+if __name__ == "__main__":
+    main()
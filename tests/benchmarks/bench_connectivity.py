@@ -0,0 +1,111 @@
+"""Connectivity graph build, neighbour, port usage, net and path queries.
+
+Run with ``python -m tests.benchmarks.bench_connectivity``. The synthetic
+designs have blocks with four ports each and two-endpoint connections,
+mostly between nearby blocks, so that the design has a few large connected
+components. Neighbour and port usage queries through the graph are compared
+with a linear scan of the connections, and adding 1% more connections
+incrementally with rebuilding the graph.
+"""
+import argparse
+import random
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.connectivity import ConnectivityGraph
+
+PORTS = 4
+
+
+def endpoint(rng: random.Random, block: int) -> cdm.SystemSdmEndpoint:
+    return cdm.SystemSdmEndpoint(functionalBlockId=f"fb-{block}", portId=f"port-{rng.randrange(PORTS)}")
+
+
+def connection(rng: random.Random, blocks: int, i: int) -> cdm.SystemSdmConnection:
+    source = rng.randrange(blocks)
+    # One in 50 connections is between distant blocks
+    target = rng.randrange(blocks) if rng.random() < 0.02 else (source + rng.randint(1, 8)) % blocks
+    return cdm.SystemSdmConnection(id=f"conn-{i}", endpoints=[endpoint(rng, source), endpoint(rng, target)])
+
+
+def build_design(endpoints: int, seed: int = 0) -> cdm.SystemSdmFunctionalModel:
+    rng = random.Random(seed)
+    blocks = endpoints // (2 * PORTS)
+    return cdm.SystemSdmFunctionalModel(
+        id="fm-1",
+        functionalBlocks=[
+            cdm.SystemSdmFunctionalBlock(
+                id=f"fb-{i}",
+                ports=[cdm.SystemSdmPort(id=f"port-{j}", name="UART", quantity=1) for j in range(PORTS)],
+            )
+            for i in range(blocks)
+        ],
+        connections=[connection(rng, blocks, i) for i in range(endpoints // 2)],
+    )
+
+
+def scan_neighbours(model: cdm.SystemSdmFunctionalModel, block_id: str) -> set[str]:
+    found = set()
+    for conn in model.connections:
+        ids = [e.functionalBlockId for e in conn.endpoints]
+        if block_id in ids:
+            found.update(ids)
+    found.discard(block_id)
+    return found
+
+
+def scan_usage(model: cdm.SystemSdmFunctionalModel, block_id: str, port_id: str) -> int:
+    return sum(
+        1
+        for conn in model.connections
+        for e in conn.endpoints
+        if e.functionalBlockId == block_id and e.portId == port_id
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'endpoints':>9} {'build [ms]':>11} {'neigh [us]':>11} {'scan [us]':>10} {'usage [us]':>11}"
+        f" {'scan [us]':>10} {'nets [ms]':>10} {'path [us]':>10} {'add 1% [ms]':>12} {'rebuild [ms]':>13}"
+    )
+    for endpoints in args.endpoints:
+        model = build_design(endpoints)
+        blocks = len(model.functionalBlocks)
+        graph, build = timed(lambda: ConnectivityGraph.from_model(model))
+        rng = random.Random(1)
+        wanted = [f"fb-{rng.randrange(blocks)}" for _ in range(args.queries)]
+        ports = [f"port-{rng.randrange(PORTS)}" for _ in range(args.queries)]
+        found, neighbours = timed(lambda: [graph.neighbours(b) for b in wanted])
+        scanned, scan = timed(lambda: [scan_neighbours(model, b) for b in wanted[:20]])
+        assert list(map(set, found[:20])) == scanned
+        used, usage = timed(lambda: [graph.port_usage(b, p) for b, p in zip(wanted, ports)])
+        scanned, usage_scan = timed(lambda: [scan_usage(model, b, p) for b, p in zip(wanted[:20], ports[:20])])
+        assert used[:20] == scanned
+        _, nets = timed(graph.nets)
+        _, paths = timed(lambda: [graph.path(a, b) for a, b in zip(wanted[:100], wanted[100:200])])
+
+        added = [connection(rng, blocks, len(model.connections) + i) for i in range(endpoints // 200)]
+        _, add = timed(lambda: [graph.add_connection(c) for c in added])
+        model.connections += added
+        rebuilt, rebuild = timed(lambda: ConnectivityGraph.from_model(model))
+        assert graph.neighbours(wanted[0]) == rebuilt.neighbours(wanted[0])
+        print(
+            f"{endpoints:>9} {build:>11.1f} {neighbours * 1000 / len(wanted):>11.2f} {scan * 1000 / 20:>10.1f}"
+            f" {usage * 1000 / len(used):>11.2f} {usage_scan * 1000 / 20:>10.1f} {nets:>10.1f}"
+            f" {paths * 10:>10.1f} {add:>12.1f} {rebuild:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
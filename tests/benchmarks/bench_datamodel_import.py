@@ -0,0 +1,61 @@
+"""Cold-start import time of the whole datamodel vs single subsets.
+
+Run with ``python -m tests.benchmarks.bench_datamodel_import`` once the
+per-subset layout has been generated (``make gen-subsets``). Every case is
+imported in a fresh interpreter with ``-X importtime``; the best total
+import time, the time spent in the datamodel modules themselves and the peak
+RSS of the process are reported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+CASES = [
+    ("linkml_runtime only", "import linkml_runtime.utils.yamlutils, linkml_runtime.linkml_model.meta"),
+    ("datamodel.common_data_model", "import common_data_model.datamodel.common_data_model"),
+    ("datamodel.system", "import common_data_model.datamodel.system"),
+    ("datamodel.device_model", "import common_data_model.datamodel.device_model"),
+    ("lazy SystemSdmSystemModelVersion", "from common_data_model.datamodel import SystemSdmSystemModelVersion"),
+]
+
+RSS = "import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def run(statement: str) -> tuple[float, float, int, int]:
+    """Total and datamodel import time [ms], peak RSS [KiB] and datamodel
+    modules loaded"""
+    code = f"{statement}; import sys; print(sum(m.startswith('common_data_model.datamodel.') for m in sys.modules)); {RSS}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True, env=os.environ,
+    )
+    total = datamodel = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip().startswith("common_data_model.datamodel"):
+            datamodel += int(own)
+        # Only top-level imports; nested ones are part of their cumulative time
+        if not name.startswith("  "):
+            total += int(cumulative)
+    modules, rss = result.stdout.split()
+    return total / 1000, datamodel / 1000, int(rss), int(modules)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'import':<34} {'time [ms]':>10} {'datamodel [ms]':>15} {'RSS [MiB]':>10} {'modules':>8}")
+    for name, statement in CASES:
+        run(statement)  # compile to bytecode first
+        runs = [run(statement) for _ in range(args.repeat)]
+        elapsed, datamodel, rss = (min(r[i] for r in runs) for i in range(3))
+        print(f"{name:<34} {elapsed:>10.0f} {datamodel:>15.0f} {rss / 1024:>10.1f} {runs[0][3]:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Generated fast codec vs json_dumper/json_loader.
+
+Run with ``python -m tests.benchmarks.bench_fast_codec``. The document is
+``tests/data/esd_basic_flow.json`` with every entity of its collections
+replicated ``--scale`` times (with distinct GUIDs).
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from linkml_runtime.dumpers import json_dumper
+from linkml_runtime.loaders import json_loader
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+
+DATA = Path(__file__).parent.parent / "data" / "esd_basic_flow.json"
+
+
+def scale_document(document: dict, scale: int) -> dict:
+    def replicate(entities: list) -> list:
+        text = json.dumps(entities)
+        return [e for n in range(scale) for e in json.loads(text.replace('"guid-', f'"guid-{n}-'))]
+
+    scaled = dict(document)
+    for name in ("deviceModels", "softwareModels", "hardwareModels"):
+        scaled[name] = replicate(document.get(name, []))
+    functional_model = scaled["functionalModel"] = dict(document["functionalModel"])
+    for name in ("functionalBlocks", "connections"):
+        functional_model[name] = replicate(functional_model.get(name, []))
+    return scaled
+
+
+def best_of(repeat: int, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    target = cdm.SystemSdmSystemModelVersion
+    text = json.dumps(scale_document(json.loads(DATA.read_text()), args.scale))
+    start = time.perf_counter()
+    fast_codec.codec()
+    print(f"codec ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    expected, load_ms = best_of(args.repeat, lambda: json_loader.loads(text, target_class=target))
+    loaded, fast_load_ms = best_of(args.repeat, lambda: fast_codec.loads(text, target))
+    assert loaded == expected
+    dumped, dump_ms = best_of(args.repeat, lambda: json_dumper.dumps(expected, inject_type=False))
+    fast_dumped, fast_dump_ms = best_of(args.repeat, lambda: fast_codec.dumps(expected))
+    assert fast_dumped == dumped
+
+    print(f"{'operation':<12} {'linkml [ms]':>12} {'fast [ms]':>10} {'speedup':>8}")
+    for name, slow, fast in (("loads", load_ms, fast_load_ms), ("dumps", dump_ms, fast_dump_ms)):
+        print(f"{name:<12} {slow:>12.0f} {fast:>10.0f} {slow / fast:>7.1f}x")
+    print(f"document size: {len(dumped) / 2**20:.1f} MiB, identical output")
+
+
+if __name__ == "__main__":
+    main()
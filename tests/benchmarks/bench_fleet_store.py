@@ -0,0 +1,120 @@
+"""OTA fleet store ingestion, rollups and memory.
+
+Run with ``python -m tests.benchmarks.bench_fleet_store``. The synthetic
+devices are spread over fleets with a package of one of a few versions
+each, loaded from a JSON lines file; a second file of status updates then
+changes the status of random devices and upgrades some of them. Memory and
+rollup queries are compared with keeping ``OtaDevice`` objects and counting
+them, which is measured on a sample of the devices and scaled to all of
+them.
+"""
+import argparse
+import json
+import random
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.fleet_store import STATUSES, FleetStore
+
+
+def device_lines(devices: int, fleets: int, packages: int, seed: int = 0):
+    rng = random.Random(seed)
+    for d in range(devices):
+        yield json.dumps(
+            {
+                "id": f"dev-{d}",
+                "status": STATUSES[rng.randrange(len(STATUSES))],
+                "fleets": [f"fleet-{d % fleets}"],
+                "packages": [f"pkg-{rng.randrange(packages)}"],
+            }
+        )
+
+
+def update_lines(updates: int, devices: int, packages: int, seed: int = 1):
+    rng = random.Random(seed)
+    for _ in range(updates):
+        record = {"id": f"dev-{rng.randrange(devices)}", "status": STATUSES[rng.randrange(len(STATUSES))]}
+        if rng.random() < 0.1:
+            record["packages"] = [f"pkg-{rng.randrange(packages)}"]
+        yield json.dumps(record)
+
+
+def load(lines, packages: int) -> FleetStore:
+    store = FleetStore()
+    for p in range(packages):
+        store.add_package({"id": f"pkg-{p}", "version": f"{p % 4}.0"})
+    store.ingest(lines)
+    return store
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=5_000_000)
+    parser.add_argument("--updates", type=int, default=1_000_000)
+    parser.add_argument("--fleets", type=int, default=100)
+    parser.add_argument("--packages", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=100_000, help="Devices kept as objects for the baseline")
+    args = parser.parse_args()
+    fast_codec.codec()
+
+    # Memory per device, of the store and of objects
+    lines = list(device_lines(args.sample, args.fleets, args.packages))
+    tracemalloc.start()
+    sample = load(lines, args.packages)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    objects = [fast_codec.from_dict(cdm.OtaDevice, json.loads(line)) for line in lines]
+    object_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del lines
+
+    fleet, status = "fleet-7", STATUSES[2]
+    _, scan_time = timed(lambda: sum(1 for o in objects if fleet in o.fleets and o.status.code.text == status))
+    expected = sum(1 for o in objects if fleet in o.fleets and o.status.code.text == status)
+    assert sample.count(fleet, status) == expected
+    del objects, sample
+
+    with tempfile.TemporaryDirectory() as directory:
+        devices, updates = os.path.join(directory, "devices.jsonl"), os.path.join(directory, "updates.jsonl")
+        with open(devices, "w") as file:
+            file.writelines(line + "\n" for line in device_lines(args.devices, args.fleets, args.packages))
+        with open(updates, "w") as file:
+            file.writelines(line + "\n" for line in update_lines(args.updates, args.devices, args.packages))
+        with open(devices) as file:
+            store, load_time = timed(lambda: load(file, args.packages))
+        with open(updates) as file:
+            count, update_time = timed(lambda: store.ingest(file))
+    _, count_time = timed(lambda: store.count(fleet, status), 1000)
+    _, version_time = timed(lambda: store.count(fleet, version="1.0"), 100)
+    _, scan_store_time = timed(lambda: store.devices(fleet, status))
+    assert len(store.devices(fleet, status)) == store.count(fleet, status)
+    _, export_time = timed(lambda: list(store.export_devices(f"dev-{d}" for d in range(10_000))))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+    scale = args.devices / args.sample
+    print(f"{args.devices} devices in {args.fleets} fleets, {count} status updates, peak RSS {peak:.0f} MB")
+    print(f"{'':>30} {'store':>12} {'objects':>12}")
+    print(f"{'memory [MB]':>30} {store_bytes * scale / 2**20:>12.0f} {object_bytes * scale / 2**20:>12.0f}  (scaled)")
+    print(f"{'load [devices/s]':>30} {args.devices / load_time:>12.0f}")
+    print(f"{'ingest updates [updates/s]':>30} {count / update_time:>12.0f}")
+    print(f"{'count fleet x status [ms]':>30} {count_time * 1000:>12.4f} {scan_time * scale * 1000:>12.0f}  (scan, scaled)")
+    print(f"{'count fleet x version [ms]':>30} {version_time * 1000:>12.3f}")
+    print(f"{'list fleet x status [ms]':>30} {scan_store_time * 1000:>12.0f}")
+    print(f"{'export 10k devices [ms]':>30} {export_time * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""GRID formatting, parsing and dispatch.
+
+Run with ``python -m tests.benchmarks.bench_grid``. GRIDs of random
+classes of the schema are formatted and parsed back with the compiled
+templates, and compared with what services do without them: substituting
+the fields into the template text, and trying one regular expression per
+template until one matches.
+"""
+import argparse
+import random
+import re
+import time
+
+from common_data_model.grid import registry, schema_templates
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def naive_patterns(templates: dict[str, str]) -> list[tuple[str, re.Pattern]]:
+    patterns = []
+    for name, template in templates.items():
+        parts = re.split(r"\{([^{}]+)\}", template)
+        # Literals at even positions, field names at odd ones
+        pattern = "".join(
+            f"(?P<{part.replace('-', '_')}>[^:/]*)" if i % 2 else re.escape(part) for i, part in enumerate(parts)
+        )
+        patterns.append((name, re.compile(pattern)))
+    return patterns
+
+
+def naive_parse(patterns: list[tuple[str, re.Pattern]], grid: str):
+    for name, pattern in patterns:
+        match = pattern.fullmatch(grid)
+        if match:
+            return name, match.groupdict()
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grids", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    (templates, grids), load = timed(lambda: (schema_templates(), registry()))
+    esd = grids["system_ESDDocument"]
+    ids = [f"{i:08x}-4d2c-9a1e-{i:012x}" for i in range(args.grids)]
+
+    formatted, format_time = timed(lambda: esd.format_many(workspace_id="ws-1", id=ids))
+    text = templates["system_ESDDocument"].replace("{workspace-id}", "ws-1")
+    expected, replace_time = timed(lambda: [text.replace("{id}", i) for i in ids])
+    assert formatted == expected
+    columns, parse_time = timed(lambda: esd.parse_many(formatted))
+    assert columns["id"] == ids
+    pattern = naive_patterns({"esd": templates["system_ESDDocument"]})[0][1]
+    matched, match_time = timed(lambda: [pattern.fullmatch(g).groupdict() for g in formatted])
+    assert [m["id"] for m in matched] == ids
+
+    # GRIDs of random classes
+    rng = random.Random(0)
+    names = list(templates)
+    mixed = []
+    for i, id in enumerate(ids):
+        template = grids[rng.choice(names)]
+        mixed.append(template.format(**{f: id if f == "id" else f"v{i % 100}" for f in template.fields}))
+    parsed, dispatch_time = timed(lambda: grids.parse_many(mixed))
+    patterns = naive_patterns(templates)
+    sample = mixed[: max(1, args.grids // 10)]
+    found, naive_time = timed(lambda: [naive_parse(patterns, g) for g in sample])
+    naive_time *= len(mixed) / len(sample)
+    assert all(p.values == f[1] and f[0] in p.template.classes for p, f in zip(parsed, found))
+
+    n = args.grids
+    print(f"{len(templates)} annotated classes, {len(grids.templates)} templates (loaded in {load * 1000:.0f} ms)")
+    print(f"{'':>30} {'GRIDs/s':>12} {'baseline':>12}")
+    print(f"{'format_many, one class':>30} {n / format_time:>12.0f} {n / replace_time:>12.0f}  (str.replace)")
+    print(f"{'parse_many, one class':>30} {n / parse_time:>12.0f} {n / match_time:>12.0f}  (regex per GRID)")
+    print(f"{'parse_many, any class':>30} {n / dispatch_time:>12.0f} {n / naive_time:>12.0f}  (regex per template)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Throughput of the in-memory and SQLite id mappers.
+
+Run with ``python -m tests.benchmarks.bench_id_mapper``. Maps ``--ids`` local
+ids in batches, then measures forward and reverse lookups from a fresh
+session that only has the database to go on.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from tests.clients.id_mapper import IdMapper, SqliteIdMapper
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>12,.0f} ids/s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    local_ids = [f"fb-{i}.port-{i % 7}" for i in range(args.ids)]
+    batches = [local_ids[i : i + args.batch] for i in range(0, args.ids, args.batch)]
+    sample = random.Random(0).sample(range(args.ids), args.lookups)
+
+    memory = IdMapper(name="esd")
+    start = time.perf_counter()
+    for batch in batches:
+        memory.map_ids(batch)
+    print(f"in-memory map_ids:        {rate(args.ids, time.perf_counter() - start)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ids.sqlite")
+        with SqliteIdMapper(name="esd", path=path) as mapper:
+            start = time.perf_counter()
+            for batch in batches:
+                mapper.map_ids(batch)
+            print(f"sqlite map_ids:           {rate(args.ids, time.perf_counter() - start)}")
+
+        with SqliteIdMapper(name="esd", path=path) as mapper:
+            start = time.perf_counter()
+            for batch in batches:
+                mapper.map_ids(batch)
+            print(f"sqlite map_ids (restart): {rate(args.ids, time.perf_counter() - start)}")
+
+        with SqliteIdMapper(name="esd", path=path) as mapper:
+            start = time.perf_counter()
+            for i in sample:
+                assert mapper.local_id(f"guid-{i + 1}") == local_ids[i]
+            print(f"sqlite reverse (cold):    {rate(args.lookups, time.perf_counter() - start)}")
+            start = time.perf_counter()
+            for i in sample:
+                mapper.local_id(f"guid-{i + 1}")
+            print(f"sqlite reverse (cached):  {rate(args.lookups, time.perf_counter() - start)}")
+
+        print(f"database size:            {os.path.getsize(path) / args.ids:>12.1f} bytes/id")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Compare full and incremental ESD -> SDM compilation.
+
+Run with ``python -m tests.benchmarks.bench_incremental_compile``. For every
+model size the same edit (a new port on ``edit`` functional blocks) is
+compiled both ways: the full compile grows with the model, the incremental
+one with the edit.
+"""
+import argparse
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from tests.clients.esd_client import ESDClient
+
+
+def build_esd(blocks: int) -> tuple[ESDClient, list[cdm.SystemFunctionalBlock]]:
+    esd = ESDClient()
+    hw_project = esd.add_hardware_project()
+    fbs = []
+    previous = None
+    for i in range(blocks):
+        fb = esd.add_functional_block(title=f"Block {i}", hw_project=hw_project)
+        port = esd.add_port(fb, cdm.SystemPortType.UART)
+        esd.add_hardware_component(fb, f"MPN-{i}")
+        if previous:
+            esd.add_connection(previous[0], previous[1], fb, port)
+        previous = (fb, port)
+        fbs.append(fb)
+    return esd, fbs
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 5_000])
+    parser.add_argument("--edits", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"{'blocks':>8} {'edit':>6} {'full [ms]':>10} {'incremental [ms]':>17}")
+    for size in args.sizes:
+        for edit in args.edits:
+            if edit > size:
+                continue
+            esd, fbs = build_esd(size)
+            esd.compile_sdm()
+            step = size // edit
+            for fb in fbs[::step][:edit]:
+                esd.add_port(fb, cdm.SystemPortType.GPIO)
+            incremental = timed(esd.compile_sdm)
+            full = timed(lambda: esd.compile_sdm(incremental=False))
+            print(f"{size:>8} {edit:>6} {full * 1000:>10.1f} {incremental * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
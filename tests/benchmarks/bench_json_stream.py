@@ -0,0 +1,112 @@
+"""Streaming vs in-memory JSON serialization and loading of large SDMs.
+
+Run with ``python -m tests.benchmarks.bench_json_stream``. The model has many
+functional blocks and device models with nested peripherals; time and peak
+traced memory are reported for ``json_dumper``/``json_loader`` and for
+``json_stream.dump``, ``json_stream.load`` and ``json_stream.iter_entities``.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from linkml_runtime.dumpers import json_dumper
+from linkml_runtime.loaders import json_loader
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import json_stream
+from tests.benchmarks.bench_sdm_diff import build_sdm
+
+
+def build_device_model(i: int, peripherals: int) -> cdm.SystemSdmDeviceModel:
+    return cdm.SystemSdmDeviceModel(
+        id=f"dm-{i}",
+        mpn=f"MCU-{i}",
+        peripherals=[
+            cdm.DmPeripheral(
+                id=f"dm-{i}.p-{p}",
+                name=f"UART{p}",
+                instances=[
+                    cdm.DmPeripheralInstance(
+                        id=f"dm-{i}.p-{p}.i-{n}",
+                        name=f"UART{p}_{n}",
+                        modes=[
+                            cdm.DmPeripheralMode(
+                                name="async",
+                                configurations=[
+                                    cdm.DmPeripheralConfiguration(
+                                        id=f"dm-{i}.p-{p}.i-{n}.c-{c}",
+                                        pinConfigs=[
+                                            cdm.DmPeripheralPinConfig(
+                                                pinName=f"P{c}{pin}", function=f"TXD{n}"
+                                            )
+                                            for pin in range(2)
+                                        ],
+                                    )
+                                    for c in range(2)
+                                ],
+                            )
+                        ],
+                    )
+                    for n in range(2)
+                ],
+            )
+            for p in range(peripherals)
+        ],
+    )
+
+
+def build_model(blocks: int, devices: int) -> cdm.SystemSdmSystemModelVersion:
+    sdm = build_sdm(blocks)
+    sdm.deviceModels = [build_device_model(i, peripherals=8) for i in range(devices)]
+    return sdm
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed * 1000, peak / 2**20
+
+
+def dump_in_memory(sdm, path):
+    with open(path, "w", encoding="UTF-8") as f:
+        f.write(json_dumper.dumps(sdm, inject_type=False))
+
+
+def count_entities(path):
+    return sum(1 for _ in json_stream.iter_entities(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=20_000)
+    parser.add_argument("--devices", type=int, default=200)
+    args = parser.parse_args()
+
+    sdm = build_model(args.blocks, args.devices)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sdm.json")
+        streamed_path = os.path.join(tmp, "sdm-streamed.json")
+        rows = [
+            ("json_dumper.dumps + write", lambda: dump_in_memory(sdm, path)),
+            ("json_stream.dump", lambda: json_stream.dump(sdm, streamed_path)),
+            ("json_loader.load", lambda: json_loader.load(path, target_class=cdm.SystemSdmSystemModelVersion)),
+            ("json_stream.load", lambda: json_stream.load(path)),
+            ("json_stream.iter_entities", lambda: count_entities(path)),
+        ]
+        print(f"{'operation':<28} {'time [ms]':>10} {'peak [MiB]':>11}")
+        for name, fn in rows:
+            _, elapsed, peak = measure(fn)
+            print(f"{name:<28} {elapsed:>10.0f} {peak:>11.1f}")
+        with open(path, encoding="UTF-8") as a, open(streamed_path, encoding="UTF-8") as b:
+            assert a.read() == b.read()
+        print(f"document size: {os.path.getsize(path) / 2**20:.1f} MiB, identical output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Part index lookups, BOM matching and memory-mapped loading.
+
+Run with ``python -m tests.benchmarks.bench_part_index``. The synthetic
+supply parts have MPNs of a few families with random suffixes and one of
+a few manufacturers. The index is built, saved and memory-mapped back; its
+lookups are compared with a dict keyed by normalized (manufacturer, MPN),
+loading it with unpickling that dict (what every worker process would do
+without the shared file), and prefix search with scanning the MPNs.
+"""
+import argparse
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from common_data_model.part_index import PartIndex, PartIndexBuilder, normalize_manufacturer, normalize_mpn
+
+MANUFACTURERS = ["Texas Instruments", "Yageo", "Vishay", "Murata", "Analog Devices", "STMicroelectronics", "Microchip"]
+FAMILIES = ["LM", "TPS", "RC0603FR-07", "GRM188R71", "STM32F", "PIC18F", "AD", "MAX", "CRCW0603"]
+
+
+def build_parts(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"sp-{i}",
+            "Part_mpn": f"{rng.choice(FAMILIES)}{rng.randrange(10**6):06d}-{rng.choice('ABCDT')}",
+            "Part_manufacturer": rng.choice(MANUFACTURERS),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parts", type=int, default=1_000_000)
+    parser.add_argument("--bom", type=int, default=1000, help="Elements of the matched BOM")
+    args = parser.parse_args()
+
+    parts = build_parts(args.parts)
+    rng = random.Random(1)
+    bom = []
+    for part in rng.sample(parts, args.bom):
+        # Spelled differently from the supply parts
+        bom.append(
+            {
+                "BomItemElement_mpn": part["Part_mpn"].lower().replace("-", " "),
+                "BomItemElement_manufacturer": part["Part_manufacturer"].upper() + " Inc.",
+            }
+        )
+
+    def build():
+        builder = PartIndexBuilder()
+        builder.add_supply_parts(parts)
+        return builder.build()
+
+    index, build_time = timed(build)
+    table: dict[tuple[str, str], list[str]] = {}
+    for part in parts:
+        key = normalize_manufacturer(part["Part_manufacturer"]), normalize_mpn(part["Part_mpn"])
+        table.setdefault(key, []).append(part["id"])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "parts.idx")
+        index.save(path)
+        pickled = os.path.join(directory, "parts.pickle")
+        with open(pickled, "wb") as file:
+            pickle.dump(table, file)
+        size, pickle_size = os.path.getsize(path), os.path.getsize(pickled)
+
+        mapped, open_time = timed(lambda: PartIndex.open(path))
+
+        def unpickle():
+            with open(pickled, "rb") as file:
+                return pickle.load(file)
+
+        _, load_time = timed(unpickle)
+
+        matched, match_time = timed(lambda: mapped.match(bom))
+        expected, dict_time = timed(
+            lambda: [
+                table.get(
+                    (
+                        normalize_manufacturer(e["BomItemElement_manufacturer"]),
+                        normalize_mpn(e["BomItemElement_mpn"]),
+                    ),
+                    [],
+                )
+                for e in bom
+            ]
+        )
+        # Manufacturers with "Inc." normalize to the same key
+        assert [sorted(m.id for m in found) for found in matched] == [sorted(ids) for ids in expected]
+        prefix = normalize_mpn(bom[0]["BomItemElement_mpn"])[:8]
+        found, search_time = timed(lambda: mapped.search(prefix), 100)
+        scanned, scan_time = timed(lambda: [p["id"] for p in parts if normalize_mpn(p["Part_mpn"]).startswith(prefix)])
+        assert sorted(m.id for m in found) == sorted(scanned)
+        mapped.close()
+
+    print(f"{args.parts} supply parts, BOM of {args.bom} elements")
+    print(f"{'':>28} {'index':>12} {'dict':>12}")
+    print(f"{'build [s]':>28} {build_time:>12.2f}")
+    print(f"{'file [MB]':>28} {size / 2**20:>12.1f} {pickle_size / 2**20:>12.1f}")
+    print(f"{'open per worker [ms]':>28} {open_time * 1000:>12.2f} {load_time * 1000:>12.0f}")
+    print(f"{'match BOM [ms]':>28} {match_time * 1000:>12.1f} {dict_time * 1000:>12.1f}")
+    print(f"{'prefix search [ms]':>28} {search_time * 1000:>12.2f} {scan_time * 1000:>12.0f}  (scan)")
+
+
+if __name__ == "__main__":
+    main()
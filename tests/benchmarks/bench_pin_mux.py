@@ -0,0 +1,102 @@
+"""Pin mux conflict detection and pin assignment on large synthetic MCUs.
+
+Run with ``python -m tests.benchmarks.bench_pin_mux``. The device has the
+given number of pins and peripheral instances, each with a mode of several
+alternative configurations routing its functions to random pins. Conflict
+detection with bitsets is compared with collecting the configurations of
+every pin, for configurations conflicting on most pins and for a
+conflict-free selection, and solving is timed for a satisfiable and an
+unsatisfiable request.
+"""
+import argparse
+import random
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.pin_mux import PinMux
+
+KINDS = {"UART": ("TXD", "RXD"), "SPI": ("MOSI", "MISO", "SCK", "SS"), "I2C": ("SCL", "SDA"), "CAN": ("CTX", "CRX")}
+
+
+def build_device(pins: int, instances: int, alternatives: int, seed: int = 0) -> cdm.SystemSdmDeviceModel:
+    rng = random.Random(seed)
+    kinds = list(KINDS)
+    peripherals = []
+    for i in range(instances):
+        kind = kinds[i % len(kinds)]
+        configurations = []
+        for a in range(alternatives):
+            ports = rng.sample(range(pins), len(KINDS[kind]))
+            configurations.append(
+                cdm.DmPeripheralConfiguration(
+                    id=f"{kind.lower()}{i}.{a}",
+                    pinConfigs=[
+                        cdm.DmPeripheralPinConfig(pinName=f"{kind.lower()}{i}.{f.lower()}", function=f, portName=f"P{p}")
+                        for f, p in zip(KINDS[kind], ports)
+                    ],
+                )
+            )
+        mode = cdm.DmPeripheralMode(name=kind, configurations=configurations)
+        peripherals.append(
+            cdm.DmPeripheral(id=f"{kind.lower()}{i}", instances=[cdm.DmPeripheralInstance(id=f"{kind.lower()}{i}", modes=[mode])])
+        )
+    return cdm.SystemSdmDeviceModel(
+        id="device-1",
+        mpn="MCU",
+        ports=[cdm.DmPort(id=f"p{p}", name=f"P{p}", pin=str(p + 1)) for p in range(pins)],
+        peripherals=peripherals,
+    )
+
+
+def scan_conflicts(mux: PinMux, configuration_ids: list[str]) -> dict[str, list[str]]:
+    claimants: dict[str, list[str]] = {}
+    for configuration_id in configuration_ids:
+        for c in mux.options[mux.index(configuration_id)].configuration.pinConfigs:
+            claimants.setdefault(c.portName, []).append(configuration_id)
+    return {pin: ids for pin, ids in claimants.items() if len(ids) > 1}
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pins", type=int, nargs="+", default=[64, 256, 512])
+    parser.add_argument("--instances", type=int, default=200)
+    parser.add_argument("--alternatives", type=int, default=15)
+    args = parser.parse_args()
+
+    print(
+        f"{'pins':>5} {'configs':>8} {'build [ms]':>11} {'check [ms]':>11} {'scan [ms]':>10}"
+        f" {'check ok [us]':>14} {'scan ok [us]':>13} {'solve [ms]':>11} {'unsat [ms]':>11}"
+    )
+    for pins in args.pins:
+        device = build_device(pins, args.instances, args.alternatives)
+        mux, build = timed(lambda: PinMux(device))
+        # One configuration of every instance, which conflict on most pins,
+        # and the conflict-free configurations of a solution
+        enabled = [o.configuration.id for o in mux.options[:: args.alternatives]]
+        found, check = timed(lambda: mux.conflicts(enabled), 10)
+        scanned, scan = timed(lambda: scan_conflicts(mux, enabled), 10)
+        assert {c.resource: c.configuration_ids for c in found} == scanned
+
+        requests = ["UART", "UART", "SPI", "SPI", "I2C", "I2C", "CAN", "CAN"]
+        selection, solve = timed(lambda: mux.solve(requests))
+        solved = [o.configuration.id for o in selection]
+        found, check_ok = timed(lambda: mux.conflicts(solved), 100)
+        scanned, scan_ok = timed(lambda: scan_conflicts(mux, solved), 100)
+        assert found == [] and scanned == {}
+        # More SPI instances than the device has pins for
+        _, unsat = timed(lambda: mux.solve(["SPI"] * (pins // 4 + 1)))
+        print(
+            f"{pins:>5} {len(mux.options):>8} {build:>11.1f} {check:>11.2f} {scan:>10.2f}"
+            f" {check_ok * 1000:>14.1f} {scan_ok * 1000:>13.1f} {solve:>11.2f} {unsat:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
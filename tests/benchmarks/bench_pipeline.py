@@ -0,0 +1,202 @@
+"""ESD -> SDM pipeline stages across model sizes, compared with a stored baseline.
+
+Run with ``python -m tests.benchmarks.bench_pipeline``. For every size tier
+(functional blocks; see :func:`tests.scale_model.tier`) a seeded ESD
+document is generated and taken through the pipeline: mapping its ids to
+GUIDs, a full compile, an incremental compile after a one-port edit and
+the ``json_dumper`` serialization of the SDM. Pruning the JSON schema of
+the CDM to the targets of ``pruned-schemas.yaml`` does not depend on the
+model and is measured once.
+
+Stages are timed over ``--repeat`` passes, keeping the fastest; a last
+pass, under ``tracemalloc``, records the peak of the memory allocated
+during each stage and its retained blocks, the net number of memory blocks
+it left allocated (``--no-memory`` skips it). Results are compared with the
+baseline (``--baseline``, by default ``baselines/bench_pipeline.json`` next
+to this file): a metric more than its tolerance above the baseline is
+reported as a regression and the exit status is 1. ``--save`` stores the
+results as the new baseline. Baselines are only comparable on the same
+machine; they record the platform and Python version they were made with.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, NamedTuple, Optional
+
+import yaml
+from linkml_runtime.dumpers import json_dumper
+
+import common_data_model.datamodel.common_data_model as cdm
+from tests.clients.id_mapper import IdMapper
+from tests.scale_model import build_esd, tier
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "bench_pipeline.json")
+SCHEMA = os.path.join(ROOT, "src", "common_data_model", "schema", "common_data_model.yaml")
+
+TIERS = (10, 100, 1_000, 10_000, 100_000)
+DEFAULT_TIERS = TIERS[:-1]
+
+# Relative increase over the baseline reported as a regression, and the
+# absolute increase below which differences are noise
+TOLERANCE = {"time": 0.25, "peak": 0.10, "retained": 0.10}
+NOISE = {"time": 0.005, "peak": 1 << 20, "retained": 1000}
+
+
+class Measurement(NamedTuple):
+    time: float
+    peak: Optional[int] = None
+    # Blocks allocated after the stage less those before: what it keeps
+    # alive, not how many allocations it made
+    retained: Optional[int] = None
+
+
+def measure(fn: Callable[[], Any], traced: bool) -> tuple[Any, Measurement]:
+    gc.collect()
+    if not traced:
+        start = time.perf_counter()
+        result = fn()
+        return result, Measurement(time.perf_counter() - start)
+    tracemalloc.reset_peak()
+    before, blocks = tracemalloc.get_traced_memory()[0], sys.getallocatedblocks()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - before
+    return result, Measurement(elapsed, peak, sys.getallocatedblocks() - blocks)
+
+
+def run_tier(blocks: int, traced: bool) -> dict[str, Measurement]:
+    results = {}
+    esd, results["generate"] = measure(lambda: build_esd(tier(blocks)), traced)
+    model = esd.model
+    local_ids = [
+        *(fb.id for fb in model.functionalBlocks),
+        *(f"{fb.id}.{port.id}" for fb in model.functionalBlocks for port in fb.ports),
+        *(kc.id for fb in model.functionalBlocks for kc in fb.keyComponents),
+        *(c.id for c in model.connections),
+    ]
+    _, results["map_ids"] = measure(lambda: IdMapper(name="bench").map_ids(local_ids), traced)
+    sdm, results["compile"] = measure(lambda: esd.compile_sdm(incremental=False), traced)
+    esd.add_port(model.functionalBlocks[len(model.functionalBlocks) // 2], cdm.SystemPortType.GPIO)
+    sdm, results["recompile"] = measure(esd.compile_sdm, traced)
+    _, results["dumps"] = measure(lambda: json_dumper.dumps(sdm, inject_type=False), traced)
+    return results
+
+
+def json_schema() -> dict:
+    from linkml.generators.jsonschemagen import JsonSchemaGenerator
+
+    return json.loads(JsonSchemaGenerator(SCHEMA, mergeimports=True).serialize())
+
+
+def run_prune(schema: dict, traced: bool) -> dict[str, Measurement]:
+    spec = importlib.util.spec_from_file_location("prune_schema", os.path.join(ROOT, "prune-schema.py"))
+    prune_schema = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(prune_schema)
+    with open(os.path.join(ROOT, "pruned-schemas.yaml")) as f:
+        targets = yaml.safe_load(f)["targets"]
+
+    def prune():
+        pruner = prune_schema.SchemaPruner(schema)
+        return [pruner.prune(t["type"], t["title"]) for t in targets]
+
+    _, measurement = measure(prune, traced)
+    return {"prune": measurement}
+
+
+def run(
+    tiers: list[int], memory: bool, schema: Optional[dict], repeat: int = 1
+) -> dict[str, dict[str, dict[str, float]]]:
+    runs: list[tuple[str, Callable[[bool], dict[str, Measurement]]]] = [
+        (str(blocks), lambda traced, blocks=blocks: run_tier(blocks, traced)) for blocks in tiers
+    ]
+    if schema is not None:
+        runs.append(("schema", lambda traced: run_prune(schema, traced)))
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for name, fn in runs:
+        passes = [fn(False) for _ in range(repeat)]
+        timings = {stage: min(p[stage] for p in passes) for stage in passes[0]}
+        traced = {}
+        if memory:
+            tracemalloc.start()
+            try:
+                traced = fn(True)
+            finally:
+                tracemalloc.stop()
+        results[name] = {
+            stage: {
+                "time": m.time,
+                **({"peak": traced[stage].peak, "retained": traced[stage].retained} if stage in traced else {}),
+            }
+            for stage, m in timings.items()
+        }
+    return results
+
+
+def regressions(results: dict, baseline: dict) -> list[tuple[str, str, str, float]]:
+    """(tier, stage, metric, ratio) of the metrics above their tolerance"""
+    found = []
+    for name, stages in results.items():
+        for stage, metrics in stages.items():
+            base = baseline.get(name, {}).get(stage, {})
+            for metric, value in metrics.items():
+                old = base.get(metric)
+                if old is None or value - old <= NOISE[metric]:
+                    continue
+                if old <= 0 or value > old * (1 + TOLERANCE[metric]):
+                    found.append((name, stage, metric, value / old if old > 0 else float("inf")))
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiers", type=int, nargs="+", default=list(DEFAULT_TIERS), help=f"Among {TIERS}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing passes per tier")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--no-schema", action="store_true", help="Skip pruning the JSON schema")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline")
+    args = parser.parse_args()
+
+    results = run(args.tiers, not args.no_memory, None if args.no_schema else json_schema(), args.repeat)
+    baseline: dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    found = regressions(results, baseline.get("results", {}))
+    flagged = {(name, stage) for name, stage, _, _ in found}
+
+    print(f"{'tier':>8} {'stage':>10} {'time [ms]':>11} {'peak [MB]':>10} {'retained':>10} {'time vs baseline':>17}")
+    for name, stages in results.items():
+        for stage, metrics in stages.items():
+            base = baseline.get("results", {}).get(name, {}).get(stage, {}).get("time")
+            peak = f"{metrics['peak'] / 2**20:>10.1f}" if "peak" in metrics else f"{'':>10}"
+            retained = f"{metrics['retained']:>10}" if "retained" in metrics else f"{'':>10}"
+            ratio = f"{metrics['time'] / base:>16.2f}x" if base else f"{'':>17}"
+            mark = "  REGRESSION" if (name, stage) in flagged else ""
+            print(f"{name:>8} {stage:>10} {metrics['time'] * 1000:>11.1f} {peak} {retained} {ratio}{mark}")
+    for name, stage, metric, ratio in found:
+        print(f"Regression: {stage} ({name}) {metric} is {ratio:.2f}x the baseline")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "platform": platform.platform(), "results": results},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+    elif found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Pruning a large schema to many targets: per-target walk vs SchemaPruner.
+
+Run with ``python -m tests.benchmarks.bench_prune_schema [schema.json]``.
+Without a schema file a synthetic, layered $defs graph with reference cycles
+is generated.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import time
+
+spec = importlib.util.spec_from_file_location(
+    "prune_schema",
+    os.path.join(os.path.dirname(__file__), "..", "..", "prune-schema.py"),
+)
+prune_schema = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prune_schema)
+
+
+def walk_per_target(full_schema, target_type):
+    """The single-target traversal prune-schema.py used to run per invocation"""
+    defs = full_schema["$defs"]
+    referenced_names = {target_type}
+    to_process = [defs[target_type]]
+    while to_process:
+        current = to_process.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key == "$ref" and isinstance(value, str):
+                    ref_name = value.split("/")[-1]
+                    if ref_name in defs and ref_name not in referenced_names:
+                        referenced_names.add(ref_name)
+                        to_process.append(defs[ref_name])
+                else:
+                    to_process.append(value)
+        elif isinstance(current, list):
+            to_process.extend(current)
+    return referenced_names
+
+
+def synthetic_schema(types: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    defs = {}
+    for i in range(types):
+        refs = [rng.randrange(i, types) for _ in range(3)]
+        if rng.random() < 0.05:
+            refs.append(rng.randrange(0, i + 1))  # back edge closing a cycle
+        defs[f"T{i}"] = {
+            "type": "object",
+            "properties": {
+                f"p{n}": {"anyOf": [{"$ref": f"#/$defs/T{r}"}, {"type": "null"}]}
+                for n, r in enumerate(refs)
+            },
+        }
+    return {"$defs": defs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("schema", nargs="?", help="JSON schema file (default: synthetic)")
+    parser.add_argument("--types", type=int, default=5_000)
+    parser.add_argument("--targets", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.schema:
+        with open(args.schema) as f:
+            schema = json.load(f)
+    else:
+        schema = synthetic_schema(args.types)
+    targets = random.Random(1).sample(list(schema["$defs"]), min(args.targets, len(schema["$defs"])))
+
+    start = time.perf_counter()
+    expected = {t: walk_per_target(schema, t) for t in targets}
+    per_target = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pruner = prune_schema.SchemaPruner(schema)
+    for t in targets:
+        pruner.prune(t, t)
+    memoized = time.perf_counter() - start
+
+    assert all(set(pruner.referenced_names(t)) == expected[t] for t in targets)
+    print(f"types: {len(schema['$defs'])}, targets: {len(targets)}")
+    print(f"per-target walk: {per_target * 1000:10.1f} ms")
+    print(f"SchemaPruner:    {memoized * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
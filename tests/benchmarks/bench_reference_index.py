@@ -0,0 +1,73 @@
+"""Reference index build, integrity check, resolution and incremental update.
+
+Run with ``python -m tests.benchmarks.bench_reference_index``. The model has
+blocks with ports and connections between them, hardware components for
+every block and device models they refer to. Resolving by id through the
+index is compared with a linear scan, and updating the index for a 1% patch
+with rebuilding it.
+"""
+import argparse
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.reference_index import SdmReferenceIndex
+from common_data_model.sdm_diff import diff_sdm
+from tests.benchmarks.bench_sdm_diff import build_sdm, edit
+
+
+def build_model(blocks: int, devices: int = 50) -> cdm.SystemSdmSystemModelVersion:
+    sdm = build_sdm(blocks)
+    for fb in sdm.functionalModel.functionalBlocks:
+        fb.hardwareComponentIds = [f"hc-{fb.id}"]
+    sdm.deviceModels = [cdm.SystemSdmDeviceModel(id=f"dm-{i}", mpn=f"MCU-{i}") for i in range(devices)]
+    sdm.hardwareModels = [
+        cdm.SystemSdmHardwareModel(
+            id="hw-1",
+            functionalBlockIds=[fb.id for fb in sdm.functionalModel.functionalBlocks],
+            hardwareComponents=[
+                cdm.SystemSdmHardwareComponent(id=f"hc-fb-{i}", deviceModelId=f"dm-{i % devices}")
+                for i in range(blocks)
+            ],
+        )
+    ]
+    return sdm
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, nargs="+", default=[2_500, 10_000, 40_000])
+    parser.add_argument("--lookups", type=int, default=1_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'blocks':>7} {'refs':>7} {'build [ms]':>11} {'check [ms]':>11} {'get [us]':>9}"
+        f" {'scan [us]':>10} {'apply 1% [ms]':>14}"
+    )
+    for blocks in args.blocks:
+        sdm = build_model(blocks)
+        index, build = timed(lambda: SdmReferenceIndex(sdm))
+        report, check = timed(index.check)
+        assert report.ok
+
+        components = sdm.hardwareModels[0].hardwareComponents
+        wanted = [components[(i * 7919) % blocks].id for i in range(args.lookups)]
+        _, get = timed(lambda: [index.get("hardwareComponent", i) for i in wanted])
+        _, scan = timed(lambda: [next(c for c in components if c.id == i) for i in wanted[:100]])
+
+        patch = diff_sdm(sdm, edit(sdm, 0.01, seed=blocks))
+        _, apply = timed(lambda: index.apply(patch))
+        references = sum(1 for _ in index.references())
+        print(
+            f"{blocks:>7} {references:>7} {build:>11.1f} {check:>11.1f} {get * 1000 / len(wanted):>9.2f}"
+            f" {scan * 1000 / 100:>10.1f} {apply:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Memory and address lookups of register maps, as objects and as arrays.
+
+Run with ``python -m tests.benchmarks.bench_register_map``. The synthetic
+device has peripheral address blocks of 100 registers, each register with
+a few fields and an enum value for its single-bit fields. Memory is
+measured with tracemalloc, for the generated objects and for the
+:class:`RegisterMap` loaded from them (including its string table), and
+address lookups through the interval index are compared with a linear scan
+of the registers.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.register_map import RegisterMap
+
+REGISTERS_PER_BLOCK = 100
+FIELDS = [("EN", 0, 0), ("MODE", 1, 3), ("DIV", 4, 11), ("IE", 12, 12), ("DATA", 16, 31)]
+
+
+def build_address_map(registers: int) -> cdm.DmAddressMap:
+    blocks = []
+    for b in range(registers // REGISTERS_PER_BLOCK):
+        base = 0x40000000 + 0x1000 * b
+        blocks.append(
+            cdm.DmAddressBlock(
+                dm_HasAddressRange_start_address=base,
+                dm_HasAddressRange_size=4 * REGISTERS_PER_BLOCK,
+                dm_AddressBlock_name=f"PERIPH{b}",
+                dm_AddressBlock_type="Peripheral",
+                dm_AddressBlock_peripheral_instance=f"periph{b}",
+                dm_AddressBlock_registers=[
+                    cdm.DmRegister(
+                        dm_HasAddressRange_start_address=base + 4 * r,
+                        dm_HasAddressRange_size=4,
+                        dm_Register_name=f"REG{r}",
+                        description=f"Register {r}",
+                        dm_Register_access="ReadWrite",
+                        dm_Register_reset_value="0x00000000",
+                        dm_Register_fields=[
+                            cdm.DmRegisterField(
+                                dm_RegisterField_name=name,
+                                dm_RegisterField_lsb=lsb,
+                                dm_RegisterField_msb=msb,
+                                dm_RegisterField_enums=[
+                                    cdm.DmFieldEnum(dm_FieldEnum_name="ENABLED", dm_FieldEnum_value="1")
+                                ]
+                                if lsb == msb
+                                else [],
+                            )
+                            for name, lsb, msb in FIELDS
+                        ],
+                    )
+                    for r in range(REGISTERS_PER_BLOCK)
+                ],
+            )
+        )
+    return cdm.DmAddressMap(
+        dm_AddressMapModel_segments=[
+            cdm.DmAddressSegment(
+                dm_HasAddressRange_start_address=0x40000000,
+                dm_HasAddressRange_size=0x1000 * len(blocks),
+                dm_AddressSegment_name="PERIPHERALS",
+                dm_AddressSegment_blocks=blocks,
+            )
+        ]
+    )
+
+
+def allocated(build):
+    """Result of build and the memory it allocated and kept, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registers", type=int, nargs="+", default=[5_000, 50_000])
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'registers':>9} {'objects [MB]':>13} {'arrays [MB]':>12} {'B/register':>11} {'ratio':>6}"
+        f" {'load [ms]':>10} {'locate [us]':>12} {'scan [us]':>10}"
+    )
+    for registers in args.registers:
+        address_map, objects = allocated(lambda: build_address_map(registers))
+        register_map, arrays = allocated(lambda: RegisterMap.from_address_map(address_map))
+        _, load = timed(lambda: RegisterMap.from_address_map(address_map))
+
+        rng = random.Random(registers)
+        blocks = address_map.dm_AddressMapModel_segments[0].dm_AddressSegment_blocks
+        addresses = [
+            0x40000000 + 0x1000 * rng.randrange(len(blocks)) + 4 * rng.randrange(REGISTERS_PER_BLOCK)
+            for _ in range(args.lookups)
+        ]
+        found, locate = timed(lambda: [register_map.register_at(a) for a in addresses])
+        all_registers = [r for b in blocks for r in b.dm_AddressBlock_registers]
+        scanned, scan = timed(
+            lambda: [
+                next(r for r in all_registers if r.dm_HasAddressRange_start_address == a) for a in addresses[:20]
+            ]
+        )
+        assert [r.start_address for r in found[:20]] == [r.dm_HasAddressRange_start_address for r in scanned]
+        print(
+            f"{registers:>9} {objects / 2**20:>13.1f} {arrays / 2**20:>12.2f} {arrays / registers:>11.0f}"
+            f" {objects / arrays:>6.0f} {load:>10.0f} {locate * 1000 / len(addresses):>12.2f}"
+            f" {scan * 1000 / 20:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Diff and patch of large SDM versions with 1% of the entities changed.
+
+Run with ``python -m tests.benchmarks.bench_sdm_diff``. The target version is
+diffed both when it shares unchanged entities with the baseline (as produced
+by the version store) and when it is a full independent copy (as loaded from
+JSON); a full JSON dump is shown as the cost of a full-model transfer.
+"""
+import argparse
+import random
+import time
+from copy import deepcopy
+
+from linkml_runtime.dumpers import json_dumper
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sdm_diff import apply_patch, diff_sdm
+from common_data_model.version_store import SdmVersionBuilder
+
+
+def build_sdm(blocks: int) -> cdm.SystemSdmSystemModelVersion:
+    return cdm.SystemSdmSystemModelVersion(
+        id="sdm-1",
+        version=0,
+        functionalModel=cdm.SystemSdmFunctionalModel(
+            id="fm-1",
+            functionalBlocks=[
+                cdm.SystemSdmFunctionalBlock(
+                    id=f"fb-{i}",
+                    name=f"Block {i}",
+                    ports=[
+                        cdm.SystemSdmPort(id=f"fb-{i}.port-{j}", name="UART", quantity=1)
+                        for j in range(2)
+                    ],
+                )
+                for i in range(blocks)
+            ],
+            connections=[
+                cdm.SystemSdmConnection(
+                    id=f"conn-{i}",
+                    endpoints=[
+                        cdm.SystemSdmEndpoint(functionalBlockId=f"fb-{i}", portId=f"fb-{i}.port-1"),
+                        cdm.SystemSdmEndpoint(
+                            functionalBlockId=f"fb-{i + 1}", portId=f"fb-{i + 1}.port-0"
+                        ),
+                    ],
+                )
+                for i in range(blocks - 1)
+            ],
+        ),
+    )
+
+
+def edit(sdm, fraction: float, seed: int) -> cdm.SystemSdmSystemModelVersion:
+    rng = random.Random(seed)
+    blocks = sdm.functionalModel.functionalBlocks
+    changed = rng.sample(blocks, max(int(len(blocks) * fraction), 3))
+    update = SdmVersionBuilder(sdm)
+    third = len(changed) // 3
+    for fb in changed[:third]:
+        renamed = deepcopy(fb)
+        renamed.name += " (rev 2)"
+        update.put("functionalBlocks", renamed)
+    for fb in changed[third : 2 * third]:
+        update.remove("functionalBlocks", fb.id)
+    for i in range(len(changed) - 2 * third):
+        update.put("functionalBlocks", cdm.SystemSdmFunctionalBlock(id=f"fb-new-{i}", name="New"))
+    return update.sdm
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, nargs="+", default=[2_500, 10_000])
+    parser.add_argument("--changed", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>9} {'changes':>8} {'diff shared [ms]':>17} {'diff copy [ms]':>15}"
+        f" {'apply [ms]':>11} {'json dump [ms]':>15}"
+    )
+    for blocks in args.blocks:
+        old = build_sdm(blocks)
+        entities = blocks * 3 + len(old.functionalModel.connections)
+        new = edit(old, args.changed, seed=blocks)
+        copied = deepcopy(new)
+
+        patch, diff_shared = timed(lambda: diff_sdm(old, new))
+        _, diff_copy = timed(lambda: diff_sdm(old, copied))
+        patched, apply = timed(lambda: apply_patch(old, patch))
+        _, dump = timed(lambda: json_dumper.dumps(new, inject_type=False))
+        assert patched.functionalModel.functionalBlocks == new.functionalModel.functionalBlocks
+
+        print(
+            f"{entities:>9} {len(patch):>8} {diff_shared:>17.1f} {diff_copy:>15.1f}"
+            f" {apply:>11.2f} {dump:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
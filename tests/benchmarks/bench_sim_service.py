@@ -0,0 +1,91 @@
+"""SIM service load test with many concurrent clients.
+
+Run with ``python -m tests.benchmarks.bench_sim_service``. Every simulated
+client edits the MPN of one device model of a shared system model over and
+over, pushing every edit to the SIM service over a local socket, all
+clients at once. Clients either own their device model or share it with
+others, in which case pushes refused because another client changed the
+device first are rebased and pushed again by the client library. Clients
+either wait for each push before the next edit, or make bursts of edits
+that the client library coalesces. Throughput is committed edits per
+second, latency is from an edit to the version holding it. The clients run
+in the process of the server, so both include the work of the clients.
+"""
+import argparse
+import asyncio
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.sim_service import SimClient, SimServer
+
+
+def initial(devices: int) -> cdm.SystemSdmSystemModelVersion:
+    return cdm.SystemSdmSystemModelVersion(
+        id="sim",
+        version=0,
+        deviceModels=[cdm.SystemSdmDeviceModel(id=f"dm-{d}", mpn="M0") for d in range(devices)],
+    )
+
+
+def edited(sdm: cdm.SystemSdmSystemModelVersion, d: int, mpn: str) -> cdm.SystemSdmSystemModelVersion:
+    devices = list(sdm.deviceModels)
+    devices[d] = cdm.SystemSdmDeviceModel(id=f"dm-{d}", mpn=mpn)
+    return cdm.SystemSdmSystemModelVersion(id=sdm.id, version=sdm.version, deviceModels=devices)
+
+
+async def client(port: int, d: int, edits: int, burst: int, latencies: list[float]) -> None:
+    async with await SimClient.connect(port=port) as sim:
+        await sim.pull()
+        for e in range(0, edits, burst):
+            start = time.perf_counter()
+            # Edits of a burst all start from the same baseline
+            await asyncio.gather(*(sim.push(edited(sim.baseline, d, f"M{i + 1}")) for i in range(e, e + burst)))
+            latencies.extend([time.perf_counter() - start] * burst)
+
+
+async def run(clients: int, devices: int, edits: int, burst: int) -> tuple[SimServer, list[float], float]:
+    server = SimServer(initial(devices))
+    _, port = await server.start(port=0)
+    latencies: list[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, c % devices, edits, burst, latencies) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    await server.close()
+    return server, latencies, elapsed
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=20, help="Edits per client")
+    parser.add_argument("--burst", type=int, default=5, help="Edits per burst")
+    parser.add_argument("--sharing", type=int, default=10, help="Clients per shared device model")
+    args = parser.parse_args()
+    fast_codec.codec()
+
+    print(f"{args.clients} clients, {args.edits} edits each")
+    print(f"{'':>26} {'edits/s':>9} {'versions':>9} {'pushes':>9} {'refused':>9} {'p50 [ms]':>9} {'p99 [ms]':>9}")
+    shared = max(1, args.clients // args.sharing)
+    for name, burst, devices in (
+        ("own device, every edit", 1, args.clients),
+        (f"own device, bursts of {args.burst}", args.burst, args.clients),
+        (f"{args.sharing} per device, every edit", 1, shared),
+    ):
+        server, latencies, elapsed = asyncio.run(run(args.clients, devices, args.edits, burst))
+        # Every client ends with the same MPN
+        final = server.store.snapshot()
+        assert [d.mpn for d in final.deviceModels] == [f"M{args.edits}"] * devices
+        print(
+            f"{name:>26} {len(latencies) / elapsed:>9.0f} {server.version:>9} {server.pushes:>9}"
+            f" {server.refused:>9} {percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Bulk loading of SDM versions into the SQLite store and indexed queries.
+
+Run with ``python -m tests.benchmarks.bench_sql_store``. Synthetic SDM
+versions (functional blocks with ports, connections, device models and
+hardware components using them) are written as JSON files, one per
+version, loaded into a store on disk and queried for the hardware
+components using an MPN across all versions. The query is compared with
+what is done without the store: reading every file and walking it.
+
+The load rate is given for the whole of ``load_files`` and without the
+time spent parsing the JSON files, measured on its own.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sql_store import SqlStore, iter_files
+
+MPNS = [f"STM32F4{i:02d}" for i in range(50)]
+
+
+def build_version(version: int, blocks: int, rng: random.Random) -> dict:
+    devices = [{"id": f"dm-{i}", "mpn": mpn} for i, mpn in enumerate(rng.sample(MPNS, 10))]
+    return {
+        "id": "sdm-1",
+        "version": version,
+        "functionalModel": {
+            "id": "fm-1",
+            "functionalBlocks": [
+                {
+                    "id": f"fb-{i}",
+                    "name": f"Block {i}",
+                    "hardwareComponentIds": [f"hc-{i}"],
+                    "ports": [{"id": f"fb-{i}.port-{j}", "name": "UART", "quantity": 1} for j in range(2)],
+                }
+                for i in range(blocks)
+            ],
+            "connections": [
+                {
+                    "id": f"conn-{i}",
+                    "endpoints": [
+                        {"functionalBlockId": f"fb-{i}", "portId": f"fb-{i}.port-1"},
+                        {"functionalBlockId": f"fb-{i + 1}", "portId": f"fb-{i + 1}.port-0"},
+                    ],
+                }
+                for i in range(blocks - 1)
+            ],
+        },
+        "deviceModels": devices,
+        "hardwareModels": [
+            {
+                "id": "hm-1",
+                "functionalBlockIds": [f"fb-{i}" for i in range(blocks)],
+                "hardwareComponents": [
+                    {"id": f"hc-{i}", "name": f"U{i}", "deviceModelId": rng.choice(devices)["id"]}
+                    for i in range(blocks)
+                ],
+            }
+        ],
+    }
+
+
+def scan(paths: list[str], mpn: str) -> list[tuple[int, str]]:
+    found = []
+    for path in paths:
+        with open(path) as f:
+            version = json.load(f)
+        devices = {d["id"] for d in version.get("deviceModels", []) if d.get("mpn") == mpn}
+        for model in version.get("hardwareModels", []):
+            for component in model.get("hardwareComponents", []):
+                if component.get("deviceModelId") in devices:
+                    found.append((version["version"], component["id"]))
+    return found
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=500, help="Functional blocks per version")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for version in range(args.versions):
+            path = os.path.join(directory, f"sdm-{version}.json")
+            with open(path, "w") as f:
+                json.dump(build_version(version, args.blocks, rng), f)
+            paths.append(path)
+
+        _, parse_time = timed(lambda: sum(1 for _ in iter_files(paths)))
+        with SqlStore(os.path.join(directory, "store.db")) as store:
+            rows, load_time = timed(lambda: store.load_files(paths, cdm.SystemSdmSystemModelVersion))
+            mpn = MPNS[0]
+            # Loads the codec
+            store.version(0).object
+            found, query_time = timed(lambda: store.hardware_components(mpn), 10)
+            expected, scan_time = timed(lambda: scan(paths, mpn))
+            assert sorted((v, c.id) for v, c in found) == sorted(expected)
+            objects, object_time = timed(lambda: [c.object for _, c in store.hardware_components(mpn)])
+            assert all(o.deviceModelId == c.values["deviceModelId"] for o, (_, c) in zip(objects, found))
+            version, version_time = timed(lambda: store.version(args.versions // 2).object)
+            assert len(version.functionalModel.functionalBlocks) == args.blocks
+        size = sum(os.path.getsize(p) for p in paths)
+
+    print(f"{args.versions} versions of {rows // args.versions} entities, {size / 2**20:.0f} MB of JSON")
+    print(f"{'':>36} {'store':>10} {'files':>10}")
+    print(f"{'load [entities/s]':>36} {rows / load_time:>10.0f}")
+    print(f"{'  excluding JSON parsing':>36} {rows / (load_time - parse_time):>10.0f}")
+    print(f"{'components by MPN [ms]':>36} {query_time * 1000:>10.2f} {scan_time * 1000:>10.0f}  ({len(found)} found)")
+    print(f"{'  and build them [ms]':>36} {object_time * 1000:>10.0f}")
+    print(f"{'build a whole version [ms]':>36} {version_time * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Throughput and memory of the streaming SVD importer on synthetic files.
+
+Run with ``python -m tests.benchmarks.bench_svd_import``. Every synthetic
+file has peripherals of 100 registers with a few fields and enumerated
+values, and every other peripheral is derived from the first one, as the
+instances of a peripheral usually are.
+The peak memory of streaming a file through the importer is compared with
+parsing its whole tree with ``ElementTree.parse``, measured by tracemalloc,
+and the catalogue of files is imported in this process and across a
+process pool.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+from common_data_model import fast_codec
+from common_data_model.svd_import import SvdReader, import_catalogue
+
+REGISTERS_PER_PERIPHERAL = 100
+
+
+def write_svd(path: str, peripherals: int) -> None:
+    with open(path, "w") as out:
+        out.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n<device><name>BENCH</name><series>BENCH</series>"
+            "<size>32</size><access>read-write</access><resetValue>0</resetValue><peripherals>\n"
+        )
+        for p in range(peripherals):
+            base = 0x40000000 + 0x1000 * p
+            if p % 2:
+                out.write(
+                    f"<peripheral derivedFrom='PERIPH0'><name>PERIPH{p}</name>"
+                    f"<baseAddress>{base:#x}</baseAddress></peripheral>\n"
+                )
+                continue
+            out.write(
+                f"<peripheral><name>PERIPH{p}</name><groupName>GROUP{p % 10}</groupName>"
+                f"<description>Peripheral {p}</description><baseAddress>{base:#x}</baseAddress>"
+                "<addressBlock><offset>0</offset><size>0x1000</size><usage>registers</usage></addressBlock><registers>\n"
+            )
+            for r in range(REGISTERS_PER_PERIPHERAL):
+                out.write(
+                    f"<register><name>REG{r}</name><description>Register {r} of peripheral {p}</description>"
+                    f"<addressOffset>{4 * r:#x}</addressOffset><fields>"
+                    "<field><name>EN</name><bitOffset>0</bitOffset><bitWidth>1</bitWidth><enumeratedValues>"
+                    "<enumeratedValue><name>OFF</name><value>0</value></enumeratedValue>"
+                    "<enumeratedValue><name>ON</name><value>1</value></enumeratedValue></enumeratedValues></field>"
+                    "<field><name>MODE</name><bitRange>[3:1]</bitRange></field>"
+                    "<field><name>DATA</name><lsb>16</lsb><msb>31</msb></field>"
+                    "</fields></register>\n"
+                )
+            out.write("</registers></peripheral>\n")
+        out.write("</peripherals></device>\n")
+
+
+def peak(fn):
+    """Result of fn and the peak memory it allocated, in bytes"""
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peripherals", type=int, default=400)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"device{i}.svd") for i in range(args.files)]
+        for path in paths:
+            write_svd(path, args.peripherals)
+        megabytes = os.path.getsize(paths[0]) / 2**20
+
+        # Peak memory of parsing the whole tree, and of streaming the
+        # peripherals through the importer without keeping them (with the
+        # codec loaded beforehand)
+        fast_codec.codec()
+        _, tree = peak(lambda: ElementTree.parse(paths[0]))
+        _, stream = peak(lambda: sum(p.registers for p in SvdReader(paths[0]).peripherals()))
+        registers, read = timed(lambda: sum(p.registers for p in SvdReader(paths[0]).peripherals()))
+        print(f"{megabytes:.1f} MB file, {registers} registers")
+        print(f"peak memory: {tree / 2**20:.1f} MB to parse the tree, {stream / 2**20:.1f} MB to stream the import")
+        print(f"import: {read:.2f} s, {registers / read:.0f} registers/s\n")
+
+        print(f"{'processes':>9} {'files':>6} {'registers':>10} {'time [s]':>9} {'registers/s':>12}")
+        for processes in sorted({1, args.processes}):
+            results, elapsed = timed(lambda: list(import_catalogue(paths, processes=processes)))
+            total = sum(r.registers for r in results)
+            print(f"{processes:>9} {len(paths):>6} {total:>10} {elapsed:>9.2f} {total / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Impact, coverage and baseline queries on a large requirements project.
+
+Run with ``python -m tests.benchmarks.bench_traceability``. The synthetic
+project has a requirement tree (a few top-level requirements decomposed a
+few levels down), verification cases validating most leaf requirements,
+change requests impacting random requirements and two baselines. Impact
+queries are compared with a breadth-first search over the JSON objects
+following the same slots (with the reverse of
+``req_verification_validates_requirements`` built once), which is what
+every query costs without the index.
+"""
+import argparse
+import random
+import time
+from collections import deque
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.traceability import TraceabilityIndex
+
+
+def build_project(requirements: int, seed: int = 0) -> dict[type, list[dict]]:
+    rng = random.Random(seed)
+    reqs = [{"id": f"req-{i}", "req_requirement_children": []} for i in range(requirements)]
+    # Every requirement after the first 20 refines an earlier one
+    for i in range(20, requirements):
+        parent = reqs[rng.randrange(max(i // 6, 20) - 20, max(i // 6, 20))]
+        parent["req_requirement_children"].append(f"req-{i}")
+    leaves = [r["id"] for r in reqs if not r["req_requirement_children"]]
+    cases = [
+        {"id": f"vc-{i}", "req_verification_validates_requirements": [leaf]}
+        for i, leaf in enumerate(rng.sample(leaves, int(len(leaves) * 0.9)))
+    ]
+    changes = [
+        {"id": f"cr-{i}", "req_change_impacts_requirements": [f"req-{rng.randrange(requirements)}"]}
+        for i in range(1000)
+    ]
+    kept = [r["id"] for r in reqs if rng.random() < 0.99]
+    baselines = [
+        {"id": "bl-1", "req_baseline_includes_requirements": [r["id"] for r in reqs[: requirements * 9 // 10]]},
+        {"id": "bl-2", "req_baseline_includes_requirements": kept},
+    ]
+    return {
+        cdm.ReqRequirement: reqs,
+        cdm.ReqVerificationCase: cases,
+        cdm.ReqRequirementChangeRequest: changes,
+        cdm.ReqRequirementBaseline: baselines,
+    }
+
+
+def bfs_impact(by_id: dict[str, dict], validated_by: dict[str, list[str]], start: str) -> set[str]:
+    found, queue = {start}, deque([start])
+    while queue:
+        element = by_id.get(queue.popleft(), {})
+        linked = (
+            element.get("req_requirement_children", [])
+            + element.get("req_change_impacts_requirements", [])
+            + validated_by.get(element.get("id"), [])
+        )
+        for id in linked:
+            if id not in found:
+                found.add(id)
+                queue.append(id)
+    found.discard(start)
+    return found
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requirements", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200, help="Impact queries of random change requests")
+    args = parser.parse_args()
+
+    project = build_project(args.requirements)
+    by_id = {e["id"]: e for elements in project.values() for e in elements}
+    validated_by: dict[str, list[str]] = {}
+    for case in project[cdm.ReqVerificationCase]:
+        for req in case["req_verification_validates_requirements"]:
+            validated_by.setdefault(req, []).append(case["id"])
+
+    def build():
+        index = TraceabilityIndex()
+        for cls, elements in project.items():
+            index.add_all(elements, cls)
+        index.impact("req-0")
+        return index
+
+    index, build_time = timed(build)
+    rng = random.Random(1)
+    changes = [c["id"] for c in rng.sample(project[cdm.ReqRequirementChangeRequest], args.queries)]
+    top = [f"req-{i}" for i in range(20)]
+
+    impacts, impact_time = timed(lambda: [index.impact(c) for c in changes])
+    _, repeat_time = timed(lambda: [index.impact(c) for c in changes])
+    expected, bfs_time = timed(lambda: [bfs_impact(by_id, validated_by, c) for c in changes])
+    assert impacts == expected
+    top_impact, top_time = timed(lambda: index.impact(top[0]))
+    _, top_repeat_time = timed(lambda: index.impact(top[0]))
+    expected, top_bfs_time = timed(lambda: bfs_impact(by_id, validated_by, top[0]))
+    assert top_impact == expected
+
+    # Incremental updates: new links queried right away
+    def relink():
+        for i in range(100):
+            index.link(f"cr-new-{i}", "req_change_impacts_requirements", f"req-{rng.randrange(args.requirements)}")
+            index.impact(f"cr-new-{i}")
+            index.link(f"req-{rng.randrange(1000, args.requirements)}", "req_requirement_children", f"req-new-{i}")
+
+    _, link_time = timed(relink)
+    unverified, coverage_time = timed(index.unverified)
+    rolled_up, rollup_time = timed(lambda: index.unverified(through_children=True))
+    diff, diff_time = timed(lambda: index.diff_baselines("bl-1", "bl-2"))
+
+    print(f"{args.requirements} requirements, {len(index)} ids")
+    print(f"{'':>40} {'index':>10} {'BFS':>10}")
+    print(f"{'build [s]':>40} {build_time:>10.2f}")
+    print(
+        f"{'impact of a change request [ms]':>40} {impact_time * 1000 / args.queries:>10.3f} "
+        f"{bfs_time * 1000 / args.queries:>10.3f}"
+    )
+    print(f"{'  repeated [ms]':>40} {repeat_time * 1000 / args.queries:>10.3f}")
+    print(f"{'impact of a top requirement [ms]':>40} {top_time * 1000:>10.1f} {top_bfs_time * 1000:>10.1f}  ({len(top_impact)} ids)")
+    print(f"{'  repeated [ms]':>40} {top_repeat_time * 1000:>10.1f}")
+    print(f"{'link, query, link [ms]':>40} {link_time * 10:>10.3f}")
+    print(f"{'unverified requirements [ms]':>40} {coverage_time * 1000:>10.0f}  ({len(unverified)})")
+    print(f"{'  through children [ms]':>40} {rollup_time * 1000:>10.0f}  ({len(rolled_up)})")
+    print(
+        f"{'baseline diff [ms]':>40} {diff_time * 1000:>10.0f}  "
+        f"(+{len(diff.added)} -{len(diff.removed)}, {len(diff.affected)} affected)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Throughput of the validation engine against the per-file validation path.
+
+Run with ``python -m tests.benchmarks.bench_validation``. A batch of SDM
+documents of the scale model (see :mod:`tests.scale_model`), one in ten
+made invalid, is written as JSON files and validated against the pruned
+``system_data_model.schema.json``:
+
+* per file, as ``linkml-run-examples`` does: the linkml ``Validator``
+  (closed-world JSON schema plugin, its schema already loaded) on every
+  parsed file, on a sample of the files;
+* with one ``jsonschema`` validator of the pruned schema for the batch;
+* with the :class:`~common_data_model.validation.ValidationEngine`, in one
+  process and across ``--processes``, and again once the documents are in
+  its cache of validated contents.
+
+Startup times are those of compiling the schema with an empty cache and of
+loading the compiled schema from the cache.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+import jsonschema
+
+from common_data_model import fast_codec
+from common_data_model.validation import CompiledSchema, ValidationEngine
+from tests.benchmarks.bench_pipeline import ROOT, json_schema
+from tests.scale_model import build_esd, tier
+
+TARGET = "SystemSdmSystemModelVersion"
+
+
+def write_documents(directory: str, documents: int, blocks: int) -> list[str]:
+    paths = []
+    for i in range(documents):
+        document = fast_codec.to_dict(build_esd(tier(blocks, seed=i)).compile_sdm(incremental=False))
+        if i % 10 == 9:
+            document["functionalModel"]["functionalBlocks"][i % blocks]["owner"] = "nobody"
+        paths.append(os.path.join(directory, f"sdm-{i}.json"))
+        with open(paths[-1], "w") as f:
+            json.dump(document, f)
+    return paths
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=20, help="Functional blocks per document")
+    parser.add_argument("--sample", type=int, default=20, help="Documents validated per file with linkml")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    from linkml.validator import Validator
+    from linkml.validator.plugins import JsonschemaValidationPlugin
+
+    spec = importlib.util.spec_from_file_location("prune_schema", os.path.join(ROOT, "prune-schema.py"))
+    prune_schema = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(prune_schema)
+
+    with tempfile.TemporaryDirectory() as directory:
+        schema = prune_schema.prune_schema(json_schema(), TARGET, "System Data Model")
+        schema_path = os.path.join(directory, "system_data_model.schema.json")
+        with open(schema_path, "w") as f:
+            json.dump(schema, f, indent=2)
+        paths = write_documents(directory, args.documents, args.blocks)
+        size = sum(os.path.getsize(p) for p in paths)
+        cache = os.path.join(directory, "cache")
+
+        def parsed(path):
+            with open(path, "rb") as f:
+                return json.load(f)
+
+        # linkml, per file
+        linkml_validator = Validator(
+            os.path.join(ROOT, "src", "common_data_model", "schema", "common_data_model.yaml"),
+            [JsonschemaValidationPlugin(closed=True)],
+        )
+        linkml_validator.validate(parsed(paths[0]), "system_SdmSystemModelVersion")
+        sample = paths[: args.sample]
+        linkml_invalid, linkml_time = timed(
+            lambda: [
+                p for p in sample if linkml_validator.validate(parsed(p), "system_SdmSystemModelVersion").results
+            ]
+        )
+
+        reference = jsonschema.Draft202012Validator(schema)
+        expected, jsonschema_time = timed(lambda: [p for p in paths if next(reference.iter_errors(parsed(p)), None)])
+        assert linkml_invalid == [p for p in expected if p in sample]
+
+        compiled, cold_time = timed(lambda: CompiledSchema.load(schema_path, cache))
+        _, warm_time = timed(lambda: CompiledSchema.load(schema_path, cache))
+
+        def run(processes: int, cache_dir=None):
+            with ValidationEngine(compiled, cache_dir, processes) as engine:
+                engine.validate_files(paths[:1])
+                return timed(lambda: engine.validate_files(paths))
+
+        one, one_time = run(1)
+        pool, pool_time = run(args.processes)
+        _, first_time = run(1, cache)
+        cached, cached_time = run(1, cache)
+        for report in (one, pool, cached):
+            assert [r.source for r in report.invalid] == expected
+        assert cached.cached == len(paths)
+
+    per_file = linkml_time / len(sample)
+    print(f"{args.documents} documents of {args.blocks} blocks ({size / len(paths) / 1024:.0f} kB each)")
+    print(f"{'':>36} {'documents/s':>12} {'speedup':>8}")
+    rows = [
+        ("linkml, per file", per_file),
+        ("jsonschema", jsonschema_time / len(paths)),
+        ("engine, 1 process", one_time / len(paths)),
+        (f"engine, {args.processes} processes", pool_time / len(paths)),
+        ("engine, first run with cache", first_time / len(paths)),
+        ("engine, already validated", cached_time / len(paths)),
+    ]
+    for name, seconds in rows:
+        print(f"{name:>36} {1 / seconds:>12.0f} {per_file / seconds:>7.0f}x")
+    print(f"{'startup, compiling [ms]':>36} {cold_time * 1000:>12.1f}")
+    print(f"{'startup, cached [ms]':>36} {warm_time * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
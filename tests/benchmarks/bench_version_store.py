@@ -0,0 +1,131 @@
+"""Memory retained by 1,000 SDM versions: version store vs deepcopy snapshots.
+
+Run with ``python -m tests.benchmarks.bench_version_store``. Every version
+changes a single functional block of a model whose device models carry
+thousands of peripherals and ports.
+"""
+import argparse
+import tracemalloc
+from copy import deepcopy
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.version_store import SdmVersionStore
+
+
+def build_device_model(index: int, peripherals: int) -> cdm.SystemSdmDeviceModel:
+    return cdm.SystemSdmDeviceModel(
+        id=f"dm-{index}",
+        mpn=f"MCU-{index}",
+        peripherals=[
+            cdm.DmPeripheral(
+                id=f"p{i}",
+                name=f"Peripheral {i}",
+                instances=[
+                    cdm.DmPeripheralInstance(
+                        id=f"p{i}.0",
+                        modes=[
+                            cdm.DmPeripheralMode(
+                                name="Default",
+                                configurations=[
+                                    cdm.DmPeripheralConfiguration(
+                                        id=f"p{i}.0.default",
+                                        pinConfigs=[
+                                            cdm.DmPeripheralPinConfig(
+                                                pinName=f"p{i}.pin{j}",
+                                                pinValue=f"p{i}.pin{j}.p{j}",
+                                                portName=f"P{j}",
+                                            )
+                                            for j in range(4)
+                                        ],
+                                    )
+                                ],
+                            )
+                        ],
+                    )
+                ],
+            )
+            for i in range(peripherals)
+        ],
+        ports=[
+            cdm.DmPort(id=f"port{i}", name=f"P{i}", pin=str(i))
+            for i in range(peripherals)
+        ],
+    )
+
+
+def build_sdm(blocks: int, peripherals: int) -> cdm.SystemSdmSystemModelVersion:
+    return cdm.SystemSdmSystemModelVersion(
+        id="sdm-1",
+        version=0,
+        functionalModel=cdm.SystemSdmFunctionalModel(
+            id="fm-1",
+            functionalBlocks=[
+                cdm.SystemSdmFunctionalBlock(id=f"fb-{i}", name=f"Block {i}")
+                for i in range(blocks)
+            ],
+        ),
+        deviceModels=[build_device_model(i, peripherals) for i in range(2)],
+    )
+
+
+def edited_block(version: int, blocks: int) -> cdm.SystemSdmFunctionalBlock:
+    index = version % blocks
+    return cdm.SystemSdmFunctionalBlock(id=f"fb-{index}", name=f"Block {index} v{version}")
+
+
+def measure_store(sdm, versions: int, blocks: int) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = SdmVersionStore(sdm)
+    for version in range(versions):
+        with store.edit() as v:
+            v.put("functionalBlocks", edited_block(version, blocks))
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(store) == versions + 1
+    return retained
+
+
+def measure_deepcopy(sdm, versions: int, blocks: int) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = [sdm]
+    for version in range(versions):
+        snapshot = deepcopy(history[-1])
+        snapshot.version += 1
+        fbs = snapshot.functionalModel.functionalBlocks
+        fbs[version % blocks] = edited_block(version, blocks)
+        history.append(snapshot)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", type=int, default=1_000)
+    parser.add_argument("--blocks", type=int, default=2_000)
+    parser.add_argument("--peripherals", type=int, default=2_000)
+    parser.add_argument(
+        "--deepcopy-versions",
+        type=int,
+        default=10,
+        help="deepcopy snapshots to measure; extrapolated to --versions",
+    )
+    args = parser.parse_args()
+
+    sdm = build_sdm(args.blocks, args.peripherals)
+    store = measure_store(sdm, args.versions, args.blocks)
+    deep = measure_deepcopy(sdm, args.deepcopy_versions, args.blocks)
+    deep_total = deep / args.deepcopy_versions * args.versions
+
+    mib = 1024 * 1024
+    print(f"versions retained:       {args.versions}")
+    print(f"version store:           {store / mib:10.1f} MiB "
+          f"({store / args.versions / 1024:.1f} KiB/version)")
+    print(f"deepcopy (extrapolated): {deep_total / mib:10.1f} MiB "
+          f"({deep / args.deepcopy_versions / 1024:.1f} KiB/version)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Per-stage profile of compiling an ESD document into an SDM and serializing it.
+
+Run with ``python -m tests.benchmarks.profile_compile [esd.json]``. The
+document (JSON or YAML ``SystemESDDocument``; without one, a scale model
+of ``--blocks`` functional blocks, see :mod:`tests.scale_model`) is
+compiled from scratch, then ``--incremental`` more times after a one-port
+edit each, and the SDM is serialized with :mod:`common_data_model.fast_codec`,
+under an :mod:`~common_data_model.instrumentation` recording. Devices
+configured in the Device Modeler are not part of an ESD document, so a
+document read from a file only has the device models its software
+components create.
+
+The breakdown lists every stage with its calls, time and share of the
+recording, and with ``--allocations`` the memory it allocated, followed by
+the counters (entities compiled, IdMapper hits and misses...). The results
+can also be written as JSON lines (``--jsonl``) or in the Prometheus text
+format (``--prometheus``).
+"""
+import argparse
+import time
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec, instrumentation
+from tests.clients.esd_client import ESDClient
+from tests.scale_model import build_esd, tier
+
+# Stages in pipeline order; others are listed after them
+STAGES = (
+    "compile",
+    "compile.copy",
+    "compile.functional_blocks",
+    "compile.connections",
+    "compile.hardware_models",
+    "compile.software_models",
+    "compile.device_models",
+    "serialize.to_dict",
+    "serialize.encode",
+)
+
+
+def load_esd(path: str) -> ESDClient:
+    if path.endswith((".yaml", ".yml")):
+        from linkml_runtime.loaders import yaml_loader
+
+        return ESDClient(yaml_loader.load(path, cdm.SystemESDDocument))
+    return ESDClient(fast_codec.load(path, cdm.SystemESDDocument))
+
+
+def breakdown(totals: instrumentation.CounterSink, elapsed: float) -> list[str]:
+    names = [s for s in STAGES if s in totals.stages] + sorted(set(totals.stages) - set(STAGES))
+    lines = [f"{'stage':<30} {'calls':>6} {'time [ms]':>10} {'share':>6} {'allocated [kB]':>15} {'peak [kB]':>10}"]
+    for name in names:
+        stats = totals.stages[name]
+        label = "  " * name.count(".") + name.rsplit(".", 1)[-1] if name.startswith("compile.") else name
+        memory = f"{stats.allocated / 1024:>15.0f} {stats.peak / 1024:>10.0f}" if stats.peak else ""
+        row = f"{label:<30} {stats.calls:>6} {stats.seconds * 1000:>10.1f} {stats.seconds / elapsed:>6.0%} {memory}"
+        lines.append(row.rstrip())
+    lines.append(f"{'total':<30} {'':>6} {elapsed * 1000:>10.1f}")
+    lines.append("")
+    lines.extend(f"{name:<36} {n:>10}" for name, n in sorted(totals.counters.items()))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("document", nargs="?", help="ESD document (JSON or YAML)")
+    parser.add_argument("--blocks", type=int, default=1000, help="Size of the scale model without a document")
+    parser.add_argument("--incremental", type=int, default=0, help="Incremental compiles after one-port edits")
+    parser.add_argument("--allocations", action="store_true", help="Trace allocations (slower)")
+    parser.add_argument("--jsonl", help="Append the results to a JSON lines file")
+    parser.add_argument("--prometheus", help="Write the results in the Prometheus text format")
+    args = parser.parse_args()
+
+    esd = load_esd(args.document) if args.document else build_esd(tier(args.blocks))
+    totals = instrumentation.CounterSink()
+    sinks = [totals]
+    if args.jsonl:
+        sinks.append(instrumentation.JsonLinesSink(args.jsonl))
+    if args.prometheus:
+        sinks.append(instrumentation.PrometheusSink(args.prometheus))
+
+    start = time.perf_counter()
+    with instrumentation.recording(sinks=sinks, allocations=args.allocations):
+        sdm = esd.compile_sdm(incremental=False)
+        blocks = esd.model.functionalBlocks
+        for i in range(args.incremental):
+            esd.add_port(blocks[i * 7919 % len(blocks)], cdm.SystemPortType.GPIO)
+            sdm = esd.compile_sdm()
+        fast_codec.dumps(sdm)
+    elapsed = time.perf_counter() - start
+
+    source = args.document or f"scale model of {args.blocks} blocks"
+    print(f"{source}: {len(blocks)} functional blocks, {len(esd.model.connections)} connections")
+    print("\n".join(breakdown(totals, elapsed)))
+
+
+if __name__ == "__main__":
+    main()
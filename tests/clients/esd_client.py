@@ -1,47 +1,56 @@
 import uuid
-from copy import deepcopy
-from typing import Dict, Any
+from copy import copy
+from typing import Callable, Dict, Any
 
 import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import instrumentation
+from common_data_model.connectivity import ConnectivityGraph
+from common_data_model.sdm_diff import REMOVE, diff_sdm
+from tests.clients.id_mapper import IdMapper
+from tests.clients.sim_client import SIMClient
+from tests.sim import SIM
 
 
-class IdMapper:
-    def __init__(self, name: str) -> None:
-        self.counter = 1
-        self.name = name
-        self.mapping: dict[str, str] = {}
-
-    def map_id(self, original_id: str) -> str:
-        try:
-            return self.mapping[original_id]
-        except KeyError:
-            self.mapping[original_id] = "guid-" + str(self.counter)
-            self.counter += 1
-            return self.mapping[original_id]
-
-    def map_entity(self, entity: Any) -> Any:
-        original_id = entity.id
-        entity.id = self.map_id(entity.id)
-        entity.metadata = [
-            cdm.SystemSmClientMetadata(
-                clientId=self.name,
-                parameters=[cdm.SystemParameter(id="local-id", value=original_id)],
-            )
-        ]
-        return entity
+class SdmCache:
+    """Compiled SDM entities keyed by ESD-local id.
+
+    An entity is only recompiled when it is missing or has been marked dirty
+    since the last compile; otherwise the previously compiled sub-tree is
+    reused as is, so compiled entities must be treated as immutable.
+    """
+
+    def __init__(self) -> None:
+        self.entities: dict[str, Any] = {}
+        self.dirty: set[str] = set()
 
+    def mark_dirty(self, local_id: str) -> None:
+        if local_id in self.entities:
+            self.dirty.add(local_id)
 
-class ESDClient:
+    def get(self, local_id: str, compile_entity: Callable[[], Any]) -> Any:
+        if local_id in self.dirty or local_id not in self.entities:
+            instrumentation.count("compile.recompiled")
+            self.entities[local_id] = compile_entity()
+            self.dirty.discard(local_id)
+        return self.entities[local_id]
+
+    def clear(self) -> None:
+        self.entities.clear()
+        self.dirty.clear()
+
+
+class ESDClient(SIMClient):
     def __init__(
         self,
         model: cdm.SystemESDDocument = None,
-        latest_sdm: cdm.SystemSystemModel = None,
+        latest_sdm: cdm.SystemSdmSystemModelVersion = None,
+        id_mapper: IdMapper = None,
     ) -> None:
         self.model = model if model else cdm.SystemESDDocument(id="esd-1")
         self.latest_sdm = (
             latest_sdm
             if latest_sdm
-            else cdm.SystemSystemModel(
+            else cdm.SystemSdmSystemModelVersion(
                 id="sdm-1",
                 version=0,
                 functionalModel=None,
@@ -50,9 +59,44 @@ class ESDClient:
                 hardwareModels=[],
             )
         )
-        self.deviceModels: Dict[str, cdm.SystemSmDeviceModel] = {}
-        self.sw_library: Dict[str, cdm.SystemSmSoftwareSpecification] = {}
-        self.id_mapper = IdMapper(name="esd")
+        self.deviceModels: Dict[str, cdm.SystemSdmDeviceModel] = {}
+        self.sw_library: Dict[str, cdm.SystemSdmSoftwareSpecification] = {}
+        self.id_mapper = id_mapper if id_mapper else IdMapper(name="esd")
+
+        # Compiled SDM entities, reused by incremental compiles
+        self._functional_blocks = SdmCache()
+        self._connections = SdmCache()
+        self._hardware_models = SdmCache()
+        self._software_models = SdmCache()
+        self._device_models = SdmCache()
+
+        # Built on first use, then kept up to date as blocks, ports and
+        # connections are added
+        self._connectivity: ConnectivityGraph = None
+
+        # ESD entities by local id, and reverse indexes used to find the
+        # compiled entities affected by an edit
+        self._blocks: Dict[str, cdm.SystemFunctionalBlock] = {}
+        self._key_components: Dict[str, cdm.SystemKeyComponent] = {}
+        self._software_components: Dict[str, cdm.SystemSoftwareComponent] = {}
+        self._block_hw_projects: Dict[str, set[str]] = {}
+        self._key_component_blocks: Dict[str, str] = {}
+        self._key_component_sw_projects: Dict[str, set[str]] = {}
+        for fb in self.model.functionalBlocks:
+            self._blocks[fb.id] = fb
+            for kc in fb.keyComponents:
+                self._key_components[kc.id] = kc
+                self._key_component_blocks[kc.id] = fb.id
+            for sc in fb.softwareComponents:
+                self._software_components[sc.id] = sc
+        for hp in self.model.hardwareProjects:
+            for fb_id in hp.functionalBlocks:
+                self._block_hw_projects.setdefault(fb_id, set()).add(hp.id)
+        for sp in self.model.softwareProjects:
+            for sc_id in sp.softwareComponents:
+                self._key_component_sw_projects.setdefault(
+                    self._software_components[sc_id].parentKeyComponentId, set()
+                ).add(sp.id)
 
     def add_sw_library_item(
         self,
@@ -60,14 +104,17 @@ class ESDClient:
         vendor: str,
         ecosystem: str,
         package_name: str,
-        category: cdm.SystemSmSoftwareComponentCategory,
+        category: cdm.SystemSdmSoftwareComponentCategory,
     ) -> str:
-        self.sw_library[name] = cdm.SystemSmSoftwareSpecification(
+        self.sw_library[name] = cdm.SystemSdmSoftwareSpecification(
             name=package_name,
             vendor=vendor,
             ecosystem=ecosystem,
             category=category,
         )
+        # Specifications are resolved by name, so any software model may use it
+        for sp in self.model.softwareProjects:
+            self._software_models.mark_dirty(sp.id)
         return name
 
     def add_functional_block(
@@ -78,8 +125,13 @@ class ESDClient:
             id=f"fb-{len(self.model.functionalBlocks) + 1}", name=title
         )
         self.model.functionalBlocks.append(block)
+        self._blocks[block.id] = block
+        if self._connectivity is not None:
+            self._connectivity.add_block(block.id)
         if hw_project:
             hw_project.functionalBlocks.append(block.id)
+            self._block_hw_projects.setdefault(block.id, set()).add(hw_project.id)
+            self._hardware_models.mark_dirty(hw_project.id)
         return block
 
     def add_hardware_project(self, implemented_by: str = None):
@@ -108,6 +160,9 @@ class ESDClient:
             id=f"{block.id}.kc-{len(block.keyComponents) + 1}", name=mpn
         )
         block.keyComponents.append(component)
+        self._key_components[component.id] = component
+        self._key_component_blocks[component.id] = block.id
+        self._mark_block_dirty(block.id)
         return component
 
     def add_software_component(
@@ -124,7 +179,12 @@ class ESDClient:
             parentKeyComponentId=key_comp.id,
         )
         block.softwareComponents.append(component)
+        self._software_components[component.id] = component
         sft_project.softwareComponents.append(component.id)
+        self._key_component_sw_projects.setdefault(key_comp.id, set()).add(
+            sft_project.id
+        )
+        self._software_models.mark_dirty(sft_project.id)
         return component
 
     def add_port(
@@ -142,6 +202,9 @@ class ESDClient:
             ],
         )
         block.ports.append(port)
+        self._functional_blocks.mark_dirty(block.id)
+        if self._connectivity is not None:
+            self._connectivity.add_port(block.id, port.id)
         return port
 
     def add_connection(
@@ -160,156 +223,257 @@ class ESDClient:
             ],
         )
         self.model.connections.append(connection)
+        self._connections.mark_dirty(connection.id)
+        if self._connectivity is not None:
+            self._connectivity.add_connection(connection)
         return connection
 
+    @property
+    def connectivity(self) -> ConnectivityGraph:
+        """Connectivity graph of the functional blocks of the ESD model"""
+        if self._connectivity is None:
+            self._connectivity = ConnectivityGraph.from_model(self.model)
+        return self._connectivity
+
     def configure_device(
-        self, hw_component: cdm.SystemKeyComponent, device: cdm.SystemSmDeviceModel
+        self, hw_component: cdm.SystemKeyComponent, device: cdm.SystemSdmDeviceModel
     ) -> None:
         """Simulate device configuration via (RA) Device Modeler"""
         self.deviceModels[hw_component.id] = device
+        self._mark_device_dirty(hw_component.id)
+
+    def _mark_block_dirty(self, fb_id: str) -> None:
+        self._functional_blocks.mark_dirty(fb_id)
+        for hp_id in self._block_hw_projects.get(fb_id, ()):
+            self._hardware_models.mark_dirty(hp_id)
+
+    def _mark_device_dirty(self, kc_id: str) -> None:
+        """Invalidate a device model and every compiled entity referencing it"""
+        self._device_models.mark_dirty(kc_id)
+        if kc_id in self._key_component_blocks:
+            for hp_id in self._block_hw_projects.get(
+                self._key_component_blocks[kc_id], ()
+            ):
+                self._hardware_models.mark_dirty(hp_id)
+        for sp_id in self._key_component_sw_projects.get(kc_id, ()):
+            self._software_models.mark_dirty(sp_id)
+
+    def compile_sdm(self, incremental: bool = True):
+        """Compile the System (Data) Model from the current ESD state
+
+        With ``incremental`` set, only the functional blocks, connections,
+        hardware, software and device models touched since the previous compile
+        are rebuilt; the rest of the SDM reuses the previously compiled
+        entities. The result is identical to a full (non-incremental) compile.
+        """
+        with instrumentation.stage("compile"), self.id_mapper.batch():
+            return self._compile_sdm(incremental)
+
+    def _compile_sdm(self, incremental: bool):
+        if not incremental:
+            for cache in (
+                self._functional_blocks,
+                self._connections,
+                self._hardware_models,
+                self._software_models,
+                self._device_models,
+            ):
+                cache.clear()
+
+        with instrumentation.stage("compile.copy"):
+            sdm = copy(self.latest_sdm)
+            sdm.id = self.id_mapper.map_id(self.latest_sdm.id)
+            sdm.version = self.latest_sdm.version + 1
+            # Compile into the SIM's functional model once there is one, so
+            # pushes change it block by block instead of replacing it whole
+            if self.baseline is not None and self.baseline.functionalModel:
+                sdm.functionalModel = self.baseline.functionalModel
+            if sdm.functionalModel is None:
+                sdm.functionalModel = self.id_mapper.map_entity(
+                    cdm.SystemSdmFunctionalModel(id=self.model.id)
+                )
+            else:
+                sdm.functionalModel = copy(sdm.functionalModel)
 
-    def compile_sdm(self):
-        """Compile the System (Data) Model from the current ESD state"""
         # Fully replace functional model
-        sdm = deepcopy(self.latest_sdm)
-        sdm.id = self.id_mapper.map_id(self.latest_sdm.id)
-        sdm.version = self.latest_sdm.version + 1
-        if sdm.functionalModel is None:
-            sdm.functionalModel = self.id_mapper.map_entity(cdm.SystemSmFunctionalModel(id=self.model.id))
+        with instrumentation.stage("compile.functional_blocks"):
+            sdm.functionalModel.functionalBlocks = [
+                self._functional_blocks.get(
+                    fb.id, lambda: self._compile_functional_block(fb)
+                )
+                for fb in self.model.functionalBlocks
+            ]
+        with instrumentation.stage("compile.connections"):
+            sdm.functionalModel.connections = [
+                self._connections.get(con.id, lambda: self._compile_connection(con))
+                for con in self.model.connections
+            ]
 
-        fb_blocks = dict()
-        sw_components = dict()
-        hw_components = dict()
+        # Fully replace hardware model
+        with instrumentation.stage("compile.hardware_models"):
+            sdm.hardwareModels = [
+                self._hardware_models.get(
+                    hp.id, lambda: self._compile_hardware_model(hp)
+                )
+                for hp in self.model.hardwareProjects
+            ]
 
-        sdm.functionalModel.functionalBlocks = []
-        for fb in self.model.functionalBlocks:
-            fb_blocks[fb.id] = fb
-            sdm.functionalModel.functionalBlocks.append(
-                self.id_mapper.map_entity(
-                    cdm.SystemSmFunctionalBlock(
-                        id=fb.id,
-                        name=fb.name,
-                        hardwareComponentIds=[
-                            self.id_mapper.map_id(x.id) for x in fb.keyComponents
-                        ],
-                        ports=[
-                            self.id_mapper.map_entity(
-                                cdm.SystemSmPort(
-                                    id=p.id, name=p.name, parameters=p.parameters
-                                )
-                            )
-                            for p in fb.ports
-                        ],
-                    )
+        # Fully replace software model
+        with instrumentation.stage("compile.software_models"):
+            sdm.softwareModels = [
+                self._software_models.get(
+                    sp.id, lambda: self._compile_software_model(sp)
                 )
-            )
+                for sp in self.model.softwareProjects
+            ]
+
+        # Fully replace device model
+        with instrumentation.stage("compile.device_models"):
+            sdm.deviceModels = [
+                self._device_models.get(kc_id, lambda: self._compile_device_model(dm))
+                for kc_id, dm in self.deviceModels.items()
+            ]
+
+        if instrumentation.active is not None:
+            for name, entities in (
+                ("functional_blocks", sdm.functionalModel.functionalBlocks),
+                ("connections", sdm.functionalModel.connections),
+                ("hardware_models", sdm.hardwareModels),
+                ("software_models", sdm.softwareModels),
+                ("device_models", sdm.deviceModels),
+            ):
+                instrumentation.count(f"compile.entities.{name}", len(entities))
+        return sdm
 
-            for sw_component in fb.softwareComponents:
-                sw_components[sw_component.id] = sw_component
-            for hw_component in fb.keyComponents:
-                hw_components[hw_component.id] = hw_component
-
-        for con in self.model.connections:
-            sdm.functionalModel.connections.append(
-                self.id_mapper.map_entity(
-                    cdm.SystemSmConnection(
-                        id=con.id,
-                        endpoints=[
-                            cdm.SystemSmEndpoint(
-                                functionalBlockId=self.id_mapper.map_id(
-                                    e.functionalBlockId
-                                ),
-                                portId=self.id_mapper.map_id(e.portId),
-                            )
-                            for e in con.endpoints
-                        ],
+    def _compile_functional_block(
+        self, fb: cdm.SystemFunctionalBlock
+    ) -> cdm.SystemSdmFunctionalBlock:
+        return self.id_mapper.map_entity(
+            cdm.SystemSdmFunctionalBlock(
+                id=fb.id,
+                name=fb.name,
+                hardwareComponentIds=self.id_mapper.map_ids(
+                    x.id for x in fb.keyComponents
+                ),
+                ports=[
+                    self.id_mapper.map_entity(
+                        cdm.SystemSdmPort(
+                            id=p.id, name=p.name, quantity=1, parameters=p.parameters
+                        )
                     )
-                )
+                    for p in fb.ports
+                ],
             )
+        )
 
-        # Fully replace hardware model
-        sdm.hardwareModels = []
-        for hp in self.model.hardwareProjects:
-            hw_model = cdm.SystemSmHardwareModel(
-                id=hp.id,
-                implementedBy=hp.implementedBy,
-                hardwareComponents=[],
-                functionalBlockIds=[],
+    def _compile_connection(
+        self, con: cdm.SystemConnection
+    ) -> cdm.SystemSdmConnection:
+        return self.id_mapper.map_entity(
+            cdm.SystemSdmConnection(
+                id=con.id,
+                endpoints=[
+                    cdm.SystemSdmEndpoint(
+                        functionalBlockId=self.id_mapper.map_id(e.functionalBlockId),
+                        portId=self.id_mapper.map_id(e.portId),
+                    )
+                    for e in con.endpoints
+                ],
             )
+        )
 
-            for fbId in hp.functionalBlocks:
-                hw_model.functionalBlockIds.append(self.id_mapper.map_id(fbId))
-                for kc in fb_blocks[fbId].keyComponents:
-                    hw_comp = cdm.SystemSmHardwareComponent(id=kc.id, name=kc.name)
-                    if kc.id in self.deviceModels:
-                        hw_comp.deviceModelId = self.id_mapper.map_id(
-                            self.deviceModels[kc.id].id
-                        )
-                    hw_model.hardwareComponents.append(
-                        self.id_mapper.map_entity(hw_comp)
+    def _compile_hardware_model(
+        self, hp: cdm.SystemHardwareProject
+    ) -> cdm.SystemSdmHardwareModel:
+        hw_model = cdm.SystemSdmHardwareModel(
+            id=hp.id,
+            implementedBy=hp.implementedBy,
+            hardwareComponents=[],
+            functionalBlockIds=[],
+        )
+
+        for fbId in hp.functionalBlocks:
+            hw_model.functionalBlockIds.append(self.id_mapper.map_id(fbId))
+            for kc in self._blocks[fbId].keyComponents:
+                hw_comp = cdm.SystemSdmHardwareComponent(id=kc.id, name=kc.name)
+                if kc.id in self.deviceModels:
+                    hw_comp.deviceModelId = self.id_mapper.map_id(
+                        self.deviceModels[kc.id].id
                     )
-            sdm.hardwareModels.append(self.id_mapper.map_entity(hw_model))
+                hw_model.hardwareComponents.append(self.id_mapper.map_entity(hw_comp))
+        return self.id_mapper.map_entity(hw_model)
 
-        # Fully replace software model
-        sdm.softwareModels = []
-        for sp in self.model.softwareProjects:
-            sw_components = [sw_components[sc_id] for sc_id in sp.softwareComponents]
-
-            sw_model = self.id_mapper.map_entity(
-                cdm.SystemSmSoftwareModel(
-                    id=sp.id,
-                    implementedBy=sp.implementedBy,
-                    softwareComponents=[
-                        self.id_mapper.map_entity(
-                            cdm.SystemSmSoftwareComponent(
-                                id=sc.id,
-                                name=sc.name,
-                                specification=self.sw_library.get(sc.name, None),
-                            )
+    def _compile_software_model(
+        self, sp: cdm.SystemSoftwareProject
+    ) -> cdm.SystemSdmSoftwareModel:
+        project_components = [
+            self._software_components[sc_id] for sc_id in sp.softwareComponents
+        ]
+
+        sw_model = self.id_mapper.map_entity(
+            cdm.SystemSdmSoftwareModel(
+                id=sp.id,
+                implementedBy=sp.implementedBy,
+                softwareComponents=[
+                    self.id_mapper.map_entity(
+                        cdm.SystemSdmSoftwareComponent(
+                            id=sc.id,
+                            name=sc.name,
+                            specification=self.sw_library.get(sc.name, None),
                         )
-                        for sc in sw_components
-                    ],
+                    )
+                    for sc in project_components
+                ],
+            )
+        )
+
+        if project_components:
+            hw_component = project_components[0].parentKeyComponentId
+            # Add blank device model for hardware component if not already present
+            if hw_component not in self.deviceModels:
+                self.deviceModels[hw_component] = cdm.SystemSdmDeviceModel(
+                    id=f"dm-{len(self.deviceModels) + 1}",
+                    mpn=self._key_components[hw_component].name,
+                    peripherals=[],
+                    ports=[],
                 )
+                # Hardware models compiled earlier in this pass do not reference it yet
+                self._mark_device_dirty(hw_component)
+
+            sw_model.deviceModelId = self.id_mapper.map_id(
+                self.deviceModels[hw_component].id
             )
 
-            if sw_components:
-                hw_component = sw_components[0].parentKeyComponentId
-                # Add blank device model for hardware component if not already present
-                if hw_component not in self.deviceModels:
-                    self.deviceModels[hw_component] = cdm.SystemSmDeviceModel(
-                        id=f"dm-{len(self.deviceModels) + 1}",
-                        mpn=hw_components[hw_component].name,
-                        peripherals=[],
-                        ports=[],
-                    )
+        return sw_model
 
-                sw_model.deviceModelId = self.id_mapper.map_id(
-                    self.deviceModels[hw_component].id
-                )
+    def _compile_device_model(
+        self, dm: cdm.SystemSdmDeviceModel
+    ) -> cdm.SystemSdmDeviceModel:
+        # Map a shallow copy so the configured device keeps its ESD-local id
+        return self.id_mapper.map_entity(copy(dm))
 
-            sdm.softwareModels.append(sw_model)
+    def push_to_sim(self, sim: SIM):
+        SIMClient.ensure_up_to_date(sim, self.baseline)
 
-        # Fully replace device model
-        sdm.deviceModels = []
-        for dm in self.deviceModels.values():
-            sdm.deviceModels.append(self.id_mapper.map_entity(dm))
+        # update SIM with the ECO between the baseline and the compiled SDM,
+        # leaving entities pushed by other clients in place
+        sdm = self.compile_sdm()
+        with instrumentation.stage("push.diff"):
+            patch = diff_sdm(self.baseline, sdm)
+            patch.changes = [
+                change
+                for change in patch.changes
+                if change.op != REMOVE or self._owns(change.value)
+            ]
+        instrumentation.count("push.changes", len(patch.changes))
+        with instrumentation.stage("push.apply"):
+            sim.apply_patch(patch)
 
-        return sdm
+        # save the new baseline version of the SIM
+        with instrumentation.stage("push.snapshot"):
+            self.baseline = sim.snapshot()
 
-    #
-    # def push_to_sim(self, sim: SIM):
-    #     SIMClient.ensure_up_to_date(sim, self.baseline)
-    #
-    #     # update SIM - trivial "full update" for now
-    #     sim.update_functional_model(self.model)
-    #     if self.device:
-    #         sim.update_device_model(self.device)
-    #
-    #     # save the new baseline version of the SIM
-    #     self.baseline = sim.snapshot()
-    #
-    # def pull_from_sim(self, sim: SIM):
-    #     # TODO: perform ECO
-    #
-    #     # save the new baseline version of the SIM
-    #     self.baseline = sim.snapshot()
+    def _owns(self, entity: Any) -> bool:
+        return any(
+            m.clientId == self.id_mapper.name for m in getattr(entity, "metadata", [])
+        )
@@ -0,0 +1,204 @@
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Iterable, Iterator, Optional
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import instrumentation
+
+GUID_PREFIX = "guid-"
+
+
+class IdMapper:
+    """Maps client-local ids to SDM GUIDs and back"""
+
+    def __init__(self, name: str) -> None:
+        self.counter = 1
+        self.name = name
+        self.mapping: dict[str, str] = {}
+        self.reverse_mapping: dict[str, str] = {}
+        # Client metadata is identical for every compile of an entity, so it
+        # is allocated once per local id and shared by all compiled entities
+        self._metadata: dict[str, list[cdm.SystemSdmClientMetadata]] = {}
+
+    def map_id(self, original_id: str) -> str:
+        try:
+            guid = self.mapping[original_id]
+        except KeyError:
+            return self.map_ids([original_id])[0]
+        if instrumentation.active is not None:
+            instrumentation.active.count("id_mapper.hit")
+        return guid
+
+    def map_ids(self, original_ids: Iterable[str]) -> list[str]:
+        """Map a whole collection of ids, allocating GUIDs for new ones in order"""
+        original_ids = list(original_ids)
+        mapping = self.mapping
+        missing = [i for i in original_ids if i not in mapping]
+        recorder = instrumentation.active
+        if recorder is not None:
+            # Per id looked up, as for map_id: a repeated new id misses each time
+            recorder.count("id_mapper.hit", len(original_ids) - len(missing))
+            recorder.count("id_mapper.miss", len(missing))
+        if missing:
+            self._allocate(list(dict.fromkeys(missing)))
+        return [mapping[i] for i in original_ids]
+
+    def local_id(self, guid: str) -> Optional[str]:
+        """Reverse lookup of the local id a GUID was allocated for"""
+        return self.reverse_mapping.get(guid)
+
+    def batch(self) -> ContextManager:
+        """Group the allocations of many map_id calls (e.g. a whole compile)"""
+        return nullcontext()
+
+    def metadata(self, original_id: str) -> list[cdm.SystemSdmClientMetadata]:
+        try:
+            return self._metadata[original_id]
+        except KeyError:
+            metadata = self._metadata[original_id] = [
+                cdm.SystemSdmClientMetadata(
+                    clientId=self.name,
+                    parameters=[cdm.SystemParameter(id="local-id", value=original_id)],
+                )
+            ]
+            return metadata
+
+    def map_entity(self, entity: Any) -> Any:
+        original_id = entity.id
+        entity.id = self.map_id(original_id)
+        entity.metadata = self.metadata(original_id)
+        return entity
+
+    def _remember(self, original_id: str, guid: str) -> None:
+        self.mapping[original_id] = guid
+        self.reverse_mapping[guid] = original_id
+
+    def _allocate(self, original_ids: list[str]) -> None:
+        instrumentation.count("id_mapper.allocated", len(original_ids))
+        for original_id in original_ids:
+            self._remember(original_id, GUID_PREFIX + str(self.counter))
+            self.counter += 1
+
+
+class SqliteIdMapper(IdMapper):
+    """IdMapper persisted in an SQLite database.
+
+    Mappings survive restarts and are shared between sessions and processes
+    using the same database file; several clients can share one file since
+    mappings are kept per client name. GUIDs are stored as integers, with a
+    unique index for each lookup direction. Mappings used by this session are
+    cached in memory, so repeated lookups do not touch the database.
+    """
+
+    # SQLite limits the number of host parameters per statement
+    CHUNK = 500
+
+    def __init__(self, name: str, path: str) -> None:
+        super().__init__(name)
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS id_counters (
+                name TEXT PRIMARY KEY,
+                next INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS id_mappings (
+                name TEXT NOT NULL,
+                local_id TEXT NOT NULL,
+                guid INTEGER NOT NULL,
+                PRIMARY KEY (name, local_id)
+            ) WITHOUT ROWID;
+            CREATE UNIQUE INDEX IF NOT EXISTS id_mappings_guid
+                ON id_mappings (name, guid);
+            """
+        )
+        self._in_batch = False
+        # Ids remembered by the open batch, forgotten again if it rolls back
+        self._pending: list[str] = []
+        self.counter = self._next_number()
+
+    def _next_number(self) -> int:
+        row = self.connection.execute(
+            "SELECT next FROM id_counters WHERE name = ?", (self.name,)
+        ).fetchone()
+        return row[0] if row else 1
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "SqliteIdMapper":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        if self._in_batch:
+            yield
+            return
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._in_batch = True
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            for original_id in self._pending:
+                self.reverse_mapping.pop(self.mapping.pop(original_id), None)
+            self.counter = self._next_number()
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._in_batch = False
+            self._pending.clear()
+
+    def local_id(self, guid: str) -> Optional[str]:
+        try:
+            return self.reverse_mapping[guid]
+        except KeyError:
+            pass
+        if not guid.startswith(GUID_PREFIX):
+            return None
+        row = self.connection.execute(
+            "SELECT local_id FROM id_mappings WHERE name = ? AND guid = ?",
+            (self.name, int(guid[len(GUID_PREFIX):])),
+        ).fetchone()
+        if row is None:
+            return None
+        self._remember(row[0], guid)
+        return row[0]
+
+    def _allocate(self, original_ids: list[str]) -> None:
+        with self.batch():
+            # Another session may have mapped some of the ids already
+            for start in range(0, len(original_ids), self.CHUNK):
+                chunk = original_ids[start : start + self.CHUNK]
+                rows = self.connection.execute(
+                    "SELECT local_id, guid FROM id_mappings WHERE name = ? "
+                    f"AND local_id IN ({', '.join('?' * len(chunk))})",
+                    (self.name, *chunk),
+                )
+                for original_id, guid in rows:
+                    self._remember(original_id, GUID_PREFIX + str(guid))
+
+            new_ids = [i for i in original_ids if i not in self.mapping]
+            instrumentation.count("id_mapper.allocated", len(new_ids))
+            if not new_ids:
+                return
+            first = self._next_number()
+            self.connection.executemany(
+                "INSERT INTO id_mappings (name, local_id, guid) VALUES (?, ?, ?)",
+                ((self.name, i, first + n) for n, i in enumerate(new_ids)),
+            )
+            self.connection.execute(
+                "INSERT INTO id_counters (name, next) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET next = excluded.next",
+                (self.name, first + len(new_ids)),
+            )
+            for n, original_id in enumerate(new_ids):
+                self._remember(original_id, GUID_PREFIX + str(first + n))
+            self._pending.extend(new_ids)
+            self.counter = first + len(new_ids)
@@ -1,19 +1,29 @@
-# from tests.sim import SIM
-#
-#
-# class SIMClient:
-#     baseline: SIM
-#
-#     def push_to_sim(self, sim: SIM):
-#         pass
-#
-#     def pull_from_sim(self, sim: SIM):
-#         pass
-#
-#     @staticmethod
-#     def ensure_up_to_date(sim: SIM, baseline: SIM):
-#         # Check if the current SIM version is the same as the baseline.
-#         # If it is newer - pull has to happen first
-#         if sim.version > baseline.version:
-#             raise Exception(
-#                 f"Current SIM version {baseline.version} does not match baseline version {sim.version}. Pull the changes first.")
\ No newline at end of file
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sdm_diff import apply_patch
+from tests.sim import SIM
+
+
+class SIMClient:
+    baseline: cdm.SystemSdmSystemModelVersion = None
+
+    def push_to_sim(self, sim: SIM):
+        pass
+
+    def pull_from_sim(self, sim: SIM):
+        if self.baseline is None:
+            # initial sync - nothing to patch yet
+            self.baseline = sim.snapshot()
+        else:
+            # ECO - transfer and apply only what changed since the baseline
+            self.baseline = apply_patch(
+                self.baseline, sim.changes_since(self.baseline.version)
+            )
+
+    @staticmethod
+    def ensure_up_to_date(sim: SIM, baseline: cdm.SystemSdmSystemModelVersion):
+        # Check if the current SIM version is the same as the baseline.
+        # If it is newer - pull has to happen first
+        if baseline is None or sim.version > baseline.version:
+            raise Exception(
+                f"Current SIM version {sim.version} does not match baseline version "
+                f"{baseline.version if baseline else None}. Pull the changes first.")
@@ -0,0 +1,154 @@
+"""Seeded generator of large ESD documents for scale tests and benchmarks.
+
+:func:`build_esd` builds a ``SystemESDDocument`` through the
+:class:`~tests.clients.esd_client.ESDClient` helpers, as a user of the ESD
+would: functional blocks spread over hardware projects, each with ports and
+key components, connections between ports of nearby blocks (designs are
+mostly local), software components using software library items, and
+fully populated device models (peripherals with instances, modes,
+configurations and pin configurations, and ports with their functions)
+configured on a share of the key components. The same :class:`ScaleModel`
+and seed always give the same document.
+"""
+import random
+from copy import copy
+from typing import NamedTuple
+
+import common_data_model.datamodel.common_data_model as cdm
+from tests.clients.esd_client import ESDClient
+
+PORT_TYPES = [v for v in vars(cdm.SystemPortType).values() if isinstance(v, cdm.SystemPortType)]
+CATEGORIES = [
+    v for v in vars(cdm.SystemSdmSoftwareComponentCategory).values() if isinstance(v, cdm.SystemSdmSoftwareComponentCategory)
+]
+VENDORS = ["Renesas", "NXP", "STMicroelectronics", "Microchip", "Nordic", "Espressif"]
+PERIPHERALS = ["SCI", "SPI", "IIC", "GPT", "ADC", "DAC", "CAN", "USBFS", "ETHERC", "SSIE", "CEU", "GLCDC"]
+
+
+class ScaleModel(NamedTuple):
+    blocks: int = 10
+    ports_per_block: int = 4
+    # Connections per block, and how far (in blocks) a connection reaches
+    connections_per_block: float = 1.5
+    locality: int = 20
+    key_components_per_block: int = 2
+    hardware_projects: int = 1
+    software_projects: int = 1
+    library_items: int = 20
+    software_components_per_block: float = 0.5
+    # Share of the key components with a configured device model, and the
+    # number of distinct device models
+    configured: float = 0.05
+    device_models: int = 10
+    peripherals: int = 8
+    instances: int = 4
+    device_ports: int = 64
+    seed: int = 0
+
+
+def tier(blocks: int, seed: int = 0) -> ScaleModel:
+    """Scale model of a design of ``blocks`` functional blocks, with
+    projects, library items and device models growing with it"""
+    return ScaleModel(
+        blocks=blocks,
+        hardware_projects=max(1, blocks // 500),
+        software_projects=max(1, blocks // 1000),
+        library_items=min(20 + blocks // 10, 2000),
+        device_models=min(max(2, blocks // 100), 200),
+        seed=seed,
+    )
+
+
+def device_model(index: int, model: ScaleModel, rng: random.Random) -> cdm.SystemSdmDeviceModel:
+    """Device model with every peripheral, instance, mode and port populated"""
+    pins = [f"P{i // 16}{i % 16:02d}" for i in range(model.device_ports)]
+    peripherals = []
+    functions: dict[str, list[cdm.DmPortFunction]] = {}
+    for name in rng.sample(PERIPHERALS, min(model.peripherals, len(PERIPHERALS))):
+        instances = []
+        for unit in range(model.instances):
+            instance = f"{name.lower()}{unit}"
+            used = rng.sample(pins, 2)
+            for pin, function in zip(used, ("TX", "RX")):
+                functions.setdefault(pin, []).append(
+                    cdm.DmPortFunction(name=f"{function}_{name}", peripheralInstance=instance)
+                )
+            configuration = cdm.DmPeripheralConfiguration(
+                id=f"{instance}.mode.a",
+                parameters=[
+                    cdm.DmPeripheralParameter(name="fspDriverId", value=f"module.driver.{name.lower()}"),
+                    cdm.DmPeripheralParameter(name="fspConfigId", value=f"{instance}.mode"),
+                ],
+                pinConfigs=[
+                    cdm.DmPeripheralPinConfig(
+                        pinName=f"{instance}.{function.lower()}",
+                        pinValue=f"{instance}.{function.lower()}.{pin.lower()}",
+                        function=function,
+                        portName=pin,
+                    )
+                    for pin, function in zip(used, ("TX", "RX"))
+                ],
+                pinDependencyConfigs=[
+                    cdm.DmPeripheralPinDependencyConfig(name=f"{instance}.pairing", value=f"{instance}.pairing.a")
+                ],
+            )
+            instances.append(
+                cdm.DmPeripheralInstance(
+                    id=instance,
+                    name=instance.upper(),
+                    unit=str(unit),
+                    modes=[cdm.DmPeripheralMode(name="Default", configurations=[configuration])],
+                )
+            )
+        peripherals.append(cdm.DmPeripheral(id=name.lower(), name=f"Connectivity:{name}", instances=instances))
+    ports = [
+        cdm.DmPort(id=pin.lower(), name=pin, pin=str(i + 1), functions=functions.get(pin, []))
+        for i, pin in enumerate(pins)
+    ]
+    return cdm.SystemSdmDeviceModel(
+        id=f"device-{index + 1}", mpn=f"R7FA{index:04d}", peripherals=peripherals, ports=ports
+    )
+
+
+def build_esd(model: ScaleModel) -> ESDClient:
+    rng = random.Random(model.seed)
+    esd = ESDClient()
+    hw_projects = [esd.add_hardware_project(implemented_by=f"hw-{i}") for i in range(model.hardware_projects)]
+    sw_projects = [esd.add_software_project(implemented_by=f"sw-{i}") for i in range(model.software_projects)]
+    library = [
+        esd.add_sw_library_item(
+            name=f"Library {i}",
+            vendor=rng.choice(VENDORS),
+            ecosystem="FSP",
+            package_name=f"module.library_{i}",
+            category=rng.choice(CATEGORIES),
+        )
+        for i in range(model.library_items)
+    ]
+    devices = [device_model(i, model, rng) for i in range(model.device_models)]
+
+    blocks, ports, key_components = [], [], []
+    for i in range(model.blocks):
+        block = esd.add_functional_block(title=f"Block {i}", hw_project=hw_projects[i % len(hw_projects)])
+        blocks.append(block)
+        ports.append([esd.add_port(block, rng.choice(PORT_TYPES)) for _ in range(model.ports_per_block)])
+        components = [
+            esd.add_hardware_component(block, f"MPN-{rng.randrange(10 * model.blocks)}")
+            for _ in range(model.key_components_per_block)
+        ]
+        key_components.extend(components)
+        if rng.random() < model.software_components_per_block:
+            esd.add_software_component(block, components[0], rng.choice(library), sw_projects[i % len(sw_projects)])
+
+    for _ in range(int(model.blocks * model.connections_per_block)):
+        source = rng.randrange(model.blocks)
+        target = min(max(source + rng.randint(-model.locality, model.locality), 0), model.blocks - 1)
+        if target == source or not ports[source]:
+            continue
+        esd.add_connection(blocks[source], rng.choice(ports[source]), blocks[target], rng.choice(ports[target]))
+
+    for i, component in enumerate(rng.sample(key_components, int(len(key_components) * model.configured))):
+        device = copy(rng.choice(devices))
+        device.id = f"{device.id}.{i}"
+        esd.configure_device(component, device)
+    return esd
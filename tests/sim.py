@@ -1,53 +1,86 @@
-# import copy
-# from pathlib import Path
-# from linkml_runtime.loaders import json_loader
-# from linkml_runtime.dumpers import json_dumper
-# import common_data_model.datamodel.common_data_model as cdm
-#
-# def load_sim(filepath: str) -> cdm.SystemSim:
-#     return json_loader.load(filepath, target_class=cdm.SystemSim)
-#
-# class SIM:
-#     _model: cdm.SystemSystemModel
-#     version: int
-#
-#     #region Fabric / ctors
-#
-#     @staticmethod
-#     def empty():
-#         return SIM(model=cdm.SystemSim(id="unique_sim_id"))
-#
-#     @staticmethod
-#     def from_json(filepath: Path):
-#         return SIM(model=load_sim(str(filepath)))
-#
-#     def __init__(self, model: cdm.SystemSim = None):
-#         self._model = model
-#         self.version = 0
-#
-#     #endregion
-#
-#     def __repr__(self):
-#         return json_dumper.dumps(self._model)
-#
-#     #region Update methods
-#
-#     def update_functional_model(self, functional_model: cdm.SystemESDDocument):
-#         self.version += 1
-#         self._model.functionalModel = copy.deepcopy(functional_model)
-#
-#     def update_software_model(self, software_model: cdm.SftSoftwareBom):
-#         self.version += 1
-#         self._model.softwareModels.append(copy.deepcopy(software_model))
-#
-#     def update_device_model(self, device_model: cdm.DmConfiguredDeviceModel):
-#         self.version += 1
-#         self._model.deviceModels.append(copy.deepcopy(device_model))
-#
-#     #endregion
-#
-#     def snapshot(self):
-#         return copy.deepcopy(self)
-#
-#     def dump(self):
-#         print(repr(self))
\ No newline at end of file
+from pathlib import Path
+from linkml_runtime.loaders import json_loader
+from linkml_runtime.dumpers import json_dumper
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sdm_diff import SdmPatch, apply_patch, diff_sdm
+from common_data_model.version_store import SdmVersionStore
+
+
+def load_sim(filepath: str) -> cdm.SystemSdmSystemModelVersion:
+    return json_loader.load(filepath, target_class=cdm.SystemSdmSystemModelVersion)
+
+
+class SIM:
+    _store: SdmVersionStore
+
+    #region Fabric / ctors
+
+    @staticmethod
+    def empty():
+        return SIM(
+            model=cdm.SystemSdmSystemModelVersion(
+                id="unique_sim_id",
+                version=0,
+                functionalModel=cdm.SystemSdmFunctionalModel(id="unique_fm_id"),
+            )
+        )
+
+    @staticmethod
+    def from_json(filepath: Path):
+        return SIM(model=load_sim(str(filepath)))
+
+    def __init__(self, model: cdm.SystemSdmSystemModelVersion = None):
+        if model is None:
+            model = cdm.SystemSdmSystemModelVersion(id="sim", version=0)
+        self._store = SdmVersionStore(model)
+
+    #endregion
+
+    @property
+    def version(self) -> int:
+        return self._store.version
+
+    @property
+    def model(self) -> cdm.SystemSdmSystemModelVersion:
+        return self._store.snapshot()
+
+    def __repr__(self):
+        return json_dumper.dumps(self.model)
+
+    #region Update methods
+    # The SIM takes ownership of the passed entities: versions share them
+    # instead of deep-copying, so callers must not mutate them afterwards.
+
+    def update_functional_model(self, functional_model: cdm.SystemSdmFunctionalModel):
+        with self._store.edit() as v:
+            v.set("functionalModel", functional_model)
+
+    def update_software_model(self, software_model: cdm.SystemSdmSoftwareModel):
+        with self._store.edit() as v:
+            v.put("softwareModels", software_model)
+
+    def update_device_model(self, device_model: cdm.SystemSdmDeviceModel):
+        with self._store.edit() as v:
+            v.put("deviceModels", device_model)
+
+    def apply_patch(self, patch: SdmPatch):
+        """Apply a client ECO to the latest version"""
+        self._store.commit(apply_patch(self._store.snapshot(), patch))
+
+    #endregion
+
+    def changes_since(self, version: int) -> SdmPatch:
+        """ECO bringing a client at ``version`` up to the latest version"""
+        patch = diff_sdm(self._store[version], self._store.snapshot())
+        patch.target_version = self.version
+        return patch
+
+    def snapshot(self) -> cdm.SystemSdmSystemModelVersion:
+        """O(1) immutable view of the current version"""
+        return self._store.snapshot()
+
+    def checkout(self, version: int) -> cdm.SystemSdmSystemModelVersion:
+        return self._store[version]
+
+    def dump(self):
+        print(repr(self))
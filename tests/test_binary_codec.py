@@ -0,0 +1,40 @@
+import io
+
+import pytest
+from linkml_runtime.dumpers import json_dumper
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import binary_codec
+from tests.test_json_stream import make_sdm
+
+
+def test_round_trip_preserves_json_form():
+    sdm = make_sdm()
+    sdm.name = "Ünïcode ✓"
+    data = binary_codec.dumps(sdm)
+    loaded = binary_codec.loads(data)
+    assert loaded == sdm
+    assert json_dumper.dumps(loaded, inject_type=False) == json_dumper.dumps(sdm, inject_type=False)
+    # Repeated strings are written once
+    assert data.count(b"local-id") <= 1
+    assert len(data) * 3 < len(json_dumper.dumps(sdm, inject_type=False))
+
+
+def test_versions_follow_each_other_on_a_stream():
+    first = make_sdm()
+    second = cdm.SystemSdmSystemModelVersion(id="guid-empty", version=2)
+    stream = io.BytesIO()
+    binary_codec.dump(first, stream)
+    binary_codec.dump(second, stream)
+    stream.seek(0)
+
+    entities = list(binary_codec.iter_entities(stream, ["deviceModels"]))
+    assert entities == [("deviceModels", e) for e in first.deviceModels]
+    assert binary_codec.load(stream) == second
+    with pytest.raises(EOFError):
+        binary_codec.load(stream)
+
+
+def test_rejects_other_data():
+    with pytest.raises(ValueError):
+        binary_codec.loads(b'{"id": "guid-1", "version": 1}')
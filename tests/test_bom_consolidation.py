@@ -0,0 +1,91 @@
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.bom_consolidation import BomConsolidator, normalize_manufacturer
+
+
+def element(cls, mpn: str, manufacturer: str = None, part: str = None):
+    return cls(BomItemElement_mpn=mpn, BomItemElement_manufacturer=manufacturer, BomItemElement_part=part)
+
+
+def make_boms() -> tuple[cdm.ProManagedBOM, dict]:
+    board = cdm.ProManagedBOM(
+        id="board",
+        items=[
+            cdm.ProBomItem(
+                quantity=2,
+                designators=["R1", "R2"],
+                primaryElement=element(cdm.ProBomItemElement, "RC0603FR-0710KL", "Yageo"),
+                alternates=[element(cdm.ProBomItemAlternate, "CRCW060310K0FKEA", "Vishay")],
+            ),
+            cdm.ProBomItem(
+                quantity=1,
+                designators=["U1"],
+                primaryElement=element(cdm.ProBomItemElement, "LM317T", "Texas Instruments Inc.", "lib-1"),
+                substitutes=[element(cdm.ProBomItemSubstitute, "LM317T", "ON Semiconductor")],
+            ),
+            cdm.ProBomItem(quantity=1, designators=["J1"]),
+        ],
+    )
+    # JSON form, with other spellings of the same parts
+    variant = {
+        "id": "variant",
+        "items": [
+            {
+                "quantity": 3,
+                "designators": ["R5", "R6"],
+                "primaryElement": {"BomItemElement_mpn": "rc0603fr-0710kl ", "BomItemElement_manufacturer": "YAGEO"},
+            },
+            {
+                "quantity": 4,
+                "primaryElement": {"BomItemElement_mpn": "CRCW0603 10K0FKEA", "BomItemElement_manufacturer": "Vishay"},
+            },
+            {
+                "quantity": 1,
+                "primaryElement": {
+                    "BomItemElement_mpn": "LM317T",
+                    "BomItemElement_manufacturer": "TI",
+                    "BomItemElement_part": "lib-2",
+                },
+            },
+            {"quantity": 1, "primaryElement": {"BomItemElement_mpn": "LM317T"}},
+        ],
+    }
+    return board, variant
+
+
+def test_normalizes_manufacturers():
+    assert normalize_manufacturer("Texas Instruments, Inc.") == "texas instruments"
+    assert normalize_manufacturer("Würth Elektronik GmbH & Co. KG") == "würth elektronik"
+    assert normalize_manufacturer("Co.") == "co"
+
+
+def test_consolidates_quantities_and_groups():
+    board, variant = make_boms()
+    consolidator = BomConsolidator({"TI": "Texas Instruments"})
+    consolidator.add(board, 10)
+    consolidator.add(variant, 5)
+    assert consolidator.lines == 6
+    bom = consolidator.consolidate("buy-list")
+
+    items = {(i.primaryElement.BomItemElement_mpn, i.primaryElement.BomItemElement_manufacturer): i for i in bom.items}
+    assert {key: i.quantity for key, i in items.items()} == {
+        ("CRCW060310K0FKEA", "Vishay"): 20,
+        ("LM317T", "Texas Instruments Inc."): 15,
+        ("LM317T", None): 5,
+        ("RC0603FR-0710KL", "Yageo"): 35,
+    }
+    resistor = items["RC0603FR-0710KL", "Yageo"]
+    assert [a.BomItemElement_mpn for a in resistor.alternates] == ["CRCW060310K0FKEA"]
+    assert [a.BomItemElement_mpn for a in items["CRCW060310K0FKEA", "Vishay"].alternates] == ["RC0603FR-0710KL"]
+    regulator = items["LM317T", "Texas Instruments Inc."]
+    assert [s.BomItemElement_manufacturer for s in regulator.substitutes] == ["ON Semiconductor"]
+    assert regulator.primaryElement.BomItemElement_part == "lib-1"
+
+    assert [i.BomIssue_severity for i in regulator.issues] == ["Error"]
+    assert "lib-1 and lib-2" in regulator.issues[0].BomIssue_description
+    assert [i.BomIssue_description for i in resistor.issues] == [
+        "Item R5, R6 of variant has 2 designators for a quantity of 3"
+    ]
+    assert [i.BomIssue_description for i in items["LM317T", None].issues] == [
+        "LM317T is listed without manufacturer and under Texas Instruments Inc., ON Semiconductor"
+    ]
+    assert [i.BomIssue_description for i in bom.issues] == ["Item J1 of board has no MPN"]
@@ -0,0 +1,71 @@
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import connectivity
+from common_data_model.connectivity import ConnectivityGraph
+from tests.clients.esd_client import ESDClient
+from tests.test_flows import build_basic_flow
+from tests.test_json_stream import make_sdm
+
+
+def chain(esd: ESDClient, count: int):
+    blocks = [esd.add_functional_block(title=f"B{i}", hw_project=None) for i in range(count)]
+    ports = [esd.add_port(block, cdm.SystemPortType.UART) for block in blocks]
+    return blocks, ports
+
+
+def test_sdm_functional_model_graph():
+    sdm = make_sdm()
+    graph = ConnectivityGraph.from_model(sdm.functionalModel)
+    mcu, wifi = sdm.functionalModel.functionalBlocks
+    # Both blocks have a port "guid-4"; ports are keyed by block
+    assert graph.neighbours(mcu.id, "guid-4") == [(wifi.id, "guid-4")]
+    assert graph.neighbours(wifi.id) == [mcu.id]
+    assert graph.port_usage(mcu.id, "guid-4") == 1
+    assert graph.connections_at(wifi.id, "guid-4") == ["guid-8"]
+    assert graph.nets() == [[(mcu.id, "guid-4"), (wifi.id, "guid-4")]]
+    assert graph.path(mcu.id, wifi.id) == [mcu.id, wifi.id]
+
+
+def test_components_nets_and_paths():
+    esd = ESDClient()
+    blocks, ports = chain(esd, 5)
+    extra = esd.add_port(blocks[1], cdm.SystemPortType.SPI)
+    esd.add_connection(blocks[0], ports[0], blocks[1], ports[1])
+    esd.add_connection(blocks[1], extra, blocks[2], ports[2])
+    esd.add_connection(blocks[2], ports[2], blocks[3], ports[3])
+    graph = ConnectivityGraph.from_model(esd.model)
+    ids = [block.id for block in blocks]
+
+    assert graph.path(ids[0], ids[3]) == ids[:4]
+    assert graph.path(ids[0], ids[4]) is None
+    assert graph.path(ids[0], "no-such-block") is None
+    assert sorted(map(sorted, graph.components())) == [ids[:4], [ids[4]]]
+    # Ports of one block are not connected through the block
+    assert sorted(map(sorted, graph.nets())) == [
+        [(ids[0], ports[0].id), (ids[1], ports[1].id)],
+        [(ids[1], extra.id), (ids[2], ports[2].id), (ids[3], ports[3].id)],
+    ]
+    assert graph.net(ids[3], ports[3].id) == graph.nets()[1]
+    assert graph.port_usage(ids[2], ports[2].id) == 2
+    assert graph.neighbours(ids[1]) == [ids[0], ids[2]]
+
+
+def test_esd_client_updates_the_graph_incrementally(monkeypatch):
+    monkeypatch.setattr(connectivity, "COMPACT_MIN", 4)
+    esd = ESDClient()
+    build_basic_flow(esd)
+    graph = esd.connectivity
+    blocks, ports = chain(esd, 20)
+    mcu = esd.model.functionalBlocks[0]
+    for i in range(19):
+        esd.add_connection(blocks[i], ports[i], blocks[i + 1], ports[i + 1])
+    esd.add_connection(mcu, mcu.ports[0], blocks[0], ports[0])
+
+    assert esd.connectivity is graph
+    rebuilt = ConnectivityGraph.from_model(esd.model)
+    ids = [block.id for block in esd.model.functionalBlocks]
+    for block_id in ids:
+        assert graph.neighbours(block_id) == rebuilt.neighbours(block_id)
+    assert graph.path(ids[1], ids[-1]) == rebuilt.path(ids[1], ids[-1])
+    assert graph.path(ids[1], ids[-1]) == [ids[1], ids[0], *ids[2:]]
+    assert graph.components() == rebuilt.components()
+    assert graph.nets() == rebuilt.nets()
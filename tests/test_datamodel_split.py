@@ -0,0 +1,36 @@
+import json
+import subprocess
+import sys
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.datamodel_split import split_datamodel
+
+CHECK = """
+import json, sys
+import dm.system
+loaded = sorted(m for m in sys.modules if m.startswith("dm."))
+from dm import SystemSdmFunctionalBlock, DmPeripheral, slots
+import dm.common_data_model as cdm
+assert SystemSdmFunctionalBlock is dm.system.SystemSdmFunctionalBlock is cdm.SystemSdmFunctionalBlock
+block = cdm.SystemSdmFunctionalBlock(id="fb-1", ports=[{"id": "p-1", "quantity": 1}])
+assert isinstance(block.ports[0], cdm.SystemSdmPort)
+print(json.dumps({"loaded": loaded, "names": sorted(vars(cdm)), "slots": sorted(vars(slots))}))
+"""
+
+
+def test_subsets_load_independently(tmp_path):
+    package = tmp_path / "dm"
+    package.mkdir()
+    for module, source in split_datamodel().items():
+        (package / f"{module}.py").write_text(source)
+
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK], cwd=tmp_path, capture_output=True, text=True, check=True
+    )
+    found = json.loads(result.stdout)
+    assert found["loaded"] == ["dm._base", "dm.core", "dm.device_model", "dm.system"]
+    # The facade has the names of the monolithic module
+    assert set(found["names"]) - {"__builtins__", "__cached__", "__file__", "__spec__"} >= {
+        n for n in vars(cdm) if not n.startswith("__")
+    }
+    assert set(found["slots"]) == set(vars(cdm.slots))
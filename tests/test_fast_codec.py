@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import pytest
+from linkml_runtime.dumpers import json_dumper
+from linkml_runtime.loaders import json_loader
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+
+DATA = Path(__file__).parent / "data" / "esd_basic_flow.json"
+
+
+def test_round_trip_matches_linkml():
+    text = DATA.read_text()
+    expected = json_loader.loads(text, target_class=cdm.SystemSdmSystemModelVersion)
+
+    loaded = fast_codec.loads(text, cdm.SystemSdmSystemModelVersion)
+    assert loaded == expected
+    assert list(loaded.__dict__) == list(expected.__dict__)
+    assert isinstance(loaded.functionalModel.functionalBlocks[0].id, cdm.SystemSdmFunctionalBlockId)
+    assert fast_codec.dumps(loaded) == json_dumper.dumps(expected, inject_type=False)
+
+
+def test_enums_and_empty_values():
+    model = cdm.SystemSdmSoftwareModel(
+        id="sbom-1",
+        softwareComponents=[
+            cdm.SystemSdmSoftwareComponent(
+                id="drv-1", name="", specification=cdm.SystemSdmSoftwareSpecification(category="DRIVER")
+            ),
+            cdm.SystemSdmSoftwareComponent(
+                id="rtos-1",
+                specification=cdm.SystemSdmSoftwareSpecification(
+                    category=cdm.SystemSdmSoftwareComponentCategory.OPERATING_SYSTEM, vendor="acme"
+                ),
+            ),
+        ],
+    )
+    expected = json_dumper.dumps(model, inject_type=False)
+    assert fast_codec.dumps(model) == expected
+    assert fast_codec.to_dict(model) == json.loads(expected)
+    assert fast_codec.loads(expected, cdm.SystemSdmSoftwareModel) == model
+
+
+def test_other_input_shapes_use_the_constructor():
+    # Inlined lists may also be given as dictionaries keyed by id
+    data = {"id": "fb-1", "ports": {"port-1": {"quantity": 1}}}
+    assert fast_codec.from_dict(cdm.SystemSdmFunctionalBlock, data) == cdm.SystemSdmFunctionalBlock(**data)
+
+
+def test_missing_codec_module(monkeypatch):
+    monkeypatch.setattr(fast_codec, "_codec", None)
+    monkeypatch.setattr(fast_codec, "CODEC_MODULE", "common_data_model.datamodel.no_such_codec")
+    with pytest.raises(ImportError, match="make gen-codec"):
+        fast_codec.codec()
@@ -0,0 +1,110 @@
+import io
+import json
+
+import pytest
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.fleet_store import FleetStore
+
+
+def make_store() -> FleetStore:
+    store = FleetStore()
+    store.add_package(cdm.OtaPackage(id="pkg-1", name="Firmware", version="1.0"))
+    store.add_package({"id": "pkg-2", "version": "2.0"})
+    store.add_device(cdm.OtaDevice(id="dev-1", status="UpToDate", fleets=["fleet-a"], packages=["pkg-2"]))
+    store.add_device({"id": "dev-2", "status": "Outdated", "fleets": ["fleet-a", "fleet-b"], "packages": ["pkg-1"]})
+    store.add_device({"id": "dev-3", "name": "Spare"})
+    store.add_fleet(cdm.OtaFleet(id="fleet-b", name="Beta", devices=["dev-3"]))
+    return store
+
+
+def test_maintains_rollups():
+    store = make_store()
+    assert len(store) == 3
+    assert store.status_counts() == {"UpToDate": 1, "Outdated": 1, None: 1}
+    assert store.status_counts("fleet-b") == {"Outdated": 1, None: 1}
+    assert store.count("fleet-a") == 2
+    assert store.count("fleet-a", "Outdated") == 1
+    assert store.count(version="2.0") == 1
+    assert store.package_counts("fleet-a") == {"pkg-1": 1, "pkg-2": 1}
+    assert store.devices("fleet-b", None) == ["dev-3"]
+
+
+def test_ingests_status_lines():
+    store = make_store()
+    lines = [
+        {"id": "dev-2", "status": "UpdatePending", "packages": ["pkg-2"]},
+        {"id": "dev-3", "fleets": ["fleet-a"]},
+        {"id": "dev-4", "status": "NotSeen", "fleets": ["fleet-b"]},
+        {"id": "dev-1", "status": "Error"},
+    ]
+    source = io.StringIO("".join(json.dumps(line) + "\n" for line in lines))
+    assert store.ingest(source) == 4
+    assert store.status_counts() == {"NotSeen": 1, "Error": 1, "UpdatePending": 1, None: 1}
+    assert store.status_counts("fleet-a") == {"Error": 1, "UpdatePending": 1, None: 1}
+    assert store.count("fleet-b") == 2
+    assert store.count(version="2.0") == 2 and store.count(version="1.0") == 0
+    assert store.package_counts(status="Error") == {"pkg-2": 1}
+
+    # The rollups agree with counting the exported devices
+    devices = list(store.export_devices())
+    assert sum(1 for d in devices if "fleet-a" in d.fleets) == store.count("fleet-a")
+    assert store.device("dev-2") == cdm.OtaDevice(
+        id="dev-2", status="UpdatePending", fleets=["fleet-a", "fleet-b"], packages=["pkg-2"]
+    )
+    assert store.device("dev-3").name == "Spare"
+    assert store.fleet("fleet-b") == cdm.OtaFleet(id="fleet-b", name="Beta", devices=["dev-2", "dev-4"])
+    assert store.package("pkg-1") == cdm.OtaPackage(id="pkg-1", name="Firmware", version="1.0")
+
+
+def test_skips_invalid_records():
+    store = make_store()
+    lines = [
+        '{"id": "dev-1", "status": "Bricked", "fleets": ["fleet-c"]}',
+        '{"status": "Error"}',
+        '{"id": "dev-2", "status": "Error"}',
+    ]
+    assert store.ingest(lines) == 1
+    assert store.rejected == ["dev-1", None]
+    assert store.count("fleet-a") == 2 and store.count("fleet-a", "UpToDate") == 1
+    assert store.devices("fleet-a", "UpToDate") == ["dev-1"]
+    assert store.status_counts() == {"UpToDate": 1, "Error": 1, None: 1}
+    with pytest.raises(ValueError):
+        store.update({"id": "dev-5", "status": "Bricked"})
+    assert len(store) == 3
+
+
+def test_skips_lines_that_are_not_one_object():
+    store = FleetStore()
+    lines = [
+        '{"id": "dev-1", "status": "Error"}',
+        "{bad",
+        '{"id": "dev-2"}, {"id": "dev-3"}',
+        "5",
+        '["dev-4"]',
+        "",
+        '{"id": "dev-5", "status": "NotSeen"}',
+    ]
+    assert store.ingest(lines) == 2
+    assert store.status_counts() == {"Error": 1, "NotSeen": 1}
+    assert [(e.line, e.reason) for e in store.errors] == [
+        (2, "Expecting property name enclosed in double quotes at column 2"),
+        (3, "Extra data at column 16"),
+    ]
+    assert store.rejected == [None, None]
+
+
+def test_counts_devices_once_per_version():
+    store = make_store()
+    store.add_package({"id": "pkg-3", "name": "Bootloader"})
+    store.update({"id": "dev-1", "packages": ["pkg-2", "pkg-3"]})
+    assert store.count("fleet-a", version="2.0") == 1
+
+    # A package given a version later moves its devices to that version
+    store.add_package({"id": "pkg-3", "version": "2.0"})
+    assert store.count("fleet-a", version="2.0") == 1
+    assert store.count(status="UpToDate", version="2.0") == 1
+    store.add_package({"id": "pkg-2", "version": "2.1"})
+    assert store.count(version="2.0") == store.count(version="2.1") == 1
+    assert store.count("fleet-b", version="1.0") == 1 and store.count(version="3.0") == 0
+    assert store.package("pkg-3").version == "2.0"
@@ -13,8 +13,7 @@ def assert_sdm_matches_expected(sdm, expected_filepath: str):
         expected_json = f.read()
     assert sdm_json == expected_json
 
-def test_esd_basic_flow():
-    esd = ESDClient()
+def build_basic_flow(esd: ESDClient):
 
     hw_project = esd.add_hardware_project()
     sw_project = esd.add_software_project()
@@ -24,7 +23,7 @@ def test_esd_basic_flow():
         vendor="Renesas",
         ecosystem="FSP",
         package_name="module.driver.wifi_da16xxx",
-        category=cdm.SystemSmSoftwareComponentCategory.DRIVER,
+        category=cdm.SystemSdmSoftwareComponentCategory.DRIVER,
     )
 
     mcu = esd.add_functional_block(title="MCU", hw_project=hw_project)
@@ -42,7 +41,7 @@ def test_esd_basic_flow():
 
     esd.configure_device(
         hw_component=mcu_hw_comp,
-        device=cdm.SystemSmDeviceModel(
+        device=cdm.SystemSdmDeviceModel(
             id="device-1",
             mpn="R7FA6M3AH3CFB",
             peripherals=[
@@ -115,5 +114,51 @@ def test_esd_basic_flow():
         ),
     )
 
+    return mcu, mcu_hw_comp, hw_project, sw_project
+
+
+def test_esd_basic_flow():
+    esd = ESDClient()
+    build_basic_flow(esd)
+
     sdm = esd.compile_sdm()
     assert_sdm_matches_expected(sdm, "data/esd_basic_flow.json")
+
+
+def edit_basic_flow(esd: ESDClient, mcu, mcu_hw_comp, hw_project, sw_project):
+    sensor = esd.add_functional_block(title="Sensor", hw_project=hw_project)
+    sensor_i2c = esd.add_port(sensor, cdm.SystemPortType.I2C)
+    mcu_i2c = esd.add_port(mcu, cdm.SystemPortType.I2C)
+    esd.add_connection(mcu, mcu_i2c, sensor, sensor_i2c)
+    sensor_hw_comp = esd.add_hardware_component(sensor, "HS3001")
+    esd.add_software_component(sensor, sensor_hw_comp, "HS300x", sw_project)
+    esd.configure_device(
+        hw_component=mcu_hw_comp,
+        device=cdm.SystemSdmDeviceModel(id="device-2", mpn="R7FA6M3AH3CFB"),
+    )
+
+
+def test_esd_incremental_compile():
+    incremental, full = ESDClient(), ESDClient()
+    incremental_handles = build_basic_flow(incremental)
+    full_handles = build_basic_flow(full)
+
+    first = incremental.compile_sdm()
+    assert json_dumper.dumps(first, inject_type=False) == json_dumper.dumps(
+        full.compile_sdm(incremental=False), inject_type=False
+    )
+
+    edit_basic_flow(incremental, *incremental_handles)
+    edit_basic_flow(full, *full_handles)
+
+    second = incremental.compile_sdm()
+    assert json_dumper.dumps(second, inject_type=False) == json_dumper.dumps(
+        full.compile_sdm(incremental=False), inject_type=False
+    )
+
+    # Untouched entities are reused, edited ones are recompiled
+    wifi_block = first.functionalModel.functionalBlocks[1]
+    assert second.functionalModel.functionalBlocks[1] is wifi_block
+    assert second.functionalModel.connections[0] is first.functionalModel.connections[0]
+    assert second.functionalModel.functionalBlocks[0] is not first.functionalModel.functionalBlocks[0]
+    assert second.hardwareModels[0] is not first.hardwareModels[0]
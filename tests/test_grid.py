@@ -0,0 +1,48 @@
+import pytest
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.grid import GridRegistry, GridTemplate, registry, schema_templates
+
+
+def test_round_trips_every_annotated_class():
+    templates = schema_templates()
+    assert templates["system_ESDDocument"] == "grid:workspace:{workspace-id}:system-design:esd/{id}"
+    classes = {getattr(cls, "class_name", None) for cls in vars(cdm).values()}
+    grids = registry()
+    for name, text in templates.items():
+        assert name in classes
+        template = grids[name]
+        values = {field: f"{field}-{i}" for i, field in enumerate(template.fields)}
+        grid = template.format(**values)
+        assert template.parse(grid) == values
+        parsed = grids.parse(grid)
+        assert parsed.template is template and name in parsed.template.classes and parsed.values == values
+        assert template.parse_many([grid, grid]) == {field: [value] * 2 for field, value in values.items()}
+    assert grids.parse("grid:workspace:ws:library:unknown/x") is None
+    assert grids.parse("grid:supply::platform:part/a:b") is None
+
+
+def test_formats_objects_and_columns():
+    grids = registry()
+    part = cdm.SupPart(id="P1", Part_mpn="LM317T", Part_manufacturer="sup-ti")
+    assert grids.format(part) == "grid:supply::platform:part/P1"
+    assert grids.format(cdm.SupOffer(id="O1"), id="P1", offerID="O1") == "grid:supply::platform:part/P1/offer/O1"
+    assert grids["pro_ConsolidatedBOM"] is grids["pro_ManagedBOM"]
+    esd = grids[cdm.SystemESDDocument]
+    assert esd.format_many(workspace_id="ws%1", id=["a", "b"]) == [
+        "grid:workspace:ws%1:system-design:esd/a",
+        "grid:workspace:ws%1:system-design:esd/b",
+    ]
+    assert grids.format_many("sup_offer", id=["p1", "p2"], offerID=["o1", "o2"])[1] == "grid:supply::platform:part/p2/offer/o2"
+    with pytest.raises(KeyError):
+        esd.format(id="a")
+    with pytest.raises(ValueError):
+        esd.parse_many(["grid:supply::platform:part/P1"])
+
+
+def test_dispatch_tries_fields_after_literal_segments():
+    grids = GridRegistry({"a": "grid:{scope}:x/{id}", "b": "grid:global:y/{id}"})
+    assert grids.parse("grid:global:x/1") == (grids["a"], {"scope": "global", "id": "1"})
+    assert grids.parse("grid:global:y/1") == (grids["b"], {"id": "1"})
+    with pytest.raises(ValueError):
+        GridTemplate("grid:part-{id}")
@@ -0,0 +1,65 @@
+import pytest
+
+from common_data_model import instrumentation
+from tests.clients.esd_client import ESDClient
+from tests.clients.id_mapper import IdMapper, SqliteIdMapper
+from tests.test_flows import assert_sdm_matches_expected, build_basic_flow
+
+
+def test_map_ids_and_reverse_lookup():
+    mapper = IdMapper(name="esd")
+
+    assert mapper.map_ids(["fb-1", "fb-2", "fb-1"]) == ["guid-1", "guid-2", "guid-1"]
+    assert mapper.map_id("fb-3") == "guid-3"
+    assert mapper.local_id("guid-2") == "fb-2"
+    assert mapper.local_id("guid-4") is None
+    assert mapper.metadata("fb-1") is mapper.metadata("fb-1")
+
+    # Hits and misses count every id looked up, GUIDs are allocated once
+    totals = instrumentation.CounterSink()
+    with instrumentation.recording(sinks=[totals]):
+        mapper.map_ids(["fb-4", "fb-1", "fb-4"])
+    assert totals.counters == {"id_mapper.hit": 1, "id_mapper.miss": 2, "id_mapper.allocated": 1}
+
+
+def test_sqlite_mapping_survives_restart(tmp_path):
+    path = str(tmp_path / "ids.sqlite")
+    with SqliteIdMapper(name="esd", path=path) as mapper:
+        assert mapper.map_ids(["fb-1", "fb-2"]) == ["guid-1", "guid-2"]
+        with mapper.batch():
+            assert mapper.map_id("fb-3") == "guid-3"
+
+    with SqliteIdMapper(name="esd", path=path) as mapper, SqliteIdMapper(
+        name="e2", path=path
+    ) as other:
+        assert mapper.local_id("guid-3") == "fb-3"
+        assert mapper.map_ids(["fb-4", "fb-2"]) == ["guid-4", "guid-2"]
+        # Mappings are kept per client
+        assert other.map_id("fb-1") == "guid-1"
+        assert other.local_id("guid-4") is None
+
+
+def test_sqlite_batch_rolls_back(tmp_path):
+    with SqliteIdMapper(name="esd", path=str(tmp_path / "ids.sqlite")) as mapper:
+        mapper.map_id("fb-1")
+        with pytest.raises(RuntimeError):
+            with mapper.batch():
+                mapper.map_id("fb-2")
+                raise RuntimeError()
+        assert mapper.local_id("guid-2") is None
+        assert mapper.map_id("fb-3") == "guid-2"
+
+
+def test_compile_with_sqlite_mapper(tmp_path):
+    path = str(tmp_path / "ids.sqlite")
+    with SqliteIdMapper(name="esd", path=path) as mapper:
+        esd = ESDClient(id_mapper=mapper)
+        build_basic_flow(esd)
+        assert_sdm_matches_expected(esd.compile_sdm(), "data/esd_basic_flow.json")
+
+    # A new session compiling the same design gets the same GUIDs
+    with SqliteIdMapper(name="esd", path=path) as mapper:
+        esd = ESDClient(id_mapper=mapper)
+        build_basic_flow(esd)
+        assert_sdm_matches_expected(esd.compile_sdm(), "data/esd_basic_flow.json")
+        assert mapper.counter == 13
@@ -0,0 +1,55 @@
+import io
+import json
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec, instrumentation
+from tests.scale_model import ScaleModel, build_esd
+
+
+def test_compile_stages_and_counters(tmp_path):
+    esd = build_esd(ScaleModel(blocks=20, configured=0.25, device_models=2))
+    totals = instrumentation.CounterSink()
+    log = io.StringIO()
+    prometheus = instrumentation.PrometheusSink(tmp_path / "cdm.prom")
+    with instrumentation.recording(sinks=[totals, instrumentation.JsonLinesSink(log), prometheus]) as recorder:
+        sdm = esd.compile_sdm(incremental=False)
+        fast_codec.dumps(sdm)
+        recorder.flush()
+        esd.add_port(esd.model.functionalBlocks[0], cdm.SystemPortType.GPIO)
+        esd.compile_sdm()
+
+    assert instrumentation.active is None
+    assert totals.stages["compile"].calls == 2
+    assert totals.stages["compile"].seconds >= totals.stages["compile.functional_blocks"].seconds
+    assert {"compile.copy", "compile.device_models", "serialize.to_dict", "serialize.encode"} <= set(totals.stages)
+    assert totals.counters["compile.entities.functional_blocks"] == 40
+    assert totals.counters["compile.entities.device_models"] == len(sdm.deviceModels) * 2
+
+    # One flush per compile: all GUIDs are allocated by the first one
+    first, second = [json.loads(line) for line in log.getvalue().splitlines()]
+    assert first["counters"]["id_mapper.miss"] == first["counters"]["id_mapper.allocated"] > 0
+    assert "id_mapper.miss" not in second["counters"] or second["counters"]["id_mapper.miss"] == 1
+    assert second["counters"]["id_mapper.hit"] > 0
+    assert second["counters"]["compile.recompiled"] < first["counters"]["compile.recompiled"]
+
+    text = (tmp_path / "cdm.prom").read_text()
+    assert '# TYPE cdm_stage_seconds_total counter' in text
+    assert 'cdm_stage_calls_total{stage="compile"} 2' in text
+    assert 'cdm_events_total{event="compile.entities.functional_blocks"} 40' in text
+
+
+def test_disabled_and_allocations():
+    assert instrumentation.stage("a") is instrumentation.stage("b")
+    instrumentation.count("ignored")
+
+    totals = instrumentation.CounterSink()
+    with instrumentation.recording(sinks=[totals], allocations=True):
+        with instrumentation.stage("outer"):
+            kept = bytearray(1 << 20)
+            with instrumentation.stage("inner"):
+                bytearray(4 << 20)
+    outer, inner = totals.stages["outer"], totals.stages["inner"]
+    assert inner.peak >= 4 << 20 and inner.allocated < 1 << 16
+    # The inner peak counts in the outer stage's, on top of what it kept
+    assert outer.peak >= 5 << 20 and outer.allocated >= 1 << 20
+    del kept
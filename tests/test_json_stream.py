@@ -0,0 +1,97 @@
+import io
+
+from linkml_runtime.dumpers import json_dumper
+from linkml_runtime.loaders import json_loader
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import json_stream
+from tests.clients.esd_client import ESDClient
+from tests.test_flows import build_basic_flow
+
+
+def make_sdm() -> cdm.SystemSdmSystemModelVersion:
+    esd = ESDClient()
+    build_basic_flow(esd)
+    sdm = esd.compile_sdm()
+    sdm.deviceModels.append(
+        cdm.SystemSdmDeviceModel(
+            id="dm-uart",
+            mpn="R7FA6M3AH3CFB",
+            peripherals=[
+                cdm.DmPeripheral(
+                    id="uart",
+                    instances=[
+                        cdm.DmPeripheralInstance(
+                            id="uart0",
+                            modes=[
+                                cdm.DmPeripheralMode(
+                                    name="async",
+                                    configurations=[
+                                        cdm.DmPeripheralConfiguration(
+                                            id="uart0-cfg",
+                                            pinConfigs=[cdm.DmPeripheralPinConfig(pinName="P101", function="TXD0")],
+                                        )
+                                    ],
+                                )
+                            ],
+                        )
+                    ],
+                )
+            ],
+        )
+    )
+    return sdm
+
+
+def test_dump_matches_json_dumper():
+    sdm = make_sdm()
+    expected = json_dumper.dumps(sdm, inject_type=False)
+    for depth in (1, 2, json_stream.DEFAULT_DEPTH, 10):
+        text = io.StringIO()
+        json_stream.dump(sdm, text, depth=depth)
+        assert text.getvalue() == expected
+
+    binary = io.BytesIO()
+    json_stream.dump(sdm, binary)
+    assert binary.getvalue().decode("UTF-8") == expected
+    assert "".join(json_stream.iter_json(sdm, inject_type=True)) == json_dumper.dumps(sdm)
+
+
+def test_dump_of_empty_version():
+    sdm = cdm.SystemSdmSystemModelVersion(id="sdm-1", version=0)
+    assert "".join(json_stream.iter_json(sdm)) == json_dumper.dumps(sdm, inject_type=False)
+
+
+def test_iter_entities_and_load():
+    sdm = make_sdm()
+    text = json_dumper.dumps(sdm, inject_type=False)
+
+    # Tiny chunks split every value across reads
+    entities = list(json_stream.iter_entities(io.StringIO(text), chunk_size=3))
+    assert [collection for collection, _ in entities] == [
+        "functionalBlocks",
+        "functionalBlocks",
+        "connections",
+        "deviceModels",
+        "deviceModels",
+        "softwareModels",
+        "hardwareModels",
+    ]
+    assert entities[4][1] == sdm.deviceModels[1]
+
+    devices = json_stream.iter_entities(io.BytesIO(text.encode()), collections=["deviceModels"])
+    assert [dm.id for _, dm in devices] == [dm.id for dm in sdm.deviceModels]
+
+    loaded = json_stream.load(io.StringIO(text), chunk_size=5)
+    assert loaded == json_loader.loads(text, target_class=cdm.SystemSdmSystemModelVersion)
+
+
+def test_numbers_split_across_reads():
+    text = '{"values": [1.25, 3e10, 17, -0.5E-3, 2e+2], "version": 1024}'
+    for chunk_size in range(1, 9):
+        scanner = json_stream._Scanner(io.StringIO(text), chunk_size)
+        assert {key: list(scanner.elements()) if key == "values" else scanner.value() for key in scanner.members()} == {
+            "values": [1.25, 3e10, 17, -0.5e-3, 200.0],
+            "version": 1024,
+        }
+        assert json_stream.load(io.StringIO('{"id": "sdm-1", "version": 1024}'), chunk_size).version == 1024
@@ -0,0 +1,57 @@
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.part_index import Match, PartIndex, PartIndexBuilder, normalize_mpn
+
+
+def make_index() -> PartIndex:
+    builder = PartIndexBuilder({"sup-ti": "Texas Instruments", "sup-yageo": "Yageo"})
+    builder.add_supply_parts(
+        [
+            cdm.SupPart(id="sp-1", Part_mpn="LM317T", Part_manufacturer="sup-ti"),
+            cdm.SupPart(id="sp-2", Part_mpn="LM317-T", Part_manufacturer="sup-onsemi"),
+            cdm.SupPart(id="sp-3", Part_mpn="LM358DR", Part_manufacturer="sup-ti"),
+            {"id": "sp-4", "Part_mpn": "RC0603FR-0710KL", "Part_manufacturer": "sup-yageo"},
+            {"id": "sp-5", "Part_mpn": "MAX232CPE+", "Part_manufacturer": "Analog Devices"},
+        ]
+    )
+    builder.add_library_parts(
+        [
+            cdm.ProBomItemElement(BomItemElement_mpn="lm317t", BomItemElement_manufacturer="TI Inc.", BomItemElement_part="lib-1"),
+            cdm.ProBomItemElement(BomItemElement_mpn="RC0603FR0710KL", BomItemElement_part="lib-2"),
+            cdm.ProBomItemElement(BomItemElement_mpn="LM358DR"),
+        ]
+    )
+    return builder.build()
+
+
+def test_normalizes_mpns():
+    assert normalize_mpn(" rc0603fr-07 10k.l ") == "RC0603FR0710KL"
+    assert normalize_mpn("max232cpe+") == "MAX232CPE+"
+    assert normalize_mpn("LTC1234#PBF") == "LTC1234#PBF"
+
+
+def test_looks_up_parts():
+    index = make_index()
+    assert len(index) == 7
+    # "TI Inc." is not an alias, so the library part is another manufacturer
+    assert index.lookup("Texas Instruments, Inc.", "lm 317 t") == [Match("supply", "sp-1", "sup-ti", "LM317T")]
+    assert index.lookup("sup-ti", "LM317T") == [Match("supply", "sp-1", "sup-ti", "LM317T")]
+    assert {m.id for m in index.lookup(None, "LM317T")} == {"sp-1", "sp-2", "lib-1"}
+    assert index.lookup("Yageo", "LM317T") == []
+    assert [m.id for m in index.search("lm3")] == ["sp-2", "sp-1", "lib-1", "sp-3"]
+    assert [m.id for m in index.search("LM3", limit=1)] == ["sp-2"]
+    assert index.search("XYZ") == []
+
+
+def test_matches_boms_through_memory_mapped_files(tmp_path):
+    path = tmp_path / "parts.idx"
+    make_index().save(path)
+    elements = [
+        {"BomItemElement_mpn": "RC0603FR-0710KL", "BomItemElement_manufacturer": "YAGEO"},
+        cdm.ProBomItemAlternate(BomItemElement_mpn="RC0603FR-0710KL"),
+        {"BomItemElement_mpn": "MAX232CPE+", "BomItemElement_manufacturer": "Analog Devices Inc"},
+        {"BomItemElement_mpn": "MAX232CPE", "BomItemElement_manufacturer": "Analog Devices"},
+        {"BomItemElement_manufacturer": "Yageo"},
+    ]
+    with PartIndex.open(path) as index:
+        matched = [[m.id for m in found] for found in index.match(elements)]
+    assert matched == [["sp-4"], ["lib-2", "sp-4"], ["sp-5"], [], []]
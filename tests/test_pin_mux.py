@@ -0,0 +1,112 @@
+import pytest
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.pin_mux import PinConflict, PinMux
+from tests.test_json_stream import make_sdm
+
+
+def configuration(config_id: str, pins: dict[str, str], pairing: str = None) -> cdm.DmPeripheralConfiguration:
+    instance = config_id.split(".")[0]
+    return cdm.DmPeripheralConfiguration(
+        id=config_id,
+        pinConfigs=[
+            cdm.DmPeripheralPinConfig(
+                pinName=f"{instance}.{function.lower()}",
+                pinValue=f"{instance}.{function.lower()}.{port.lower()}",
+                function=function,
+                portName=port,
+            )
+            for function, port in pins.items()
+        ],
+        pinDependencyConfigs=[
+            cdm.DmPeripheralPinDependencyConfig(name=f"{instance}.pairing", value=pairing)
+        ]
+        if pairing
+        else [],
+    )
+
+
+def make_device() -> cdm.SystemSdmDeviceModel:
+    def instance(instance_id, mode, *configurations):
+        return cdm.DmPeripheralInstance(
+            id=instance_id,
+            name=instance_id.upper(),
+            modes=[cdm.DmPeripheralMode(name=mode, configurations=list(configurations))],
+        )
+
+    return cdm.SystemSdmDeviceModel(
+        id="device-1",
+        mpn="MCU",
+        ports=[cdm.DmPort(id=f"p10{i}", name=f"P10{i}", pin=str(40 + i)) for i in range(6)],
+        peripherals=[
+            cdm.DmPeripheral(
+                id="sci",
+                name="Connectivity:SCI",
+                instances=[
+                    instance(
+                        "sci0",
+                        "Asynchronous UART",
+                        configuration("sci0.uart.a", {"TXD": "P100", "RXD": "P101"}, "sci0.pairing.a"),
+                        configuration("sci0.uart.b", {"TXD": "P104", "RXD": "P105"}, "sci0.pairing.b"),
+                    ),
+                    instance(
+                        "sci1",
+                        "Simple SPI",
+                        configuration("sci1.spi.a", {"MOSI": "P100", "MISO": "P102", "SCK": "P103"}),
+                        configuration("sci1.spi.b", {"MOSI": "P102", "MISO": "P101", "SCK": "P103"}),
+                    ),
+                ],
+            ),
+            cdm.DmPeripheral(
+                id="iic",
+                name="Connectivity:IIC",
+                instances=[
+                    instance("iic0", "I2C Master", configuration("iic0.i2c.a", {"SCL": "P104", "SDA": "P100"})),
+                ],
+            ),
+        ],
+    )
+
+
+def test_detects_pin_instance_and_dependency_conflicts():
+    mux = PinMux(make_device())
+    assert mux.conflicts(["sci0.uart.a", "iic0.i2c.a"]) == [PinConflict("P100", ["sci0.uart.a", "iic0.i2c.a"])]
+    assert mux.conflicts(["sci0.uart.b", "sci1.spi.a"]) == []
+    # Two configurations of one instance, selecting different pairings
+    assert mux.conflicts(["sci0.uart.a", "sci0.uart.b"]) == [
+        PinConflict("instance:sci0", ["sci0.uart.a", "sci0.uart.b"]),
+        PinConflict("dependency:sci0.pairing", ["sci0.uart.a", "sci0.uart.b"]),
+    ]
+
+
+def test_solves_requests_and_emits_the_pin_assignment():
+    mux = PinMux(make_device())
+    # I2C claims P100 and P104, which every UART configuration needs
+    assert mux.solve(["UART", "SPI", "I2C"]) is None
+
+    selection = mux.solve(["UART", "SPI"])
+    assert [o.configuration.id for o in selection] == ["sci0.uart.b", "sci1.spi.a"]
+    assert not mux.conflicts(o.configuration.id for o in selection)
+    assert [o.configuration.id for o in mux.solve(["SPI"], enabled=["iic0.i2c.a"])] == ["sci1.spi.b"]
+    assert mux.solve(["SPI"], enabled=["sci0.uart.a", "iic0.i2c.a"]) is None
+    assert [o.configuration.id for o in mux.solve(["SCI1", "I2C"])] == ["sci1.spi.b", "iic0.i2c.a"]
+
+    model = mux.assignment_model(mux.solve(["sci1.spi.b"]))
+    assert [(p.pinNumber, p.pinName, p.pinFunction, p.symbolicName) for p in model.pins] == [
+        (41, "P101", "sci1.miso", "P101"),
+        (42, "P102", "sci1.mosi", "P102"),
+        (43, "P103", "sci1.sck", "P103"),
+    ]
+    foreign = selection[0]._replace(configuration=configuration("sci7.uart.a", {"TXD": "P999"}))
+    resources = list(mux.resources)
+    with pytest.raises(ValueError):
+        mux.assignment_model([foreign])
+    assert mux.resources == resources
+
+
+def test_basic_flow_device_model():
+    device = make_sdm().deviceModels[0]
+    mux = PinMux(device)
+    assert mux.conflicts(["sci9.mode.asynchronous.a"]) == []
+    model = mux.assignment_model(mux.solve(["UART"]))
+    assert [(p.pinNumber, p.pinName) for p in model.pins] == [(45, "P203"), (46, "P202")]
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "prune_schema", os.path.join(os.path.dirname(__file__), "..", "prune-schema.py")
+)
+prune_schema = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prune_schema)
+
+
+def ref(name: str) -> dict:
+    return {"$ref": f"#/$defs/{name}"}
+
+
+SCHEMA = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "$defs": {
+        # A <-> B form a cycle that also reaches C; D is referenced by nobody
+        "A": {"properties": {"b": ref("B"), "items": {"anyOf": [ref("C")]}}},
+        "B": {"properties": {"a": {"items": ref("A")}}},
+        "C": {"properties": {"e": ref("E"), "external": ref("Missing")}},
+        "D": {"properties": {"a": ref("A")}},
+        "E": {"type": "string"},
+    },
+}
+
+
+def test_pruner_resolves_cycles_and_transitive_refs():
+    pruner = prune_schema.SchemaPruner(SCHEMA)
+
+    assert pruner.referenced_names("A") == ["A", "B", "C", "E"]
+    assert pruner.referenced_names("B") == ["A", "B", "C", "E"]
+    assert pruner.referenced_names("C") == ["C", "E"]
+    assert pruner.referenced_names("D") == ["A", "B", "C", "D", "E"]
+    assert pruner.component["A"] == pruner.component["B"]
+
+    pruned = pruner.prune("B", "Only B")
+    assert pruned["$ref"] == "#/$defs/B"
+    assert pruned["title"] == "Only B"
+    assert list(pruned["$defs"]) == ["A", "B", "C", "E"]
+
+
+def test_prune_schema_unknown_type():
+    with pytest.raises(ValueError):
+        prune_schema.prune_schema(SCHEMA, "Missing", "Missing")
@@ -0,0 +1,88 @@
+from copy import deepcopy
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.reference_index import Reference, SdmReferenceIndex
+from common_data_model.sdm_diff import diff_sdm
+from tests.clients.esd_client import ESDClient
+from tests.test_flows import build_basic_flow, edit_basic_flow
+from tests.test_json_stream import make_sdm
+
+
+def state(index: SdmReferenceIndex):
+    return (
+        sorted((repr(key), id(entity)) for key, entity in index.entities()),
+        sorted(map(repr, index.references())),
+    )
+
+
+def test_resolves_references_of_the_basic_flow():
+    sdm = make_sdm()
+    index = SdmReferenceIndex(sdm)
+    assert index.check().ok
+
+    mcu, wifi = sdm.functionalModel.functionalBlocks
+    # Ports are only unique within their block
+    assert index.get("port", (wifi.id, wifi.ports[0].id)) is wifi.ports[0]
+    endpoint_refs = [r for r in index.referrers("port", (mcu.id, mcu.ports[0].id))]
+    assert endpoint_refs == [Reference(("connection", "guid-8"), "endpoints.portId", ("port", ("guid-5", "guid-4")))]
+    device_model = index.get("deviceModel", "guid-9")
+    assert {r.source for r in index.referrers("deviceModel", "guid-9")} == {
+        ("hardwareComponent", "guid-3"),
+        ("softwareModel", "guid-12"),
+    }
+    assert all(index.resolve(r) is device_model for r in index.referrers("deviceModel", "guid-9"))
+
+
+def test_reports_dangling_references_and_duplicate_ids():
+    sdm = make_sdm()
+    blocks = sdm.functionalModel.functionalBlocks
+    blocks[0].hardwareComponentIds.append("guid-missing")
+    blocks.append(deepcopy(blocks[1]))
+    sdm.functionalModel.connections[0].endpoints[0].portId = "no-such-port"
+
+    report = SdmReferenceIndex(sdm).check()
+    assert not report.ok
+    assert sorted(r.target for r in report.dangling) == [
+        ("hardwareComponent", "guid-missing"),
+        ("port", ("guid-5", "no-such-port")),
+    ]
+    assert sorted(report.duplicates) == [
+        ("functionalBlock", "guid-7"),
+        ("port", ("guid-7", "guid-4")),
+    ]
+
+
+def test_apply_updates_the_index_incrementally():
+    esd = ESDClient()
+    handles = build_basic_flow(esd)
+    old = esd.compile_sdm()
+    edit_basic_flow(esd, *handles)
+    new = esd.compile_sdm()
+    new.version = old.version + 1
+    new.functionalModel.functionalBlocks[0].hardwareComponentIds.append("guid-missing")
+
+    index = SdmReferenceIndex(old)
+    untouched = index.get("functionalBlock", new.functionalModel.functionalBlocks[1].id)
+    patched = index.apply(diff_sdm(old, new))
+
+    assert index.version is patched
+    assert state(index) == state(SdmReferenceIndex(patched))
+    assert index.check() == SdmReferenceIndex(patched).check()
+    assert ("hardwareComponent", "guid-missing") in {r.target for r in index.check().dangling}
+    assert index.get("functionalBlock", untouched.id) is untouched
+
+
+def test_apply_handles_replaced_collections():
+    old = cdm.SystemSdmSystemModelVersion(id="sdm", version=1)
+    new = cdm.SystemSdmSystemModelVersion(
+        id="sdm",
+        version=2,
+        hardwareModels=[cdm.SystemSdmHardwareModel(id="hw", functionalBlockIds=["fb-1"])],
+        functionalModel=cdm.SystemSdmFunctionalModel(
+            id="fm", functionalBlocks=[cdm.SystemSdmFunctionalBlock(id="fb-1")]
+        ),
+    )
+    index = SdmReferenceIndex(old)
+    patched = index.apply(diff_sdm(old, new))
+    assert state(index) == state(SdmReferenceIndex(patched))
+    assert index.check().ok
@@ -0,0 +1,108 @@
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.register_map import RegisterMap
+
+
+def register(address: int, name: str, fields: list[tuple[str, int, int]]) -> cdm.DmRegister:
+    return cdm.DmRegister(
+        dm_HasAddressRange_start_address=address,
+        dm_HasAddressRange_size=4,
+        dm_Register_name=name,
+        dm_Register_access="ReadWrite",
+        dm_Register_reset_value="0x00000000",
+        dm_Register_fields=[
+            cdm.DmRegisterField(
+                dm_RegisterField_name=field,
+                dm_RegisterField_lsb=lsb,
+                dm_RegisterField_msb=msb,
+                dm_RegisterField_enums=[cdm.DmFieldEnum(dm_FieldEnum_name="ON", dm_FieldEnum_value="1")]
+                if lsb == msb
+                else [],
+            )
+            for field, lsb, msb in fields
+        ],
+    )
+
+
+def make_address_map() -> cdm.DmAddressMap:
+    return cdm.DmAddressMap(
+        dm_AddressMapModel_segments=[
+            cdm.DmAddressSegment(
+                dm_HasAddressRange_start_address=0x40000000,
+                dm_HasAddressRange_size=0x10000,
+                dm_AddressSegment_name="APB",
+                dm_AddressSegment_aliases=["PERIPH"],
+                dm_AddressSegment_peripherals=["sci"],
+                dm_AddressSegment_blocks=[
+                    cdm.DmAddressBlock(
+                        dm_HasAddressRange_start_address=0x40000000 + 0x100 * i,
+                        dm_HasAddressRange_size=0x100,
+                        dm_AddressBlock_name=f"SCI{i}",
+                        dm_AddressBlock_type="Peripheral",
+                        dm_AddressBlock_peripheral_instance=f"sci{i}",
+                        dm_AddressBlock_registers=[
+                            register(0x40000000 + 0x100 * i, "SMR", [("CKS", 0, 1), ("STOP", 3, 3)]),
+                            register(0x40000004 + 0x100 * i, "BRR", [("BRR", 0, 7)]),
+                        ],
+                    )
+                    for i in range(3)
+                ],
+            ),
+            cdm.DmAddressSegment(
+                dm_HasAddressRange_start_address=0x20000000,
+                dm_HasAddressRange_size=0x8000,
+                dm_AddressSegment_name="SRAM",
+                dm_AddressSegment_blocks=[
+                    cdm.DmAddressBlock(
+                        dm_HasAddressRange_start_address=0x20000000,
+                        dm_HasAddressRange_size=0x8000,
+                        dm_AddressBlock_type="Memory",
+                        dm_AddressBlock_memories=[cdm.DmMemory(dm_Memory_name="SRAM0", dm_Memory_size=0x8000)],
+                    )
+                ],
+            ),
+        ]
+    )
+
+
+def test_round_trips_objects_and_json():
+    address_map = make_address_map()
+    register_map = RegisterMap.from_address_map(address_map)
+    assert register_map.count("register") == 6 and register_map.count("enum") == 3
+    assert fast_codec.to_dict(register_map.to_address_map()) == fast_codec.to_dict(address_map)
+
+    from_json = RegisterMap.from_address_map(fast_codec.to_dict(address_map))
+    assert fast_codec.to_dict(from_json.to_address_map()) == fast_codec.to_dict(address_map)
+
+
+def test_locates_addresses_and_bits():
+    register_map = RegisterMap.from_address_map(make_address_map())
+    location = register_map.locate(0x40000204)
+    assert (location.segment.name, location.block.name, location.register.name) == ("APB", "SCI2", "BRR")
+    assert location.block.peripheral_instance == "sci2" and location.block.type == "Peripheral"
+    assert location.register.parent == location.block
+    assert [f.name for f in register_map.fields_at(0x40000100, 3)] == ["STOP"]
+    assert [f.name for f in register_map.fields_at(0x40000100)] == ["CKS", "STOP"]
+
+    location = register_map.locate(0x20000010)
+    assert location.register is None
+    assert [m.name for m in location.block.children("memory")] == ["SRAM0"]
+    assert register_map.locate(0x10000000) == (None, None, None)
+    assert register_map.locate(0x40000008).register is None
+    assert register_map.overlaps() == []
+
+
+def test_reports_overlaps():
+    address_map = make_address_map()
+    sci0 = address_map.dm_AddressMapModel_segments[0].dm_AddressSegment_blocks[0]
+    sci0.dm_AddressBlock_registers.append(register(0x40000002, "SSR", [("TEND", 2, 2)]))
+    sci0.dm_AddressBlock_registers[0].dm_Register_fields.append(
+        cdm.DmRegisterField(dm_RegisterField_name="CM", dm_RegisterField_lsb=1, dm_RegisterField_msb=2)
+    )
+    register_map = RegisterMap.from_address_map(address_map)
+    assert sorted((a.level, a.name, b.name) for a, b in register_map.overlaps()) == [
+        ("field", "CKS", "CM"),
+        ("register", "SMR", "SSR"),
+        ("register", "SSR", "BRR"),
+    ]
+    assert [r.name for r in register_map.covering("register", 0x40000003)] == ["SSR", "SMR"]
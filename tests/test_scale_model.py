@@ -0,0 +1,24 @@
+from linkml_runtime.dumpers import json_dumper
+
+from tests.scale_model import ScaleModel, build_esd, tier
+
+
+def test_same_seed_same_document():
+    model = tier(50, seed=3)
+    first, second = build_esd(model), build_esd(model)
+    assert json_dumper.dumps(first.model) == json_dumper.dumps(second.model)
+    assert json_dumper.dumps(build_esd(model._replace(seed=4)).model) != json_dumper.dumps(first.model)
+
+
+def test_counts_and_compile():
+    model = ScaleModel(blocks=40, configured=0.25, device_models=3)
+    esd = build_esd(model)
+    blocks = esd.model.functionalBlocks
+    assert len(blocks) == 40
+    assert all(len(fb.ports) == model.ports_per_block for fb in blocks)
+    assert sum(len(fb.keyComponents) for fb in blocks) == 80
+
+    sdm = esd.compile_sdm(incremental=False)
+    assert len(sdm.functionalModel.functionalBlocks) == 40
+    assert len(sdm.deviceModels) == 20
+    assert all(dm.peripherals and dm.ports for dm in sdm.deviceModels)
@@ -0,0 +1,123 @@
+import pytest
+from linkml_runtime.dumpers import json_dumper
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sdm_diff import (
+    ADD,
+    MODIFY,
+    REMOVE,
+    PatchConflictError,
+    apply_patch,
+    diff_sdm,
+)
+from tests.clients.e2_client import E2Client
+from tests.clients.esd_client import ESDClient
+from tests.clients.id_mapper import IdMapper
+from tests.sim import SIM
+from tests.test_flows import build_basic_flow, edit_basic_flow
+
+
+def dumps(sdm) -> str:
+    return json_dumper.dumps(sdm, inject_type=False)
+
+
+def test_diff_and_apply_round_trip():
+    esd = ESDClient()
+    handles = build_basic_flow(esd)
+    old = esd.compile_sdm()
+    old_json = dumps(old)
+    edit_basic_flow(esd, *handles)
+    new = esd.compile_sdm()
+    new.version = old.version + 1
+
+    patch = diff_sdm(old, new)
+    patched = apply_patch(old, patch)
+
+    assert dumps(patched) == dumps(new)
+    assert dumps(old) == old_json
+    # Untouched entities are shared with the baseline
+    assert patched.functionalModel.functionalBlocks[1] is old.functionalModel.functionalBlocks[1]
+    assert patched.softwareModels[0] is not old.softwareModels[0]
+
+    ops = {(change.op, change.path[-1] if change.path else ()) for change in patch.changes}
+    assert (ADD, ("functionalBlocks", "guid-15")) in ops
+    assert (REMOVE, ("deviceModels", "guid-9")) in ops
+    assert (MODIFY, ("hardwareModels", "guid-10")) in ops
+    assert len(patch) == 10
+
+
+def test_entities_are_matched_by_id_not_position():
+    old = cdm.SystemSdmSystemModelVersion(
+        id="sdm",
+        version=3,
+        deviceModels=[cdm.SystemSdmDeviceModel(id=f"dm-{i}", mpn=f"M{i}") for i in range(4)],
+    )
+    new = cdm.SystemSdmSystemModelVersion(
+        id="sdm",
+        version=4,
+        deviceModels=[
+            cdm.SystemSdmDeviceModel(id="dm-x", mpn="X"),
+            old.deviceModels[0],
+            cdm.SystemSdmDeviceModel(id="dm-1", mpn="M1-rev2"),
+            old.deviceModels[3],
+        ],
+    )
+
+    patch = diff_sdm(old, new)
+
+    assert [(c.op, c.path) for c in patch.changes] == [
+        (ADD, (("deviceModels", "dm-x"),)),
+        (MODIFY, (("deviceModels", "dm-1"),)),
+        (REMOVE, (("deviceModels", "dm-2"),)),
+    ]
+    assert patch.changes[1].value == {"mpn": "M1-rev2"}
+    assert dumps(apply_patch(old, patch)) == dumps(new)
+    with pytest.raises(PatchConflictError):
+        apply_patch(new, patch)
+
+
+def test_clients_exchange_ecos_through_sim():
+    sim = SIM.empty()
+    esd, e2 = ESDClient(), E2Client()
+    build_basic_flow(esd)
+
+    esd.pull_from_sim(sim)
+    esd.push_to_sim(sim)
+    assert sim.version == 1
+    assert dumps(sim.snapshot().functionalModel) == dumps(esd.compile_sdm().functionalModel)
+
+    e2.pull_from_sim(sim)
+    e2.push_to_sim(sim)
+    assert [sw.id for sw in sim.snapshot().softwareModels] == ["guid-11", "sbom-1"]
+
+    # ESD has to pull the E2 change before pushing again, and keeps it
+    with pytest.raises(Exception):
+        esd.push_to_sim(sim)
+    esd.pull_from_sim(sim)
+    assert esd.baseline.version == 2
+    assert dumps(esd.baseline) == dumps(sim.snapshot())
+    esd.push_to_sim(sim)
+    assert [sw.id for sw in sim.snapshot().softwareModels] == ["guid-11", "sbom-1"]
+
+
+def test_clients_keep_each_others_blocks():
+    sim = SIM.empty()
+    first = ESDClient()
+    second = ESDClient(model=cdm.SystemESDDocument(id="esd-2"), id_mapper=IdMapper(name="esd-2"))
+    second.id_mapper.counter = 1000
+    mcu = first.add_functional_block(title="MCU", hw_project=None)
+    sensor = second.add_functional_block(title="Sensor", hw_project=None)
+    second.add_port(sensor, cdm.SystemPortType.I2C)
+
+    for client in (first, second):
+        client.pull_from_sim(sim)
+        client.push_to_sim(sim)
+    first.add_port(mcu, cdm.SystemPortType.I2C)
+    first.pull_from_sim(sim)
+    first.push_to_sim(sim)
+
+    functional_model = sim.snapshot().functionalModel
+    assert functional_model.id == "unique_fm_id"
+    blocks = {fb.name: fb for fb in functional_model.functionalBlocks}
+    assert sorted(blocks) == ["MCU", "Sensor"]
+    assert len(blocks["MCU"].ports) == len(blocks["Sensor"].ports) == 1
@@ -0,0 +1,97 @@
+import asyncio
+import struct
+
+import pytest
+from linkml_runtime.dumpers import json_dumper
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.sdm_diff import PatchConflictError, diff_sdm
+from common_data_model.sim_service import (
+    SimClient,
+    SimServer,
+    SimVersionError,
+    _read_message,
+    decode_patch,
+    encode_patch,
+)
+from tests.clients.esd_client import ESDClient
+from tests.test_flows import build_basic_flow
+
+
+def dumps(sdm) -> str:
+    return json_dumper.dumps(sdm, inject_type=False)
+
+
+def with_device(sdm: cdm.SystemSdmSystemModelVersion, id: str, mpn: str) -> cdm.SystemSdmSystemModelVersion:
+    devices = [d for d in sdm.deviceModels if d.id != id] + [cdm.SystemSdmDeviceModel(id=id, mpn=mpn)]
+    return cdm.SystemSdmSystemModelVersion(
+        id=sdm.id, version=sdm.version, functionalModel=sdm.functionalModel, deviceModels=devices
+    )
+
+
+def test_patches_round_trip_through_json():
+    esd = ESDClient()
+    build_basic_flow(esd)
+    sdm = esd.compile_sdm()
+    patch = diff_sdm(cdm.SystemSdmSystemModelVersion(id=sdm.id, version=0), sdm)
+    decoded = decode_patch(encode_patch(patch))
+    assert decoded == patch
+
+
+def test_clients_push_and_pull_concurrently():
+    async def run():
+        async with SimServer() as server:
+            host, port = await server.start(port=0)
+            esd = await SimClient.connect(host, port)
+            e2 = await SimClient.connect(host, port, rebase=False)
+            base = await esd.pull()
+            await e2.pull()
+
+            # A burst of pushes is coalesced into one push of the last model
+            versions = await asyncio.gather(*(esd.push(with_device(base, "dm-1", f"M{i}")) for i in range(5)))
+            assert versions == [1] * 5 and server.pushes == 1
+            assert server.store.snapshot().deviceModels[0].mpn == "M4"
+
+            # e2 is behind: changes to other devices are committed on top
+            assert await e2.push(with_device(e2.baseline, "dm-2", "X")) == 2
+            assert dumps(e2.baseline) == dumps(server.store.snapshot())
+            assert await esd.push(with_device(esd.baseline, "dm-1", "M5")) == 3
+            # but changes to a device changed meanwhile are refused without rebase
+            with pytest.raises(SimVersionError):
+                await e2.push(with_device(e2.baseline, "dm-1", "Y"))
+            assert [d.mpn for d in server.store.snapshot().deviceModels] == ["X", "M5"]
+            assert dumps(await e2.pull()) == dumps(esd.baseline)
+
+            # Changes to a device removed meanwhile do not apply
+            edited = with_device(esd.baseline, "dm-2", "Y")
+            await e2.push(cdm.SystemSdmSystemModelVersion(id="sim", version=3, deviceModels=[e2.baseline.deviceModels[1]]))
+            with pytest.raises(PatchConflictError):
+                await esd.push(edited)
+            await esd.close()
+            await e2.close()
+
+    asyncio.run(run())
+
+
+def test_malformed_messages_are_answered_with_errors():
+    async def run():
+        async with SimServer() as server:
+            host, port = await server.start(port=0)
+            reader, writer = await asyncio.open_connection(host, port)
+
+            async def send(header: bytes, body: bytes = b"") -> dict:
+                writer.write(struct.pack(">II", len(header), len(body)) + header + body)
+                answer, _ = await _read_message(reader)
+                return answer
+
+            assert (await send(b'{"op": "push"}', b"{}"))["error"] == "Unknown version None"
+            assert (await send(b'{"op": "push", "base": 0}', b"not json"))["error"].startswith("Invalid ECO")
+            changes = b'{"base": 0, "target": 1, "changes": [["modify", [], 5, null]]}'
+            assert not (await send(b'{"op": "push", "base": 0}', changes))["ok"]
+            assert (await send(b"[1]"))["error"].startswith("Invalid message")
+            # The connection is still in step
+            assert await send(b'{"op": "version"}') == {"version": 0}
+            assert server.refused == 4 and server.version == 0
+            writer.close()
+
+    asyncio.run(run())
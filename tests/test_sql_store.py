@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model._util import JsonLineError
+from common_data_model.sql_store import SqlStore
+
+
+def make_sdm(version: int, mpn: str) -> cdm.SystemSdmSystemModelVersion:
+    return cdm.SystemSdmSystemModelVersion(
+        id="sdm-1",
+        version=version,
+        functionalModel=cdm.SystemSdmFunctionalModel(
+            id="fm-1",
+            functionalBlocks=[
+                cdm.SystemSdmFunctionalBlock(id="fb-1", name="MCU", hardwareComponentIds=["hc-1"]),
+                cdm.SystemSdmFunctionalBlock(id="fb-2", name="WiFi"),
+            ],
+            connections=[
+                cdm.SystemSdmConnection(
+                    id="conn-1",
+                    endpoints=[
+                        cdm.SystemSdmEndpoint(functionalBlockId="fb-1", portId="p-1"),
+                        cdm.SystemSdmEndpoint(functionalBlockId="fb-2", portId="p-2"),
+                    ],
+                )
+            ],
+        ),
+        deviceModels=[cdm.SystemSdmDeviceModel(id="dm-1", mpn=mpn)],
+        hardwareModels=[
+            cdm.SystemSdmHardwareModel(
+                id="hm-1",
+                hardwareComponents=[cdm.SystemSdmHardwareComponent(id="hc-1", name="U1", deviceModelId="dm-1")],
+            )
+        ],
+    )
+
+
+def test_load_and_rebuild_versions():
+    store = SqlStore()
+    sdm = make_sdm(0, "R7FA6M3AH3CFB")
+    # Root, functional model, 2 blocks, connection, 2 endpoints, device
+    # model, hardware model and hardware component
+    assert store.load([sdm]) == 10
+    assert store.load([fast_codec.to_dict(make_sdm(1, "ESP32"))], cdm.SystemSdmSystemModelVersion) == 10
+
+    assert store.versions("sdm-1") == [0, 1]
+    assert fast_codec.to_dict(store.version(0).object) == fast_codec.to_dict(sdm)
+    blocks = store.find(cdm.SystemSdmFunctionalBlock, id="fb-1")
+    assert len(blocks) == 2
+    assert blocks[0].values == {"id": "fb-1", "name": "MCU"}
+    assert blocks[0].object.hardwareComponentIds == ["hc-1"]
+
+
+def test_reference_queries_across_versions():
+    store = SqlStore()
+    store.load([make_sdm(0, "R7FA6M3AH3CFB"), make_sdm(1, "ESP32"), make_sdm(2, "R7FA6M3AH3CFB")])
+
+    found = store.hardware_components("R7FA6M3AH3CFB")
+    assert [(version, c.id) for version, c in found] == [(0, "hc-1"), (2, "hc-1")]
+    assert found[0][1].object == cdm.SystemSdmHardwareComponent(id="hc-1", name="U1", deviceModelId="dm-1")
+    assert len(store.referencing(cdm.SystemSdmEndpoint, "functionalBlockId", "fb-2")) == 3
+    assert len(store.referencing(cdm.SystemSdmFunctionalBlock, "hardwareComponentIds", "hc-1")) == 3
+
+
+def test_load_files(tmp_path):
+    parts = [{"id": f"sp-{i}", "Part_mpn": f"LM{i}", "Part_manufacturer": "ti"} for i in range(3)]
+    (tmp_path / "parts.json").write_text(json.dumps(parts[:2]))
+    (tmp_path / "parts.jsonl").write_text("\n" + json.dumps(parts[2]) + "\n\n")
+    (tmp_path / "parts.yaml").write_text("id: sp-3\nPart_mpn: LM3\nPart_manufacturer: ti\n")
+    store = SqlStore(str(tmp_path / "store.db"))
+    paths = [tmp_path / "parts.json", tmp_path / "parts.jsonl", tmp_path / "parts.yaml"]
+    assert store.load_files(paths, cdm.SupPart) == 4
+    store.close()
+
+    # A line holding two objects is not JSON lines: the load is rolled back
+    (tmp_path / "bad.jsonl").write_text("\n".join(json.dumps(p) for p in parts[:2]) + "\n{}, {}\n")
+    with SqlStore(str(tmp_path / "store.db")) as store:
+        with pytest.raises(JsonLineError, match=r"bad.jsonl, line 3: Extra data"):
+            store.load_files([tmp_path / "bad.jsonl"], cdm.SupPart)
+        assert len(store.query(cdm.SupPart)) == 4
+        assert [p.id for p in store.find(cdm.SupPart, Part_mpn="LM3")] == ["sp-3"]
+        assert store.find(cdm.SupPart, Part_mpn="LM1")[0].object == cdm.SupPart(**parts[1])
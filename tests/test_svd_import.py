@@ -0,0 +1,139 @@
+import io
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model import fast_codec
+from common_data_model.register_map import RegisterMap
+from common_data_model.svd_import import SvdReader, import_catalogue, load_svd
+
+SVD = b"""<?xml version="1.0" encoding="utf-8"?>
+<device schemaVersion="1.3">
+  <vendor>Acme</vendor>
+  <name>ACME32F1</name>
+  <series>ACME32</series>
+  <size>32</size>
+  <access>read-write</access>
+  <resetValue>0x00000000</resetValue>
+  <peripherals>
+    <peripheral>
+      <name>UART0</name>
+      <description>Universal
+        asynchronous receiver transmitter</description>
+      <groupName>UART</groupName>
+      <baseAddress>0x40001000</baseAddress>
+      <addressBlock><offset>0</offset><size>0x400</size><usage>registers</usage></addressBlock>
+      <registers>
+        <register>
+          <name>CR</name>
+          <addressOffset>0x0</addressOffset>
+          <fields>
+            <field>
+              <name>EN</name><bitOffset>0</bitOffset><bitWidth>1</bitWidth>
+              <enumeratedValues>
+                <name>ENABLE</name>
+                <enumeratedValue><name>OFF</name><value>0</value></enumeratedValue>
+                <enumeratedValue><name>ON</name><value>1</value></enumeratedValue>
+              </enumeratedValues>
+            </field>
+            <field><name>MODE</name><bitRange>[3:1]</bitRange></field>
+            <field>
+              <name>IE</name><lsb>4</lsb><msb>4</msb>
+              <enumeratedValues derivedFrom="ENABLE"/>
+            </field>
+          </fields>
+        </register>
+        <register derivedFrom="CR">
+          <name>CR2</name>
+          <addressOffset>0x4</addressOffset>
+        </register>
+        <register>
+          <name>SR</name>
+          <addressOffset>0x8</addressOffset>
+          <size>16</size>
+          <access>read-only</access>
+        </register>
+        <register>
+          <dim>2</dim><dimIncrement>4</dimIncrement>
+          <name>DATA%s</name>
+          <addressOffset>0x10</addressOffset>
+        </register>
+        <cluster>
+          <name>FIFO</name>
+          <addressOffset>0x20</addressOffset>
+          <register><name>LEVEL</name><addressOffset>0x4</addressOffset></register>
+        </cluster>
+      </registers>
+    </peripheral>
+    <peripheral derivedFrom="UART0">
+      <name>UART1</name>
+      <baseAddress>0x40002000</baseAddress>
+    </peripheral>
+    <peripheral>
+      <name>TIM0</name>
+      <baseAddress>0x40003000</baseAddress>
+      <registers>
+        <register derivedFrom="UART0.SR"><name>STATUS</name><addressOffset>0x0</addressOffset></register>
+      </registers>
+    </peripheral>
+  </peripherals>
+</device>
+"""
+
+
+def test_maps_svd_to_device_model():
+    model = load_svd(io.BytesIO(SVD))
+    assert (model.id, model.dm_FullStackDeviceModel_family) == ("ACME32F1", "ACME32")
+    assert [(p.id, [i.id for i in p.instances]) for p in model.peripherals] == [
+        ("uart", ["uart0", "uart1"]),
+        ("tim0", ["tim0"]),
+    ]
+    uart0, uart1, tim0 = model.dm_FullStackDeviceModel_address_map.dm_AddressMapModel_segments[0].dm_AddressSegment_blocks
+    assert uart0.description == "Universal asynchronous receiver transmitter"
+    assert (uart0.dm_HasAddressRange_size, uart0.dm_AddressBlock_peripheral_instance) == (0x400, "uart0")
+    assert [(r.dm_Register_name, r.dm_HasAddressRange_start_address) for r in uart0.dm_AddressBlock_registers] == [
+        ("CR", 0x40001000),
+        ("CR2", 0x40001004),
+        ("SR", 0x40001008),
+        ("DATA0", 0x40001010),
+        ("DATA1", 0x40001014),
+        ("FIFO.LEVEL", 0x40001024),
+    ]
+    cr, cr2, sr = uart0.dm_AddressBlock_registers[:3]
+    assert [(f.dm_RegisterField_name, f.dm_RegisterField_lsb, f.dm_RegisterField_msb) for f in cr.dm_Register_fields] == [
+        ("EN", 0, 0),
+        ("MODE", 1, 3),
+        ("IE", 4, 4),
+    ]
+    assert (sr.dm_HasAddressRange_size, sr.dm_Register_access.code.text) == (2, "ReadOnly")
+    assert (cr.dm_HasAddressRange_size, cr.dm_Register_reset_value) == (4, "0x00000000")
+    assert tim0.dm_AddressBlock_registers[0].dm_Register_access.code.text == "ReadOnly"
+
+    # Derivations share the objects they derive from
+    en, _, ie = cr.dm_Register_fields
+    assert [e.dm_FieldEnum_name for e in en.dm_RegisterField_enums] == ["OFF", "ON"]
+    assert all(a is b for a, b in zip(ie.dm_RegisterField_enums, en.dm_RegisterField_enums))
+    assert all(a is b for a, b in zip(cr2.dm_Register_fields, cr.dm_Register_fields))
+    assert [r.dm_HasAddressRange_start_address for r in uart1.dm_AddressBlock_registers][:2] == [0x40002000, 0x40002004]
+    assert uart1.dm_AddressBlock_registers[0].dm_Register_fields[0] is en
+
+    register_map = RegisterMap.from_address_map(model.dm_FullStackDeviceModel_address_map)
+    assert register_map.locate(0x40002024).register.name == "FIFO.LEVEL"
+    assert register_map.overlaps() == []
+
+
+def test_streams_peripherals():
+    reader = SvdReader(io.BytesIO(SVD))
+    names = [p.block.dm_AddressBlock_name for p in reader.peripherals()]
+    assert names == ["UART0", "UART1", "TIM0"]
+    assert reader.device["vendor"] == "Acme"
+
+
+def test_imports_catalogues(tmp_path):
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"device{i}.svd"
+        path.write_bytes(SVD)
+        paths.append(str(path))
+    output = tmp_path / "models"
+    results = list(import_catalogue(paths, str(output), processes=2))
+    assert [(r.peripherals, r.registers) for r in results] == [(3, 13)] * 2
+    assert fast_codec.load(str(output / "device0.json"), cdm.DmFullstackDeviceModel).mpn == "ACME32F1"
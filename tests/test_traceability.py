@@ -0,0 +1,99 @@
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.traceability import TraceabilityIndex
+
+
+def requirement(id: str, children=(), **links) -> cdm.ReqRequirement:
+    return cdm.ReqRequirement(
+        id=id,
+        Requirement_identifier=id.upper(),
+        Requirement_title=id,
+        Requirement_text=id,
+        req_requirement_children=list(children),
+        **links,
+    )
+
+
+def make_index() -> TraceabilityIndex:
+    index = TraceabilityIndex(
+        [
+            requirement("sys", ["hw", "sw"]),
+            requirement("hw", ["hw-1"]),
+            requirement("hw-1"),
+            requirement("sw", req_requirement_verified_by_activities=["vc-2"]),
+            cdm.ReqVerificationCase(
+                id="vc-1",
+                VerificationCase_identifier="VC-1",
+                VerificationCase_method="test",
+                req_verification_validates_requirements=["hw-1"],
+            ),
+            cdm.ReqRequirementChangeRequest(
+                id="cr-1", RequirementChangeRequest_reason="EMC", req_change_impacts_requirements=["hw"]
+            ),
+        ]
+    )
+    # Baselines in their JSON form, as their generated class requires a
+    # lifecycle state with no slots
+    index.add_all(
+        [
+            {"id": "bl-1", "req_baseline_includes_requirements": ["sys", "hw", "hw-1"]},
+            {"id": "bl-2", "req_baseline_includes_requirements": ["sys", "hw", "sw"]},
+        ],
+        cdm.ReqRequirementBaseline,
+    )
+    return index
+
+
+def test_impact_coverage_and_baselines():
+    index = make_index()
+    assert index.impact("cr-1") == {"hw", "hw-1", "vc-1"}
+    assert index.impact("cr-1", cdm.ReqRequirement) == {"hw", "hw-1"}
+    assert index.impact("sys") == {"hw", "hw-1", "vc-1", "sw", "vc-2"}
+    # Membership in a baseline does not propagate impact
+    assert index.impact("bl-1") == set()
+    assert index.unverified() == ["sys", "hw"]
+    assert index.unverified(through_children=True) == []
+
+    diff = index.diff_baselines("bl-1", "bl-2")
+    assert diff.added == ["sw"]
+    assert diff.removed == ["hw-1"]
+    assert diff.affected == []
+
+
+def test_links_are_maintained_incrementally():
+    index = make_index()
+    assert index.impact("hw-1") == {"vc-1"}
+
+    # A failing verification triggers a change request impacting a parent,
+    # closing a cycle
+    index.link("vc-1", "req_verification_triggers_changes", "cr-2")
+    index.link("cr-2", "req_change_impacts_requirements", "hw")
+    assert index.impact("hw-1") == {"vc-1", "cr-2", "hw"}
+    assert index.impacted_by("vc-1", "hw-1")
+    assert index.impact("cr-1") == {"hw", "hw-1", "vc-1", "cr-2"}
+
+    # Breaking the cycle splits the component again
+    index.unlink("cr-2", "req_change_impacts_requirements", "hw")
+    assert index.impact("hw-1") == {"vc-1", "cr-2"}
+    assert not index.impacted_by("vc-1", "hw-1")
+
+    old = requirement("sw", req_requirement_verified_by_activities=["vc-2"])
+    index.replace(old, requirement("sw", ["sw-1"]))
+    assert index.impact("sys", cdm.ReqRequirement) == {"hw", "hw-1", "sw", "sw-1"}
+    assert index.unverified() == ["sys", "hw", "sw", "sw-1"]
+    assert index.linked("sw", "children") == ["sw-1"]
+    assert index.linked("sw", "children", upstream=True) == ["sys"]
+
+
+def test_incremental_order_matches_condensation():
+    links = [(f"r{i}", f"r{(i * 7 + 3) % 40}") for i in range(40)] + [(f"r{i}", f"r{i + 1}") for i in range(0, 39, 5)]
+    incremental = TraceabilityIndex([requirement(f"r{i}") for i in range(40)])
+    incremental.impact("r0")
+    for source, target in links:
+        incremental.link(source, "req_requirement_children", target)
+        # Query as links are added, so cached sets have to be kept up to date
+        incremental.impact(source)
+    rebuilt = TraceabilityIndex(
+        [requirement(f"r{i}", [t for s, t in links if s == f"r{i}"]) for i in range(40)]
+    )
+    for i in range(40):
+        assert incremental.impact(f"r{i}") == rebuilt.impact(f"r{i}")
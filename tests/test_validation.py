@@ -0,0 +1,99 @@
+import json
+import os
+
+import jsonschema
+import pytest
+
+from common_data_model.validation import CompiledSchema, ValidationEngine, compile_schema
+
+
+def ref(name: str) -> dict:
+    return {"$ref": f"#/$defs/{name}"}
+
+
+# The shapes gen-json-schema emits for the CDM
+SCHEMA = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "$defs": {
+        "Port": {
+            "additionalProperties": False,
+            "properties": {
+                "id": {"type": "string"},
+                "type": {"anyOf": [ref("PortType"), {"type": "null"}]},
+                "pin": {"type": ["integer", "null"], "minimum": 1},
+            },
+            "required": ["id"],
+            "type": "object",
+        },
+        "PortType": {"enum": ["GPIO", "UART", "SPI"], "type": "string"},
+        "Block": {
+            "additionalProperties": False,
+            "properties": {
+                "id": {"type": "string", "pattern": "^fb-"},
+                "ports": {"items": ref("Port"), "type": ["array", "null"]},
+                "children": {"items": ref("Block"), "type": ["array", "null"]},
+            },
+            "required": ["id"],
+            "type": "object",
+        },
+    },
+    "$ref": "#/$defs/Block",
+}
+
+DOCUMENTS = [
+    {"id": "fb-1", "ports": [{"id": "p-1", "type": "GPIO", "pin": 3}], "children": [{"id": "fb-2"}]},
+    {"id": "fb-1", "ports": None},
+    {"id": "block", "ports": [{"type": "I2C", "pin": 0}, {"id": 1, "extra": True, "more": 2}]},
+    {"children": [{"id": "fb-2", "children": [{"id": "fb-3", "ports": "p-1"}]}], "name": "x"},
+    {"id": "fb-1", "ports": [None, {"id": "p-1", "pin": 2.0}, {"id": "p-2", "pin": True}]},
+    ["fb-1"],
+]
+
+
+def test_errors_match_jsonschema():
+    compiled = CompiledSchema.load(SCHEMA, cache_dir=None)
+    reference = jsonschema.Draft202012Validator(SCHEMA)
+    for document in DOCUMENTS:
+        expected = sorted(
+            ("".join(f"/{p}" for p in e.absolute_path), e.validator, e.message) for e in reference.iter_errors(document)
+        )
+        assert sorted(compiled.validate(document)) == expected
+    assert compiled.validate({"id": "p-1", "type": "SPI"}, "Port") == []
+    assert [e.path for e in compiled.validate({"type": "I2C"}, "Port")] == ["", "/type"]
+
+    with pytest.raises(ValueError, match="uniqueItems"):
+        compile_schema({"$defs": {"A": {"type": "array", "uniqueItems": True}}})
+
+
+def test_compiled_schema_and_results_are_cached(tmp_path):
+    cache = str(tmp_path)
+    engine = ValidationEngine(SCHEMA, cache_dir=cache, processes=1)
+    texts = [json.dumps(d) for d in DOCUMENTS] + [json.dumps(DOCUMENTS[0]), "{"]
+    report = engine.validate(texts)
+    assert [r.ok for r in report.results] == [True, True, False, False, False, False, True, False]
+    assert report.results[-1].errors[0].keyword == "parse"
+    assert report.cached == 0
+    assert report.to_dict()["invalid"] == 5
+    engine.close()
+
+    # A new engine loads the compiled schema and skips validated documents
+    assert len([f for f in os.listdir(cache) if f.endswith(".bin")]) == 1
+    with ValidationEngine(SCHEMA, cache_dir=cache, processes=1) as engine:
+        again = engine.validate(texts)
+        assert again.cached == len(texts)
+        assert again.results == [r._replace(cached=True) for r in report.results]
+        # Against another class, documents are validated again
+        assert engine.validate(texts[:1], "Port").cached == 0
+
+
+def test_files_across_processes(tmp_path):
+    paths = []
+    for i in range(150):
+        document = {"id": f"fb-{i}", "ports": [{"id": "p-1", "type": "UART" if i % 50 else "CAN"}]}
+        path = tmp_path / f"block-{i}.{'yaml' if i % 2 else 'json'}"
+        path.write_text(json.dumps(document))
+        paths.append(path)
+    with ValidationEngine(SCHEMA, cache_dir=None, processes=2) as engine:
+        report = engine.validate_files(paths)
+    assert [r.source for r in report.invalid] == [str(paths[0]), str(paths[50]), str(paths[100])]
+    assert report.invalid[0].errors[0].path == "/ports/0/type"
@@ -0,0 +1,72 @@
+import pytest
+
+import common_data_model.datamodel.common_data_model as cdm
+from common_data_model.version_store import SdmVersionStore
+from tests.sim import SIM
+
+
+def make_sdm() -> cdm.SystemSdmSystemModelVersion:
+    return cdm.SystemSdmSystemModelVersion(
+        id="sdm-1",
+        version=0,
+        functionalModel=cdm.SystemSdmFunctionalModel(
+            id="fm-1",
+            functionalBlocks=[
+                cdm.SystemSdmFunctionalBlock(id="fb-1", name="MCU"),
+                cdm.SystemSdmFunctionalBlock(id="fb-2", name="WiFi"),
+            ],
+        ),
+        deviceModels=[cdm.SystemSdmDeviceModel(id="dm-1", mpn="R7FA6M3AH3CFB")],
+    )
+
+
+def test_edit_shares_unchanged_entities():
+    store = SdmVersionStore(make_sdm())
+    base = store.snapshot()
+
+    with store.edit() as v:
+        v.put("functionalBlocks", cdm.SystemSdmFunctionalBlock(id="fb-2", name="BLE"))
+        v.put("connections", cdm.SystemSdmConnection(id="conn-1"))
+
+    latest = store.snapshot()
+    assert store.version == latest.version == 1
+    assert [fb.name for fb in latest.functionalModel.functionalBlocks] == ["MCU", "BLE"]
+    assert latest.functionalModel.functionalBlocks[0] is base.functionalModel.functionalBlocks[0]
+    assert latest.deviceModels is base.deviceModels
+    # The base version is left untouched
+    assert [fb.name for fb in base.functionalModel.functionalBlocks] == ["MCU", "WiFi"]
+    assert base.functionalModel.connections == []
+    assert store[0] is base
+
+
+def test_random_access_and_remove():
+    store = SdmVersionStore(make_sdm())
+    for i in range(5):
+        with store.edit() as v:
+            v.put("deviceModels", cdm.SystemSdmDeviceModel(id=f"dm-{i + 2}", mpn="R7FA6M3AH3CFB"))
+    with store.edit() as v:
+        v.remove("deviceModels", "dm-1")
+
+    assert len(store) == 7
+    assert [dm.id for dm in store[3].deviceModels] == ["dm-1", "dm-2", "dm-3", "dm-4"]
+    assert [dm.id for dm in store[6].deviceModels] == ["dm-2", "dm-3", "dm-4", "dm-5", "dm-6"]
+    with pytest.raises(KeyError):
+        store[7]
+    with pytest.raises(ValueError):
+        store.commit(make_sdm())
+
+
+def test_sim_updates_create_versions():
+    sim = SIM.empty()
+    baseline = sim.snapshot()
+
+    sim.update_device_model(cdm.SystemSdmDeviceModel(id="dm-1", mpn="R7FA6M3AH3CFB"))
+    sim.update_software_model(cdm.SystemSdmSoftwareModel(id="sw-1"))
+    sim.update_software_model(cdm.SystemSdmSoftwareModel(id="sw-1", name="updated"))
+
+    assert sim.version == 3
+    assert baseline.version == 0 and baseline.softwareModels == []
+    assert [sw.name for sw in sim.model.softwareModels] == ["updated"]
+    assert sim.checkout(2).softwareModels[0].name is None
+    assert sim.snapshot() is sim.snapshot()
+    assert SIM().version == 0 and SIM().model.functionalModel is None